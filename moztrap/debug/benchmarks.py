@@ -0,0 +1,488 @@
+"""
+Benchmarks of hot paths, for comparing performance across commits.
+
+Each benchmark does its setup, then times one run of the operation under
+``Bench.timed`` (which also counts its queries), then cleans up; it's run
+``repeat`` times against whatever data is in the database. Benchmarks write to
+the database (and run as a superuser created for the purpose, deleted when
+they're done), so they refuse to run unless the data was generated with
+``manage.py generate_data``, or ``force`` is given::
+
+    results = run(repeat=5)
+
+``results`` is JSON-serializable: for each benchmark, the time of each run in
+milliseconds (the first is cold, the rest may be served from caches), their
+minimum and median, the number of queries of the first run, and the number of
+operations (e.g. requests) in each run and per second of the fastest run. A
+benchmark that doesn't apply to the current configuration is reported as
+skipped, with the reason.
+
+"""
+import datetime
+import time
+import uuid
+
+from django.conf import settings
+from django.core import signals
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.db.models import Count
+from django.test.client import Client
+
+from moztrap import model
+from moztrap.model import synthetic
+
+from .queries import QueryLog
+
+
+
+BENCHMARKS = []
+
+
+
+def benchmark(func):
+    """Register ``func`` as a benchmark, named after the function."""
+    BENCHMARKS.append(func)
+    return func
+
+
+
+class BenchmarkError(Exception):
+    """A benchmark can't be run, or its operation failed."""
+    pass
+
+
+
+class BenchmarkSkipped(BenchmarkError):
+    """A benchmark doesn't apply to the current configuration."""
+    pass
+
+
+
+class Bench(object):
+    """Shared state of a benchmark run; records timings of ``timed`` blocks."""
+    def __init__(self):
+        self.samples = []
+        self.operations = 1
+        self._user = None
+        self._client = None
+        self._productversion = None
+
+
+    def timed(self):
+        """Return context manager timing and counting queries of its block."""
+        return _Timed(self)
+
+
+    @property
+    def user(self):
+        """A superuser to run benchmarks as, created for the purpose."""
+        if self._user is None:
+            name = "benchmark-{0}".format(uuid.uuid4().hex[:8])
+            self._password = uuid.uuid4().hex
+            self._user = model.User(
+                username=name,
+                email="{0}@example.com".format(name),
+                is_superuser=True,
+                is_staff=True,
+                )
+            self._user.set_password(self._password)
+            self._user.save()
+        return self._user
+
+
+    def cleanup(self):
+        """Delete the benchmark user, if it was created."""
+        if self._user is not None:
+            self._client = None
+            self._user.delete()
+            self._user = None
+
+
+    @property
+    def client(self):
+        """A test client logged in as ``user``."""
+        if self._client is None:
+            self._client = Client()
+            if not self._client.login(
+                    username=self.user.username, password=self._password):
+                raise BenchmarkError("Couldn't log in benchmark user.")
+        return self._client
+
+
+    @property
+    def productversion(self):
+        """The product version with the most case versions."""
+        if self._productversion is None:
+            try:
+                self._productversion = model.ProductVersion.objects.annotate(
+                    num_caseversions=Count("caseversions")).order_by(
+                    "-num_caseversions")[0]
+            except IndexError:
+                raise BenchmarkError("There are no product versions.")
+        return self._productversion
+
+
+    def get(self, url, data=None):
+        """GET ``url`` with ``client``, raising BenchmarkError if not 200."""
+        response = self.client.get(url, data or {})
+        if response.status_code != 200:
+            raise BenchmarkError(
+                "GET {0} returned {1}.".format(url, response.status_code))
+        return response
+
+
+
+class _Timed(object):
+    def __init__(self, bench):
+        self.bench = bench
+        self.log = QueryLog()
+
+
+    def __enter__(self):
+        self.log.start()
+        self.start = time.time()
+        return self.log
+
+
+    def __exit__(self, exc_type, exc_value, tb):
+        elapsed = time.time() - self.start
+        self.log.stop()
+        if exc_type is None:
+            self.bench.samples.append((elapsed * 1000, self.log.count))
+
+
+
+def run(names=None, repeat=3, force=False):
+    """
+    Run benchmarks (those named in ``names``, or all) ``repeat`` times each.
+
+    Raises BenchmarkError if the database wasn't populated by
+    ``generate_data``, unless ``force`` is True. Returns dictionary of details
+    of the environment and results.
+
+    """
+    if not (force or synthetic.generated()):
+        raise BenchmarkError(
+            "The database has no data from generate_data; benchmarks write "
+            "to the database, so won't run against real data unless forced.")
+    known = dict((b.__name__, b) for b in BENCHMARKS)
+    if names:
+        unknown = set(names) - set(known)
+        if unknown:
+            raise BenchmarkError(
+                "Unknown benchmarks: {0}.".format(", ".join(sorted(unknown))))
+        benchmarks = [known[name] for name in names]
+    else:
+        benchmarks = BENCHMARKS
+
+    bench = Bench()
+    results = {}
+    try:
+        for func in benchmarks:
+            bench.samples = []
+            bench.operations = 1
+            try:
+                for i in range(repeat):
+                    func(bench)
+            except BenchmarkSkipped as e:
+                results[func.__name__] = {"skipped": str(e)}
+                continue
+            times = [t for t, queries in bench.samples]
+            results[func.__name__] = {
+                "times_ms": times,
+                "min_ms": min(times),
+                "median_ms": sorted(times)[len(times) // 2],
+                "queries": bench.samples[0][1],
+                "operations": bench.operations,
+                "per_second": (
+                    bench.operations * 1000.0 / min(times)
+                    if min(times) else None),
+                }
+    finally:
+        bench.cleanup()
+
+    return {
+        "timestamp": datetime.datetime.utcnow().isoformat(),
+        "database": connection.vendor,
+        "debug": settings.DEBUG,
+        "repeat": repeat,
+        "counts": dict(
+            (m.__name__, m.objects.count())
+            for m in [
+                model.Product,
+                model.ProductVersion,
+                model.CaseVersion,
+                model.Environment,
+                model.Run,
+                model.RunCaseVersion,
+                model.Result,
+                ]
+            ),
+        "benchmarks": results,
+        }
+
+
+
+def new_run(bench, name):
+    """Create a draft run of all suites of the largest product version."""
+    pv = bench.productversion
+    run = model.Run.objects.create(
+        productversion=pv, name=name, user=bench.user)
+    for i, suite in enumerate(pv.product.suites.all()):
+        model.RunSuite.objects.create(
+            run=run, suite=suite, order=i + 1, user=bench.user)
+    return run
+
+
+
+@benchmark
+def run_activation(bench):
+    """Activate a new run of all suites of the largest product version."""
+    run = new_run(bench, "Benchmark run")
+
+    with bench.timed():
+        run.activate(user=bench.user)
+
+    run.delete(permanent=True)
+
+
+
+@benchmark
+def results_runs(bench):
+    """The first page of the run results list."""
+    url = reverse("results_runs")
+    with bench.timed():
+        bench.get(url)
+
+
+
+@benchmark
+def runtests(bench):
+    """The first page of the run tests page of the biggest active run."""
+    try:
+        run = model.Run.objects.filter(
+            status=model.Run.STATUS.active).annotate(
+            num_cases=Count("runcaseversions")).order_by("-num_cases")[0]
+        env = run.environments.all()[0]
+    except IndexError:
+        raise BenchmarkError("There are no active runs with environments.")
+    url = reverse(
+        "runtests_run", kwargs={"run_id": run.id, "env_id": env.id})
+
+    with bench.timed():
+        bench.get(url)
+
+
+
+@benchmark
+def case_list(bench):
+    """The first page of the manage cases list, filtered by product version."""
+    url = reverse("manage_cases")
+    with bench.timed():
+        bench.get(
+            url,
+            {
+                "filter-productversion": bench.productversion.id,
+                "filter-status": "active",
+                },
+            )
+
+
+
+@benchmark
+def case_import(bench):
+    """Import 100 cases of three steps each."""
+    from moztrap.model.library.importer import Importer
+    token = uuid.uuid4().hex[:8]
+    data = {
+        "cases": [
+            {
+                "name": "Benchmark import {0} {1}".format(token, i),
+                "description": "Imported case.",
+                "steps": [
+                    {
+                        "instruction": "Do step {0}.".format(s),
+                        "expected": "Step {0} works.".format(s),
+                        }
+                    for s in range(3)
+                    ],
+                }
+            for i in range(100)
+            ],
+        }
+
+    with bench.timed():
+        Importer().import_data(bench.productversion, data)
+
+    model.Case.everything.filter(
+        versions__name__startswith="Benchmark import {0}".format(token)
+        ).delete(permanent=True)
+
+
+
+@benchmark
+def productversion_clone(bench):
+    """Add a product version cloned from the largest one."""
+    from moztrap.view.manage.productversions.forms import AddProductVersionForm
+    source = bench.productversion
+    form = AddProductVersionForm(
+        {
+            "product": source.product_id,
+            "version": "benchmark-{0}".format(uuid.uuid4().hex[:8]),
+            "codename": "",
+            "clone_from": source.id,
+            "cc_version": "0",
+            },
+        user=bench.user,
+        )
+    if not form.is_valid():
+        raise BenchmarkError(
+            "Product version clone form invalid: {0}".format(form.errors))
+
+    with bench.timed():
+        pv = form.save()
+
+    pv.delete(permanent=True)
+
+
+
+@benchmark
+def api_list(bench):
+    """The first page of case versions of a product version from the API."""
+    url = reverse(
+        "api_dispatch_list",
+        kwargs={"resource_name": "caseversion", "api_name": model.API_VERSION},
+        )
+    with bench.timed():
+        bench.get(
+            url,
+            {
+                "format": "json",
+                "productversion": bench.productversion.id,
+                "limit": 20,
+                },
+            )
+
+
+
+# rows of the list whose filter URLs are generated by filter_urls
+FILTER_URL_ROWS = 1000
+
+
+
+@benchmark
+def filter_urls(bench):
+    """Filter URLs of each row of a 1000-row list of suites (no queries)."""
+    from moztrap.view.lists.filters import filter_url
+    suites = list(model.Suite.objects.all()[:FILTER_URL_ROWS])
+    if not suites:
+        raise BenchmarkError("There are no suites.")
+    rows = [suites[i % len(suites)] for i in range(FILTER_URL_ROWS)]
+
+    with bench.timed():
+        for suite in rows:
+            filter_url("manage_cases", suite)
+    bench.operations = FILTER_URL_ROWS
+
+
+
+# requests made by each run of the ajax benchmarks
+AJAX_REQUESTS = 60
+
+
+
+def finish_request():
+    """End a request as the WSGI handler does, closing database connections."""
+    signals.request_finished.send(sender=Bench)
+
+
+
+def ajax_requests(bench, pooled):
+    """
+    Time small Ajax requests, with database connections pooled or not.
+
+    Requests alternate between tag and environment element autocompletion and
+    passing a test in a run of the largest product version created for the
+    purpose (and deleted, with its results, afterwards), closing connections
+    after each request as a web server would.
+
+    """
+    pool = getattr(connection, "pool", None)
+    if pooled and pool is None:
+        raise BenchmarkSkipped(
+            "The database ENGINE doesn't pool connections; see "
+            "moztrap.deploy.backends.")
+    run = new_run(bench, "Benchmark Ajax run")
+    try:
+        run.activate(user=bench.user)
+        try:
+            env = run.environments.all()[0]
+            rcv = run.runcaseversions.all()[0]
+        except IndexError:
+            raise BenchmarkError(
+                "The largest product version has no environments or cases "
+                "in suites.")
+        _ajax_requests(bench, pool, pooled, run, env, rcv)
+    finally:
+        model.Result.everything.filter(
+            runcaseversion__run=run).delete(permanent=True)
+        run.delete(permanent=True)
+
+
+
+def _ajax_requests(bench, pool, pooled, run, env, rcv):
+    """Time the Ajax requests of ``ajax_requests`` against ``run``."""
+    requests = [
+        (
+            bench.client.get,
+            reverse("manage_tags_autocomplete"),
+            {"text": "a"},
+            ),
+        (
+            bench.client.get,
+            reverse("manage_environment_autocomplete_elements"),
+            {"text": "Synthetic"},
+            ),
+        (
+            bench.client.post,
+            reverse(
+                "runtests_run", kwargs={"run_id": run.id, "env_id": env.id}),
+            {"action-result_pass": rcv.id},
+            ),
+        ]
+
+    size = pool.size if pool is not None else None
+    if pool is not None and not pooled:
+        pool.size = 0
+        pool.clear()
+    try:
+        finish_request()
+        with bench.timed():
+            for i in range(AJAX_REQUESTS):
+                method, url, data = requests[i % len(requests)]
+                response = method(
+                    url, data, HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+                if response.status_code != 200:
+                    raise BenchmarkError(
+                        "Ajax request to {0} returned {1}.".format(
+                            url, response.status_code))
+                finish_request()
+    finally:
+        if pool is not None:
+            pool.size = size
+    bench.operations = AJAX_REQUESTS
+
+
+
+@benchmark
+def ajax_unpooled(bench):
+    """Small Ajax requests, opening a database connection for each."""
+    ajax_requests(bench, pooled=False)
+
+
+
+@benchmark
+def ajax_pooled(bench):
+    """Small Ajax requests, reusing pooled database connections."""
+    ajax_requests(bench, pooled=True)
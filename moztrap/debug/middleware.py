@@ -1,7 +1,18 @@
+import logging
+import random
+
 from django.conf import settings
 from django.core.exceptions import MiddlewareNotUsed
+from django.core.urlresolvers import resolve, Resolver404
 from django.http import HttpResponse
 
+from . import profiling
+from .queries import QueryLog
+
+
+
+logger = logging.getLogger("moztrap.debug.queries")
+
 
 
 class AjaxTracebackMiddleware(object):
@@ -14,3 +25,111 @@ class AjaxTracebackMiddleware(object):
         if request.is_ajax():
             import traceback
             return HttpResponse(traceback.format_exc().replace("\n", "<br>\n"))
+
+
+
+class QueryCountMiddleware(object):
+    """
+    Log query count and time for a random sample of requests.
+
+    A fraction ``settings.QUERY_LOG_SAMPLE_RATE`` of requests is logged (at
+    INFO level, to the "moztrap.debug.queries" logger) with the view name,
+    number of queries and their total time. Query shapes repeated at least
+    ``settings.QUERY_LOG_REPEAT_THRESHOLD`` times in a request (likely N+1
+    patterns) are logged as warnings, worst first, up to
+    ``settings.QUERY_LOG_TOP`` of them; so are requests to views over their
+    budget in ``settings.QUERY_BUDGETS`` (keyed by URL name).
+
+    Not used at all if the sample rate is zero.
+
+    """
+    def __init__(self):
+        if not settings.QUERY_LOG_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+
+
+    def process_request(self, request):
+        if random.random() < settings.QUERY_LOG_SAMPLE_RATE:
+            request._query_log = QueryLog().start()
+
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, "_query_log"):
+            request._query_log_view = "%s.%s" % (
+                view_func.__module__,
+                getattr(view_func, "__name__", view_func.__class__.__name__),
+                )
+
+
+    def process_exception(self, request, exception):
+        log = getattr(request, "_query_log", None)
+        if log is not None:
+            log.stop()
+
+
+    def process_response(self, request, response):
+        log = getattr(request, "_query_log", None)
+        if log is None:
+            return response
+        log.stop()
+
+        view = getattr(request, "_query_log_view", request.path)
+        logger.info(
+            "%s %s: %s queries in %.1f ms",
+            view, request.path, log.count, log.time * 1000)
+
+        repeated = log.repeated(settings.QUERY_LOG_REPEAT_THRESHOLD)
+        for fp, count, total, sql in repeated[:settings.QUERY_LOG_TOP]:
+            logger.warning(
+                "%s: query repeated %s times (%.1f ms): %s",
+                view, count, total * 1000, fp)
+
+        try:
+            url_name = resolve(request.path_info).url_name
+        except Resolver404:
+            url_name = None
+        budget = settings.QUERY_BUDGETS.get(url_name)
+        if budget is not None and log.count > budget:
+            logger.warning(
+                "%s: %s queries, over budget of %s", view, log.count, budget)
+
+        return response
+
+
+
+class ProfileMiddleware(object):
+    """
+    Profile requests that ask for it, spooling the profiles for staff to view.
+
+    See ``moztrap.debug.profiling`` for which requests are profiled. Profiling
+    starts in ``process_view``, so this should come last in
+    ``MIDDLEWARE_CLASSES`` to leave the ``process_view`` of other middleware
+    out of the profile; Django still calls the view, so exception middleware
+    runs as usual, and the profile is spooled (with the status of the error
+    response, if the view raised) in ``process_response``.
+
+    Not used at all if ``settings.PROFILE_SPOOL_DIR`` is not set.
+
+    """
+    def __init__(self):
+        if not settings.PROFILE_SPOOL_DIR:
+            raise MiddlewareNotUsed
+
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if profiling.requested(request):
+            request._profile = profiling.Capture(request, view_func)
+            request._profile.start()
+
+
+    def process_exception(self, request, exception):
+        capture = getattr(request, "_profile", None)
+        if capture is not None:
+            capture.stop()
+
+
+    def process_response(self, request, response):
+        capture = getattr(request, "_profile", None)
+        if capture is None:
+            return response
+        return capture.save(response)
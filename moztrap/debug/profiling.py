@@ -0,0 +1,240 @@
+"""
+Capture of profiles of individual requests to a spool directory.
+
+A request is profiled (see ``ProfileMiddleware``) if it's made by a staff user
+with a ``_profile`` query parameter, or by anyone with an ``X-MozTrap-Profile``
+header matching ``settings.PROFILE_SECRET``. The view (and the rendering of
+its template response) is run under cProfile, and the profile and a log of
+the SQL queries run are written to ``settings.PROFILE_SPOOL_DIR``, where the
+staff-only views in ``moztrap.debug.views`` can list, render and download
+them. Nothing is profiled if ``PROFILE_SPOOL_DIR`` is not set.
+
+Each capture is two files named by its id: ``<id>.prof``, in the format
+written by ``cProfile.Profile.dump_stats`` (readable with ``pstats``), and
+``<id>.json``, holding details of the request and its queries.
+
+"""
+import cProfile
+import datetime
+import json
+import os
+import pstats
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+
+from .queries import QueryLog
+
+
+
+QUERY_PARAM = "_profile"
+HEADER = "HTTP_X_MOZTRAP_PROFILE"
+
+ID_RE = re.compile(r"^[\w-]+$")
+
+# maps sort order of call tables to the row key sorted on
+SORTS = {
+    "cumulative": "cumtime",
+    "tottime": "tottime",
+    "calls": "calls",
+    }
+
+
+
+class ProfileNotFound(Exception):
+    """No capture with the given id in the spool directory."""
+    pass
+
+
+
+def requested(request):
+    """Return True if ``request`` asks for, and is allowed, profiling."""
+    secret = settings.PROFILE_SECRET
+    header = request.META.get(HEADER)
+    if secret and header and constant_time_compare(header, secret):
+        return True
+    user = getattr(request, "user", None)
+    return (
+        QUERY_PARAM in request.GET and
+        user is not None and
+        user.is_active and
+        user.is_staff
+        )
+
+
+
+class Capture(object):
+    """
+    The profile and query log of one request, taken around its view.
+
+    ``ProfileMiddleware`` starts a capture just before Django calls the view
+    and stops it once the view (and the rendering of its template response)
+    is done, or has raised. Django calls the view as usual, so exception
+    middleware (e.g. rolling back the transaction) runs as for any other
+    request.
+
+    """
+    def __init__(self, request, view_func):
+        self.request = request
+        self.view = "%s.%s" % (
+            view_func.__module__,
+            getattr(view_func, "__name__", view_func.__class__.__name__))
+        self.profiler = cProfile.Profile()
+        self.log = QueryLog(statements=True)
+        self.started = None
+        self.elapsed = None
+
+
+    def start(self):
+        """Start profiling and recording queries."""
+        self.started = datetime.datetime.now()
+        self._start = time.time()
+        self.log.start()
+        self.profiler.enable()
+
+
+    def stop(self):
+        """Stop profiling and recording queries; later calls do nothing."""
+        if self.elapsed is None:
+            self.profiler.disable()
+            self.log.stop()
+            self.elapsed = time.time() - self._start
+
+
+    def save(self, response):
+        """
+        Spool the capture of the request answered by ``response``.
+
+        The id of the capture is set in the response's ``X-MozTrap-Profile-Id``
+        header; returns the response.
+
+        """
+        self.stop()
+        user = getattr(self.request, "user", None)
+        if user is not None and user.is_authenticated():
+            username = user.username
+        else:
+            username = None
+        profile_id = save(
+            self.profiler,
+            {
+                "path": self.request.get_full_path(),
+                "method": self.request.method,
+                "view": self.view,
+                "user": username,
+                "status": response.status_code,
+                "started": self.started.isoformat(),
+                "time": self.elapsed * 1000,
+                "query_count": self.log.count,
+                "query_time": self.log.time * 1000,
+                "queries": [
+                    {"sql": sql, "time": duration * 1000}
+                    for sql, duration in self.log.statements
+                    ],
+                },
+            )
+        response["X-MozTrap-Profile-Id"] = profile_id
+        return response
+
+
+
+def path(profile_id, ext):
+    """Return path of ``profile_id`` capture file with extension ``ext``."""
+    if not ID_RE.match(profile_id):
+        raise ProfileNotFound(profile_id)
+    return os.path.join(settings.PROFILE_SPOOL_DIR, profile_id + ext)
+
+
+
+def save(profiler, details):
+    """Write ``profiler`` stats and ``details`` to spool; return capture id."""
+    spool = settings.PROFILE_SPOOL_DIR
+    if not os.path.isdir(spool):
+        os.makedirs(spool)
+    profile_id = "%s-%s" % (
+        datetime.datetime.now().strftime("%Y%m%dT%H%M%S"),
+        uuid.uuid4().hex[:8],
+        )
+    details["id"] = profile_id
+    profiler.dump_stats(path(profile_id, ".prof"))
+    with open(path(profile_id, ".json"), "w") as f:
+        json.dump(details, f)
+    prune()
+    return profile_id
+
+
+
+def prune():
+    """Delete oldest captures beyond ``settings.PROFILE_SPOOL_MAX``."""
+    ids = [p["id"] for p in captures()]
+    for profile_id in ids[settings.PROFILE_SPOOL_MAX:]:
+        for ext in [".json", ".prof"]:
+            try:
+                os.remove(path(profile_id, ext))
+            except OSError:
+                pass
+
+
+
+def captures():
+    """Return list of details (without queries) of captures, newest first."""
+    spool = settings.PROFILE_SPOOL_DIR
+    if not spool or not os.path.isdir(spool):
+        return []
+    found = []
+    for filename in os.listdir(spool):
+        profile_id, ext = os.path.splitext(filename)
+        if ext != ".json":
+            continue
+        try:
+            details = load(profile_id)
+        except ProfileNotFound:
+            continue
+        details.pop("queries", None)
+        found.append(details)
+    found.sort(key=lambda d: d["id"], reverse=True)
+    return found
+
+
+
+def load(profile_id):
+    """Return details of capture ``profile_id``."""
+    try:
+        with open(path(profile_id, ".json")) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        raise ProfileNotFound(profile_id)
+
+
+
+def top(profile_id, limit, sort="cumulative"):
+    """
+    Return top ``limit`` functions of capture ``profile_id`` by ``sort``.
+
+    ``sort`` is one of "cumulative", "tottime" or "calls". Each function is a
+    dictionary with keys "function" (a "file:line(name)" string), "calls",
+    "primitive_calls", "tottime" and "cumtime" (times in milliseconds).
+
+    """
+    try:
+        stats = pstats.Stats(path(profile_id, ".prof"))
+    except (IOError, EOFError, ValueError):
+        raise ProfileNotFound(profile_id)
+
+    rows = []
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        rows.append(
+            {
+                "function": pstats.func_std_string(func),
+                "calls": nc,
+                "primitive_calls": cc,
+                "tottime": tt * 1000,
+                "cumtime": ct * 1000,
+                }
+            )
+    key = SORTS[sort]
+    rows.sort(key=lambda r: r[key], reverse=True)
+    return rows[:limit]
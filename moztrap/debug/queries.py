@@ -0,0 +1,216 @@
+"""
+Counting, timing and fingerprinting of SQL queries.
+
+``QueryLog`` records the queries run on this thread while it's active::
+
+    with QueryLog() as log:
+        do_something()
+    log.count, log.time, log.repeated()
+
+Statements are fingerprinted by their shape (literals and parameter lists
+replaced by placeholders), so the same query run once per object in a loop (an
+N+1 pattern) shows up in ``repeated()`` as one shape with a high count.
+
+``query_budget`` asserts that a block of code runs no more than a given number
+of queries; a budget can also be looked up by URL name in
+``settings.QUERY_BUDGETS``.
+
+Recording wraps cursors of connections only while a log is active on the
+thread, so the cost when no log is active is one attribute lookup per cursor.
+
+"""
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+
+
+_state = threading.local()
+
+
+
+def active_logs():
+    """Return list of QueryLogs active on this thread."""
+    try:
+        return _state.logs
+    except AttributeError:
+        _state.logs = []
+        return _state.logs
+
+
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+
+def fingerprint(sql):
+    """Return ``sql`` with literals and parameter lists made placeholders."""
+    sql = _LITERALS.sub("?", sql)
+    sql = _LISTS.sub("(...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+
+class RecordingCursorWrapper(object):
+    """Wraps a cursor, recording executed statements in active QueryLogs."""
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+
+    def execute(self, sql, params=()):
+        start = time.time()
+        try:
+            return self.cursor.execute(sql, params)
+        finally:
+            record(sql, time.time() - start)
+
+
+    def executemany(self, sql, param_list):
+        start = time.time()
+        try:
+            return self.cursor.executemany(sql, param_list)
+        finally:
+            record(sql, time.time() - start)
+
+
+
+def record(sql, duration):
+    """Record a statement taking ``duration`` seconds in all active logs."""
+    for log in active_logs():
+        log.record(sql, duration)
+
+
+
+def install(connection):
+    """Make ``connection`` (this thread's) wrap cursors while logs are active."""
+    if getattr(connection, "_query_log_installed", False):
+        return
+    original = connection.cursor
+
+    def cursor():
+        c = original()
+        if active_logs():
+            c = RecordingCursorWrapper(c)
+        return c
+
+    connection.cursor = cursor
+    connection._query_log_installed = True
+
+
+
+class QueryLog(object):
+    """
+    Records count, total time and shapes of queries run on this thread.
+
+    If ``statements`` is True, also keeps a list of (statement, duration) of
+    every query run, in order.
+
+    """
+    def __init__(self, statements=False):
+        self.count = 0
+        self.time = 0.0
+        # maps fingerprint to [count, total time, first statement]
+        self.shapes = {}
+        self.statements = [] if statements else None
+
+
+    def start(self):
+        """Start recording queries."""
+        for connection in connections.all():
+            install(connection)
+        active_logs().append(self)
+        return self
+
+
+    def stop(self):
+        """Stop recording queries."""
+        logs = active_logs()
+        if self in logs:
+            logs.remove(self)
+
+
+    def __enter__(self):
+        return self.start()
+
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+    def record(self, sql, duration):
+        """Record one statement that took ``duration`` seconds."""
+        self.count += 1
+        self.time += duration
+        shape = self.shapes.setdefault(fingerprint(sql), [0, 0.0, sql])
+        shape[0] += 1
+        shape[1] += duration
+        if self.statements is not None:
+            self.statements.append((sql, duration))
+
+
+    def repeated(self, threshold=2):
+        """
+        Return shapes run at least ``threshold`` times, most frequent first.
+
+        Each is a tuple (fingerprint, count, total time, first statement).
+
+        """
+        shapes = [
+            (fp, count, total, sql)
+            for fp, (count, total, sql) in self.shapes.items()
+            if count >= threshold
+            ]
+        shapes.sort(key=lambda s: (-s[1], -s[2]))
+        return shapes
+
+
+
+class QueryBudgetExceeded(AssertionError):
+    """More queries were run than the budget allows."""
+    pass
+
+
+
+class query_budget(object):
+    """
+    Context manager asserting the block runs at most ``budget`` queries.
+
+    ``budget`` is a number of queries, or a URL name to look up in
+    ``settings.QUERY_BUDGETS``. Raises ``QueryBudgetExceeded`` on exit if the
+    budget was exceeded; the message lists any repeated query shapes.
+
+    """
+    def __init__(self, budget):
+        if isinstance(budget, basestring):
+            budget = settings.QUERY_BUDGETS[budget]
+        self.budget = budget
+        self.log = QueryLog()
+
+
+    def __enter__(self):
+        self.log.start()
+        return self.log
+
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.log.stop()
+        if exc_type is None and self.log.count > self.budget:
+            lines = [
+                "%s queries run, budget is %s." % (
+                    self.log.count, self.budget)]
+            for fp, count, total, sql in self.log.repeated():
+                lines.append("%s x %s" % (count, fp))
+            raise QueryBudgetExceeded("\n".join(lines))
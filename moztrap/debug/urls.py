@@ -0,0 +1,20 @@
+"""
+Debug URLconf.
+
+"""
+from django.conf.urls.defaults import patterns, url
+
+
+
+urlpatterns = patterns(
+    "moztrap.debug.views",
+
+    # profiles ---------------------------------------------------------------
+    url(r"^profiles/$", "profiles", name="debug_profiles"),
+    url(r"^profiles/(?P<profile_id>[\w-]+)/$",
+        "profile_details",
+        name="debug_profile_details"),
+    url(r"^profiles/(?P<profile_id>[\w-]+)/download/$",
+        "profile_download",
+        name="debug_profile_download"),
+    )
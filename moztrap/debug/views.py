@@ -0,0 +1,83 @@
+"""
+Staff-only views of spooled request profiles.
+
+"""
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.template.response import TemplateResponse
+from django.views.decorators.cache import never_cache
+
+from moztrap.view.users.decorators import staff_required
+
+from . import profiling
+
+
+
+def get_limit(request):
+    """Return number of call table rows requested, or the default."""
+    try:
+        limit = int(request.GET.get("limit", settings.PROFILE_TOP))
+    except ValueError:
+        limit = settings.PROFILE_TOP
+    return max(limit, 1)
+
+
+
+@never_cache
+@staff_required
+def profiles(request):
+    """List spooled profiles, newest first."""
+    if not settings.PROFILE_SPOOL_DIR:
+        raise Http404
+    return TemplateResponse(
+        request,
+        "debug/profiles.html",
+        {"profiles": profiling.captures()},
+        )
+
+
+
+@never_cache
+@staff_required
+def profile_details(request, profile_id):
+    """Show top-N call table and queries of a spooled profile."""
+    if not settings.PROFILE_SPOOL_DIR:
+        raise Http404
+    sort = request.GET.get("sort", "cumulative")
+    if sort not in profiling.SORTS:
+        sort = "cumulative"
+    limit = get_limit(request)
+    try:
+        details = profiling.load(profile_id)
+        rows = profiling.top(profile_id, limit, sort)
+    except profiling.ProfileNotFound:
+        raise Http404
+    return TemplateResponse(
+        request,
+        "debug/profile_details.html",
+        {
+            "profile": details,
+            "rows": rows,
+            "sort": sort,
+            "sorts": sorted(profiling.SORTS),
+            "limit": limit,
+            },
+        )
+
+
+
+@never_cache
+@staff_required
+def profile_download(request, profile_id):
+    """Download a spooled profile in ``pstats`` format."""
+    if not settings.PROFILE_SPOOL_DIR:
+        raise Http404
+    try:
+        with open(profiling.path(profile_id, ".prof"), "rb") as f:
+            data = f.read()
+    except (profiling.ProfileNotFound, IOError):
+        raise Http404
+    response = HttpResponse(data, content_type="application/octet-stream")
+    response["Content-Disposition"] = (
+        "attachment; filename=%s.prof" % profile_id)
+    return response
@@ -0,0 +1,8 @@
+"""
+Database backends keeping connections open in a pool between requests.
+
+Use ``moztrap.deploy.backends.mysql`` (or ``moztrap.deploy.backends.sqlite3``
+for local testing) as the ``ENGINE`` of a database in ``DATABASES``; see
+``moztrap.deploy.backends.pool``.
+
+"""
@@ -0,0 +1,13 @@
+"""
+MySQL database backend with pooled connections.
+
+"""
+from django.db.backends.mysql.base import *
+from django.db.backends.mysql import base
+
+from ..pool import PooledDatabaseWrapper
+
+
+
+class DatabaseWrapper(PooledDatabaseWrapper, base.DatabaseWrapper):
+    pass
@@ -0,0 +1,157 @@
+"""
+Pooling of database connections between requests.
+
+Django closes every database connection at the end of each request, so each
+request pays for opening a new one. ``PooledDatabaseWrapper`` instead hands
+the connection back to a per-process ``ConnectionPool``, and the next
+request on any thread takes it from there. These settings of a database in
+``DATABASES`` configure its pool:
+
+``POOL_SIZE``
+    Most idle connections kept (default 5); 0 turns pooling off.
+
+``POOL_MAX_AGE``
+    Connections older than this many seconds are closed rather than reused
+    (default 300), so they get replaced before the server times them out.
+
+A connection is rolled back when handed back, so it carries no open
+transaction (or, with MySQL's repeatable reads, no stale snapshot) into the
+next request, and it's checked with a trivial query when taken from the
+pool; connections failing the check are closed and another one tried.
+
+"""
+import threading
+import time
+
+
+
+DEFAULT_POOL_SIZE = 5
+DEFAULT_POOL_MAX_AGE = 300
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+
+def get_pool(alias, settings_dict):
+    """Return the ``ConnectionPool`` for database ``alias``."""
+    with _pools_lock:
+        if alias not in _pools:
+            _pools[alias] = ConnectionPool(
+                settings_dict.get("POOL_SIZE", DEFAULT_POOL_SIZE),
+                settings_dict.get("POOL_MAX_AGE", DEFAULT_POOL_MAX_AGE),
+                )
+        return _pools[alias]
+
+
+
+def is_usable(raw):
+    """Return True if DB-API connection ``raw`` can run a query."""
+    try:
+        cursor = raw.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchall()
+        cursor.close()
+    except Exception:
+        return False
+    return True
+
+
+
+def discard(raw):
+    """Close DB-API connection ``raw``, ignoring errors."""
+    try:
+        raw.close()
+    except Exception:
+        pass
+
+
+
+class ConnectionPool(object):
+    """Idle DB-API connections, with the time each was opened."""
+    def __init__(self, size, max_age):
+        self.size = size
+        self.max_age = max_age
+        self._idle = []
+        self._lock = threading.Lock()
+
+
+    def expired(self, opened):
+        """Return True if a connection ``opened`` at this time is too old."""
+        return time.time() - opened > self.max_age
+
+
+    def checkout(self):
+        """Return (connection, opened) of a usable idle connection, or None."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                raw, opened = self._idle.pop()
+            if self.expired(opened) or not is_usable(raw):
+                discard(raw)
+                continue
+            return raw, opened
+
+
+    def checkin(self, raw, opened):
+        """Roll back and keep connection ``raw``; close it if not wanted."""
+        if not self.expired(opened):
+            try:
+                raw.rollback()
+            except Exception:
+                pass
+            else:
+                with self._lock:
+                    if len(self._idle) < self.size:
+                        self._idle.append((raw, opened))
+                        return
+        discard(raw)
+
+
+    def clear(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for raw, opened in idle:
+            discard(raw)
+
+
+    def __len__(self):
+        return len(self._idle)
+
+
+
+class PooledDatabaseWrapper(object):
+    """
+    Mixin for a backend's ``DatabaseWrapper`` that pools its connections.
+
+    Must come before the backend's ``DatabaseWrapper`` in the bases.
+
+    """
+    def __init__(self, *args, **kwargs):
+        super(PooledDatabaseWrapper, self).__init__(*args, **kwargs)
+        self.pool = get_pool(self.alias, self.settings_dict)
+        self._opened = None
+
+
+    def _cursor(self):
+        """Take a connection from the pool if not connected, else open one."""
+        if self.connection is None:
+            pooled = self.pool.checkout()
+            if pooled is not None:
+                self.connection, self._opened = pooled
+        raw = self.connection
+        cursor = super(PooledDatabaseWrapper, self)._cursor()
+        if self.connection is not raw:
+            self._opened = time.time()
+        return cursor
+
+
+    def close(self):
+        """Hand the connection back to the pool."""
+        self.validate_thread_sharing()
+        if self.connection is not None:
+            raw, self.connection = self.connection, None
+            self.pool.checkin(raw, self._opened)
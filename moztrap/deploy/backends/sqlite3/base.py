@@ -0,0 +1,16 @@
+"""
+SQLite database backend with pooled connections, for local testing.
+
+"""
+from django.db.backends.sqlite3.base import *
+from django.db.backends.sqlite3 import base
+
+from ..pool import PooledDatabaseWrapper
+
+
+
+class DatabaseWrapper(PooledDatabaseWrapper, base.DatabaseWrapper):
+    def close(self):
+        """Ignore closing an in-memory database, which would destroy it."""
+        if self.settings_dict["NAME"] != ":memory:":
+            super(DatabaseWrapper, self).close()
@@ -0,0 +1,105 @@
+"""
+Database router sending staleness-tolerant reads to read replicas.
+
+By default every query goes to the ``default`` (primary) database. Within
+``replica_reads(alias)`` (see ``moztrap.view.utils.replica.ReplicaMiddleware``,
+which uses it for views marked ``read_replica``), reads go to the replica
+``alias`` instead, until the first write: from then on, reads go to the
+primary too, so anything read after a write sees it.
+
+Writes always go to the primary, and so do reads of ``PRIMARY_APPS`` (whose
+rows are read back immediately after being written by another request, e.g.
+sessions). Replicas are expected to be copies of the primary maintained by
+database replication, so ``syncdb`` and migrations only run on the primary.
+
+"""
+from contextlib import contextmanager
+import threading
+import time
+
+from django.conf import settings
+from django.db.utils import DEFAULT_DB_ALIAS
+
+
+
+# reads of these apps always go to the primary
+PRIMARY_APPS = set(["sessions"])
+
+
+_state = threading.local()
+
+
+
+def current_replica():
+    """Return alias of the replica reads currently go to, or None."""
+    return getattr(_state, "replica", None)
+
+
+
+def replica_epoch():
+    """
+    Return a number that changes every ``REPLICA_LAG_SECONDS``, or None.
+
+    Returns None unless reads go to a replica. A response read from a replica
+    may be stale even though the cache generations its ETag is derived from
+    are current; putting this in the ETag too bounds how long a client can
+    keep revalidating a stale response.
+
+    """
+    if current_replica() is None:
+        return None
+    return int(time.time() // settings.REPLICA_LAG_SECONDS)
+
+
+
+def use_replica(alias):
+    """Send this thread's reads to replica ``alias`` (None for primary)."""
+    _state.replica = alias
+
+
+
+def reset():
+    """Send reads to the primary; return True if there were writes since."""
+    wrote = getattr(_state, "wrote", False)
+    _state.replica = None
+    _state.wrote = False
+    return wrote
+
+
+
+@contextmanager
+def replica_reads(alias):
+    """Send reads within the block to replica ``alias``, until a write."""
+    previous = current_replica()
+    use_replica(alias)
+    try:
+        yield
+    finally:
+        use_replica(previous)
+
+
+
+class ReplicaRouter(object):
+    """Routes reads to the current replica, if any, and writes to primary."""
+    def db_for_read(self, model, **hints):
+        """Return the current replica, unless ``model`` is primary-only."""
+        if model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        return current_replica() or DEFAULT_DB_ALIAS
+
+
+    def db_for_write(self, model, **hints):
+        """Return the primary, and send the rest of the reads there too."""
+        _state.replica = None
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Replicas hold the same data, so any relation is allowed."""
+        return True
+
+
+    def allow_syncdb(self, db, model):
+        """Only create tables on the primary."""
+        return db == DEFAULT_DB_ALIAS
@@ -10,7 +10,8 @@ from .mtmodel import ConcurrencyError
 from .core.models import Product, ProductVersion, ApiKey
 from .core.auth import User, Role, Permission
 from .environments.models import Environment, Profile, Element, Category
-from .execution.models import Run, RunSuite, RunCaseVersion, Result, StepResult
+from .execution.models import (
+    Run, RunSuite, RunCaseVersion, Result, StepResult, WorkItem)
 from .library.bulk import BulkParser
 from .library.models import (
     Case, CaseVersion, CaseAttachment, CaseStep, Suite, SuiteCase)
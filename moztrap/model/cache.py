@@ -0,0 +1,355 @@
+"""
+Caching of data derived from models, invalidated by generation counters.
+
+Every model has a *model generation*, bumped whenever any instance of it is
+saved, deleted or undeleted, or a queryset of it is updated or deleted; and a
+*bulk generation*, bumped only by queryset-level changes. Every instance has
+an *object generation*, bumped whenever that instance is saved, deleted or
+undeleted. MTModel and MTQuerySet bump these automatically.
+
+An instance can also have named *related generations*, for data related to
+it that its object generation doesn't cover (e.g. a run's results); these
+are bumped explicitly, with ``bump_related``, by the code changing that data.
+
+Cached values are keyed on the generations of the models and instances they
+depend on, so when any of those change, the next lookup misses and the value
+is recomputed; stale entries are never deleted explicitly, they just age out
+of the cache backend.
+
+Changes are bumped as they're written, but until the transaction commits
+other connections still read the data as it was, and could cache it under
+the new generations. So generations bumped inside a transaction are bumped
+again once it's over: ``flush_pending`` does that, and
+``moztrap.view.utils.conditional.CacheBumpMiddleware`` calls it after each
+request's transaction; code committing outside a request should call it
+after committing.
+
+Reads from a read replica (see ``moztrap.deploy.routers``) may lag behind the
+generations, which are bumped as the primary is written; so values computed
+while reads go to a replica are returned but not cached.
+
+The cache backend is the ``settings.MODEL_CACHE`` alias in ``CACHES``; use
+locmem for development and tests, and memcached (or anything speaking its
+protocol) in production so all processes share generations.
+
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import get_cache
+from django.db import transaction
+from django.db.models import Model, get_model
+from django.utils.encoding import smart_str
+
+from moztrap.deploy import routers
+
+
+
+_backend = None
+
+# generation keys bumped inside a transaction, per thread; see flush_pending
+_pending = threading.local()
+
+# generation counters should outlive the entries keyed on them
+GENERATION_TIMEOUT = 60 * 60 * 24 * 30
+
+
+
+def get_backend():
+    """Return the cache backend used for model-derived data."""
+    global _backend
+    if _backend is None:
+        _backend = get_cache(settings.MODEL_CACHE)
+    return _backend
+
+
+
+def reset_backend():
+    """Forget the configured backend; used when settings change in tests."""
+    global _backend
+    _backend = None
+
+
+
+class CacheStats(object):
+    """Thread-safe per-namespace hit and miss counters for this process."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+
+    def record(self, namespace, hit):
+        """Record a hit (or miss, if ``hit`` is False) in ``namespace``."""
+        with self._lock:
+            counts = self._counts.setdefault(namespace, [0, 0])
+            counts[0 if hit else 1] += 1
+
+
+    def get(self, namespace=None):
+        """
+        Return dict with ``hits``, ``misses`` and ``hit_rate``.
+
+        Totals for all namespaces are returned if ``namespace`` is None.
+
+        """
+        with self._lock:
+            if namespace is None:
+                hits = sum(c[0] for c in self._counts.values())
+                misses = sum(c[1] for c in self._counts.values())
+            else:
+                hits, misses = self._counts.get(namespace, [0, 0])
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": float(hits) / total if total else 0.0,
+            }
+
+
+    def namespaces(self):
+        """Return sorted list of namespaces with recorded lookups."""
+        with self._lock:
+            return sorted(self._counts)
+
+
+    def reset(self):
+        """Clear all counters."""
+        with self._lock:
+            self._counts.clear()
+
+
+
+stats = CacheStats()
+
+
+
+def _label(model):
+    """Return the label used in generation keys for ``model``."""
+    # proxies share generations with the model they proxy
+    opts = (model._meta.concrete_model or model)._meta
+    return "%s.%s" % (opts.app_label, opts.object_name.lower())
+
+
+
+def _generation_key(dependency):
+    """
+    Return the generation key for a dependency.
+
+    A dependency is a model class or "app_label.ModelName" string (its model
+    generation), an instance (its object generation, plus the bulk generation
+    of its model), a ``(model, pk)`` tuple, treated like an instance, or a
+    ``(model, pk, name)`` tuple (the instance's related generation ``name``,
+    plus the bulk generation of its model).
+
+    """
+    if isinstance(dependency, basestring):
+        app_label, model_name = dependency.split(".", 1)
+        model = get_model(app_label, model_name)
+        if model is None:
+            raise ValueError("Unknown model %r." % dependency)
+        return _generation_key(model)
+    if isinstance(dependency, tuple):
+        model, pk = dependency[:2]
+        label = _label(model)
+        key = "gen:%s:%s" % (label, pk)
+        if len(dependency) > 2:
+            key = "%s:%s" % (key, dependency[2])
+        return ["gen:%s:bulk" % label, key]
+    if isinstance(dependency, Model):
+        return _generation_key((dependency.__class__, dependency.pk))
+    return ["gen:%s" % _label(dependency)]
+
+
+
+def _initial_generation():
+    """
+    Return a starting value for a generation counter that's gone missing.
+
+    Using the clock rather than zero means a counter that was evicted and
+    recreated can't land on a value that stale entries were keyed on.
+
+    """
+    return int(time.time() * 1000)
+
+
+
+def generations(dependencies):
+    """Return list of current generation values for ``dependencies``."""
+    keys = []
+    for dependency in dependencies:
+        keys.extend(_generation_key(dependency))
+    return _generations(keys)
+
+
+
+def object_generations(model, pks):
+    """
+    Return (bulk generation, list of object generations) of ``model``'s ``pks``.
+
+    Cheaper than ``generations`` of many ``(model, pk)`` tuples: the bulk
+    generation is looked up only once, and missing object generations aren't
+    created; an instance that's never been bumped (or whose counter was
+    evicted) has generation None, which its next bump changes.
+
+    """
+    label = _label(model)
+    bulk = _generations(["gen:%s:bulk" % label])[0]
+    keys = ["gen:%s:%s" % (label, pk) for pk in pks]
+    values = get_backend().get_many(keys)
+    return bulk, [values.get(key) for key in keys]
+
+
+
+def _generations(keys):
+    """Return list of current values of generation counters ``keys``."""
+    if not keys:
+        return []
+
+    backend = get_backend()
+    values = backend.get_many(keys)
+    missing = [k for k in keys if k not in values]
+    if missing:
+        initial = _initial_generation()
+        for key in missing:
+            # another process may have beaten us to it
+            if not backend.add(key, initial, timeout=GENERATION_TIMEOUT):
+                values[key] = backend.get(key, initial)
+            else:
+                values[key] = initial
+    return [values[k] for k in keys]
+
+
+
+def _bump(key):
+    """Increment generation counter ``key``, creating it if needed."""
+    backend = get_backend()
+    try:
+        backend.incr(key)
+    except ValueError:
+        added = backend.add(
+            key, _initial_generation(), timeout=GENERATION_TIMEOUT)
+        if not added:
+            backend.incr(key)
+
+
+
+def bump(model, pks=None):
+    """
+    Record a change to instances of ``model``.
+
+    If ``pks`` is given, the object generation of each of those instances is
+    bumped; otherwise the change is taken to be to an unknown set of
+    instances, and the bulk generation is bumped. The model generation is
+    bumped in either case.
+
+    """
+    label = _label(model)
+    keys = ["gen:%s" % label]
+    if pks is None:
+        keys.append("gen:%s:bulk" % label)
+    else:
+        keys.extend("gen:%s:%s" % (label, pk) for pk in pks)
+    _bump_all(keys)
+
+
+
+def bump_related(model, pks, name):
+    """Record a change to related data ``name`` of ``model``'s ``pks``."""
+    label = _label(model)
+    _bump_all(["gen:%s:%s:%s" % (label, pk, name) for pk in pks])
+
+
+
+def _bump_all(keys):
+    """Bump generation counters ``keys``, and again after the transaction."""
+    for key in keys:
+        _bump(key)
+    if transaction.is_managed():
+        _pending.__dict__.setdefault("keys", set()).update(keys)
+
+
+
+def flush_pending():
+    """
+    Bump again the generations bumped inside the transaction just ended.
+
+    Any value another connection cached from the pre-commit data, under the
+    generations bumped for the change, is then never looked up again.
+
+    """
+    keys = _pending.__dict__.pop("keys", ())
+    for key in keys:
+        _bump(key)
+
+
+
+def discard_pending():
+    """Forget generations bumped inside transactions without bumping them."""
+    _pending.__dict__.pop("keys", None)
+
+
+
+def make_key(key, dependencies):
+    """
+    Return full cache key for ``key`` with ``dependencies``' generations.
+
+    Long keys are hashed to fit memcached's key length limit.
+
+    """
+    full = "%s:%s" % (
+        smart_str(key), ".".join(str(g) for g in generations(dependencies)))
+    if len(full) > 200 or " " in full:
+        full = "%s:%s" % (
+            smart_str(key).split(":", 1)[0], hashlib.md5(full).hexdigest())
+    return "mt:%s" % full
+
+
+
+def fingerprint(dependencies, *parts):
+    """
+    Return hex digest of ``dependencies``' generations and any ``parts``.
+
+    The digest changes whenever any of the dependencies do, so it can serve
+    as an ETag for a response derived only from them (and ``parts``).
+
+    """
+    data = ":".join(
+        [".".join(str(g) for g in generations(dependencies))]
+        + [smart_str(part) for part in parts]
+        )
+    return hashlib.md5(data).hexdigest()
+
+
+
+def cached(key, dependencies, compute, timeout=None):
+    """
+    Return cached value for ``key``, computing and caching it if needed.
+
+    ``key`` is a string unique to the value being cached; the part before
+    the first colon is its namespace for ``stats``. ``dependencies`` is a
+    list of model classes and instances (see ``_generation_key``) the value
+    is derived from. ``compute`` is a callable returning the value.
+
+    A value computed while reads go to a replica isn't cached, since it may be
+    older than the current generations of its dependencies.
+
+    """
+    namespace = key.split(":", 1)[0]
+    full_key = make_key(key, dependencies)
+    backend = get_backend()
+
+    # wrapped so that a cached None is distinguishable from a miss
+    wrapped = backend.get(full_key)
+    if wrapped is not None:
+        stats.record(namespace, True)
+        return wrapped[0]
+
+    stats.record(namespace, False)
+    value = compute()
+    if routers.current_replica() is None:
+        if timeout is None:
+            timeout = settings.MODEL_CACHE_TIMEOUT
+        backend.set(full_key, (value,), timeout)
+    return value
@@ -6,7 +6,8 @@ from tastypie.exceptions import ImmediateHttpResponse
 from .models import Product, ProductVersion
 from .auth import User
 from ..environments.api import EnvironmentResource
-from ..mtapi import MTResource, MTAuthorization
+from ..mtapi import (MTResource, MTAuthorization, ConditionalGetMixin,
+                     PrefetchRelatedMixin, SparseListMixin)
 
 import logging
 logger = logging.getLogger(__name__)
@@ -173,7 +174,9 @@ class ProductResource(MTResource):
 
 
 
-class ProductVersionEnvironmentsResource(ModelResource):
+class ProductVersionEnvironmentsResource(
+        ConditionalGetMixin, SparseListMixin, PrefetchRelatedMixin,
+        ModelResource):
     """Return a list of productversions with full environment info."""
 
     environments = fields.ToManyField(
@@ -6,6 +6,7 @@ import base64
 import hashlib
 
 from django.db.models import Q
+from django.db.models.signals import post_save, post_delete
 
 from django.contrib.auth.backends import ModelBackend as DjangoModelBackend
 # Permission is imported solely so other places can import it from here
@@ -16,6 +17,8 @@ from preferences import preferences
 from registration.models import RegistrationProfile
 from registration.signals import user_registered
 
+from .. import cache
+
 
 # monkeypatch the User model to ensure unique email addresses
 BaseUser._meta.get_field("email")._unique = True
@@ -129,3 +132,15 @@ def add_new_user_role(user, **kwargs):
 
 
 user_registered.connect(add_new_user_role)
+
+
+
+def bump_user_generations(sender, instance, **kwargs):
+    """Bump cache generations of a saved or deleted user (not an MTModel)."""
+    if isinstance(instance, BaseUser):
+        cache.bump(BaseUser, [instance.pk])
+
+
+
+post_save.connect(bump_user_generations)
+post_delete.connect(bump_user_generations)
@@ -0,0 +1,70 @@
+"""
+Time hot paths against the data in the database, writing results as JSON.
+
+Generate data to benchmark against with ``generate_data``; benchmarks write to
+the database, so the command refuses to run against a database without
+generated data unless given ``--force``. Results (see
+``moztrap.debug.benchmarks``) are written to stdout or the file given by
+``--output``, for comparison with results from other commits.
+
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from optparse import make_option
+import json
+
+from moztrap.debug import benchmarks
+
+
+
+class Command(BaseCommand):
+    args = "[benchmark ...]"
+    help = (
+        "Runs the named benchmarks (default all: {0}) and writes results "
+        "as JSON".format(", ".join(b.__name__ for b in benchmarks.BENCHMARKS)))
+
+    option_list = BaseCommand.option_list + (
+        make_option(
+            "--repeat",
+            dest="repeat",
+            type="int",
+            default=3,
+            help="Times to run each benchmark (default 3)"),
+        make_option(
+            "--label",
+            dest="label",
+            default="",
+            help="Label to include in results, e.g. a commit id"),
+        make_option(
+            "-o",
+            "--output",
+            dest="output",
+            default=None,
+            help="File to write to; default is stdout"),
+        make_option(
+            "--force",
+            action="store_true",
+            dest="force",
+            default=False,
+            help="Run even if the database has no data from generate_data"),
+        )
+
+    def handle(self, *args, **options):
+        repeat = options.get("repeat")
+        if repeat < 1:
+            raise CommandError("--repeat must be at least 1.")
+        try:
+            results = benchmarks.run(
+                args, repeat=repeat, force=options.get("force"))
+        except benchmarks.BenchmarkError as e:
+            raise CommandError(str(e))
+        results["label"] = options.get("label")
+
+        output = options.get("output")
+        fh = open(output, "w") if output else self.stdout
+        try:
+            json.dump(results, fh, indent=2, sort_keys=True)
+            fh.write("\n")
+        finally:
+            if output:
+                fh.close()
@@ -0,0 +1,27 @@
+"""
+Merge environments that have identical elements.
+
+Identical environments (same element signature) in the same profile, or in
+no profile, are merged into the oldest of them; every reference to a merged
+environment is rewritten in bulk to the kept one. See
+``EnvironmentManager.dedupe``.
+
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from moztrap.model import cache
+from moztrap.model.environments.models import Environment
+
+
+
+class Command(BaseCommand):
+    help = "Merges environments that have identical elements"
+
+    def handle(self, *args, **options):
+        with transaction.commit_on_success():
+            merged = Environment.objects.dedupe()
+        cache.flush_pending()
+
+        if int(options.get("verbosity", 1)):
+            self.stdout.write("Merged {0} environments.\n".format(merged))
@@ -0,0 +1,90 @@
+"""
+Export results of a run, run series, or product version.
+
+Results are written to stdout (or the file given by ``--output``) as
+newline-delimited JSON or CSV, streamed in chunks so that memory use stays
+flat however many results there are.
+
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from optparse import make_option
+
+from moztrap.model.core.models import ProductVersion
+from moztrap.model.execution import export
+from moztrap.model.execution.models import Run
+
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports results of a run (or series) or a product version "
+        "as NDJSON or CSV")
+
+    option_list = BaseCommand.option_list + (
+        make_option(
+            "--run",
+            dest="run",
+            default=None,
+            help="ID of the run or run series to export results for"),
+        make_option(
+            "--productversion",
+            dest="productversion",
+            default=None,
+            help="ID of the product version to export results for"),
+        make_option(
+            "--format",
+            dest="format",
+            default="ndjson",
+            help="Output format: ndjson (default) or csv"),
+        make_option(
+            "--all",
+            action="store_true",
+            dest="all",
+            default=False,
+            help="Include superseded results, not just the latest"),
+        make_option(
+            "-o",
+            "--output",
+            dest="output",
+            default=None,
+            help="File to write to; default is stdout"),
+        )
+
+    def handle(self, *args, **options):
+        run_id = options.get("run")
+        productversion_id = options.get("productversion")
+        if bool(run_id) == bool(productversion_id):
+            raise CommandError(
+                "Give exactly one of --run or --productversion.")
+
+        format = options.get("format")
+        if format not in export.FORMATS:
+            raise CommandError(
+                'Unknown format "{0}"; use one of {1}.'.format(
+                    format, ", ".join(sorted(export.FORMATS))))
+
+        latest = not options.get("all")
+        try:
+            if run_id:
+                results = export.run_results(
+                    Run.objects.get(pk=run_id), latest=latest)
+            else:
+                results = export.productversion_results(
+                    ProductVersion.objects.get(pk=productversion_id),
+                    latest=latest,
+                    )
+        except (Run.DoesNotExist, ProductVersion.DoesNotExist, ValueError):
+            raise CommandError(
+                'Run or product version "{0}" does not exist.'.format(
+                    run_id or productversion_id))
+
+        content_type, lines = export.FORMATS[format]
+        output = options.get("output")
+        fh = open(output, "w") if output else self.stdout
+        try:
+            for line in lines(export.rows(results)):
+                fh.write(line)
+        finally:
+            if output:
+                fh.close()
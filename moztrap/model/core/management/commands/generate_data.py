@@ -0,0 +1,95 @@
+"""
+Generate synthetic data at a configurable scale, for benchmarking.
+
+Starts from one of the preset scales of ``moztrap.model.synthetic.SCALES``
+(``--scale``), with any of its counts overridden by options. Don't run this
+against a database with real data in it.
+
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from optparse import make_option
+import time
+
+from moztrap.model.synthetic import Generator, SCALES
+
+
+
+COUNTS = [
+    ("products", "products"),
+    ("versions", "versions per product"),
+    ("cases", "cases per product"),
+    ("steps", "steps per case version"),
+    ("suites", "suites per product"),
+    ("environments", "environments (each product version has all of them)"),
+    ("runs", "active runs per product version"),
+    ("run_cases", "case versions per run"),
+    ("results", "results per run case version (at most one per environment)"),
+    ]
+
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates synthetic products, cases, runs and results, using bulk "
+        "inserts")
+
+    option_list = BaseCommand.option_list + (
+        make_option(
+            "--scale",
+            dest="scale",
+            default="small",
+            help="Preset scale: {0} (default small)".format(
+                ", ".join(sorted(SCALES)))),
+        make_option(
+            "--batch-size",
+            dest="batch_size",
+            type="int",
+            default=500,
+            help="Rows per bulk insert (default 500)"),
+        make_option(
+            "--seed",
+            dest="seed",
+            type="int",
+            default=0,
+            help="Random seed for result statuses and case priorities"),
+        ) + tuple(
+        make_option(
+            "--{0}".format(name.replace("_", "-")),
+            dest=name,
+            type="int",
+            default=None,
+            help="Number of {0}".format(description))
+        for name, description in COUNTS
+        )
+
+    def handle(self, *args, **options):
+        scale = options.get("scale")
+        if scale not in SCALES:
+            raise CommandError(
+                'Unknown scale "{0}"; use one of {1}.'.format(
+                    scale, ", ".join(sorted(SCALES))))
+        counts = dict(SCALES[scale])
+        for name, description in COUNTS:
+            if options.get(name) is not None:
+                counts[name] = options[name]
+
+        verbosity = int(options.get("verbosity", 1))
+        log = None
+        if verbosity > 1:
+            log = lambda msg: self.stdout.write(msg + "\n")
+
+        start = time.time()
+        generated = Generator(
+            counts,
+            batch_size=options.get("batch_size"),
+            seed=options.get("seed"),
+            log=log,
+            ).generate()
+
+        if verbosity:
+            for name in sorted(generated):
+                self.stdout.write(
+                    "{0}: {1}\n".format(name, generated[name]))
+            self.stdout.write(
+                "Generated in {0:.1f} s.\n".format(time.time() - start))
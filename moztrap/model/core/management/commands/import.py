@@ -36,6 +36,7 @@ from optparse import make_option
 import json
 import os.path
 
+from moztrap.model import cache
 from moztrap.model.core.models import Product, ProductVersion
 from moztrap.model.library.importer import Importer
 
@@ -108,6 +109,7 @@ class Command(BaseCommand):
 
                     result = Importer().import_data(
                         product_version, case_data, force_dupes=force_dupes)
+                    cache.flush_pending()
 
                     # append this result to those for any of the other files.
                     if not results_for_files:
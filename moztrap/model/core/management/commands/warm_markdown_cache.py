@@ -0,0 +1,103 @@
+"""
+Pre-warm the rendered Markdown cache for active runs.
+
+Renders the run, case, step, tag and result-comment texts shown on the
+runtests and results pages of each active run (or of the runs given by
+``--run``) into the shared Markdown cache. With ``--benchmark``, also reports
+the time to render each run's texts uncached and from the cache.
+
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from optparse import make_option
+import time
+
+from moztrap.model.execution.models import Run, Result
+from moztrap.model.library.models import CaseVersion, CaseStep
+from moztrap.model.tags.models import Tag
+from moztrap.view.markup import render
+
+
+
+def run_texts(run):
+    """Return set of the non-empty Markdown texts shown for ``run``."""
+    texts = set([run.description])
+    texts.update(
+        CaseVersion.objects.filter(runcaseversions__run=run).values_list(
+            "description", flat=True))
+    for instruction, expected in CaseStep.objects.filter(
+            caseversion__runcaseversions__run=run).values_list(
+            "instruction", "expected"):
+        texts.update([instruction, expected])
+    texts.update(
+        Tag.objects.filter(caseversions__runcaseversions__run=run).values_list(
+            "description", flat=True))
+    texts.update(
+        Result.objects.filter(
+            runcaseversion__run=run, is_latest=True).values_list(
+            "comment", flat=True))
+    texts.discard(None)
+    texts.discard(u"")
+    return texts
+
+
+
+def timed(func, texts):
+    """Return seconds taken to call ``func`` on each of ``texts``."""
+    start = time.time()
+    for text in texts:
+        func(text)
+    return time.time() - start
+
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders Markdown texts of active runs into the rendered Markdown "
+        "cache")
+
+    option_list = BaseCommand.option_list + (
+        make_option(
+            "--run",
+            action="append",
+            dest="runs",
+            default=[],
+            help="ID of a run to warm (may be repeated); default all active"),
+        make_option(
+            "--benchmark",
+            action="store_true",
+            dest="benchmark",
+            default=False,
+            help="Report uncached and cached rendering time for each run"),
+        )
+
+    def handle(self, *args, **options):
+        run_ids = set(options.get("runs"))
+        if run_ids:
+            runs = list(Run.objects.filter(pk__in=run_ids).order_by("id"))
+            if len(runs) != len(run_ids):
+                raise CommandError("Some of the given runs do not exist.")
+        else:
+            runs = list(
+                Run.objects.filter(status=Run.STATUS.active).order_by("id"))
+
+        verbosity = int(options.get("verbosity", 1))
+        total = 0
+        for run in runs:
+            texts = run_texts(run)
+            total += len(texts)
+            if options.get("benchmark"):
+                uncached = timed(render.render, texts)
+                timed(render.cached_render, texts)
+                cached = timed(render.cached_render, texts)
+                self.stdout.write(
+                    "Run {0} ({1} texts): {2:.1f} ms uncached, "
+                    "{3:.1f} ms cached\n".format(
+                        run.id, len(texts), uncached * 1000, cached * 1000))
+            else:
+                for text in texts:
+                    render.cached_render(text)
+
+        if verbosity:
+            self.stdout.write(
+                "Warmed {0} texts for {1} runs.\n".format(total, len(runs)))
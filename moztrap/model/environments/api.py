@@ -96,18 +96,34 @@ class ElementResource(MTResource):
 
 
 
+class CachedElementsField(fields.ToManyField):
+    """Dehydrates element URIs from an environment's element cache."""
+
+    def dehydrate(self, bundle):
+        """Return URIs of the environment's elements, without a query."""
+        if self.full or not bundle.obj.pk:
+            return super(CachedElementsField, self).dehydrate(bundle)
+        resource = self.get_related_resource(None)
+        return [
+            resource.get_resource_uri(Element(pk=eid))
+            for eid in bundle.obj.element_ids
+            ]
+
+
+
 class EnvironmentResource(MTResource):
     """Create, Read and Delete capabilities for environments"""
 
-    elements = fields.ToManyField(ElementResource, "elements")
+    elements = CachedElementsField(ElementResource, "elements")
     # an environment is not required to be associated with a profile
     profile = fields.ForeignKey(ProfileResource, "profile", null=True)
+    label = fields.CharField(attribute="label", readonly=True)
 
     class Meta(MTResource.Meta):
         queryset = Environment.objects.all()
         list_allowed_methods = ['get', 'post', 'patch']
         detail_allowed_methods = ['get', 'put', 'delete']
-        fields = ["id", "profile", "elements"]
+        fields = ["id", "profile", "elements", "label"]
         filtering = {
             "elements": ALL,
             "profile": ALL_WITH_RELATIONS,
@@ -2,12 +2,281 @@
 Models for environments.
 
 """
+import hashlib
 import itertools
+import json
 from collections import defaultdict
 
 from django.db import models
+from django.db.models.signals import m2m_changed
 
-from ..mtmodel import MTModel
+from .. import cache
+from ..mtmodel import MTModel, MTManager, MTQuerySet, bulk_create, utcnow
+
+
+
+def element_signature(element_ids):
+    """
+    Return the canonical signature of a set of element ids.
+
+    This is a SHA-1 hash of the sorted distinct ids, so any two environments
+    with the same elements have the same signature. The signature of no
+    elements is the empty string.
+
+    """
+    element_ids = sorted(set(int(eid) for eid in element_ids))
+    if not element_ids:
+        return ""
+    return hashlib.sha1(",".join(str(eid) for eid in element_ids)).hexdigest()
+
+
+
+def subset_signatures(element_ids):
+    """
+    Return the signatures of all non-empty subsets of ``element_ids``.
+
+    There are 2**n - 1 of them, so this is meant for small sets, such as a
+    selection of one element from each category.
+
+    """
+    element_ids = sorted(set(int(eid) for eid in element_ids))
+    return [
+        element_signature(subset)
+        for size in range(1, len(element_ids) + 1)
+        for subset in itertools.combinations(element_ids, size)
+        ]
+
+
+
+def _ids(objs):
+    """Return list of ids of given model instances (or ids)."""
+    return [getattr(obj, "pk", obj) for obj in objs]
+
+
+
+# rough storage per row, including indexes, for Profile.preview; an
+# environment row also stores its element cache
+ENVIRONMENT_ROW_BYTES = 200
+LINK_ROW_BYTES = 50
+
+
+
+def _combinations(elements):
+    """
+    Return one environment's worth of elements per combination of elements.
+
+    Elements are split by category, and each combination of one element from
+    each category is returned as a (signature, element_cache, element_ids)
+    tuple; see ``Environment.element_cache``.
+
+    """
+    by_category = defaultdict(list)
+    for element in elements:
+        by_category[element.category].append(element)
+    categories = sorted(by_category, key=lambda c: c.name)
+
+    combinations = []
+    seen = set()
+    for combo in itertools.product(
+            *[sorted(by_category[c], key=lambda e: e.name)
+              for c in categories]):
+        element_ids = [e.id for e in combo]
+        signature = element_signature(element_ids)
+        if signature not in seen:
+            seen.add(signature)
+            combinations.append(
+                (
+                    signature,
+                    json.dumps([[e.id, e.name] for e in combo]) if combo
+                    else "",
+                    element_ids,
+                    )
+                )
+    return combinations
+
+
+
+def _reusable_environments(combinations):
+    """
+    Return dict of signature to id of reusable environments for combinations.
+
+    Environments in no profile can be reused for a new profile.
+
+    """
+    signatures = set(c[0] for c in combinations)
+    reusable = {}
+    for envid, signature in Environment.objects.filter(
+            profile__isnull=True).exclude(signature="").order_by(
+            "id").values_list("id", "signature"):
+        if signature in signatures:
+            reusable.setdefault(signature, envid)
+    return reusable
+
+
+
+class BulkAnnotatingQuerySet(MTQuerySet):
+    """
+    MTQuerySet that can annotate fetched objects in bulk, after fetching.
+
+    """
+    def __init__(self, *args, **kwargs):
+        """Start with no bulk annotations."""
+        super(BulkAnnotatingQuerySet, self).__init__(*args, **kwargs)
+        self._bulk_annotations = []
+
+
+    def _clone(self, *args, **kwargs):
+        """Clones keep the bulk annotations."""
+        clone = super(BulkAnnotatingQuerySet, self)._clone(*args, **kwargs)
+        clone._bulk_annotations = self._bulk_annotations[:]
+        return clone
+
+
+    def bulk_annotate(self, func):
+        """Return clone calling ``func`` with the list of fetched objects."""
+        clone = self._clone()
+        clone._bulk_annotations.append(func)
+        return clone
+
+
+    def iterator(self):
+        """Fetch objects, then pass them to the bulk annotations, if any."""
+        if not self._bulk_annotations:
+            return super(BulkAnnotatingQuerySet, self).iterator()
+        objs = list(super(BulkAnnotatingQuerySet, self).iterator())
+        for func in self._bulk_annotations:
+            func(objs)
+        return iter(objs)
+
+
+
+class ProtectedQuerySet(BulkAnnotatingQuerySet):
+    """
+    Queryset of objects that can't be deleted while they are in use.
+
+    Subclasses implement ``users``, returning a queryset of the objects using
+    any of the given objects, and ``used_ids``, returning the set of ids of
+    the given objects that are in use. Both take a queryset or list of ids.
+
+    """
+    def annotate_deletable(self):
+        """Annotate ``deletable`` onto fetched objects, in one more query."""
+        def annotate(objs):
+            used = self.used_ids([obj.id for obj in objs]) if objs else set()
+            for obj in objs:
+                obj._deletable = obj.id not in used
+        return self.bulk_annotate(annotate)
+
+
+    def delete(self, user=None, permanent=False):
+        """Delete these objects, or raise ProtectedError if any is in use."""
+        users = self.users(self.values("id"))
+        if users.exists():
+            raise models.ProtectedError(
+                "Some {0} are in use and cannot be deleted.".format(
+                    self.model._meta.verbose_name_plural),
+                list(users)
+                )
+        return super(ProtectedQuerySet, self).delete(
+            user=user, permanent=permanent)
+
+
+
+class ProfileQuerySet(BulkAnnotatingQuerySet):
+    """Queryset of Profiles."""
+    def annotate_categories(self):
+        """Annotate ``categories()`` onto fetched objects, in two queries."""
+        def annotate(objs):
+            category_ids = defaultdict(set)
+            if objs:
+                for profileid, categoryid in (
+                        Environment.elements.through.objects.filter(
+                            environment__profile__in=[p.id for p in objs]
+                            ).values_list(
+                            "environment__profile", "element__category"
+                            ).distinct()):
+                    category_ids[profileid].add(categoryid)
+            categories = {}
+            if category_ids:
+                categories = Category.objects.in_bulk(
+                    set.union(*category_ids.values()))
+            for obj in objs:
+                obj._categories = sorted(
+                    [categories[cid] for cid in category_ids[obj.id]
+                     if cid in categories],
+                    key=lambda c: c.name,
+                    )
+        return self.bulk_annotate(annotate)
+
+
+
+class ProfileManager(MTManager):
+    queryset_class = ProfileQuerySet
+
+
+
+class CategoryQuerySet(ProtectedQuerySet):
+    """Queryset of Categories; those of elements of environments are in use."""
+    def users(self, categories):
+        """Return environments with elements in any of ``categories``."""
+        return Environment.objects.filter(
+            elements__category__in=categories).distinct()
+
+
+    def used_ids(self, categories):
+        """Return set of ids of ``categories`` used by environments."""
+        return set(
+            Environment.elements.through.objects.filter(
+                element__category__in=categories,
+                environment__deleted_on__isnull=True,
+                ).values_list("element__category", flat=True).distinct())
+
+
+
+class CategoryManager(MTManager):
+    queryset_class = CategoryQuerySet
+
+
+
+class ElementQuerySet(ProtectedQuerySet):
+    """Queryset of Elements; those of environments are in use."""
+    def users(self, elements):
+        """Return environments with any of ``elements``."""
+        return Environment.objects.filter(elements__in=elements).distinct()
+
+
+    def used_ids(self, elements):
+        """Return set of ids of ``elements`` used by environments."""
+        return set(
+            Environment.elements.through.objects.filter(
+                element__in=elements,
+                environment__deleted_on__isnull=True,
+                ).values_list("element", flat=True).distinct())
+
+
+
+class ElementManager(MTManager):
+    queryset_class = ElementQuerySet
+
+
+
+class EnvironmentQuerySet(ProtectedQuerySet):
+    """Queryset of Environments; those of product versions are in use."""
+    def users(self, environments):
+        """Return product versions with any of ``environments``."""
+        from moztrap.model import ProductVersion
+        return ProductVersion.objects.filter(
+            environments__in=environments).distinct()
+
+
+    def used_ids(self, environments):
+        """Return set of ids of ``environments`` used by product versions."""
+        from moztrap.model import ProductVersion
+        return set(
+            ProductVersion.environments.through.objects.filter(
+                environment__in=environments,
+                productversion__deleted_on__isnull=True,
+                ).values_list("environment", flat=True).distinct())
 
 
 
@@ -21,6 +290,9 @@ class Profile(MTModel):
     """
     name = models.CharField(max_length=200)
 
+    everything = ProfileManager(show_deleted=True)
+    objects = ProfileManager(show_deleted=False)
+
 
     def __unicode__(self):
         """Return unicode representation."""
@@ -33,22 +305,90 @@ class Profile(MTModel):
         Create profile of environments as Cartesian product of given elements.
 
         Elements are split by category, and then an environment is generated
-        for each combination of one element from each category.
+        for each combination of one element from each category. Identical
+        environments that are in no profile are reused; the rest, and their
+        element links, are inserted in bulk.
 
         """
-        by_category = defaultdict(list)
-        for element in elements:
-            by_category[element.category].append(element)
+        user = kwargs.get("user")
+        combinations = _combinations(elements)
+        reusable = _reusable_environments(combinations)
 
         new = cls.objects.create(name=name, **kwargs)
 
-        for element_list in itertools.product(*by_category.values()):
-            e = Environment.objects.create(profile=new)
-            e.elements.add(*element_list)
+        now = utcnow()
+        bulk_create(
+            Environment,
+            [
+                Environment(
+                    profile=new,
+                    signature=signature,
+                    element_cache=element_cache,
+                    created_on=now,
+                    created_by=user,
+                    modified_on=now,
+                    modified_by=user,
+                    )
+                for signature, element_cache, element_ids in combinations
+                if signature not in reusable
+                ]
+            )
+        # bulk_create doesn't set ids; the new profile has one of each
+        envid_by_signature = dict(
+            (signature, envid) for envid, signature in
+            Environment.everything.filter(profile=new).values_list(
+                "id", "signature")
+            )
+        Through = Environment.elements.through
+        bulk_create(
+            Through,
+            [
+                Through(environment_id=envid_by_signature[signature],
+                        element_id=element_id)
+                for signature, element_cache, element_ids in combinations
+                if signature not in reusable
+                for element_id in element_ids
+                ]
+            )
+
+        if reusable:
+            Environment.everything.filter(pk__in=reusable.values()).update(
+                profile=new, user=user)
+
+        cache.bump(Environment)
+        cache.bump(Element, _ids(elements))
 
         return new
 
 
+    @classmethod
+    def preview(cls, *elements):
+        """
+        Report what ``generate`` would create from the given elements.
+
+        Returns a dictionary with the number of ``environments`` in the
+        profile, how many of them are ``new`` and ``reused``, the number of
+        new element ``links``, and a rough estimate of the storage the new
+        rows take, in ``bytes``.
+
+        """
+        combinations = _combinations(elements)
+        reusable = _reusable_environments(combinations)
+        created = [c for c in combinations if c[0] not in reusable]
+        links = sum(len(element_ids) for s, c, element_ids in created)
+        return {
+            "environments": len(combinations),
+            "new": len(created),
+            "reused": len(reusable),
+            "links": links,
+            "bytes": (
+                sum(ENVIRONMENT_ROW_BYTES + len(element_cache)
+                    for s, element_cache, e in created) +
+                links * LINK_ROW_BYTES
+                ),
+            }
+
+
     def clone(self, *args, **kwargs):
         """Clone profile, with environments."""
         kwargs.setdefault("cascade", ["environments"])
@@ -59,6 +399,8 @@ class Profile(MTModel):
 
     def categories(self):
         """Return an iterable of categories that are part of this profile."""
+        if hasattr(self, "_categories"):
+            return self._categories
         return Category.objects.filter(
             elements__environments__profile=self).distinct().order_by("name")
 
@@ -74,6 +416,9 @@ class Category(MTModel):
     """
     name = models.CharField(db_index=True, max_length=200)
 
+    everything = CategoryManager(show_deleted=True)
+    objects = CategoryManager(show_deleted=False)
+
 
     def __unicode__(self):
         """Return unicode representation."""
@@ -85,16 +430,36 @@ class Category(MTModel):
         verbose_name_plural = "categories"
 
 
-    # @@@ there should be some way to annotate this onto a queryset efficiently
+    def save(self, *args, **kwargs):
+        """Save category; refresh element caches of its environments."""
+        adding = self.id is None
+        ret = super(Category, self).save(*args, **kwargs)
+        if not adding:
+            Environment.update_element_caches(
+                Environment.elements.through.objects.filter(
+                    element__category=self).values_list(
+                    "environment", flat=True).distinct())
+        return ret
+
+
     @property
     def deletable(self):
-        """Return True if this category can be deleted, otherwise False."""
+        """
+        Return True if this category can be deleted, otherwise False.
+
+        Use ``annotate_deletable`` to get this for a list of categories in
+        one query.
+
+        """
+        if hasattr(self, "_deletable"):
+            return self._deletable
         return not Environment.objects.filter(elements__category=self).exists()
 
 
-    # @@@ this protection should apply to queryset.delete as well
     def delete(self, *args, **kwargs):
         """Delete this category, or raise ProtectedError if its in use."""
+        # don't trust a deletable annotation that may be stale
+        self.__dict__.pop("_deletable", None)
         if not self.deletable:
             raise models.ProtectedError(
                 "Category '{0}' is in use and cannot be deleted.".format(
@@ -113,6 +478,9 @@ class Element(MTModel):
     name = models.CharField(db_index=True, max_length=200)
     category = models.ForeignKey(Category, related_name="elements")
 
+    everything = ElementManager(show_deleted=True)
+    objects = ElementManager(show_deleted=False)
+
 
     def __unicode__(self):
         """Return unicode representation."""
@@ -123,16 +491,35 @@ class Element(MTModel):
         ordering = ["name"]
 
 
-    # @@@ there should be some way to annotate this onto a queryset efficiently
+    def save(self, *args, **kwargs):
+        """Save element; refresh element caches of its environments."""
+        adding = self.id is None
+        ret = super(Element, self).save(*args, **kwargs)
+        if not adding:
+            Environment.update_element_caches(
+                Environment.elements.through.objects.filter(
+                    element=self).values_list("environment", flat=True))
+        return ret
+
+
     @property
     def deletable(self):
-        """Return True if this element can be deleted, otherwise False."""
+        """
+        Return True if this element can be deleted, otherwise False.
+
+        Use ``annotate_deletable`` to get this for a list of elements in one
+        query.
+
+        """
+        if hasattr(self, "_deletable"):
+            return self._deletable
         return not self.environments.exists()
 
 
-    # @@@ this protection should apply to queryset.delete as well
     def delete(self, *args, **kwargs):
         """Delete this element, or raise ProtectedError if its in use."""
+        # don't trust a deletable annotation that may be stale
+        self.__dict__.pop("_deletable", None)
         if not self.deletable:
             raise models.ProtectedError(
                 "Element '{0}' is in use and cannot be deleted.".format(
@@ -143,6 +530,131 @@ class Element(MTModel):
 
 
 
+class EnvironmentManager(MTManager):
+    """Manager for Environments; looks them up and merges them by elements."""
+    queryset_class = EnvironmentQuerySet
+
+
+    def with_elements(self, elements):
+        """Return environments with exactly the given elements (or ids)."""
+        return self.filter(signature=element_signature(_ids(elements)))
+
+
+    def within(self, elements):
+        """
+        Return environments whose elements are all among the given elements.
+
+        In other words, the environments matched by a selection of these
+        elements (or ids); a selection usually has one element per category.
+
+        """
+        return self.filter(signature__in=subset_signatures(_ids(elements)))
+
+
+    def dedupe(self):
+        """
+        Merge environments with identical elements; return number merged.
+
+        Of identical environments in the same profile, the oldest is kept.
+        Identical environments in no profile are merged into the oldest one in
+        a profile (or in none, if there is no such environment). References
+        to merged environments from other tables (m2m through tables, results,
+        work items) are rewritten in bulk to the kept environment, dropping
+        any that would then be duplicates, and the merged environments are
+        deleted.
+
+        """
+        by_signature = defaultdict(list)
+        for envid, signature, profileid in self.get_query_set().exclude(
+                signature="").order_by("id").values_list(
+                "id", "signature", "profile"):
+            by_signature[signature].append((envid, profileid))
+
+        # maps merged environment id to kept environment id
+        keepers = {}
+        for envs in by_signature.values():
+            oldest_by_profile = {}
+            for envid, profileid in envs:
+                oldest_by_profile.setdefault(profileid, envid)
+            default = min(
+                [envid for profileid, envid in oldest_by_profile.items()
+                 if profileid is not None] or [envs[0][0]])
+            for envid, profileid in envs:
+                keeper = default
+                if profileid is not None:
+                    keeper = oldest_by_profile[profileid]
+                if keeper != envid:
+                    keepers[envid] = keeper
+
+        if not keepers:
+            return 0
+
+        for related in self.model._meta.get_all_related_objects(
+                include_hidden=True):
+            if related.model is not self.model.elements.through:
+                _repoint(related.model, related.field, keepers)
+
+        self.model.everything.filter(pk__in=keepers.keys()).delete(
+            permanent=True)
+
+        return len(keepers)
+
+
+
+def _repoint(model, field, keepers):
+    """
+    Point ``field`` of ``model`` rows at kept environments, in bulk.
+
+    ``keepers`` maps merged environment ids to kept environment ids. If
+    ``field`` is part of a unique_together constraint, rows that would
+    duplicate another are deleted instead; kept environments' rows win.
+
+    """
+    manager = model._base_manager
+    by_keeper = defaultdict(list)
+    for envid, keeper in keepers.items():
+        by_keeper[keeper].append(envid)
+
+    others = set()
+    for fields in model._meta.unique_together:
+        if field.name in fields:
+            others.update(
+                model._meta.get_field(f) for f in fields if f != field.name)
+
+    if others:
+        attnames = [f.attname for f in others]
+        rows = manager.filter(
+            **{"{0}__in".format(field.name): keepers.keys() + by_keeper.keys()}
+            ).values_list("id", field.attname, *attnames)
+        seen = set()
+        to_delete = []
+        moves = defaultdict(list)
+        for row in sorted(rows, key=lambda r: (r[1] in keepers, r[0])):
+            pk, envid = row[:2]
+            keeper = keepers.get(envid, envid)
+            key = (keeper,) + tuple(row[2:])
+            if key in seen:
+                to_delete.append(pk)
+            else:
+                seen.add(key)
+                if keeper != envid:
+                    moves[keeper].append(pk)
+        if to_delete:
+            manager.filter(pk__in=to_delete).delete()
+        for keeper, pks in moves.items():
+            manager.filter(pk__in=pks).update(**{field.name: keeper})
+    else:
+        for keeper, envids in by_keeper.items():
+            manager.filter(
+                **{"{0}__in".format(field.name): envids}).update(
+                **{field.name: keeper})
+
+    for bumped in [model] + [f.rel.to for f in others]:
+        if issubclass(bumped, MTModel):
+            cache.bump(bumped)
+
+
+
 class Environment(MTModel):
     """
     A collection of elements representing a testing environment.
@@ -161,10 +673,18 @@ class Environment(MTModel):
 
     elements = models.ManyToManyField(Element, related_name="environments")
 
+    # canonical hash of element ids; see ``element_signature``
+    signature = models.CharField(max_length=40, db_index=True, blank=True)
+    # denormalized JSON list of [id, name] of elements in category name order
+    element_cache = models.TextField(blank=True)
+
+    everything = EnvironmentManager(show_deleted=True)
+    objects = EnvironmentManager(show_deleted=False)
+
 
     def __unicode__(self):
         """Return unicode representation."""
-        return u", ".join(unicode(e) for e in self.ordered_elements())
+        return self.label
 
 
     class Meta:
@@ -181,23 +701,92 @@ class Environment(MTModel):
         return iter(self.elements.order_by("category__name"))
 
 
+    @property
+    def cached_elements(self):
+        """List of (id, name) of elements in category name order; no query."""
+        if not self.element_cache:
+            return []
+        return [tuple(pair) for pair in json.loads(self.element_cache)]
+
+
+    @property
+    def element_ids(self):
+        """Ids of elements in category name order, without a query."""
+        return [eid for eid, name in self.cached_elements]
+
+
+    @property
+    def element_names(self):
+        """Names of elements in category name order, without a query."""
+        return [name for eid, name in self.cached_elements]
+
+
+    @property
+    def label(self):
+        """Element names in category name order, comma-separated."""
+        return u", ".join(self.element_names)
+
+
+    @classmethod
+    def update_element_caches(cls, envids):
+        """
+        Recompute and store signatures and element caches of environments.
+
+        Takes an iterable of environment ids. Returns a dictionary mapping each
+        of them to a (signature, element_cache) tuple.
+
+        """
+        envids = list(envids)
+        if not envids:
+            return {}
+        elements = defaultdict(list)
+        for envid, elementid, name in cls.elements.through.objects.filter(
+                environment__in=envids).order_by(
+                "element__category__name", "element__name").values_list(
+                "environment", "element", "element__name"):
+            elements[envid].append([elementid, name])
+
+        caches = {}
+        by_cache = defaultdict(list)
+        for envid in envids:
+            pairs = elements[envid]
+            caches[envid] = (
+                element_signature([eid for eid, name in pairs]),
+                json.dumps(pairs) if pairs else "",
+                )
+            by_cache[caches[envid]].append(envid)
+        for (signature, element_cache), ids in by_cache.items():
+            cls._base_manager.filter(pk__in=ids).update(
+                signature=signature, element_cache=element_cache)
+        cache.bump(cls, envids)
+        return caches
+
+
     def clone(self, *args, **kwargs):
         """Clone environment, including element relationships."""
         kwargs.setdefault("cascade", ["elements"])
         return super(Environment, self).clone(*args, **kwargs)
 
 
-    # @@@ there should be some way to annotate this onto a queryset efficiently
     @property
     def deletable(self):
-        """Return True if this environment can be deleted, otherwise False."""
+        """
+        Return True if this environment can be deleted, otherwise False.
+
+        Use ``annotate_deletable`` to get this for a list of environments in
+        one query.
+
+        """
+        if hasattr(self, "_deletable"):
+            return self._deletable
         from moztrap.model import ProductVersion
         return not ProductVersion.objects.filter(environments=self).exists()
 
 
-    # @@@ this protection should apply to queryset.delete as well
     def delete(self, *args, **kwargs):
         """Delete this environment, or raise ProtectedError if its in use."""
+        # don't trust a deletable annotation that may be stale
+        self.__dict__.pop("_deletable", None)
         if not self.deletable:
             from moztrap.model import ProductVersion
             raise models.ProtectedError(
@@ -218,6 +807,34 @@ class Environment(MTModel):
 
 
 
+def update_environment_elements(sender, instance, action, reverse, pk_set,
+                                **kwargs):
+    """Keep environment element caches current as their elements change."""
+    if reverse:
+        # clearing an element's environments; pk_set is None in post_clear
+        if action == "pre_clear":
+            instance._cleared_envids = list(
+                sender.objects.filter(element=instance).values_list(
+                    "environment", flat=True))
+            return
+        envids = pk_set
+        if action == "post_clear":
+            envids = instance.__dict__.pop("_cleared_envids", [])
+    else:
+        envids = [instance.pk]
+
+    if action.startswith("post_") and envids:
+        caches = Environment.update_element_caches(envids)
+        if not reverse:
+            instance.signature, instance.element_cache = caches[instance.pk]
+
+
+
+m2m_changed.connect(
+    update_environment_elements, sender=Environment.elements.through)
+
+
+
 class HasEnvironmentsModel(models.Model):
     """
     Base for models that inherit/cascade environments to/from parents/children.
@@ -10,15 +10,19 @@ from django.core.exceptions import ValidationError, ObjectDoesNotExist
 from django.http import HttpResponse
 
 from .models import Run, RunCaseVersion, RunSuite, Result
-from ..mtapi import MTResource, MTApiKeyAuthentication, MTAuthorization
+from ..mtapi import (MTResource, MTApiKeyAuthentication, MTAuthorization,
+                     ConditionalGetMixin, OrderedMembersMixin,
+                     PrefetchRelatedMixin, ReadReplicaMixin, SparseListMixin)
 from ..core.api import (ProductVersionResource, ProductResource,
                         ReportResultsAuthorization, UserResource)
+from ..core.auth import User
 from ..environments.api import EnvironmentResource
 from ..environments.models import Environment
 from ..library.api import (CaseVersionResource, BaseSelectionResource,
                            SuiteResource)
 from ..library.models import CaseVersion, Suite
 
+from ...view.lists import filters
 from ...view.lists.filters import filter_url
 
 import logging
@@ -34,7 +38,9 @@ class RunSuiteAuthorization(MTAuthorization):
         return "execution.manage_runs"
 
 
-class RunCaseVersionResource(ModelResource):
+class RunCaseVersionResource(
+        ConditionalGetMixin, ReadReplicaMixin, SparseListMixin,
+        PrefetchRelatedMixin, ModelResource):
     """
     RunCaseVersion represents the connection between a run and a caseversion.
 
@@ -52,6 +58,7 @@ class RunCaseVersionResource(ModelResource):
     class Meta:
         queryset = RunCaseVersion.objects.all()
         list_allowed_methods = ['get']
+        read_replica = True
         filtering = {
             "run": ALL_WITH_RELATIONS,
             "caseversion": ALL_WITH_RELATIONS,
@@ -60,7 +67,8 @@ class RunCaseVersionResource(ModelResource):
 
 
 
-class RunResource(ModelResource):
+class RunResource(ConditionalGetMixin, ReadReplicaMixin, SparseListMixin,
+                  PrefetchRelatedMixin, ModelResource):
     """
     Fetch the test runs for the specified product and version.
 
@@ -82,6 +90,7 @@ class RunResource(ModelResource):
     class Meta:
         queryset = Run.objects.all()
         list_allowed_methods = ["get", "post"]
+        read_replica = True
         fields = [
             "id",
             "name",
@@ -95,6 +104,12 @@ class RunResource(ModelResource):
             "productversion": ALL_WITH_RELATIONS,
             "status": "exact",
         }
+        select_related = ["productversion__product"]
+        # keys added by dehydrate, and the fields it reads to add them
+        dehydrated = {
+            "productversion_name": ["productversion"],
+            "product_name": ["productversion"],
+            }
         authentication = MTApiKeyAuthentication()
         authorization = ReportResultsAuthorization()
         always_return_data = True
@@ -306,18 +321,24 @@ class ResultResource(ModelResource):
 
 
 
-class RunSuiteResource(MTResource):
+class RunSuiteResource(OrderedMembersMixin, MTResource):
     """
     Create, Read, Update and Delete capabilities for RunSuite.
 
-    Filterable by suite and run fields.
+    Filterable by suite and run fields. ``PATCH`` of the list with ``run``
+    and an ordered ``suites`` list sets all of a run's suites at once.
     """
 
     run = fields.ForeignKey(RunResource, 'run')
     suite = fields.ForeignKey(SuiteResource, 'suite')
 
+    owner_field = "run"
+    member_field = "suite"
+    members_key = "suites"
+
     class Meta(MTResource.Meta):
         queryset = RunSuite.objects.all()
+        list_allowed_methods = ["get", "post", "patch"]
         fields = ["suite", "run", "order", "id"]
         filtering = {
             "suite": ALL_WITH_RELATIONS,
@@ -336,6 +357,21 @@ class RunSuiteResource(MTResource):
         return ["suite", "run"]
 
 
+    def check_members(self, run, suites):
+        """suites' product must match run's product."""
+        product_id = run.productversion.product_id
+        for suite in suites:
+            if suite.product_id != product_id:
+                error_message = str(
+                    "suite's product must match run's product."
+                )
+                logger.error(
+                    "\n".join([error_message, "suite prod: %s, run prod: %s"]),
+                    suite.product_id, product_id)
+                raise ImmediateHttpResponse(
+                    response=http.HttpBadRequest(error_message))
+
+
     def hydrate_suite(self, bundle):
         """suite is read-only on PUT
         suite.product must match run.productversion.product on CREATE
@@ -385,6 +421,25 @@ class SuiteSelectionResource(BaseSelectionResource):
             "created_by": ALL_WITH_RELATIONS,
             }
         ordering = ["runs"]
+        default_ordering = ["name"]
+        # for the case_count annotation
+        cache_dependencies = ["library.SuiteCase"]
+        # keys added by dehydrate, and the fields it reads to add them
+        dehydrated = {
+            "suite_id": [],
+            "case_count": [],
+            "filter_cases": [],
+            }
+        filterset = filters.FilterSet(
+            [
+                filters.KeywordFilter("name"),
+                filters.LazyModelFilter(
+                    "author",
+                    lookup="created_by",
+                    queryset=User.objects.all(),
+                    ),
+                ]
+            )
 
 
     def dehydrate(self, bundle):
@@ -0,0 +1,184 @@
+"""
+Streaming export of test results.
+
+Results are read in id-ordered chunks of plain values (no model instances),
+and environment labels and bug URLs are looked up once per chunk, so memory
+use doesn't grow with the number of results exported.
+
+"""
+import csv
+from cStringIO import StringIO
+import json
+
+from django.utils.datastructures import SortedDict
+
+from ..environments.models import Element
+from .models import Result, StepResult
+
+
+
+CHUNK_SIZE = 1000
+
+FIELDS = [
+    "result_id",
+    "run_id",
+    "run",
+    "case_id",
+    "caseversion",
+    "environment",
+    "tester",
+    "status",
+    "comment",
+    "bugs",
+    "created_on",
+    ]
+
+# values_list lookups for each field that comes straight from the query
+_COLUMNS = [
+    "id",
+    "runcaseversion__run_id",
+    "runcaseversion__run__name",
+    "runcaseversion__caseversion__case_id",
+    "runcaseversion__caseversion__name",
+    "environment_id",
+    "tester__username",
+    "status",
+    "comment",
+    "created_on",
+    ]
+
+
+
+def run_results(run, latest=True):
+    """
+    Return results for ``run``.
+
+    If ``run`` is a series, returns results for all runs in the series. If
+    ``latest`` is True, only each tester's latest result for a case and
+    environment is included.
+
+    """
+    if run.is_series:
+        results = Result.objects.filter(runcaseversion__run__series=run)
+    else:
+        results = Result.objects.filter(runcaseversion__run=run)
+    if latest:
+        results = results.filter(is_latest=True)
+    return results
+
+
+
+def productversion_results(productversion, latest=True):
+    """Return results for all runs of ``productversion``."""
+    results = Result.objects.filter(
+        runcaseversion__run__productversion=productversion)
+    if latest:
+        results = results.filter(is_latest=True)
+    return results
+
+
+
+def environment_labels(environment_ids):
+    """Return dict mapping given environment ids to their labels."""
+    elements = {}
+    for env_id, category, name in Element.objects.filter(
+            environments__in=environment_ids).values_list(
+            "environments", "category__name", "name"):
+        elements.setdefault(env_id, []).append((category, name))
+
+    return dict(
+        (env_id, u", ".join(name for category, name in sorted(
+                    elements.get(env_id, []))))
+        for env_id in environment_ids
+        )
+
+
+
+def bug_urls(result_ids):
+    """Return dict mapping given result ids to sorted lists of bug URLs."""
+    bugs = {}
+    for result_id, url in StepResult.objects.filter(
+            result__in=result_ids).exclude(bug_url="").values_list(
+            "result_id", "bug_url").distinct():
+        bugs.setdefault(result_id, []).append(url)
+    for urls in bugs.values():
+        urls.sort()
+    return bugs
+
+
+
+def rows(results, chunk_size=CHUNK_SIZE):
+    """
+    Generate a dictionary of ``FIELDS`` for each result in ``results``.
+
+    Results are fetched ``chunk_size`` at a time, in id order.
+
+    """
+    labels = {}
+    last_id = 0
+    while True:
+        chunk = list(
+            results.filter(id__gt=last_id).order_by("id").values_list(
+                *_COLUMNS)[:chunk_size].iterator()
+            )
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+
+        labels.update(environment_labels(
+                set(values[5] for values in chunk).difference(labels)))
+        bugs = bug_urls([values[0] for values in chunk])
+
+        for (result_id, run_id, run, case_id, caseversion, env_id, tester,
+             status, comment, created_on) in chunk:
+            yield SortedDict([
+                    ("result_id", result_id),
+                    ("run_id", run_id),
+                    ("run", run),
+                    ("case_id", case_id),
+                    ("caseversion", caseversion),
+                    ("environment", labels[env_id]),
+                    ("tester", tester),
+                    ("status", status),
+                    ("comment", comment),
+                    ("bugs", bugs.get(result_id, [])),
+                    ("created_on", created_on.isoformat()),
+                    ])
+
+        if len(chunk) < chunk_size:
+            break
+
+
+
+def ndjson(rows):
+    """Generate a line of JSON for each row."""
+    for row in rows:
+        yield json.dumps(row) + "\n"
+
+
+
+def csv_lines(rows):
+    """Generate a header line, then a line of UTF-8 CSV for each row."""
+    buf = StringIO()
+    writer = csv.writer(buf)
+
+    def line(values):
+        writer.writerow(values)
+        data = buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+        return data
+
+    yield line(FIELDS)
+    for row in rows:
+        row["bugs"] = u" ".join(row["bugs"])
+        yield line(
+            [unicode(row[field]).encode("utf-8") for field in FIELDS])
+
+
+
+# maps format name to (content type, generator of lines from rows)
+FORMATS = {
+    "ndjson": ("application/x-ndjson", ndjson),
+    "csv": ("text/csv", csv_lines),
+    }
@@ -3,14 +3,19 @@ Models for test execution (runs, results).
 
 """
 import datetime
+import uuid
 
+from django.conf import settings
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
 from django.db import connection, transaction, models
 from django.db.models import Q, Count, Max
 
 from model_utils import Choices
 
-from ..mtmodel import MTModel, TeamModel, DraftStatusModel
+from .. import cache
+from ..mtmodel import (
+    MTModel, MTManager, TeamModel, DraftStatusModel, set_ordered_members,
+    utcnow)
 from ..core.auth import User
 from ..core.models import ProductVersion
 from ..environments.models import Environment, HasEnvironmentsModel
@@ -91,6 +96,17 @@ class Run(MTModel, TeamModel, DraftStatusModel, HasEnvironmentsModel):
         return super(Run, self).clone(*args, **kwargs)
 
 
+    def set_suites(self, suites, user=None):
+        """
+        Make ``suites`` (instances or ids) this run's suites, in order.
+
+        Only the changes are written; see ``set_ordered_members``.
+
+        """
+        return set_ordered_members(
+            RunSuite, "run", self, "suite", suites, user=user)
+
+
     def activate(self, *args, **kwargs):
         """Make run active, locking in runcaseversions for all suites."""
         if self.status == self.STATUS.draft:
@@ -155,8 +171,12 @@ class Run(MTModel, TeamModel, DraftStatusModel, HasEnvironmentsModel):
                     AND s.status = 'active'
                     AND rs.run_id = {0}
                     AND cve.environment_id IN ({1})
-                ORDER BY rs.order, sc.order
-                """.format(self.id, ",".join(map(str, run_env_ids)))
+                ORDER BY rs.{2}, sc.{2}
+                """.format(
+                    self.id,
+                    ",".join(map(str, run_env_ids)),
+                    connection.ops.quote_name("order"),
+                    )
             cursor.execute(sql)
 
             cv_list = [x[0] for x in cursor.fetchall()]
@@ -230,6 +250,13 @@ class Run(MTModel, TeamModel, DraftStatusModel, HasEnvironmentsModel):
 
         self._bulk_update_runcaseversion_environments_for_lock()
 
+        self._sync_workitems()
+
+        # bulk inserts bypass save(), so record the change to cached data
+        cache.bump(RunCaseVersion)
+        # the run's completion is a fraction of its runcaseversions
+        cache.bump_related(Run, [self.id], "results")
+
         self._lock_caseversions_complete()
 
 
@@ -301,6 +328,78 @@ class Run(MTModel, TeamModel, DraftStatusModel, HasEnvironmentsModel):
         RunCaseVersion.environments.through.objects.bulk_create(needed_rcv_envs)
 
 
+    def _sync_workitems(self):
+        """
+        Sync the tester work queue with this run's runcaseversion/env pairs.
+
+        Unclaimed (or lease-expired) incomplete work items are regenerated so
+        they pick up current order and priority; items for pairs that no
+        longer exist are removed. Claimed and completed items are kept.
+
+        """
+        qn = connection.ops.quote_name
+        now = connection.ops.value_to_db_datetime(utcnow())
+        cursor = connection.cursor()
+
+        cursor.execute(
+            """DELETE FROM execution_workitem
+                WHERE run_id = %s AND (
+                    (completed = %s
+                        AND (lease_expires IS NULL OR lease_expires < %s))
+                    OR NOT EXISTS (
+                        SELECT 1
+                        FROM execution_runcaseversion_environments as rcve
+                            INNER JOIN execution_runcaseversion as rcv
+                                ON rcv.id = rcve.runcaseversion_id
+                        WHERE rcve.runcaseversion_id =
+                                execution_workitem.runcaseversion_id
+                            AND rcve.environment_id =
+                                execution_workitem.environment_id
+                            AND rcv.deleted_on IS NULL
+                        )
+                    )
+            """,
+            [self.id, False, now],
+            )
+
+        done_states = Result.DONE_STATES
+        cursor.execute(
+            """INSERT INTO execution_workitem
+                    (created_on, modified_on, cc_version,
+                    run_id, runcaseversion_id, environment_id, priority,
+                    {0}, completed, claim_token)
+                SELECT %s, %s, 0,
+                    rcv.run_id, rcve.runcaseversion_id, rcve.environment_id,
+                    COALESCE(c.priority, %s), rcv.{0},
+                    CASE WHEN EXISTS (
+                        SELECT 1 FROM execution_result as r
+                        WHERE r.runcaseversion_id = rcv.id
+                            AND r.environment_id = rcve.environment_id
+                            AND r.is_latest = %s
+                            AND r.deleted_on IS NULL
+                            AND r.status IN ({1})
+                        ) THEN %s ELSE %s END,
+                    ''
+                FROM execution_runcaseversion_environments as rcve
+                    INNER JOIN execution_runcaseversion as rcv
+                        ON rcv.id = rcve.runcaseversion_id
+                    INNER JOIN library_caseversion as cv
+                        ON cv.id = rcv.caseversion_id
+                    INNER JOIN library_case as c
+                        ON c.id = cv.case_id
+                WHERE rcv.run_id = %s
+                    AND rcv.deleted_on IS NULL
+                    AND NOT EXISTS (
+                        SELECT 1 FROM execution_workitem as w
+                        WHERE w.runcaseversion_id = rcve.runcaseversion_id
+                            AND w.environment_id = rcve.environment_id
+                        )
+            """.format(qn("order"), ",".join(["%s"] * len(done_states))),
+            [now, now, WorkItem.UNPRIORITIZED, True] + done_states + [
+                True, False, self.id],
+            )
+
+
     def _lock_caseversions_complete(self):
         """Hook for doing any post-processing after doing the rcv lock."""
         pass
@@ -606,6 +705,8 @@ class Result(MTModel):
     COMPLETED_STATES = [STATUS.passed, STATUS.failed, STATUS.invalidated,
                         STATUS.blocked]
     FAILED_STATES = [STATUS.failed, STATUS.blocked]
+    # states that finish the work on a runcaseversion in an environment
+    DONE_STATES = COMPLETED_STATES + [STATUS.skipped]
 
     tester = models.ForeignKey(User, related_name="results")
     runcaseversion = models.ForeignKey(
@@ -641,9 +742,23 @@ class Result(MTModel):
 
 
     def save(self, *args, **kwargs):
-        if self.pk is None:
+        adding = self.pk is None
+        if adding:
             self.set_latest()
         super(Result, self).save(*args, **kwargs)
+        # the results summaries and completion of the rcv and its run
+        cache.bump_related(RunCaseVersion, [self.runcaseversion_id], "results")
+        cache.bump_related(Run, [self.runcaseversion.run_id], "results")
+        if adding and self.status in self.DONE_STATES:
+            WorkItem.objects.filter(
+                runcaseversion=self.runcaseversion_id,
+                environment=self.environment_id,
+                ).update(
+                    completed=True,
+                    claimed_by=None,
+                    claim_token="",
+                    lease_expires=None,
+                    )
 
 
     def set_latest(self):
@@ -680,6 +795,131 @@ class StepResult(MTModel):
 
 
 
+class WorkItemManager(MTManager):
+    """Manager for WorkItems; claims work for testers."""
+    def claim(self, run, environment, user, lease=None):
+        """
+        Claim the next available work item in ``run`` and ``environment``.
+
+        Any incomplete item ``user`` already holds in this run and environment
+        is released first, so a tester holds at most one lease at a time.
+        Highest-priority items come first, then run order. ``lease`` is a
+        timedelta; defaults to ``settings.WORKITEM_LEASE_MINUTES``.
+
+        Returns the claimed WorkItem, or None if there is no unclaimed
+        incomplete work left.
+
+        """
+        if lease is None:
+            lease = datetime.timedelta(minutes=settings.WORKITEM_LEASE_MINUTES)
+        now = utcnow()
+        token = unicode(uuid.uuid4())
+
+        self.filter(
+            run=run, environment=environment, claimed_by=user, completed=False
+            ).update(claimed_by=None, claim_token="", lease_expires=None)
+
+        qn = connection.ops.quote_name
+        params = [
+            user.id,
+            token,
+            connection.ops.value_to_db_datetime(now + lease),
+            ]
+        available = """run_id = %s
+            AND environment_id = %s
+            AND completed = %s
+            AND deleted_on IS NULL
+            AND (lease_expires IS NULL OR lease_expires < %s)"""
+        available_params = [
+            run.id,
+            environment.id,
+            False,
+            connection.ops.value_to_db_datetime(now),
+            ]
+        ordering = "priority, {0}, id".format(qn("order"))
+
+        if connection.vendor == "mysql":
+            # MySQL can't select from the table being updated, but can order
+            # and limit a single-table update directly.
+            sql = """UPDATE execution_workitem
+                SET claimed_by_id = %s, claim_token = %s, lease_expires = %s
+                WHERE {0}
+                ORDER BY {1} LIMIT 1""".format(available, ordering)
+            params.extend(available_params)
+        else:
+            # the availability conditions are re-checked on the outer update,
+            # so a row claimed concurrently is never claimed twice.
+            sql = """UPDATE execution_workitem
+                SET claimed_by_id = %s, claim_token = %s, lease_expires = %s
+                WHERE {0} AND id = (
+                    SELECT id FROM execution_workitem
+                    WHERE {0}
+                    ORDER BY {1} LIMIT 1
+                    )""".format(available, ordering)
+            params.extend(available_params * 2)
+
+        cursor = connection.cursor()
+        cursor.execute(sql, params)
+        transaction.commit_unless_managed()
+
+        if not cursor.rowcount:
+            return None
+
+        return self.select_related(
+            "runcaseversion__caseversion__case").get(claim_token=token)
+
+
+
+class WorkItem(MTModel):
+    """
+    A claimable unit of test work: one runcaseversion in one environment.
+
+    Work items mirror the runcaseversion/environment pairs of a run; they are
+    synced whenever the run's caseversions are locked in. Case priority and
+    runcaseversion order are denormalized here so that claiming the next item
+    for a tester is a single indexed UPDATE. A claim holds a lease that
+    expires; recording a completed (or skipped) result releases it.
+
+    """
+    # sorts after all real priorities
+    UNPRIORITIZED = 2147483647
+
+    run = models.ForeignKey(Run, related_name="workitems")
+    runcaseversion = models.ForeignKey(
+        RunCaseVersion, related_name="workitems")
+    environment = models.ForeignKey(Environment, related_name="workitems")
+    # denormalized from case priority and runcaseversion order
+    priority = models.IntegerField(default=UNPRIORITIZED)
+    order = models.IntegerField(default=0)
+    completed = models.BooleanField(default=False)
+
+    claimed_by = models.ForeignKey(
+        User, blank=True, null=True, related_name="workitems")
+    claim_token = models.CharField(max_length=36, blank=True, db_index=True)
+    lease_expires = models.DateTimeField(blank=True, null=True)
+
+    objects = WorkItemManager()
+
+
+    def __unicode__(self):
+        """Return unicode representation."""
+        return "%s in %s" % (self.runcaseversion, self.environment)
+
+
+    class Meta:
+        unique_together = [("runcaseversion", "environment")]
+
+
+    def release(self):
+        """Give up the claim on this work item."""
+        WorkItem.objects.filter(pk=self.pk, claim_token=self.claim_token).update(
+            claimed_by=None, claim_token="", lease_expires=None)
+        self.claimed_by = None
+        self.claim_token = ""
+        self.lease_expires = None
+
+
+
 def result_summary(results):
     """
     Given a queryset of results, return a dict summarizing their states.
@@ -1,3 +1,4 @@
+from model_utils import Choices
 from tastypie import http, fields
 from tastypie.exceptions import ImmediateHttpResponse
 from tastypie.resources import ModelResource, ALL, ALL_WITH_RELATIONS
@@ -6,7 +7,12 @@ from ..core.api import (ProductVersionResource, ProductResource,
                         UserResource)
 from .models import CaseVersion, Case, Suite, CaseStep, SuiteCase
 from ...model.core.models import ProductVersion
-from ..mtapi import MTResource, MTAuthorization
+from ...view.lists import filters
+from ..core.auth import User
+from ..tags.models import Tag
+from ..mtapi import (MTResource, MTAuthorization, ConditionalGetMixin,
+                     OrderedMembersMixin, PrefetchRelatedMixin,
+                     SparseListMixin)
 from ..environments.api import EnvironmentResource
 from ..tags.api import TagResource
 
@@ -134,18 +140,24 @@ class CaseStepResource(MTResource):
 
 
 
-class SuiteCaseResource(MTResource):
+class SuiteCaseResource(OrderedMembersMixin, MTResource):
     """
     Create, Read, Update and Delete capabilities for SuiteCase.
 
-    Filterable by suite and case fields.
+    Filterable by suite and case fields. ``PATCH`` of the list with ``suite``
+    and an ordered ``cases`` list sets all of a suite's cases at once.
     """
 
     case = fields.ForeignKey(CaseResource, 'case')
     suite = fields.ForeignKey(SuiteResource, 'suite')
 
+    owner_field = "suite"
+    member_field = "case"
+    members_key = "cases"
+
     class Meta(MTResource.Meta):
         queryset = SuiteCase.objects.all()
+        list_allowed_methods = ["get", "post", "patch"]
         fields = ["suite", "case", "order", "id"]
         filtering = {
             "suite": ALL_WITH_RELATIONS,
@@ -164,6 +176,20 @@ class SuiteCaseResource(MTResource):
         return ["suite", "case"]
 
 
+    def check_members(self, suite, cases):
+        """cases' product must match suite's product."""
+        for case in cases:
+            if case.product_id != suite.product_id:
+                error_message = str(
+                    "case's product must match suite's product."
+                )
+                logger.error(
+                    "\n".join([error_message, "case prod: %s, suite prod: %s"]),
+                    case.product_id, suite.product_id)
+                raise ImmediateHttpResponse(
+                    response=http.HttpBadRequest(error_message))
+
+
     def hydrate_case(self, bundle):
         """case is read-only on PUT
         case.product must match suite.product on CREATE
@@ -209,6 +235,7 @@ class CaseVersionResource(MTResource):
 
     class Meta(MTResource.Meta):
         queryset = CaseVersion.objects.all()
+        read_replica = True
         fields = ["id", "name", "description", "case", "status"]
         filtering = {
             "environments": ALL,
@@ -271,8 +298,17 @@ class CaseVersionResource(MTResource):
 
 
 
-class BaseSelectionResource(ModelResource):
-    """Adds filtering by negation for use with multi-select widget"""
+class BaseSelectionResource(
+        ConditionalGetMixin, SparseListMixin, PrefetchRelatedMixin,
+        ModelResource):
+    """
+    Adds filtering by negation for use with multi-select widget.
+
+    Also applies ``Meta.filterset``, the widget's own filters, to
+    ``filter-<key>`` parameters just as the UI lists do; and sorts by
+    ``Meta.default_ordering`` and then id, so that offset pages are stable.
+
+    """
     #@@@ move this to mtapi.py when that code is merged in.
 
     def apply_filters(self,
@@ -312,9 +348,28 @@ class BaseSelectionResource(ModelResource):
 
         base_object_list = self.apply_filters(
             request, applicable_filters, applicable_excludes)
+
+        filterset = getattr(self._meta, "filterset", None)
+        if filterset is not None and hasattr(request, "GET"):
+            base_object_list = filterset.bind(request.GET).filter(
+                base_object_list)
+
         return self.apply_authorization_limits(request, base_object_list)
 
 
+    def apply_sorting(self, obj_list, options=None):
+        """Sort as requested or by default, with id as the tie-breaker."""
+        obj_list = super(BaseSelectionResource, self).apply_sorting(
+            obj_list, options)
+        order_by = list(obj_list.query.order_by) or list(
+            getattr(self._meta, "default_ordering", None) or
+            obj_list.model._meta.ordering
+            )
+        if not set(["id", "-id", "pk", "-pk"]).intersection(order_by):
+            order_by.append("id")
+        return obj_list.order_by(*order_by)
+
+
 
 class CaseSelectionResource(BaseSelectionResource):
     """
@@ -351,6 +406,32 @@ class CaseSelectionResource(BaseSelectionResource):
             "created_by": ALL_WITH_RELATIONS
             }
         ordering = ["case"]
+        default_ordering = ["name"]
+        # keys added by dehydrate, and the fields it reads to add them
+        dehydrated = {
+            "case_id": ["case"],
+            "product_id": ["case"],
+            "product": ["case"],
+            "priority": ["case"],
+            }
+        filterset = filters.FilterSet(
+            [
+                filters.KeywordFilter("name"),
+                filters.LazyModelFilter(
+                    "tag", lookup="tags", queryset=Tag.objects.all()),
+                filters.LazyModelFilter(
+                    "author",
+                    lookup="created_by",
+                    queryset=User.objects.all(),
+                    ),
+                filters.ChoicesFilter(
+                    "priority",
+                    lookup="case__priority",
+                    choices=Choices(1, 2, 3, 4),
+                    coerce=int,
+                    ),
+                ]
+            )
 
 
     def dehydrate(self, bundle):
@@ -400,6 +481,40 @@ class CaseVersionSelectionResource(BaseSelectionResource):
             "created_by": ALL_WITH_RELATIONS
             }
         ordering = ["name"]
+        default_ordering = ["name"]
+        select_related = ["productversion__product"]
+        # keys added by dehydrate, and the fields it reads to add them
+        dehydrated = {
+            "case_id": ["case"],
+            "product_id": ["case"],
+            "product": ["case"],
+            "productversion_name": ["productversion"],
+            "priority": ["case"],
+            }
+        filterset = filters.FilterSet(
+            [
+                filters.KeywordFilter("name"),
+                filters.LazyModelFilter(
+                    "product version",
+                    key="productversion",
+                    lookup="productversion",
+                    queryset=ProductVersion.objects.all(),
+                    ),
+                filters.LazyModelFilter(
+                    "tag", lookup="tags", queryset=Tag.objects.all()),
+                filters.LazyModelFilter(
+                    "author",
+                    lookup="created_by",
+                    queryset=User.objects.all(),
+                    ),
+                filters.ChoicesFilter(
+                    "priority",
+                    lookup="case__priority",
+                    choices=Choices(1, 2, 3, 4),
+                    coerce=int,
+                    ),
+                ]
+            )
 
 
     def dehydrate(self, bundle):
@@ -6,7 +6,7 @@ from django.core.exceptions import ValidationError
 from django.db import models
 
 from ..attachments.models import Attachment
-from ..mtmodel import MTModel, DraftStatusModel
+from ..mtmodel import MTModel, DraftStatusModel, set_ordered_members
 from ..core.models import Product, ProductVersion
 from ..environments.models import HasEnvironmentsModel
 from ..tags.models import Tag
@@ -43,16 +43,18 @@ class Case(MTModel):
         except IndexError:
             pass
         else:
-            self.versions.exclude(pk=latest_version.pk).update(
-                latest=False, notrack=True)
-            self.versions.filter(pk=latest_version.pk).update(
+            # only rows whose flag changes are updated, so a save that doesn't
+            # change which version is latest doesn't bump generations in bulk
+            self.versions.exclude(pk=latest_version.pk).filter(
+                latest=True).update(latest=False, notrack=True)
+            self.versions.filter(pk=latest_version.pk, latest=False).update(
                 latest=True, notrack=True)
             if update_instance is not None:
-                update_instance.cc_version += 1
-                if update_instance == latest_version:
-                    update_instance.latest = True
-                else:
-                    update_instance.latest = False
+                latest = (update_instance == latest_version)
+                # the instance was just saved, so its flag is as in the DB
+                if update_instance.latest != latest:
+                    update_instance.cc_version += 1
+                update_instance.latest = latest
 
 
     def all_versions(self):
@@ -308,6 +310,17 @@ class Suite(MTModel, DraftStatusModel):
         return super(Suite, self).clone(*args, **kwargs)
 
 
+    def set_cases(self, cases, user=None):
+        """
+        Make ``cases`` (instances or ids) this suite's cases, in order.
+
+        Only the changes are written; see ``set_ordered_members``.
+
+        """
+        return set_ordered_members(
+            SuiteCase, "suite", self, "case", cases, user=user)
+
+
     class Meta:
         permissions = [("manage_suites", "Can add/edit/delete test suites.")]
 
@@ -1,10 +1,19 @@
-from tastypie import http
+from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
+from django.db.models.fields import FieldDoesNotExist
+from django.http import HttpResponseNotModified
+from django.utils.http import urlencode, parse_etags, quote_etag
+from tastypie import fields, http
 from tastypie.authentication import ApiKeyAuthentication
 from tastypie.authorization import  Authorization
-from tastypie.exceptions import ImmediateHttpResponse
-from tastypie.resources import ModelResource
+from tastypie.exceptions import BadRequest, ImmediateHttpResponse
+from tastypie.paginator import Paginator
+from tastypie.resources import ModelResource, Resource
 
+from ..view.utils.replica import read_replica
+from ..deploy import routers
+from . import cache
 from .core.models import ApiKey
+from .mtmodel import set_ordered_members
 
 import logging
 logger = logging.getLogger("moztrap.model.mtapi")
@@ -88,7 +97,566 @@ class MTAuthorization(Authorization):
 
 
 
-class MTResource(ModelResource):
+def relation_graph(resource, prefix="", many=False, field_names=None):
+    """
+    Return (select_related, prefetch_related) lookups for ``resource``.
+
+    The graph is built from the related fields the resource will dehydrate,
+    following ``full=True`` fields into the related resource, plus any
+    lookups named in ``Meta.select_related`` and ``Meta.prefetch_related``
+    for relations that ``dehydrate`` methods touch. ``prefix`` is the lookup
+    path to ``resource`` from the top-level queryset; ``many`` is True if that
+    path crosses a to-many relation, in which case everything below it has to
+    be prefetched rather than joined. If ``field_names`` is given, only those
+    fields of ``resource`` are considered.
+
+    """
+    select = []
+    prefetch = []
+
+    def add(lookup, to_many):
+        lookup = prefix + lookup
+        if many or to_many:
+            prefetch.append(lookup)
+        else:
+            select.append(lookup)
+
+    for lookup in getattr(resource._meta, "select_related", []):
+        add(lookup, False)
+    for lookup in getattr(resource._meta, "prefetch_related", []):
+        add(lookup, True)
+
+    for name, field in resource.fields.items():
+        if field_names is not None and name not in field_names:
+            continue
+        if not isinstance(field, fields.RelatedField):
+            continue
+        if not isinstance(field.attribute, basestring):
+            continue
+        to_many = isinstance(field, fields.ToManyField)
+        add(field.attribute, to_many)
+        if field.full:
+            nested_select, nested_prefetch = relation_graph(
+                field.to_class(),
+                prefix + field.attribute + "__",
+                many or to_many,
+                )
+            select.extend(nested_select)
+            prefetch.extend(nested_prefetch)
+
+    return select, prefetch
+
+
+
+def requested_fields(resource, request):
+    """
+    Return the set of field names requested in ``?fields=``, or None.
+
+    Names needn't be fields of ``resource``; keys added by its ``dehydrate``
+    method can be requested too.
+
+    """
+    if request is None or not request.GET.get("fields"):
+        return None
+    field_names = set(
+        name.strip() for name in request.GET["fields"].split(",")
+        if name.strip()
+        )
+    field_names.add("resource_uri")
+    return field_names
+
+
+
+def loaded_fields(resource, field_names):
+    """
+    Return names of fields of ``resource`` to load for ``field_names``.
+
+    Keys added by the resource's ``dehydrate`` method are declared in
+    ``Meta.dehydrated``, mapped to the fields ``dehydrate`` reads to add them;
+    if any of those keys are requested, all the fields ``dehydrate`` reads
+    are loaded too. Returns None (load everything) if ``field_names`` is None,
+    or the resource overrides ``dehydrate`` without declaring its keys.
+
+    """
+    if field_names is None:
+        return None
+    dehydrated = getattr(resource._meta, "dehydrated", None)
+    if dehydrated is None:
+        if type(resource).dehydrate.im_func is not Resource.dehydrate.im_func:
+            return None
+        return field_names
+    names = set(field_names)
+    if names.intersection(dehydrated):
+        for needed in dehydrated.values():
+            names.update(needed)
+    return names
+
+
+
+def projection(resource, queryset, field_names):
+    """
+    Return model field names to load for ``field_names`` of ``resource``.
+
+    ``field_names`` can also name model fields the resource doesn't expose.
+    Returns None if a requested field isn't backed directly by a model
+    field, since then there's no telling what it needs loaded.
+
+    """
+    model = queryset.model
+    names = set([model._meta.pk.name])
+    # relations followed by select_related can't be deferred
+    if isinstance(queryset.query.select_related, dict):
+        names.update(queryset.query.select_related)
+    for lookup in getattr(resource._meta, "select_related", []):
+        names.add(lookup.split("__")[0])
+
+    for name in field_names:
+        if name == "resource_uri":
+            continue
+        if name in resource.fields:
+            attribute = resource.fields[name].attribute
+            if not isinstance(attribute, basestring):
+                return None
+        else:
+            attribute = name
+        try:
+            field, model_class, direct, m2m = model._meta.get_field_by_name(
+                attribute)
+        except FieldDoesNotExist:
+            if name not in resource.fields:
+                continue
+            return None
+        if direct and not m2m:
+            names.add(attribute)
+
+    return sorted(names)
+
+
+
+class CursorPaginator(Paginator):
+    """
+    Pages through objects in id order, starting after the id in ``cursor``.
+
+    Unlike offset paging this stays fast deep into a large result set, and
+    doesn't skip or repeat objects when others are added or removed between
+    requests. The total count is not computed.
+
+    """
+    def get_cursor(self):
+        """Return the id to start after; 0 to start at the beginning."""
+        cursor = self.request_data.get("cursor") or 0
+        try:
+            cursor = int(cursor)
+        except ValueError:
+            raise BadRequest(
+                "Invalid cursor '%s' provided. Please provide an integer."
+                % cursor)
+        return cursor
+
+
+    def _generate_uri(self, limit, cursor):
+        if self.resource_uri is None:
+            return None
+
+        request_params = dict(
+            [k, v.encode("utf-8")] for k, v in self.request_data.items())
+        request_params.pop("offset", None)
+        request_params.update({"limit": limit, "cursor": cursor})
+        return "%s?%s" % (self.resource_uri, urlencode(request_params))
+
+
+    def page(self):
+        """Return the page of objects after the cursor, and its metadata."""
+        limit = self.get_limit()
+        cursor = self.get_cursor()
+        objects = self.objects.filter(pk__gt=cursor).order_by("pk")
+
+        next_cursor = None
+        if limit:
+            # fetch one extra to find out whether there's another page
+            objects = list(objects[:limit + 1])
+            if len(objects) > limit:
+                objects = objects[:limit]
+                next_cursor = objects[-1].pk
+        else:
+            objects = list(objects)
+
+        meta = {
+            "limit": limit,
+            "cursor": cursor,
+            "next_cursor": next_cursor,
+            "next": None,
+            }
+        if next_cursor is not None:
+            meta["next"] = self._generate_uri(limit, next_cursor)
+
+        return {
+            "objects": objects,
+            "meta": meta,
+            }
+
+
+
+def lookup_models(model, lookup):
+    """
+    Return list of models crossed by ``lookup`` (e.g. "case__suites").
+
+    Stops quietly at the first part that isn't a relation, so filter lookups
+    like "name__icontains" can be given as-is.
+
+    """
+    models = []
+    for name in lookup.split("__"):
+        try:
+            field, model_class, direct, m2m = model._meta.get_field_by_name(
+                name)
+        except FieldDoesNotExist:
+            break
+        if direct:
+            if field.rel is None:
+                break
+            model = field.rel.to
+        else:
+            model = field.model
+        models.append(model)
+    return models
+
+
+
+def resource_models(resource):
+    """
+    Return set of models whose data a GET of ``resource`` can depend on.
+
+    That's the resource's own model, the models of its related fields (and
+    everything under ``full=True`` ones), models reached by its queryset's and
+    Meta's related lookups, and any models (or "app_label.ModelName" strings)
+    listed in ``Meta.cache_dependencies`` for data its ``dehydrate`` adds.
+
+    """
+    model = resource._meta.object_class
+    models = set([model])
+    models.update(getattr(resource._meta, "cache_dependencies", []))
+
+    query = resource._meta.queryset.query
+    lookups = list(getattr(resource._meta, "select_related", []))
+    lookups.extend(getattr(resource._meta, "prefetch_related", []))
+    if isinstance(query.select_related, dict):
+        lookups.extend(query.select_related)
+    lookups.extend(
+        getattr(resource._meta.queryset, "_prefetch_related_lookups", []))
+    for lookup in lookups:
+        models.update(lookup_models(model, lookup))
+
+    for field in resource.fields.values():
+        if not isinstance(field, fields.RelatedField):
+            continue
+        related = field.to_class()
+        if field.full:
+            models.update(resource_models(related))
+        else:
+            models.add(related._meta.object_class)
+        if isinstance(field.attribute, basestring):
+            models.update(lookup_models(model, field.attribute))
+
+    return models
+
+
+
+class ConditionalGetMixin(object):
+    """
+    Set an ETag on GET responses, and answer a matching GET with a 304.
+
+    The ETag is derived from the cache generations of ``resource_models``,
+    the request's full path (so filters and paging) and Accept header, so
+    validating it costs no queries at all.
+
+    """
+    _resource_models = {}
+
+
+    def etag(self, request):
+        """Return ETag for a GET of ``request``."""
+        cls = self.__class__
+        if cls not in self._resource_models:
+            self._resource_models[cls] = list(resource_models(self))
+        models = self._resource_models[cls]
+
+        # filters may cross relations to models that aren't otherwise shown
+        model = self._meta.object_class
+        for key in request.GET:
+            models = models + lookup_models(model, key)
+
+        return cache.fingerprint(
+            models,
+            request.get_full_path(),
+            request.META.get("HTTP_ACCEPT", ""),
+            routers.replica_epoch(),
+            )
+
+
+    def conditional(self, request, method, **kwargs):
+        """Call ``method`` unless the request's If-None-Match is current."""
+        tag = self.etag(request)
+        try:
+            etags = parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+        except ValueError:
+            etags = []
+        if tag in etags or "*" in etags:
+            response = HttpResponseNotModified()
+            # a 304 has no content
+            del response["Content-Type"]
+        else:
+            response = method(request, **kwargs)
+            if response.status_code != 200:
+                return response
+        response["ETag"] = quote_etag(tag)
+        return response
+
+
+    def get_list(self, request, **kwargs):
+        """Return a page of objects, or 304 if unchanged."""
+        return self.conditional(
+            request,
+            super(ConditionalGetMixin, self).get_list,
+            **kwargs)
+
+
+    def get_detail(self, request, **kwargs):
+        """Return a single object, or 304 if unchanged."""
+        return self.conditional(
+            request,
+            super(ConditionalGetMixin, self).get_detail,
+            **kwargs)
+
+
+
+class ReadReplicaMixin(object):
+    """
+    Serve GETs from a read replica if ``Meta.read_replica`` is True.
+
+    See ``moztrap.view.utils.replica``.
+
+    """
+    def wrap_view(self, view):
+        """Mark the wrapped view as able to read from a replica."""
+        wrapper = super(ReadReplicaMixin, self).wrap_view(view)
+        if getattr(self._meta, "read_replica", False):
+            wrapper = read_replica(wrapper)
+        return wrapper
+
+
+
+class PrefetchRelatedMixin(object):
+    """
+    Fetch related objects up front for GET requests.
+
+    Tastypie dehydrates related fields one object at a time, so without this
+    a list of N objects with related fields costs at least N queries.
+
+    """
+    def get_object_list(self, request):
+        """Add select_related and prefetch_related lookups to the queryset."""
+        object_list = super(PrefetchRelatedMixin, self).get_object_list(
+            request)
+        if getattr(request, "method", None) != "GET":
+            return object_list
+
+        select, prefetch = relation_graph(
+            self,
+            field_names=loaded_fields(self, requested_fields(self, request)),
+            )
+        if select:
+            object_list = object_list.select_related(*select)
+        if prefetch:
+            object_list = object_list.prefetch_related(*prefetch)
+        return object_list
+
+
+
+class SparseListMixin(object):
+    """
+    Support ``?fields=`` sparse fieldsets and ``?cursor=`` pagination.
+
+    ``fields`` is a comma-separated list of field names; only those fields
+    (and ``resource_uri``) are dehydrated and returned, and the SQL query
+    loads only the model fields they need. The resource's ``dehydrate`` is
+    only called if keys it adds (see ``loaded_fields``) are requested, or if
+    it doesn't declare them. Giving ``cursor`` (an object id, or empty to
+    start at the beginning) switches list pagination from offset/limit to
+    ``CursorPaginator``.
+
+    """
+    def get_object_list(self, request):
+        """Defer loading model fields that weren't requested."""
+        object_list = super(SparseListMixin, self).get_object_list(request)
+        if getattr(request, "method", None) != "GET":
+            return object_list
+
+        field_names = loaded_fields(self, requested_fields(self, request))
+        if field_names is not None:
+            only = projection(self, object_list, field_names)
+            if only is not None:
+                object_list = object_list.only(*only)
+        return object_list
+
+
+    def dehydrate_fields(self, bundle, field_names):
+        """Like ``full_dehydrate``, but only for ``field_names``, if given."""
+        if field_names is None:
+            return self.full_dehydrate(bundle)
+
+        for field_name, field_object in self.fields.items():
+            if field_name not in field_names:
+                continue
+            if getattr(field_object, "dehydrated_type", None) == "related":
+                field_object.api_name = self._meta.api_name
+                field_object.resource_name = self._meta.resource_name
+
+            bundle.data[field_name] = field_object.dehydrate(bundle)
+
+            method = getattr(self, "dehydrate_%s" % field_name, None)
+            if method:
+                bundle.data[field_name] = method(bundle)
+
+        dehydrated = getattr(self._meta, "dehydrated", None)
+        if dehydrated is None or field_names.intersection(dehydrated):
+            bundle = self.dehydrate(bundle)
+        # drop anything dehydrate added that wasn't asked for
+        for key in bundle.data.keys():
+            if key not in field_names:
+                del bundle.data[key]
+        return bundle
+
+
+    def get_list(self, request, **kwargs):
+        """Return a page of objects, with only the requested fields."""
+        field_names = requested_fields(self, request)
+        objects = self.obj_get_list(
+            request=request, **self.remove_api_resource_names(kwargs))
+
+        if "cursor" in request.GET:
+            if "order_by" in request.GET:
+                raise BadRequest(
+                    "order_by can't be used with cursor; "
+                    "cursor pages are always in id order.")
+            paginator_class = CursorPaginator
+        else:
+            objects = self.apply_sorting(objects, options=request.GET)
+            paginator_class = self._meta.paginator_class
+
+        paginator = paginator_class(
+            request.GET,
+            objects,
+            resource_uri=self.get_resource_list_uri(),
+            limit=self._meta.limit,
+            )
+        to_be_serialized = paginator.page()
+
+        bundles = [
+            self.build_bundle(obj=obj, request=request)
+            for obj in to_be_serialized["objects"]
+            ]
+        to_be_serialized["objects"] = [
+            self.dehydrate_fields(bundle, field_names) for bundle in bundles]
+        to_be_serialized = self.alter_list_data_to_serialize(
+            request, to_be_serialized)
+        return self.create_response(request, to_be_serialized)
+
+
+    def get_detail(self, request, **kwargs):
+        """Return a single object, with only the requested fields."""
+        field_names = requested_fields(self, request)
+        try:
+            obj = self.cached_obj_get(
+                request=request, **self.remove_api_resource_names(kwargs))
+        except ObjectDoesNotExist:
+            return http.HttpNotFound()
+        except MultipleObjectsReturned:
+            return http.HttpMultipleChoices(
+                "More than one resource is found at this URI.")
+
+        bundle = self.build_bundle(obj=obj, request=request)
+        bundle = self.dehydrate_fields(bundle, field_names)
+        bundle = self.alter_detail_data_to_serialize(request, bundle)
+        return self.create_response(request, bundle)
+
+
+
+class OrderedMembersMixin(object):
+    """
+    Overloads ``PATCH`` of a list of ordered associations (e.g. suitecases)
+    to set all of one owner's members, in order, in a single request.
+
+    The request has the owner's URI under ``owner_field`` and the ordered
+    URIs of its members under ``members_key``. Only the differences from the
+    owner's current associations are written (see ``set_ordered_members``),
+    and the response reports how many associations were added, removed and
+    moved.
+
+    Subclasses set ``owner_field``, ``member_field`` and ``members_key``, and
+    may override ``check_members``.
+
+    """
+    owner_field = None
+    member_field = None
+    members_key = None
+
+
+    def check_members(self, owner, members):
+        """Raise ImmediateHttpResponse if ``members`` can't be in ``owner``."""
+        pass
+
+
+    def patch_list(self, request, **kwargs):
+        """Set the owner's members to the given ordered list."""
+        deserialized = self.deserialize(
+            request,
+            request.raw_post_data,
+            format=request.META.get('CONTENT_TYPE', 'application/json'))
+
+        owner_uri = deserialized.get(self.owner_field)
+        member_uris = deserialized.get(self.members_key)
+        if not owner_uri or not isinstance(member_uris, list):
+            error_msg = "PATCH request must contain {0} and {1} list.".format(
+                self.owner_field, self.members_key)
+            logger.error(error_msg)
+            raise ImmediateHttpResponse(
+                response=http.HttpBadRequest(error_msg))
+
+        owner_model = self.model._meta.get_field(self.owner_field).rel.to
+        member_model = self.model._meta.get_field(self.member_field).rel.to
+        try:
+            owner = owner_model.objects.get(pk=self._id_from_uri(owner_uri))
+            member_ids = [int(self._id_from_uri(uri)) for uri in member_uris]
+            by_id = member_model.objects.in_bulk(member_ids)
+            members = [by_id[member_id] for member_id in member_ids]
+        except (ObjectDoesNotExist, AttributeError, ValueError, KeyError):
+            error_msg = "{0} and {1} must be valid resource uris.".format(
+                self.owner_field, self.members_key)
+            logger.error(error_msg)
+            raise ImmediateHttpResponse(
+                response=http.HttpBadRequest(error_msg))
+
+        self.check_members(owner, members)
+        added, removed, moved = set_ordered_members(
+            self.model,
+            self.owner_field,
+            owner,
+            self.member_field,
+            members,
+            user=request.user,
+            )
+
+        return self.create_response(
+            request,
+            {"added": added, "removed": removed, "moved": moved},
+            response_class=http.HttpAccepted,
+            )
+
+
+
+class MTResource(ConditionalGetMixin, ReadReplicaMixin, SparseListMixin,
+                 PrefetchRelatedMixin, ModelResource):
     """Implement the common code needed for CRUD API interfaces.
 
     Child classes must implement the following abstract methods:
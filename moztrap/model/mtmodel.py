@@ -10,10 +10,11 @@ import datetime
 from django.db import models, router
 from django.db.models.deletion import Collector
 from django.db.models.query import QuerySet
-from django.db.models.signals import class_prepared
+from django.db.models.signals import class_prepared, m2m_changed
 
 from model_utils import Choices
 
+from . import cache
 from .core.auth import User
 
 
@@ -28,6 +29,91 @@ def utcnow():
 
 
 
+# rows per INSERT; keeps within SQLite's limit of 999 parameters per query
+BULK_PARAMETERS = 900
+
+
+
+def bulk_create(model, objs):
+    """Insert ``objs`` of ``model`` in as few queries as the database allows."""
+    batch_size = max(1, BULK_PARAMETERS // len(model._meta.local_fields))
+    for i in range(0, len(objs), batch_size):
+        model._base_manager.bulk_create(objs[i:i + batch_size])
+
+
+
+def set_ordered_members(model, owner_field, owner, member_field, members,
+                        user=None):
+    """
+    Make ``members`` the ordered members of ``owner``; return diff sizes.
+
+    ``model`` is an ordered association model (e.g. SuiteCase) with foreign
+    keys named ``owner_field`` and ``member_field`` and an integer ``order``;
+    ``members`` are instances or ids, in order, and duplicates are ignored.
+
+    Only the difference from the existing associations is written: those of
+    removed members are deleted, those of new members are inserted in bulk,
+    and kept associations whose order changed are updated with one query per
+    distinct shift (so moving one member is two updates). Kept associations
+    keep their ids.
+
+    Returns (added, removed, moved) counts.
+
+    """
+    owner_id = getattr(owner, "pk", owner)
+    member_ids = []
+    for member in members:
+        member_id = int(getattr(member, "pk", member))
+        if member_id not in member_ids:
+            member_ids.append(member_id)
+    position = dict((member_id, i) for i, member_id in enumerate(member_ids))
+
+    kept = set()
+    removed = []
+    shifts = {}
+    existing = model.objects.filter(**{owner_field: owner_id}).order_by(
+        "order", "id").values_list("id", member_field, "order")
+    for pk, member_id, order in existing:
+        if member_id not in position or member_id in kept:
+            removed.append(pk)
+            continue
+        kept.add(member_id)
+        shift = position[member_id] - order
+        if shift:
+            shifts.setdefault(shift, []).append(pk)
+
+    for i in range(0, len(removed), BULK_PARAMETERS):
+        model.everything.filter(
+            pk__in=removed[i:i + BULK_PARAMETERS]).delete(permanent=True)
+    for shift, pks in shifts.items():
+        for i in range(0, len(pks), BULK_PARAMETERS):
+            model.everything.filter(
+                pk__in=pks[i:i + BULK_PARAMETERS]).update(
+                order=models.F("order") + shift, user=user)
+
+    owner_attname = model._meta.get_field(owner_field).attname
+    member_attname = model._meta.get_field(member_field).attname
+    now = utcnow()
+    added = [
+        model(
+            order=i,
+            created_on=now,
+            created_by=user,
+            modified_on=now,
+            modified_by=user,
+            **{owner_attname: owner_id, member_attname: member_id}
+            )
+        for i, member_id in enumerate(member_ids)
+        if member_id not in kept
+        ]
+    if added:
+        bulk_create(model, added)
+        cache.bump(model)
+
+    return len(added), len(removed), sum(len(pks) for pks in shifts.values())
+
+
+
 class SoftDeleteCollector(Collector):
     """
     A variant of Django's default delete-cascade collector that implements soft
@@ -57,6 +143,7 @@ class SoftDeleteCollector(Collector):
             model._base_manager.filter(
                 pk__in=pk_list, deleted_on__isnull=True).update(
                 deleted_by=user, deleted_on=now)
+            cache.bump(model, pk_list)
 
 
     def undelete(self, user=None):
@@ -72,6 +159,7 @@ class SoftDeleteCollector(Collector):
             model._base_manager.filter(
                 pk__in=pk_list, deleted_on__in=deletion_times).update(
                 deleted_by=None, deleted_on=None)
+            cache.bump(model, pk_list)
 
 
 
@@ -100,7 +188,10 @@ class MTQuerySet(QuerySet):
             kwargs["modified_on"] = utcnow()
         # increment the concurrency control version for all updated objects
         kwargs["cc_version"] = models.F("cc_version") + 1
-        return super(MTQuerySet, self).update(*args, **kwargs)
+        rows = super(MTQuerySet, self).update(*args, **kwargs)
+        if rows:
+            cache.bump(self.model)
+        return rows
 
 
     def delete(self, user=None, permanent=False):
@@ -109,7 +200,10 @@ class MTQuerySet(QuerySet):
 
         """
         if permanent:
-            return super(MTQuerySet, self).delete()
+            super(MTQuerySet, self).delete()
+            cache.bump(self.model)
+            return
+        self._for_write = True
         collector = SoftDeleteCollector(using=self.db)
         collector.collect(self)
         collector.delete(user)
@@ -120,6 +214,7 @@ class MTQuerySet(QuerySet):
         Undelete all objects in this queryset.
 
         """
+        self._for_write = True
         collector = SoftDeleteCollector(using=self.db)
         collector.collect(self)
         collector.undelete(user)
@@ -138,6 +233,10 @@ class MTManager(models.Manager):
     still hide deleted objects.
 
     """
+    # subclasses may use a subclass of MTQuerySet
+    queryset_class = MTQuerySet
+
+
     def __init__(self, *args, **kwargs):
         """Instantiate a MTManager, pulling out the ``show_deleted`` arg."""
         self._show_deleted = kwargs.pop("show_deleted", False)
@@ -146,7 +245,9 @@ class MTManager(models.Manager):
 
     def get_query_set(self):
         """Return a ``MTQuerySet`` for all queries."""
-        qs = MTQuerySet(self.model, using=self.db)
+        # not self.db, which would fix the database for reads even if the
+        # queryset is used for writes (see moztrap.deploy.routers)
+        qs = self.queryset_class(self.model, using=self._db)
         if not self._show_deleted:
             qs = qs.filter(deleted_on__isnull=True)
         return qs
@@ -217,7 +318,8 @@ class MTModel(models.Model):
                         self.__class__, self.id, previous_version)
                     )
         else:
-            return super(MTModel, self).save(*args, **kwargs)
+            super(MTModel, self).save(*args, **kwargs)
+        cache.bump(self.__class__, [self.pk])
 
 
     def clone(self, cascade=None, overrides=None, user=None):
@@ -288,7 +390,9 @@ class MTModel(models.Model):
 
         """
         if permanent:
-            return super(MTModel, self).delete()
+            super(MTModel, self).delete()
+            cache.bump(self.__class__)
+            return
         self._collector.delete(user)
 
 
@@ -441,3 +545,17 @@ def set_default_status(sender, **kwargs):
 
 
 class_prepared.connect(set_default_status)
+
+
+
+def bump_m2m_generations(sender, instance, action, model, pk_set, **kwargs):
+    """Bump cache generations of MTModels on both sides of an m2m change."""
+    if not action.startswith("post_"):
+        return
+    if isinstance(instance, MTModel):
+        cache.bump(instance.__class__, [instance.pk])
+    if issubclass(model, MTModel):
+        cache.bump(model, pk_set)
+
+
+m2m_changed.connect(bump_m2m_generations)
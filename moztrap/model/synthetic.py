@@ -0,0 +1,391 @@
+"""
+Generation of large volumes of synthetic data, for benchmarking.
+
+``Generator`` creates products, versions, cases (with versions and steps),
+suites, environments, active runs, and results, at a configurable scale. All
+rows are written with bulk inserts in batches (with primary keys allocated up
+front, so related rows can be built without reading anything back), so even
+the "production" scale of ``SCALES`` can be generated in reasonable time::
+
+    counts = Generator(SCALES["small"]).generate()
+
+Counts are per parent: e.g. ``cases`` is cases per product and ``results``
+is results per run case version (one per environment, up to the number of
+environments). Each product version has all of the generated environments.
+
+Generated data is marked by its tester user (``TESTER``), so tools that write
+to the database (e.g. benchmarks) can check with ``generated()`` that they
+aren't running against real data.
+
+Bulk inserts bypass ``save()``, so denormalized data that ``save()`` would
+maintain (product version order, latest case versions, work items) is
+written directly, and the cache generations of all generated models are
+bumped when done.
+
+"""
+import datetime
+import itertools
+import json
+import random
+
+from django.db import transaction
+from django.db.models import Max
+
+from . import cache
+from .core.auth import User
+from .core.models import Product, ProductVersion
+from .environments.models import (
+    Profile, Category, Element, Environment, element_signature)
+from .execution.models import Run, RunSuite, RunCaseVersion, Result
+from .library.models import Case, CaseVersion, CaseStep, Suite, SuiteCase
+from .mtmodel import utcnow
+
+
+
+# Username of the user generated data is created by; marks generated data.
+TESTER = "synthetic-tester"
+
+
+# Result statuses generated, with relative frequency.
+STATUSES = (
+    [Result.STATUS.passed] * 16 +
+    [Result.STATUS.failed] * 2 +
+    [Result.STATUS.blocked, Result.STATUS.invalidated, Result.STATUS.skipped]
+    )
+
+
+SCALES = {
+    "tiny": {
+        "products": 1,
+        "versions": 2,
+        "cases": 10,
+        "steps": 2,
+        "suites": 2,
+        "environments": 2,
+        "runs": 2,
+        "run_cases": 5,
+        "results": 1,
+        },
+    "small": {
+        "products": 5,
+        "versions": 3,
+        "cases": 200,
+        "steps": 3,
+        "suites": 5,
+        "environments": 4,
+        "runs": 5,
+        "run_cases": 50,
+        "results": 2,
+        },
+    "medium": {
+        "products": 20,
+        "versions": 4,
+        "cases": 1000,
+        "steps": 3,
+        "suites": 10,
+        "environments": 10,
+        "runs": 10,
+        "run_cases": 100,
+        "results": 5,
+        },
+    # 500k case versions, 5k runs, 20M results
+    "production": {
+        "products": 50,
+        "versions": 4,
+        "cases": 2500,
+        "steps": 3,
+        "suites": 10,
+        "environments": 20,
+        "runs": 25,
+        "run_cases": 200,
+        "results": 20,
+        },
+    }
+
+
+
+def generated():
+    """Return True if the database holds data generated by ``Generator``."""
+    return User.objects.filter(username=TESTER).exists()
+
+
+
+class BulkWriter(object):
+    """Buffers unsaved instances of a model and bulk-inserts them in batches."""
+    def __init__(self, model, batch_size):
+        self.model = model
+        self.batch_size = batch_size
+        self.count = 0
+        self._pending = []
+
+
+    def add(self, obj):
+        """Queue ``obj`` for insert, inserting a batch if one is full."""
+        self._pending.append(obj)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+
+    def flush(self):
+        """Insert all queued objects."""
+        if self._pending:
+            self.model._base_manager.bulk_create(self._pending)
+            self.count += len(self._pending)
+            self._pending = []
+
+
+
+class Generator(object):
+    """Generates synthetic data at the scale given by ``counts``."""
+    def __init__(self, counts, batch_size=500, seed=0, log=None):
+        self.counts = counts
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.log = log or (lambda msg: None)
+        self.now = utcnow()
+        self._next_ids = {}
+        self._writers = {}
+
+
+    def generate(self):
+        """Generate all data; return dictionary mapping model name to count."""
+        with transaction.commit_on_success():
+            self.tester, created = User.objects.get_or_create(
+                username=TESTER,
+                defaults={"email": "%s@example.com" % TESTER},
+                )
+            self.environments = self.generate_environments()
+        for i in range(self.counts["products"]):
+            # a transaction per product keeps transactions a reasonable size
+            with transaction.commit_on_success():
+                self.generate_product()
+            self.log(
+                "Product {0} of {1} done.".format(
+                    i + 1, self.counts["products"]))
+
+        for model in self._writers:
+            cache.bump(model)
+        cache.flush_pending()
+
+        return dict(
+            (model._meta.object_name, writer.count)
+            for model, writer in self._writers.items()
+            )
+
+
+    def next_id(self, model):
+        """Allocate and return a primary key for a new ``model`` row."""
+        if model not in self._next_ids:
+            last = model._base_manager.aggregate(last=Max("id"))["last"]
+            self._next_ids[model] = (last or 0) + 1
+        pk = self._next_ids[model]
+        self._next_ids[model] += 1
+        return pk
+
+
+    def writer(self, model):
+        """Return the ``BulkWriter`` for ``model``."""
+        if model not in self._writers:
+            self._writers[model] = BulkWriter(model, self.batch_size)
+        return self._writers[model]
+
+
+    def add(self, model, pk=None, **kwargs):
+        """Queue a new ``model`` row with a pre-allocated id; return the id."""
+        if pk is None:
+            pk = self.next_id(model)
+        self.writer(model).add(
+            model(
+                id=pk,
+                created_on=self.now,
+                modified_on=self.now,
+                **kwargs)
+            )
+        return pk
+
+
+    def link(self, through, **kwargs):
+        """Queue a new row of m2m ``through`` model."""
+        self.writer(through).add(through(**kwargs))
+
+
+    def flush(self, *models):
+        """Insert all queued rows of ``models``, in order."""
+        for model in models:
+            self.writer(model).flush()
+
+
+    def generate_environments(self):
+        """
+        Return ids of new environments, in a new profile.
+
+        Environments are combinations of one element from each of three
+        categories, with just enough elements to make enough environments.
+
+        """
+        wanted = self.counts["environments"]
+        per_category = 1
+        while per_category ** 3 < wanted:
+            per_category += 1
+
+        profile = self.add(Profile, name="Synthetic profile")
+        # (id, name) pairs of elements, by category in category name order
+        elements = []
+        for name in ["Browser", "Locale", "OS"]:
+            category = self.add(Category, name="Synthetic %s" % name)
+            names = [
+                "Synthetic %s %s" % (name, i + 1) for i in range(per_category)]
+            elements.append(
+                [
+                    (self.add(Element, name=n, category_id=category), n)
+                    for n in names
+                    ]
+                )
+
+        EnvElement = Environment.elements.through
+        environments = []
+        for combo in itertools.islice(itertools.product(*elements), wanted):
+            # bulk-inserted links don't send m2m_changed to set the signature
+            # and element cache
+            env = self.add(
+                Environment,
+                profile_id=profile,
+                signature=element_signature([eid for eid, n in combo]),
+                element_cache=json.dumps([list(pair) for pair in combo]),
+                )
+            environments.append(env)
+            for element, n in combo:
+                self.link(EnvElement, environment_id=env, element_id=element)
+
+        self.flush(Profile, Category, Element, Environment, EnvElement)
+        return environments
+
+
+    def generate_product(self):
+        """Generate one product and everything in it."""
+        counts = self.counts
+        product = self.next_id(Product)
+        self.add(Product, pk=product, name="Synthetic product %s" % product)
+        self.flush(Product)
+
+        cases = [
+            self.add(
+                Case,
+                product_id=product,
+                priority=self.random.randint(1, 4),
+                )
+            for i in range(counts["cases"])
+            ]
+
+        suites = [
+            self.add(
+                Suite,
+                product_id=product,
+                name="Synthetic suite %s" % (i + 1),
+                status=Suite.STATUS.active,
+                )
+            for i in range(counts["suites"])
+            ]
+        self.flush(Case, Suite)
+
+        for i, case in enumerate(cases):
+            if suites:
+                self.add(
+                    SuiteCase,
+                    suite_id=suites[i % len(suites)],
+                    case_id=case,
+                    order=i // len(suites),
+                    )
+        self.flush(SuiteCase)
+
+        for i in range(counts["versions"]):
+            self.generate_version(
+                product, i + 1, cases, suites, i + 1 == counts["versions"])
+
+
+    def generate_version(self, product, number, cases, suites, latest):
+        """Generate a product version, its case versions, runs and results."""
+        counts = self.counts
+        PVEnv = ProductVersion.environments.through
+        CVEnv = CaseVersion.environments.through
+        RunEnv = Run.environments.through
+        RCVEnv = RunCaseVersion.environments.through
+
+        version = self.add(
+            ProductVersion,
+            product_id=product,
+            version="%s.0" % number,
+            order=number,
+            latest=latest,
+            )
+        for env in self.environments:
+            self.link(PVEnv, productversion_id=version, environment_id=env)
+        self.flush(ProductVersion, PVEnv)
+
+        caseversions = []
+        for case in cases:
+            cv = self.add(
+                CaseVersion,
+                productversion_id=version,
+                case_id=case,
+                name="Synthetic case %s" % case,
+                description="Description of synthetic case %s." % case,
+                status=CaseVersion.STATUS.active,
+                latest=latest,
+                )
+            caseversions.append(cv)
+            for env in self.environments:
+                self.link(CVEnv, caseversion_id=cv, environment_id=env)
+        self.flush(CaseVersion)
+        for cv in caseversions:
+            for step in range(counts["steps"]):
+                self.add(
+                    CaseStep,
+                    caseversion_id=cv,
+                    number=step + 1,
+                    instruction="Do step %s." % (step + 1),
+                    expected="Step %s works." % (step + 1),
+                    )
+        self.flush(CaseStep, CVEnv)
+
+        result_envs = self.environments[:counts["results"]]
+        for r in range(counts["runs"]):
+            run = self.add(
+                Run,
+                productversion_id=version,
+                name="Synthetic run %s.%s" % (number, r + 1),
+                status=Run.STATUS.active,
+                start=datetime.date.today(),
+                )
+            for env in self.environments:
+                self.link(RunEnv, run_id=run, environment_id=env)
+            for i, suite in enumerate(suites):
+                self.add(RunSuite, run_id=run, suite_id=suite, order=i + 1)
+            self.flush(Run, RunEnv, RunSuite)
+
+            rcvs = []
+            for order, cv in enumerate(caseversions[:counts["run_cases"]]):
+                rcv = self.add(
+                    RunCaseVersion,
+                    run_id=run,
+                    caseversion_id=cv,
+                    order=order + 1,
+                    )
+                rcvs.append(rcv)
+                for env in self.environments:
+                    self.link(RCVEnv, runcaseversion_id=rcv, environment_id=env)
+            self.flush(RunCaseVersion, RCVEnv)
+
+            for rcv in rcvs:
+                for env in result_envs:
+                    self.add(
+                        Result,
+                        tester_id=self.tester.id,
+                        runcaseversion_id=rcv,
+                        environment_id=env,
+                        status=self.random.choice(STATUSES),
+                        is_latest=True,
+                        )
+            self.flush(Result)
+
+            Run._base_manager.get(pk=run)._sync_workitems()
@@ -32,6 +32,15 @@ DATABASES = {
         }
     }
 
+DATABASE_ROUTERS = ["moztrap.deploy.routers.ReplicaRouter"]
+
+# Aliases in DATABASES of read replicas of "default"; views marked with
+# moztrap.view.utils.replica.read_replica read from a random one of them.
+DATABASE_REPLICAS = []
+# Replicas are assumed to lag the primary by at most this; a client that
+# writes anything reads only from the primary for this long afterwards.
+REPLICA_LAG_SECONDS = 10
+
 # http://en.wikipedia.org/wiki/List_of_tz_zones_by_name
 # although not all choices may be available on all operating systems.
 # On Unix systems, a value of None will cause Django to use the same
@@ -95,18 +104,52 @@ TEMPLATE_CONTEXT_PROCESSORS = [
 ]
 
 MIDDLEWARE_CLASSES = [
+    "moztrap.debug.middleware.QueryCountMiddleware",
     "django.middleware.common.CommonMiddleware",
     "djangosecure.middleware.SecurityMiddleware",
+    # must come before TransactionMiddleware; it acts after the commit
+    "moztrap.view.utils.conditional.CacheBumpMiddleware",
     "django.middleware.transaction.TransactionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "session_csrf.CsrfMiddleware",
     "moztrap.view.users.middleware.SetUsernameMiddleware",
+    "moztrap.view.utils.replica.ReplicaMiddleware",
+    # last, so only the view is profiled
+    "moztrap.debug.middleware.ProfileMiddleware",
 ]
 
 ROOT_URLCONF = "moztrap.view.urls"
 
+# Fraction of requests whose SQL queries are counted and logged (see
+# moztrap.debug.middleware.QueryCountMiddleware); 0 turns it off entirely.
+QUERY_LOG_SAMPLE_RATE = 0
+# log query shapes repeated this many times in a request (N+1 patterns)...
+QUERY_LOG_REPEAT_THRESHOLD = 5
+# ...at most this many of them per request
+QUERY_LOG_TOP = 3
+# Maximum queries per request, by URL name; exceeding one is logged, and
+# moztrap.debug.queries.query_budget can assert them in tests. Set at current
+# usage for a full default page of 20 items; lower them as views improve.
+QUERY_BUDGETS = {
+    "runtests_run": 135,
+    "results_runs": 95,
+    "results_runcaseversions": 160,
+    "manage_cases": 15,
+    }
+
+# Directory to write request profiles to (see moztrap.debug.profiling); staff
+# users can then profile a request by adding a "_profile" query parameter, and
+# view the profiles at /debug/profiles/. None turns profiling off entirely.
+PROFILE_SPOOL_DIR = None
+# Anyone sending this value in an X-MozTrap-Profile header is profiled too.
+PROFILE_SECRET = ""
+# Number of profiles kept in the spool directory; the oldest are deleted.
+PROFILE_SPOOL_MAX = 100
+# Default number of functions shown in a profile's call table.
+PROFILE_TOP = 50
+
 TEMPLATE_DIRS = [
     # Put strings here, like "/home/html/django_templates" or "C:/www/django/templates".
     # Always use forward slashes, even on Windows.
@@ -149,9 +192,23 @@ INSTALLED_APPS = [
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        # room for cached list items (moztrap.view.lists.itemcache) of a few
+        # full pages, plus their generation counters
+        'OPTIONS': {'MAX_ENTRIES': 10000},
     }
 }
 
+# Alias in CACHES of the cache for data derived from models (see
+# moztrap.model.cache). Should be shared by all processes in production.
+MODEL_CACHE = "default"
+MODEL_CACHE_TIMEOUT = 60 * 60
+
+# Rendered Markdown (see moztrap.view.markup.render) is cached per process in
+# an LRU cache of this many entries, and in this CACHES alias (None to disable)
+MARKDOWN_CACHE_SIZE = 5000
+MARKDOWN_CACHE = "default"
+MARKDOWN_CACHE_TIMEOUT = 60 * 60 * 24
+
 AUTHENTICATION_BACKENDS = [
     "moztrap.model.core.auth.ModelBackend",
     "moztrap.model.core.auth.BrowserIDBackend",
@@ -224,7 +281,7 @@ MIDDLEWARE_CLASSES.insert(
     MIDDLEWARE_CLASSES.index(
         "django.contrib.messages.middleware.MessageMiddleware"
         ) + 1,
-    "messages_ui.middleware.AjaxMessagesMiddleware")
+    "moztrap.view.utils.conditional.AjaxMessagesMiddleware")
 
 INSTALLED_APPS += ["ajax_loading_overlay"]
 
@@ -242,3 +299,6 @@ SITE_URL = "http://localhost:8000"
 BROWSERID_CREATE_USER = "moztrap.model.core.auth.browserid_create_user"
 
 USE_BROWSERID = True
+
+# How long a tester's claim on a test in the runtests work queue lasts.
+WORKITEM_LEASE_MINUTES = 30
@@ -7,6 +7,13 @@ except ImportError:
 
 CACHES["default"]["VERSION"] = 1
 
+# South needs to be told the adapter for the pooled backends
+SOUTH_DATABASE_ADAPTERS = dict(
+    (alias, "south.db.%s" % db["ENGINE"].rsplit(".", 1)[-1])
+    for alias, db in DATABASES.items()
+    if db["ENGINE"].startswith("moztrap.deploy.backends.")
+    )
+
 if DEBUG:
     MIDDLEWARE_CLASSES.insert(
         0, "moztrap.debug.middleware.AjaxTracebackMiddleware")
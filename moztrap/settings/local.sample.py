@@ -22,6 +22,17 @@ Copy local.sample.py to local.py and modify as needed.
 #         }
 #     }
 
+# To keep database connections open between requests instead of opening one
+# per request, use "moztrap.deploy.backends.mysql" as the ENGINE; "POOL_SIZE"
+# (default 5) and "POOL_MAX_AGE" (seconds, default 300) configure the pool.
+# See moztrap/deploy/backends/pool.py.
+
+# To serve reports and API reads from read replicas, add them to DATABASES
+# (with the same settings as "default" but their own HOST) and list their
+# aliases here. For local testing, two SQLite files will do, e.g. "NAME":
+# "primary.db" for "default" and a copy of it as "NAME": "replica.db".
+# DATABASE_REPLICAS = ["replica"]
+
 #DEBUG = False
 #TEMPLATE_DEBUG = False
 
@@ -116,6 +127,22 @@ Copy local.sample.py to local.py and modify as needed.
 #    }
 #}
 
+# Derived data (see moztrap.model.cache) is cached in this CACHES alias; its
+# generation counters must be shared by all processes, so in production point
+# it at memcached (or another memcached-protocol server) as above.
+#MODEL_CACHE = "default"
+
+# Rendered Markdown is also cached in a CACHES alias shared by all processes
+# (pre-warm it with "manage.py warm_markdown_cache"); None disables that tier.
+#MARKDOWN_CACHE = "default"
+
+# To let staff profile individual requests (by adding a "_profile" query
+# parameter) and view the profiles at /debug/profiles/, give a directory to
+# write them to. Requests with an X-MozTrap-Profile header matching
+# PROFILE_SECRET are profiled for anyone.
+#PROFILE_SPOOL_DIR = "/var/tmp/moztrap-profiles"
+#PROFILE_SECRET = ""
+
 # if DEBUG:
     # LOGGING["handlers"]["console"] = {
     #     "level": "DEBUG",
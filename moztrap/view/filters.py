@@ -7,6 +7,7 @@ from moztrap import model
 
 from .lists import filters
 from .lists import cases
+from .lists import facets
 
 
 
@@ -14,10 +15,12 @@ class ProductFilterSet(filters.FilterSet):
     """FilterSet for Products."""
     filters = [
         filters.KeywordFilter("name"),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "creator",
             lookup="created_by",
-            queryset=model.User.objects.all().order_by("username")),
+            queryset=model.User.objects.all().order_by("username"),
+            search=["username"],
+            ),
         ]
 
 
@@ -31,11 +34,13 @@ class ProductVersionFilterSet(filters.FilterSet):
             ),
         filters.KeywordFilter("version"),
         filters.KeywordFilter("codename"),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "creator",
             lookup="created_by",
-            queryset=model.User.objects.all().order_by("username")),
-        filters.ModelFilter(
+            queryset=model.User.objects.all().order_by("username"),
+            search=["username"],
+            ),
+        filters.LazyModelFilter(
             "environment element",
             lookup="environments__elements",
             key="envelement",
@@ -52,24 +57,28 @@ class RunFilterSet(filters.FilterSet):
             "product",
             lookup="productversion__product",
             queryset=model.Product.objects.all().order_by("name")),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "productversion",
             queryset=model.ProductVersion.objects.all().order_by(
-                "product__name", "version").select_related()),
+                "product__name", "version").select_related(),
+            search=["product__name", "version"],
+            dependencies=[model.Product],
+            ),
         filters.KeywordFilter("name"),
         filters.KeywordFilter("description"),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "suite",
             lookup="suites",
             queryset=model.Suite.objects.all().order_by("name")),
         filters.KeywordExactFilter(
             "case id", lookup="suites__cases__id", key="case", coerce=int),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "creator",
             lookup="created_by",
             queryset=model.User.objects.all().order_by("username"),
+            search=["username"],
             ),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "environment element",
             lookup="environments__elements",
             key="envelement",
@@ -81,7 +90,7 @@ class RunFilterSet(filters.FilterSet):
             choices=[(1, "series"), (0, "individual")],
             coerce=int,
             ),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "members of series",
             lookup="series",
             queryset=model.Run.objects.filter(is_series=True).order_by("name")
@@ -115,7 +124,7 @@ class RunCaseVersionFilterSet(filters.FilterSet):
             choices=Choices(1, 2, 3, 4),
             coerce=int,
             ),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "tag",
             lookup="caseversion__tags",
             queryset=model.Tag.objects.all().order_by("name"),
@@ -125,42 +134,61 @@ class RunCaseVersionFilterSet(filters.FilterSet):
             lookup="caseversion__case__product",
             queryset=model.Product.objects.all().order_by("name"),
             ),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "run",
             queryset=model.Run.objects.all().order_by("name"),
             ),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "product version",
             lookup="run__productversion",
             key="productversion",
             queryset=model.ProductVersion.objects.all().order_by(
-                "product__name", "version")),
+                "product__name", "version"),
+            search=["product__name", "version"],
+            dependencies=[model.Product],
+            ),
         filters.KeywordFilter(
             "instruction", lookup="caseversion__steps__instruction"),
         filters.KeywordFilter(
             "expected result",
             lookup="caseversion__steps__expected",
             key="expected"),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "creator",
             lookup="caseversion__created_by",
-            queryset=model.User.objects.all().order_by("username")),
-        filters.ModelFilter(
+            queryset=model.User.objects.all().order_by("username"),
+            search=["username"],
+            ),
+        filters.LazyModelFilter(
             "environment element",
             lookup="environments__elements",
             key="envelement",
             queryset=model.Element.objects.all().order_by("name")),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "suite",
             lookup="caseversion__case__suites",
             queryset=model.Suite.objects.all().order_by("name")),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "tester",
             lookup="results__tester",
             queryset=model.User.objects.all().order_by("username"),
+            search=["username"],
             ),
         ]
 
+    facets = facets.FacetIndex(
+        model.RunCaseVersion,
+        product="run__productversion__product",
+        facets={
+            "status": [model.CaseVersion],
+            "priority": [model.Case],
+            "tag": [model.CaseVersion],
+            "productversion": [model.Run],
+            "envelement": [model.Environment],
+            "suite": [model.Case, model.SuiteCase],
+            },
+        )
+
 
 
 class RunTestsRunCaseVersionFilterSet(filters.FilterSet):
@@ -176,7 +204,7 @@ class RunTestsRunCaseVersionFilterSet(filters.FilterSet):
             choices=Choices(1, 2, 3, 4),
             coerce=int,
             ),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "tag",
             lookup="caseversion__tags",
             queryset=model.Tag.objects.all().order_by("name")),
@@ -186,11 +214,13 @@ class RunTestsRunCaseVersionFilterSet(filters.FilterSet):
             "expected result",
             lookup="caseversion__steps__expected",
             key="expected"),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "creator",
             lookup="caseversion__created_by",
-            queryset=model.User.objects.all().order_by("username")),
-        filters.ModelFilter(
+            queryset=model.User.objects.all().order_by("username"),
+            search=["username"],
+            ),
+        filters.LazyModelFilter(
             "suite",
             lookup="caseversion__case__suites",
             queryset=model.Suite.objects.all().order_by("name")),
@@ -202,12 +232,13 @@ class ResultFilterSet(filters.FilterSet):
     """FilterSet for results."""
     filters = [
         filters.ChoicesFilter("status", choices=sorted(model.Result.STATUS)),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "tester",
             queryset=model.User.objects.all().order_by("username"),
+            search=["username"],
             ),
         filters.KeywordFilter("comment"),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "environment element",
             lookup="environment__elements",
             key="envelement",
@@ -224,14 +255,16 @@ class SuiteFilterSet(filters.FilterSet):
             "product",
             queryset=model.Product.objects.all().order_by("name"),
             ),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "product version",
             lookup="product__versions",
             key="productversion",
             queryset=model.ProductVersion.objects.all().order_by(
                 "product__name", "version"),
+            search=["product__name", "version"],
+            dependencies=[model.Product],
             ),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "run",
             lookup="runs",
             queryset=model.Run.objects.all().order_by("name")
@@ -240,10 +273,12 @@ class SuiteFilterSet(filters.FilterSet):
         filters.KeywordFilter("description"),
         filters.KeywordExactFilter(
             "case id", lookup="cases__id", key="case", coerce=int),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "creator",
             lookup="created_by",
-            queryset=model.User.objects.all().order_by("username")),
+            queryset=model.User.objects.all().order_by("username"),
+            search=["username"],
+            ),
         ]
 
 
@@ -265,7 +300,7 @@ class CaseVersionFilterSet(filters.FilterSet):
             ),
         filters.KeywordFilter("name"),
         filters.KeywordFilter("description"),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "tag",
             lookup="tags",
             queryset=model.Tag.objects.all().order_by("name"),
@@ -274,32 +309,50 @@ class CaseVersionFilterSet(filters.FilterSet):
             "product",
             lookup="case__product",
             queryset=model.Product.objects.all().order_by("name")),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "product version",
             lookup="productversion",
             key="productversion",
             queryset=model.ProductVersion.objects.all().order_by(
-                "product__name", "version").select_related()),
+                "product__name", "version").select_related(),
+            search=["product__name", "version"],
+            dependencies=[model.Product],
+            ),
         filters.KeywordFilter("instruction", lookup="steps__instruction"),
         filters.KeywordFilter(
             "expected result",
             lookup="steps__expected",
             key="expected"),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "creator",
             lookup="created_by",
-            queryset=model.User.objects.all().order_by("username")),
-        filters.ModelFilter(
+            queryset=model.User.objects.all().order_by("username"),
+            search=["username"],
+            ),
+        filters.LazyModelFilter(
             "environment element",
             lookup="environments__elements",
             key="envelement",
             queryset=model.Element.objects.all().order_by("name")),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "suite",
             lookup="case__suites",
             queryset=model.Suite.objects.all().order_by("name")),
         ]
 
+    facets = facets.FacetIndex(
+        model.CaseVersion,
+        product="productversion__product",
+        facets={
+            "status": [],
+            "priority": [model.Case],
+            "tag": [],
+            "productversion": [],
+            "envelement": [model.Environment],
+            "suite": [model.Case, model.SuiteCase],
+            },
+        )
+
 
 
 class TagFilterSet(filters.FilterSet):
@@ -310,18 +363,21 @@ class TagFilterSet(filters.FilterSet):
             "product",
             queryset=model.Product.objects.all().order_by("name"),
             ),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "product version",
             lookup="product__versions",
             key="productversion",
             queryset=model.ProductVersion.objects.select_related(
                 "product").order_by(
                     "product__name", "version"),
+            search=["product__name", "version"],
+            dependencies=[model.Product],
             ),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "creator",
             lookup="created_by",
             queryset=model.User.objects.all().order_by("username"),
+            search=["username"],
             ),
         ]
 
@@ -331,15 +387,16 @@ class ProfileFilterSet(filters.FilterSet):
     """FilterSet for environment Profiles."""
     filters = [
         filters.KeywordFilter("name"),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "environment element",
             lookup="environments__elements",
             key="envelement",
             queryset=model.Element.objects.all().order_by("name")),
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "creator",
             lookup="created_by",
             queryset=model.User.objects.all().order_by("username"),
+            search=["username"],
             ),
         ]
 
@@ -348,7 +405,7 @@ class ProfileFilterSet(filters.FilterSet):
 class EnvironmentFilterSet(filters.FilterSet):
     """FilterSet for Environments."""
     filters = [
-        filters.ModelFilter(
+        filters.LazyModelFilter(
             "environment element",
             lookup="elements",
             key="envelement",
@@ -0,0 +1,406 @@
+"""
+Per-option counts for list filters, from an in-memory bitmap index.
+
+A ``FacetIndex`` holds, for each product, the ids of a list's items and a
+bitmap of them for each value of each facet (a filter whose values are
+columns or relations of the items, e.g. status or tag). Counting how many
+items match each option, given the current filter state, is then a few
+bitmap intersections, with no SQL; except that filters the index doesn't
+cover (e.g. keyword filters) are applied with one id query.
+
+The index lives in process memory and is built lazily. Each product's part
+of it is checked against the model cache generations (see
+``moztrap.model.cache``) on every use. After a change to the items' model,
+the product's item ids are re-read, and the facet values of just the items
+that are new or whose object generations have changed (an item's product
+never changes); a change to a model only one facet depends on rebuilds just
+that facet. Parts are updated in copies, without holding the index's lock
+across queries. Parts built while reads go to a read replica,
+which may lag behind the generations, are used for that request but not
+kept.
+
+"""
+from array import array
+import binascii
+import copy
+import threading
+
+from moztrap.deploy import routers
+from moztrap.model import cache
+
+
+
+def bitmap(positions):
+    """Return int with the bits at ``positions`` set."""
+    if not positions:
+        return 0
+    data = bytearray(max(positions) // 8 + 1)
+    for p in positions:
+        data[p >> 3] |= 1 << (p & 7)
+    data.reverse()
+    return int(binascii.hexlify(data), 16)
+
+
+
+def compact(positions, size):
+    """
+    Return the more compact of a bitmap and a sorted array of ``positions``.
+
+    ``size`` is the number of positions in the index; a value found on few
+    items is cheaper to store as an array of their positions.
+
+    """
+    if len(positions) * 32 < size:
+        return array("L", sorted(positions))
+    return bitmap(positions)
+
+
+
+def as_bitmap(members):
+    """Return ``members`` (bitmap or position array) as a bitmap."""
+    if isinstance(members, array):
+        return bitmap(members)
+    return members
+
+
+
+def popcount(bits):
+    """Return number of bits set in ``bits``."""
+    return bin(bits).count("1")
+
+
+
+class Mask(object):
+    """A bitmap that positions arrays can be efficiently counted against."""
+    def __init__(self, bits):
+        self.bits = bits
+        self._bytes = None
+
+
+    def count(self, members):
+        """Return size of intersection of ``members`` with this mask."""
+        if not isinstance(members, array):
+            return popcount(self.bits & members)
+        if self._bytes is None:
+            hexed = "%x" % self.bits
+            if len(hexed) % 2:
+                hexed = "0" + hexed
+            self._bytes = bytearray(binascii.unhexlify(hexed))
+            self._bytes.reverse()
+        data = self._bytes
+        size = len(data)
+        return sum(
+            1 for p in members
+            if (p >> 3) < size and data[p >> 3] >> (p & 7) & 1)
+
+
+
+class Partition(object):
+    """
+    The index of one product's items.
+
+    Positions of items are never reused: an item that's gone, or whose facet
+    values are re-read, is cleared from ``all`` (which all counts are masked
+    by), and a re-read item is given a new position at the end.
+
+    """
+    def __init__(self, ids, generation, bulk=None, objects=None):
+        """
+        Initialize a Partition of the items with ``ids``.
+
+        ``generation`` and ``bulk`` are the model and bulk generations of the
+        items' model, and ``objects`` maps ids to object generations, all as
+        they were before the items were read.
+
+        """
+        self.ids = array("l", ids)
+        self.generation = generation
+        self.bulk = bulk
+        self.objects = objects or {}
+        self.positions = dict((i, p) for p, i in enumerate(self.ids))
+        self.all = (1 << len(self.ids)) - 1
+        # facet key -> {value: bitmap or array of positions}
+        self.facets = {}
+        # facet key -> generations the facet was built at
+        self.generations = {}
+
+
+    def _by_value(self, pairs):
+        """Return {value: positions} from (item id, value) ``pairs``."""
+        by_value = {}
+        for item_id, value in pairs:
+            if value is None or item_id not in self.positions:
+                continue
+            by_value.setdefault(value, []).append(self.positions[item_id])
+        return by_value
+
+
+    def index(self, key, pairs):
+        """Index facet ``key`` from (item id, value) ``pairs``."""
+        size = len(self.ids)
+        self.facets[key] = dict(
+            (value, compact(positions, size))
+            for value, positions in self._by_value(pairs).items()
+            )
+
+
+    def add(self, key, pairs):
+        """Add (item id, value) ``pairs`` of re-read items to facet ``key``."""
+        facet = dict(self.facets[key])
+        size = len(self.ids)
+        for value, positions in self._by_value(pairs).items():
+            members = facet.get(value)
+            if members is None:
+                facet[value] = compact(positions, size)
+            elif isinstance(members, array):
+                members = array("L", members)
+                members.extend(sorted(positions))
+                facet[value] = members
+            else:
+                facet[value] = members | bitmap(positions)
+        self.facets[key] = facet
+
+
+    def changes(self, ids, objects):
+        """
+        Return (changed, gone) ids, given the items' current ids and objects.
+
+        ``changed`` are the ids of items that are new or whose object
+        generation has changed, ``gone`` those of items no longer there.
+
+        """
+        changed = set(i for i in ids if self.objects.get(i) != objects[i])
+        gone = set(self.positions).difference(ids)
+        return changed, gone
+
+
+    def update(self, changed, gone, generation, objects):
+        """
+        Re-position ``changed`` items and clear ``gone`` ones.
+
+        The facets of changed items must then be re-read, with ``add``.
+
+        """
+        ids = array("l", self.ids)
+        positions = dict(self.positions)
+        cleared = 0
+        for item_id in changed | gone:
+            position = positions.pop(item_id, None)
+            if position is not None:
+                cleared |= 1 << position
+        added = 0
+        for item_id in sorted(changed):
+            positions[item_id] = len(ids)
+            added |= 1 << len(ids)
+            ids.append(item_id)
+        self.ids = ids
+        self.positions = positions
+        self.all = (self.all & ~cleared) | added
+        self.generation = generation
+        self.objects = objects
+
+
+    def copy(self):
+        """Return a copy that can be updated independently."""
+        partition = copy.copy(self)
+        partition.facets = dict(self.facets)
+        partition.generations = dict(self.generations)
+        return partition
+
+
+    def current(self, generation, lookups, facet_generations):
+        """Return True if up to date for ``lookups`` at given generations."""
+        return self.generation == generation and all(
+            self.generations.get(key) == facet_generations[key]
+            for key in lookups
+            )
+
+
+    def mask(self, ids):
+        """Return bitmap of those of ``ids`` in this partition."""
+        return bitmap(
+            [self.positions[i] for i in ids if i in self.positions])
+
+
+
+class FacetIndex(object):
+    """An in-memory bitmap index of a list's items by facet values."""
+    # more changed items than this since a partition's last use rebuild it
+    max_changes = 500
+
+
+    def __init__(self, model, product, product_key="product", facets=None):
+        """
+        Initialize a FacetIndex.
+
+        ``model`` is the model of the list's items, and ``product`` the lookup
+        from it to its product; ``product_key`` is the key of the list's
+        product filter. ``facets`` maps the keys of the filters to index to
+        lists of any models (other than ``model``) their values depend on.
+
+        """
+        self.model = model
+        self.product_lookup = product
+        self.product_key = product_key
+        self.facets = facets or {}
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+
+    def _items(self):
+        """Return queryset of all items."""
+        return self.model.objects.all()
+
+
+    def _product_ids(self):
+        """Return list of all product ids."""
+        from moztrap.model import Product
+        return cache.cached(
+            "facetproducts",
+            [Product],
+            lambda: list(Product.objects.values_list("id", flat=True)),
+            )
+
+
+    def generations(self):
+        """
+        Return (model generation, {facet key: generations}).
+
+        The generations of a facet are those of the models it depends on.
+
+        """
+        dependencies = [self.model]
+        for deps in self.facets.values():
+            dependencies.extend(d for d in deps if d not in dependencies)
+        current = dict(zip(dependencies, cache.generations(dependencies)))
+        return current[self.model], dict(
+            (key, [current[d] for d in deps])
+            for key, deps in self.facets.items()
+            )
+
+
+    def partition(self, product_id, lookups, generations):
+        """
+        Return up-to-date Partition for ``product_id``.
+
+        ``lookups`` maps facet keys to the lookups of their filters, and
+        ``generations`` is the current ``generations()``. An out-of-date
+        partition is updated in a copy, without holding the lock, so other
+        threads keep counting with the old one meanwhile.
+
+        """
+        generation, facet_generations = generations
+        with self._lock:
+            partition = self._partitions.get(product_id)
+        if partition is not None and partition.current(
+                generation, lookups, facet_generations):
+            return partition
+        partition = self._update(partition, product_id, lookups, generations)
+        # what's read from a replica may predate the generations
+        if routers.current_replica() is None:
+            with self._lock:
+                self._partitions[product_id] = partition
+        return partition
+
+
+    def _update(self, partition, product_id, lookups, generations):
+        """Return up-to-date copy of ``partition`` (None to build one)."""
+        generation, facet_generations = generations
+        items = self._items().filter(**{self.product_lookup: product_id})
+        changed = None
+        if partition is None or partition.generation != generation:
+            ids = list(items.values_list("id", flat=True))
+            bulk, objects = cache.object_generations(self.model, ids)
+            objects = dict(zip(ids, objects))
+            if partition is not None and partition.bulk == bulk:
+                changed, gone = partition.changes(ids, objects)
+                # too many changes to be worth reading just theirs
+                if (len(changed) + len(gone) > self.max_changes or
+                        len(partition.ids) + len(changed) > 2 * len(ids)):
+                    changed = None
+            if changed is None:
+                partition = Partition(ids, generation, bulk, objects)
+            else:
+                partition = partition.copy()
+                partition.update(changed, gone, generation, objects)
+                if changed or gone:
+                    # facets not re-read now would be out of date
+                    for key in set(partition.facets).difference(lookups):
+                        del partition.facets[key]
+                        del partition.generations[key]
+        else:
+            partition = partition.copy()
+            changed = set()
+
+        for key, lookup in lookups.items():
+            if partition.generations.get(key) != facet_generations[key]:
+                partition.index(key, items.values_list("id", lookup))
+            elif changed:
+                partition.add(
+                    key,
+                    items.filter(id__in=changed).values_list("id", lookup))
+            partition.generations[key] = facet_generations[key]
+        return partition
+
+
+    def counts(self, boundfilterset, queryset):
+        """
+        Return {facet key: {value: count}} for the current filter state.
+
+        The count for each value of a facet is of the items of ``queryset``
+        that match all of ``boundfilterset``'s current filters, other than the
+        facet's own, and have that value. ``queryset`` should be the list's
+        unfiltered queryset; it's only queried if any filters the index
+        doesn't cover are in use.
+
+        """
+        lookups = {}
+        selected = {}
+        product_ids = None
+        others = []
+        for bf in boundfilterset:
+            if bf.key in self.facets:
+                lookups[bf.key] = bf._filter.lookup
+                if bf.values:
+                    selected[bf.key] = bf.values
+            elif bf.key == self.product_key and bf.values:
+                product_ids = bf.values
+            elif bf.values:
+                others.append(bf)
+
+        if product_ids is None:
+            product_ids = self._product_ids()
+
+        ids = None
+        if others:
+            for bf in others:
+                queryset = bf.filter(queryset)
+            ids = set(queryset.values_list("id", flat=True))
+
+        generations = self.generations()
+        counts = dict((key, {}) for key in lookups)
+        for product_id in product_ids:
+            partition = self.partition(product_id, lookups, generations)
+            base = partition.all
+            if ids is not None:
+                base &= partition.mask(ids)
+            # union of the selected values' bitmaps, for each facet
+            unions = {}
+            for key, values in selected.items():
+                union = 0
+                for value in values:
+                    members = partition.facets[key].get(value)
+                    if members is not None:
+                        union |= as_bitmap(members)
+                unions[key] = union
+            for key in lookups:
+                bits = base
+                for other, union in unions.items():
+                    if other != key:
+                        bits &= union
+                mask = Mask(bits)
+                key_counts = counts[key]
+                for value, members in partition.facets[key].items():
+                    key_counts[value] = (
+                        key_counts.get(value, 0) + mask.count(members))
+        return counts
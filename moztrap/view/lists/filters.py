@@ -5,11 +5,22 @@ Utilities for filtering querysets in a view.
 
 from collections import namedtuple
 from functools import wraps
+import hashlib
 import json
 import urlparse
 
-from django.core.urlresolvers import reverse, resolve
+from django.core.urlresolvers import (
+    get_script_prefix, reverse, resolve, Resolver404)
+from django.db.models import Q
 from django.utils.datastructures import MultiValueDict
+from django.utils.encoding import smart_str
+
+from moztrap.model import cache
+
+
+
+# (script prefix, path or view, model class) -> head of the filter URL
+_url_heads = {}
 
 
 
@@ -24,6 +35,30 @@ def filter_url(path_or_view, obj):
     For instance, ``filter_url("manage_cases", product)`` would return the URL
     for viewing the manage list of cases, filtered by ``product``.
 
+    The URL up to the object's id is worked out once for each view and model
+    class; after that, this is just string concatenation.
+
+    """
+    key = (get_script_prefix(), path_or_view, obj.__class__)
+    try:
+        head, with_pk = _url_heads[key]
+    except KeyError:
+        head, with_pk = _url_heads[key] = _filter_url_head(
+            path_or_view, obj.__class__)
+    if with_pk:
+        return "{0}{1}".format(head, obj.pk)
+    return head
+
+
+
+def _filter_url_head(path_or_view, model_class):
+    """
+    Return (URL head, whether to append pk) for ``filter_url``.
+
+    The head is the URL of the view, with the querystring up to the value of
+    its filter for ``model_class``; if the view has no such filter, it's the
+    URL with an empty querystring, and the pk isn't appended.
+
     """
     if callable(path_or_view):
         view_func = path_or_view
@@ -36,12 +71,54 @@ def filter_url(path_or_view, obj):
 
         view_func = resolve(path).func
 
-    params = view_func.filterset.params_for(obj)
+    param = view_func.filterset.param_for(model_class)
+    if param is None:
+        return "{0}?".format(path), False
+    return "{0}?{1}=".format(path, param), True
 
-    return "{0}?{1}".format(
-        path,
-        "&".join(["{0}={1}".format(k, v) for k, v in params.items()])
-        )
+
+
+def _filterset(path):
+    """Return the filterset of the list view at ``path``, or None."""
+    try:
+        view_func = resolve(path).func
+    except Resolver404:
+        return None
+    return getattr(view_func, "filterset", None)
+
+
+
+def lazy_filter(path, key):
+    """
+    Return the ``LazyModelFilter`` with ``key`` on the list view at ``path``.
+
+    Returns None if ``path`` doesn't resolve to a filtered view, or its
+    filterset has no lazy filter with that key.
+
+    """
+    for flt in _filterset(path) or []:
+        if flt.lazy and flt.key == key:
+            return flt
+    return None
+
+
+
+def option_counts(path, key, GET=None, COOKIES=None):
+    """
+    Return {value: count} for options of filter ``key`` of list at ``path``.
+
+    Counts are for the filter state in ``GET`` and ``COOKIES``, as the list
+    view binds it. Returns None if the list has no facet index covering the
+    filter.
+
+    """
+    filterset = _filterset(path)
+    if (filterset is None or filterset.facets is None or
+            key not in filterset.facets.facets):
+        return None
+    facets = filterset.facets
+    bfs = filterset.bind(GET, COOKIES)
+    return facets.counts(bfs, facets.model.objects.all())[key]
 
 
 
@@ -70,6 +147,8 @@ def filter(ctx_name, filters=None, filterset_class=None):
             except AttributeError:
                 return response
             bfs = filterset.bind(request.GET, request.COOKIES)
+            if filterset.facets is not None:
+                bfs.add_counts(filterset.facets.counts(bfs, ctx[ctx_name]))
             ctx[ctx_name] = bfs.filter(ctx[ctx_name])
             ctx["filters"] = bfs
             return response
@@ -98,6 +177,7 @@ class BoundFilterSet(object):
         self.filterset = filterset
         self.filters = self.filterset.filters
         self.boundfilters = [BoundFilter(f, self.data) for f in self.filters]
+        self.counts = None
 
 
     def __iter__(self):
@@ -118,6 +198,35 @@ class BoundFilterSet(object):
         return queryset
 
 
+    def add_counts(self, counts):
+        """Set option counts from ``counts``, {filter key: {value: count}}."""
+        self.counts = counts
+        for boundfilter in self.boundfilters:
+            if boundfilter.key in counts:
+                boundfilter.add_counts(counts[boundfilter.key])
+
+
+    @property
+    def counts_json(self):
+        """
+        Counts of the rendered options as JSON, for updating them client-side.
+
+        Lazy filters render only their selected options, so only those counts
+        are included; counts of others come with their ``filter_options``.
+
+        """
+        return json.dumps(
+            dict(
+                (
+                    bf.key,
+                    dict((unicode(o.value), o.count) for o in bf.options),
+                    )
+                for bf in self.boundfilters
+                if bf.counted
+                )
+            )
+
+
 
 class PinnedFilters(object):
     """An object to manage pinned filters saved as cookies in the session."""
@@ -158,6 +267,8 @@ class FilterSet(object):
     """A set of possible filters on a queryset."""
     # subclasses can have preset filters
     filters = []
+    # and a FacetIndex, to count matches for each option of some filters
+    facets = None
 
     bound_class = BoundFilterSet
 
@@ -215,17 +326,41 @@ class FilterSet(object):
         otherwise will return empty dict.
 
         """
+        param = self.param_for(obj.__class__)
+        if param is None:
+            return {}
+        return {param: obj.pk}
+
+
+    def param_for(self, model_class):
+        """
+        Return querystring parameter name to filter by a ``model_class`` pk.
+
+        Returns None if there is no ModelFilter for ``model_class``. Looked up
+        once per model class.
+
+        """
+        try:
+            return self._params[model_class]
+        except AttributeError:
+            self._params = {}
+        except KeyError:
+            pass
+
+        param = None
         for flt in self.filters:
             qs = getattr(flt, "queryset", None)
             if qs is not None:
-                if isinstance(obj, qs.model):
-                    return {"{0}{1}".format(self.prefix, flt.key): obj.pk}
+                if issubclass(model_class, qs.model):
+                    param = "{0}{1}".format(self.prefix, flt.key)
+                    break
+        self._params[model_class] = param
+        return param
 
-        return {}
 
 
-
-FilterOption = namedtuple("FilterOption", ["value", "label", "selected"])
+FilterOption = namedtuple(
+    "FilterOption", ["value", "label", "selected", "count"])
 
 
 
@@ -239,10 +374,17 @@ class BoundFilter(object):
         # list of valid selected option values
         self.values = self._filter.values(self.data)
 
+        # True once options have counts
+        self.counted = False
+
         value_set = set(self.values)
         self.options = [
             FilterOption(
-                value=val, label=label, selected=(val in value_set))
+                value=val,
+                label=label,
+                selected=(val in value_set),
+                count=None,
+                )
             for val, label in self._filter.options(self.values)]
 
 
@@ -251,6 +393,15 @@ class BoundFilter(object):
         return self._filter.filter(queryset, self.values)
 
 
+    def add_counts(self, counts):
+        """Set option counts from ``counts``, {value: count}."""
+        self.options = [
+            option._replace(count=counts.get(option.value, 0))
+            for option in self.options
+            ]
+        self.counted = True
+
+
     @property
     def cls(self):
         """Pass-through to Filter cls."""
@@ -269,6 +420,12 @@ class BoundFilter(object):
         return self._filter.key
 
 
+    @property
+    def lazy(self):
+        """Pass-through to Filter lazy."""
+        return self._filter.lazy
+
+
     def __iter__(self):
         """Yields FilterOption objects when iterated."""
         return iter(self.options)
@@ -283,6 +440,8 @@ class Filter(object):
     """Encapsulates the filtering possibilities for a single field."""
     # A filter-type class; for use in CSS styling of the filter input
     cls = ""
+    # True if only selected options are rendered; see LazyModelFilter
+    lazy = False
 
 
     def __init__(self, name, lookup=None, key=None, coerce=None,
@@ -424,6 +583,98 @@ class ModelFilter(BaseChoicesFilter):
 
 
 
+class LazyModelFilter(ModelFilter):
+    """
+    A ModelFilter with too many options to render them all.
+
+    Only the selected options are rendered; others are found by searching,
+    a page at a time, through the ``filter_options`` JSON view. Search
+    results are cached until the filtered model (or any of ``dependencies``)
+    changes.
+
+    """
+    cls = "lazy"
+    lazy = True
+    page_size = 20
+
+
+    def __init__(self, *args, **kwargs):
+        """
+        Looks for ``search`` and ``dependencies`` keyword arguments.
+
+        ``search`` is a list of lookups for the fields search text is matched
+        against (default ``["name"]``); ``dependencies`` are any other models
+        the option labels show data from.
+
+        """
+        self.search_lookups = kwargs.pop("search", ["name"])
+        self.dependencies = kwargs.pop("dependencies", [])
+        super(LazyModelFilter, self).__init__(*args, **kwargs)
+
+
+    def options(self, values):
+        """Given list of selected values, return them as options."""
+        if not values:
+            return []
+        return [
+            (obj.pk, self.label_func(obj))
+            for obj in self.queryset.filter(pk__in=values)
+            ]
+
+
+    def values(self, data):
+        """Given data dict, return list of selected values that exist."""
+        values = [
+            v for v in super(BaseChoicesFilter, self).values(data)
+            if v is not None
+            ]
+        if not values:
+            return []
+        existing = set(
+            self.queryset.filter(pk__in=values).values_list("pk", flat=True))
+        return [v for v in values if v in existing]
+
+
+    def search(self, text, page=1):
+        """
+        Return (options, more) for ``page`` of options matching ``text``.
+
+        Every word of ``text`` must be found (case-insensitively) in one of
+        the search fields. ``options`` is a list of (value, label) tuples;
+        ``more`` is True if there are later pages.
+
+        """
+        key = "filteroptions:%s" % hashlib.md5(
+            ":".join([
+                    str(self.queryset.query),
+                    self.key,
+                    smart_str(text),
+                    str(page),
+                    ])
+            ).hexdigest()
+        return cache.cached(
+            key,
+            [self.queryset.model] + list(self.dependencies),
+            lambda: self._search(text, page),
+            )
+
+
+    def _search(self, text, page):
+        """Query for ``page`` of options matching ``text``."""
+        qs = self.queryset.all()
+        for word in text.split():
+            q = Q()
+            for lookup in self.search_lookups:
+                q |= Q(**{"{0}__icontains".format(lookup): word})
+            qs = qs.filter(q)
+        start = (page - 1) * self.page_size
+        objs = list(qs[start:start + self.page_size + 1])
+        options = [
+            (obj.pk, self.label_func(obj)) for obj in objs[:self.page_size]]
+        return options, len(objs) > self.page_size
+
+
+
 class KeywordExactFilter(Filter):
     """Allows user to input arbitrary filter values; no pre-set options list."""
     cls = "keyword"
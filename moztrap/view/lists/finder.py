@@ -1,6 +1,11 @@
 """
 Finder; a multi-column hierarchical object navigator.
 
+Column contents are cached under the model generations of the models they're
+read from (see ``moztrap.model.cache``), and the Ajax responses for child
+columns carry ETags derived from the same generations, so a browser
+re-opening a column it has seen gets a 304 without any queries being run.
+
 """
 from functools import wraps
 import posixpath
@@ -8,6 +13,9 @@ import posixpath
 from django.db import models
 from django.shortcuts import render
 
+from moztrap.model import cache
+
+from ..utils.conditional import conditional
 from .filters import filter_url
 
 
@@ -25,18 +33,23 @@ def finder(finder_cls):
         def _wrapped_view(request, *args, **kwargs):
             if request.is_ajax() and request.GET.get("finder"):
                 col_name = request.GET["col"]
-                return render(
-                    request,
-                    finder.column_template(col_name),
-                    {
-                        "colname": col_name,
-                        "finder": {
-                            "finder": finder,
-                            col_name: finder.objects(
-                                col_name, request.GET["id"])
-                            },
-                        }
-                    )
+
+                @conditional(*finder.dependencies(col_name))
+                def column(request):
+                    return render(
+                        request,
+                        finder.column_template(col_name),
+                        {
+                            "colname": col_name,
+                            "finder": {
+                                "finder": finder,
+                                col_name: finder.objects(
+                                    col_name, request.GET["id"])
+                                },
+                            }
+                        )
+
+                return column(request)
             response = view_func(request, *args, **kwargs)
             try:
                 ctx = response.context_data
@@ -76,6 +89,12 @@ class Finder(object):
             zip([c.name for c in self.columns[:-1]], self.columns[1:])
             )
         self.columns_by_model = dict((c.model, c) for c in self.columns)
+        # column name -> (lookup, through model or None) to filter by parent
+        self.parent_relations = {}
+        for col in self.columns[1:]:
+            relation = self._find_parent_relation(col)
+            if relation is not None:
+                self.parent_relations[col.name] = relation
 
 
     def column_template(self, column_name):
@@ -116,42 +135,77 @@ class Finder(object):
         Given a column name, return the list of objects.
 
         If a parent is given and there is a parent column, filter the list by
-        that parent.
+        that parent. The list is cached until any of the column's
+        ``dependencies`` change.
 
         """
         col = self._get_column_by_name(column_name)
-        ret = col.objects()
-        if parent is not None:
-            try:
-                parent_col = self.parent_columns[col.name]
-            except KeyError:
-                raise ValueError(
-                    "Column {0} has no parent.".format(column_name))
-
-            opts = col.model._meta
-
-            attr = None
-            for field in [
-                    f for f in opts.fields if isinstance(f, models.ForeignKey)
-                    ] + opts.many_to_many:
-                if field.rel.to is parent_col.model:
-                    attr = field.name
-                    break
-
-            if attr is None:
-                try:
-                    attr = [
-                        r.get_accessor_name()
-                        for r in opts.get_all_related_many_to_many_objects()
-                        if r.model is parent_col.model
-                        ][0]
-                except IndexError:
-                    raise ValueError(
-                        "Cannot find relationship from {0} to {1}".format(
-                            col.model, parent_col.model))
-
-            ret = ret.filter(**{attr: parent})
-        return ret
+        if parent is None:
+            return cache.cached(
+                "finder:{0}:{1}".format(self._cache_name(), col.name),
+                self.dependencies(column_name),
+                lambda: list(col.objects()),
+                )
+
+        try:
+            parent_col = self.parent_columns[col.name]
+        except KeyError:
+            raise ValueError(
+                "Column {0} has no parent.".format(column_name))
+        try:
+            attr, through = self.parent_relations[col.name]
+        except KeyError:
+            raise ValueError(
+                "Cannot find relationship from {0} to {1}".format(
+                    col.model, parent_col.model))
+
+        return cache.cached(
+            "finder:{0}:{1}:{2}".format(self._cache_name(), col.name, parent),
+            self.dependencies(column_name),
+            lambda: list(col.objects().filter(**{attr: parent})),
+            )
+
+
+    def dependencies(self, column_name):
+        """Return list of models the objects in given column depend on."""
+        col = self._get_column_by_name(column_name)
+        deps = [col.model] + list(col.dependencies)
+        relation = self.parent_relations.get(col.name)
+        if relation is not None and relation[1] is not None:
+            deps.append(relation[1])
+        return deps
+
+
+    def _cache_name(self):
+        """Return name identifying this finder's cached column contents."""
+        return "{0}.{1}".format(
+            self.__class__.__module__, self.__class__.__name__)
+
+
+    def _find_parent_relation(self, col):
+        """
+        Return (lookup, through model or None) from column to its parent.
+
+        Returns None if there is no relationship from the column's model to
+        its parent column's model.
+
+        """
+        parent_model = self.parent_columns[col.name].model
+        opts = col.model._meta
+
+        for field in [
+                f for f in opts.fields if isinstance(f, models.ForeignKey)
+                ]:
+            if field.rel.to is parent_model:
+                return field.name, None
+        for field in opts.many_to_many:
+            if field.rel.to is parent_model:
+                return field.name, field.rel.through
+        for related in opts.get_all_related_many_to_many_objects():
+            if related.model is parent_model:
+                return related.get_accessor_name(), related.field.rel.through
+
+        return None
 
 
     def _get_column_by_name(self, column_name):
@@ -164,12 +218,22 @@ class Finder(object):
 
 
 class Column(object):
-    def __init__(self, name, template_name, queryset, goto=None):
+    def __init__(self, name, template_name, queryset, goto=None,
+                 dependencies=None):
+        """
+        Initialize a Column.
+
+        ``dependencies`` lists any models other than the queryset's model
+        whose data is shown in the column (e.g. by related-object lookups in
+        its template).
+
+        """
         self.name = name
         self.template_name = template_name
         self.model = queryset.model
         self.queryset = queryset
         self.goto = goto
+        self.dependencies = dependencies or []
 
 
     def objects(self):
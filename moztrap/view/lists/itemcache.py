@@ -0,0 +1,71 @@
+"""
+Caching of rendered list items.
+
+A rendered list item is cached under its fragment name and template version,
+the object's id and ``cc_version``, and the user's permission bucket; the
+cache entry is also keyed on the generations (see ``moztrap.model.cache``) of
+the object and of any related models or instances the item displays, so it
+is re-rendered as soon as any of those change.
+
+Items should depend on the instances (and related generations) they display
+rather than on whole models wherever possible; a dependency on a busy model
+invalidates every cached item whenever any instance of it changes.
+
+"""
+from django.db.models.query import QuerySet
+from django.utils.safestring import mark_safe
+
+from moztrap.model import cache
+
+
+
+def perm_bucket(user, perms):
+    """
+    Return string identifying which of ``perms`` ``user`` has.
+
+    Users with the same bucket for an item's ``perms`` see the same rendered
+    item, so they share a cache entry.
+
+    """
+    return "".join(
+        "1" if user is not None and user.has_perm(perm) else "0"
+        for perm in perms
+        )
+
+
+
+def cached_render(name, obj, render, user=None, perms=(), dependencies=(),
+                  version=""):
+    """
+    Return rendered list item for ``obj``, from the cache if possible.
+
+    ``name`` identifies the kind of list item, and ``version`` the revision of
+    its template. ``render`` is a callable returning the rendered item; it's
+    only called on a cache miss. ``perms`` are the permissions (of ``user``)
+    the rendered item varies on. ``dependencies`` are the related models and
+    instances (or "app_label.ModelName" strings, related generation tuples, or
+    lists or querysets of instances) whose data the item shows.
+
+    """
+    key = "fragment:%s:%s:%s:%s:%s" % (
+        name,
+        version,
+        obj.pk,
+        getattr(obj, "cc_version", ""),
+        perm_bucket(user, perms),
+        )
+    return mark_safe(
+        cache.cached(
+            key, [obj] + _flatten(dependencies), lambda: unicode(render())))
+
+
+
+def _flatten(dependencies):
+    """Return list of ``dependencies``, with any lists or querysets expanded."""
+    flat = []
+    for dependency in dependencies:
+        if isinstance(dependency, (list, QuerySet)):
+            flat.extend(dependency)
+        else:
+            flat.append(dependency)
+    return flat
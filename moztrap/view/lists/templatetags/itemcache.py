@@ -0,0 +1,80 @@
+"""
+Template tags for caching rendered list items.
+
+"""
+import hashlib
+
+from django.template import Library
+from django.utils.encoding import smart_str
+
+from classytags.core import Tag, Options
+from classytags.arguments import Argument, MultiValueArgument
+
+from .. import itemcache
+
+
+
+register = Library()
+
+
+
+class CacheItem(Tag):
+    """
+    Cache the rendered contents of the tag for the given object.
+
+    Usage::
+
+        {% cacheitem "name" obj depends "app.Model" other_obj perms "perm" %}
+          ...
+        {% endcacheitem %}
+
+    The ``depends`` and ``perms`` clauses are optional; dependencies can be
+    instances, lists or querysets of them, "app.Model" strings, or related
+    generations (see the ``related`` filter). The cache key includes
+    a hash of the tag's contents, so editing them invalidates old entries;
+    templates included by the contents are not hashed.
+
+    """
+    name = "cacheitem"
+    options = Options(
+        Argument("fragment"),
+        Argument("obj"),
+        "depends",
+        MultiValueArgument("dependencies", required=False),
+        "perms",
+        MultiValueArgument("perms", required=False),
+        blocks=[("endcacheitem", "nodelist")],
+        )
+
+
+    def __init__(self, parser, tokens):
+        """Parse the tag, and record a hash of its contents as its version."""
+        remaining = list(parser.tokens)
+        super(CacheItem, self).__init__(parser, tokens)
+        contents = remaining[:len(remaining) - len(parser.tokens)]
+        self.version = hashlib.md5(
+            "".join(smart_str(t.contents) for t in contents)).hexdigest()[:8]
+
+
+    def render_tag(self, context, fragment, obj, dependencies, perms,
+                   nodelist):
+        """Return cached contents for ``obj``, rendering them on a miss."""
+        return itemcache.cached_render(
+            fragment,
+            obj,
+            lambda: nodelist.render(context),
+            user=context.get("user"),
+            perms=perms,
+            dependencies=dependencies,
+            version=self.version,
+            )
+
+
+register.tag(CacheItem)
+
+
+
+@register.filter
+def related(obj, name):
+    """Return ``obj``'s related generation ``name``, as a dependency."""
+    return (obj.__class__, obj.pk, name)
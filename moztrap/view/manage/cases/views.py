@@ -19,6 +19,7 @@ from moztrap.view.lists.filters import PinnedFilters
 from moztrap.view.users.decorators import permission_required
 from moztrap.view.utils.ajax import ajax
 from moztrap.view.utils.auth import login_maybe_required
+from moztrap.view.utils.conditional import conditional
 
 from ..finders import ManageFinder
 
@@ -61,6 +62,18 @@ def cases_list(request):
 
 @never_cache
 @login_maybe_required
+@conditional(
+    "library.Case",
+    "library.CaseStep",
+    "library.CaseAttachment",
+    "library.Suite",
+    "library.SuiteCase",
+    "execution.StepResult",
+    "environments.Environment",
+    "environments.Element",
+    "core.User",
+    objects=lambda caseversion_id: [(model.CaseVersion, caseversion_id)],
+    )
 def case_details(request, caseversion_id):
     """Get details snippet for a caseversion."""
     caseversion = get_object_or_404(model.CaseVersion, pk=caseversion_id)
@@ -44,7 +44,8 @@ class EnvironmentElementSelectMultiple(mtforms.MTSelectMultiple):
             element = c[1].obj
             available.setdefault(element.category, []).append(element)
         # ensure we also include empty categories
-        categories = list(model.Category.objects.order_by("name"))
+        categories = list(
+            model.Category.objects.order_by("name").annotate_deletable())
         for category in categories:
             # annotate with elements available in this widget
             category.choice_elements = available.get(category, [])
@@ -58,7 +59,7 @@ class AddProfileForm(ProfileForm):
     """Form for adding a profile."""
     elements = mtforms.MTModelMultipleChoiceField(
         queryset=model.Element.objects.order_by(
-            "category", "name").select_related(),
+            "category", "name").select_related().annotate_deletable(),
         widget=EnvironmentElementSelectMultiple,
         error_messages={"required": "Please select at least one element."})
 
@@ -72,6 +73,11 @@ class AddProfileForm(ProfileForm):
             )
 
 
+    def preview(self):
+        """Return what saving would generate; see ``Profile.preview``."""
+        return model.Profile.preview(*self.cleaned_data["elements"])
+
+
 
 class PopulateProductVersionEnvsForm(mtforms.NonFieldErrorsClassFormMixin,
                                      forms.Form,
@@ -41,7 +41,7 @@ def profiles_list(request):
         request,
         "manage/environment/profiles.html",
         {
-            "profiles": model.Profile.objects.all(),
+            "profiles": model.Profile.objects.all().annotate_categories(),
             }
         )
 
@@ -67,22 +67,28 @@ def profile_details(request, profile_id):
 @category_element_ajax_add_edit
 def profile_add(request):
     """Add an environment profile."""
+    preview = None
     if request.method == "POST":
         form = forms.AddProfileForm(request.POST, user=request.user)
-        profile = form.save_if_valid()
-        if profile is not None:
-            messages.success(
-                request, u"Profile '{0}' added.".format(
-                    profile.name)
-                )
-            return redirect("manage_profiles")
+        if "preview" in request.POST:
+            if form.is_valid():
+                preview = form.preview()
+        else:
+            profile = form.save_if_valid()
+            if profile is not None:
+                messages.success(
+                    request, u"Profile '{0}' added.".format(
+                        profile.name)
+                    )
+                return redirect("manage_profiles")
     else:
         form = forms.AddProfileForm(user=request.user)
     return TemplateResponse(
         request,
         "manage/environment/add_profile.html",
         {
-            "form": form
+            "form": form,
+            "preview": preview,
             }
         )
 
@@ -20,8 +20,9 @@ class ManageFinder(finder.Finder):
         finder.Column(
             "productversions",
             "_productversions.html",
-            model.ProductVersion.objects.all(),
+            model.ProductVersion.objects.select_related("product"),
             "manage_runs",
+            dependencies=[model.Product],
             ),
         finder.Column(
             "runs",
@@ -101,10 +101,7 @@ class RunForm(mtforms.NonFieldErrorsClassFormMixin, mtforms.MTModelForm):
             # if this is empty, then don't make any changes, because
             # either there are no suites, or this came from the read
             # only suite list.
-            run.runsuites.all().delete(permanent=True)
-            for i, suite in enumerate(self.cleaned_data["suites"]):
-                model.RunSuite.objects.create(
-                    run=run, suite=suite, order=i, user=user)
+            run.set_suites(self.cleaned_data["suites"], user=user)
 
         return run
 
@@ -0,0 +1,147 @@
+"""
+Cached rendering of Markdown.
+
+Rendered HTML is cached under a hash of its source text: first in a bounded
+in-process LRU cache, then (if ``settings.MARKDOWN_CACHE`` names a cache alias)
+in that cache, which is shared by all processes if it's memcached. Case steps
+and descriptions are rendered on every runtests and case details page but
+rarely change, so nearly every lookup is a hit.
+
+Hits and misses are recorded in ``moztrap.model.cache.stats`` under the
+"markdown" namespace.
+
+"""
+from collections import deque
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import get_cache
+from django.utils.encoding import force_unicode, smart_str
+
+import markdown2
+
+from moztrap.model.cache import stats
+
+
+
+class LRUCache(object):
+    """A thread-safe dictionary holding at most ``size`` recently-used items."""
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        # key -> (tick of last use, value)
+        self._items = {}
+        # (tick, key) per use, oldest first; stale once the key is used again
+        self._uses = deque()
+        self._tick = 0
+
+
+    def _use(self, key, value):
+        """Store ``value`` under ``key`` as the most recently used item."""
+        self._tick += 1
+        self._items[key] = (self._tick, value)
+        self._uses.append((self._tick, key))
+        # keep the use log from growing without bound on a hot working set
+        if len(self._uses) > 2 * self.size + 16:
+            self._uses = deque(
+                sorted((tick, k) for k, (tick, v) in self._items.items()))
+
+
+    def get(self, key, default=None):
+        """Return value for ``key`` (marking it recently used) or ``default``."""
+        with self._lock:
+            try:
+                tick, value = self._items[key]
+            except KeyError:
+                return default
+            self._use(key, value)
+            return value
+
+
+    def set(self, key, value):
+        """Set ``key`` to ``value``, evicting the least recently used item."""
+        with self._lock:
+            self._use(key, value)
+            while len(self._items) > self.size:
+                tick, oldest = self._uses.popleft()
+                if self._items.get(oldest, (None,))[0] == tick:
+                    del self._items[oldest]
+
+
+    def clear(self):
+        """Remove all items."""
+        with self._lock:
+            self._items.clear()
+            self._uses.clear()
+
+
+    def __len__(self):
+        return len(self._items)
+
+
+
+_local = None
+_shared = None
+
+
+
+def get_local():
+    """Return the in-process cache."""
+    global _local
+    if _local is None:
+        _local = LRUCache(settings.MARKDOWN_CACHE_SIZE)
+    return _local
+
+
+
+def get_shared():
+    """Return the shared cache backend, or None if not configured."""
+    global _shared
+    if _shared is None and settings.MARKDOWN_CACHE:
+        _shared = get_cache(settings.MARKDOWN_CACHE)
+    return _shared
+
+
+
+def reset():
+    """Forget both cache tiers; used when settings change in tests."""
+    global _local, _shared
+    _local = None
+    _shared = None
+
+
+
+def render(text):
+    """Render Markdown ``text`` to HTML (escaping any HTML in it), uncached."""
+    return force_unicode(markdown2.markdown(text, safe_mode="escape"))
+
+
+
+def cache_key(text):
+    """Return cache key for rendering of ``text``."""
+    return "markdown:%s:%s" % (
+        markdown2.__version__, hashlib.sha1(smart_str(text)).hexdigest())
+
+
+
+def cached_render(text):
+    """Render Markdown ``text`` to HTML, from the cache if possible."""
+    key = cache_key(text)
+    local = get_local()
+    html = local.get(key)
+    if html is not None:
+        stats.record("markdown", True)
+        return html
+
+    shared = get_shared()
+    if shared is not None:
+        html = shared.get(key)
+
+    stats.record("markdown", html is not None)
+    if html is None:
+        html = render(text)
+        if shared is not None:
+            shared.set(key, html, settings.MARKDOWN_CACHE_TIMEOUT)
+    local.set(key, html)
+    return html
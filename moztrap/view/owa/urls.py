@@ -11,5 +11,11 @@ urlpatterns = patterns(
 
     # open web apps ----------------------------------------------------------
     url("^manifest.webapp", "manifest", name="owa_manifest"),
+    url(r"^bundle/(?P<run_id>\d+)/env/(?P<env_id>\d+)/$",
+        "bundle",
+        name="owa_bundle"),
+    url(r"^sync/(?P<run_id>\d+)/env/(?P<env_id>\d+)/$",
+        "sync",
+        name="owa_sync"),
 
 )
@@ -5,8 +5,16 @@ Open Web Apps view.
 import json
 
 from django.conf import settings
-from django.http import HttpResponse
+from django.core.urlresolvers import reverse
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.shortcuts import get_object_or_404
 from django.template.response import TemplateResponse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_POST
+
+from ... import model
+
+from ..users.decorators import permission_required
 
 
 
@@ -27,3 +35,186 @@ def manifest(request):
         json.dumps(manifest),
         content_type="application/x-web-app-manifest+json",
         )
+
+
+
+def _run_and_environment(run_id, env_id):
+    """Return (run, environment) for given ids, or raise Http404."""
+    run = get_object_or_404(model.Run, pk=run_id)
+    environment = get_object_or_404(run.environments.all(), pk=env_id)
+    return run, environment
+
+
+
+@never_cache
+@permission_required("execution.execute")
+def bundle(request, run_id, env_id):
+    """
+    Return a compact JSON bundle of a run in one environment, for offline use.
+
+    Each case carries the ``cc_version`` of its caseversion; offline results
+    are synced back with it so edits made in the meantime can be detected.
+    The bundle also carries the sync URL and the CSRF token to send with it
+    (as the ``X-CSRFToken`` header).
+
+    """
+    run, environment = _run_and_environment(run_id, env_id)
+
+    rcvs = run.runcaseversions.filter(
+        environments=environment).select_related(
+            "caseversion__case").prefetch_related(
+                "caseversion__steps", "caseversion__attachments")
+
+    latest = {}
+    for result in model.Result.objects.filter(
+            runcaseversion__run=run,
+            environment=environment,
+            is_latest=True,
+            ).exclude(
+                status__in=model.Result.PENDING_STATES,
+                ).select_related("tester").order_by("created_on"):
+        latest[result.runcaseversion_id] = {
+            "status": result.status,
+            "tester": result.tester.username,
+            "comment": result.comment,
+            }
+
+    cases = []
+    for rcv in rcvs:
+        cv = rcv.caseversion
+        cases.append({
+            "runcaseversion": rcv.id,
+            "case": cv.case_id,
+            "cc_version": cv.cc_version,
+            "name": cv.name,
+            "description": cv.description,
+            "priority": cv.case.priority,
+            "steps": [
+                [step.number, step.instruction, step.expected]
+                for step in cv.steps.all()
+                ],
+            "attachments": [
+                {"name": a.name, "url": a.url} for a in cv.attachments.all()],
+            "result": latest.get(rcv.id),
+            })
+
+    data = {
+        "run": {"id": run.id, "name": run.name, "cc_version": run.cc_version},
+        "environment": {"id": environment.id, "name": unicode(environment)},
+        "cases": cases,
+        "sync_url": reverse(
+            "owa_sync", kwargs={"run_id": run.id, "env_id": environment.id}),
+        "csrf_token": getattr(request, "csrf_token", ""),
+        }
+
+    return HttpResponse(json.dumps(data), content_type="application/json")
+
+
+
+# extra arguments accepted for each result status; the rest are ignored.
+RESULT_ARGS = {
+    "passed": [],
+    "failed": ["comment", "stepnumber", "bug"],
+    "invalidated": ["comment"],
+    "blocked": ["comment"],
+    "skipped": [],
+    }
+
+
+
+def _result_kwargs(status, data):
+    """
+    Return extra keyword arguments for a ``status`` result from ``data``.
+
+    A ``stepnumber`` is coerced to an integer (null means none); ``comment``
+    and ``bug`` must be strings. Raises ValueError for anything else.
+
+    """
+    kwargs = {}
+    for name in RESULT_ARGS[status]:
+        value = data.get(name)
+        if name == "stepnumber":
+            if value is not None:
+                try:
+                    kwargs[name] = int(value)
+                except TypeError:
+                    raise ValueError("Bad stepnumber %r." % (value,))
+        elif name in data:
+            if not isinstance(value, basestring):
+                raise ValueError("Bad %s %r." % (name, value))
+            kwargs[name] = value
+    return kwargs
+
+
+
+@never_cache
+@require_POST
+@permission_required("execution.execute")
+def sync(request, run_id, env_id):
+    """
+    Record a batch of results recorded offline against a bundle.
+
+    Expects a JSON body like::
+
+        {"results": [
+            {"runcaseversion": 12, "cc_version": 3, "status": "passed"},
+            {"runcaseversion": 14, "cc_version": 1, "status": "failed",
+             "comment": "broken", "stepnumber": 2, "bug": "http://..."}
+        ]}
+
+    Results are applied via the same runcaseversion result methods as the
+    result API. Results for cases that are no longer in the run, or whose
+    caseversion has changed since the bundle was fetched, or with invalid
+    data, are not applied but reported back as conflicts.
+
+    """
+    run, environment = _run_and_environment(run_id, env_id)
+
+    if not run.status == model.Run.STATUS.active:
+        return HttpResponseBadRequest("Run is not active.")
+
+    try:
+        results = json.loads(request.raw_post_data)["results"]
+        rcv_ids = [int(r["runcaseversion"]) for r in results]
+    except (ValueError, KeyError, TypeError):
+        return HttpResponseBadRequest("Expected a JSON list of results.")
+
+    rcvs = dict(
+        (rcv.id, rcv) for rcv in run.runcaseversions.filter(
+            environments=environment, id__in=rcv_ids).select_related(
+                "caseversion")
+        )
+
+    can_skip = request.user.has_perm("execution.manage_runs")
+    applied = []
+    conflicts = []
+    for data, rcv_id in zip(results, rcv_ids):
+        status = data.get("status")
+        rcv = rcvs.get(rcv_id)
+        reason = None
+        if rcv is None:
+            reason = "not in run"
+        elif status not in RESULT_ARGS:
+            reason = "invalid status"
+        elif status == model.Result.STATUS.skipped and not can_skip:
+            reason = "not permitted"
+        elif data.get("cc_version") != rcv.caseversion.cc_version:
+            reason = "case changed"
+        else:
+            try:
+                kwargs = _result_kwargs(status, data)
+            except ValueError:
+                reason = "invalid data"
+
+        if reason is not None:
+            conflicts.append({"runcaseversion": rcv_id, "reason": reason})
+            continue
+
+        rcv.get_result_method(status)(
+            environment=environment, user=request.user, **kwargs)
+        applied.append(rcv_id)
+
+    return HttpResponse(
+        json.dumps({"applied": applied, "conflicts": conflicts}),
+        content_type="application/json",
+        )
@@ -32,8 +32,9 @@ class ResultsFinder(finder.Finder):
         finder.Column(
             "productversions",
             "_productversions.html",
-            model.ProductVersion.objects.all(),
+            model.ProductVersion.objects.select_related("product"),
             "results_runs",
+            dependencies=[model.Product],
             ),
         finder.Column(
             "runs",
@@ -44,7 +45,9 @@ class ResultsFinder(finder.Finder):
         CaseColumn(
             "cases",
             "_cases.html",
-            model.RunCaseVersion.objects.order_by("caseversion__name"),
+            model.RunCaseVersion.objects.select_related(
+                "caseversion", "run").order_by("caseversion__name"),
             "results_results",
+            dependencies=[model.CaseVersion, model.Run],
             ),
         ]
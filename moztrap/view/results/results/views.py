@@ -12,11 +12,13 @@ from moztrap import model
 from moztrap.view.filters import ResultFilterSet
 from moztrap.view.lists import decorators as lists
 from moztrap.view.utils.ajax import ajax
+from moztrap.view.utils.replica import read_replica
 
 from ..finders import ResultsFinder
 
 
 
+@read_replica
 @login_maybe_required
 @lists.finder(ResultsFinder)
 @lists.filter("results", filterset_class=ResultFilterSet)
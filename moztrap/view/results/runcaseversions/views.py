@@ -12,11 +12,14 @@ from moztrap import model
 from moztrap.view.filters import RunCaseVersionFilterSet
 from moztrap.view.lists import decorators as lists
 from moztrap.view.utils.ajax import ajax
+from moztrap.view.utils.replica import read_replica
+from moztrap.view.utils.conditional import conditional
 
 from ..finders import ResultsFinder
 
 
 
+@read_replica
 @login_maybe_required
 @lists.finder(ResultsFinder)
 @lists.filter("runcaseversions", filterset_class=RunCaseVersionFilterSet)
@@ -29,6 +32,7 @@ def runcaseversions_list(request):
         "results/case/cases.html",
         {
             "runcaseversions": model.RunCaseVersion.objects.only(
+                "cc_version",
                 "caseversion__name",
                 "caseversion__case__priority",
                 "run__name",
@@ -47,7 +51,19 @@ def runcaseversions_list(request):
 
 
 
+@read_replica
 @login_maybe_required
+@conditional(
+    "library.CaseVersion",
+    "library.CaseStep",
+    "library.CaseAttachment",
+    "execution.Result",
+    "execution.StepResult",
+    "environments.Environment",
+    "environments.Element",
+    "core.User",
+    objects=lambda rcv_id: [(model.RunCaseVersion, rcv_id)],
+    )
 def runcaseversion_details(request, rcv_id):
     """Get details snippet for a runcaseversion."""
     runcaseversion = get_object_or_404(
@@ -12,12 +12,25 @@ from moztrap import model
 from moztrap.view.filters import RunFilterSet
 from moztrap.view.lists import decorators as lists
 from moztrap.view.utils.ajax import ajax
+from moztrap.view.utils.replica import read_replica
+from moztrap.view.utils.conditional import conditional
 
 from ..finders import ResultsFinder
 
 
 
+@read_replica
 @login_maybe_required
+@conditional(
+    "execution.Run",
+    "execution.RunCaseVersion",
+    "execution.Result",
+    "core.Product",
+    "core.ProductVersion",
+    "library.Suite",
+    "environments.Element",
+    "core.User",
+    )
 @lists.finder(ResultsFinder)
 @lists.filter("runs", filterset_class=RunFilterSet)
 @lists.sort("runs", "start", "desc")
@@ -29,6 +42,8 @@ def runs_list(request):
         "results/run/runs.html",
         {
             "runs": model.Run.objects.filter(is_series=False).only(
+                "cc_version",
+                "status",
                 "name",
                 "start",
                 "end",
@@ -44,7 +59,14 @@ def runs_list(request):
 
 
 
+@read_replica
 @login_maybe_required
+@conditional(
+    "environments.Environment",
+    "environments.Element",
+    "core.User",
+    objects=lambda run_id: [(model.Run, run_id)],
+    )
 def run_details(request, run_id):
     """Get details snippet for a run."""
     run = get_object_or_404(
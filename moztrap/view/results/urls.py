@@ -23,6 +23,11 @@ urlpatterns = patterns(
         "runs.views.run_details",
         name="results_run_details"),
 
+    # export
+    url(r"^runs/(?P<run_id>\d+)/export/$",
+        "views.export_run",
+        name="results_run_export"),
+
     # runcaseversions --------------------------------------------------------
 
     # list
@@ -40,5 +45,11 @@ urlpatterns = patterns(
     # list
     url(r"^case/(?P<rcv_id>\d+)/$",
         "results.views.results_list",
-        name="results_results")
+        name="results_results"),
+
+    # export -----------------------------------------------------------------
+
+    url(r"^productversions/(?P<productversion_id>\d+)/export/$",
+        "views.export_productversion",
+        name="results_productversion_export"),
 )
@@ -1,10 +1,13 @@
 """
-Home results view.
+Home results view, and results export.
 
 """
 from django.core.urlresolvers import reverse
-from django.shortcuts import redirect
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.shortcuts import get_object_or_404, redirect
 
+from moztrap import model
+from moztrap.model.execution import export
 from moztrap.view.utils.auth import login_maybe_required
 
 
@@ -14,3 +17,54 @@ def home(request):
     """Results home redirects to list of active test runs, with finder open."""
     return redirect(
         reverse("results_runs") + "?openfinder=1&filter-status=active")
+
+
+
+@login_maybe_required
+def export_run(request, run_id):
+    """Stream results of a run (or all runs in a series)."""
+    run = get_object_or_404(model.Run, pk=run_id)
+    return _export_response(
+        request,
+        export.run_results(run, latest=not request.GET.get("all")),
+        "run-%s" % run.id,
+        )
+
+
+
+@login_maybe_required
+def export_productversion(request, productversion_id):
+    """Stream results of all runs of a product version."""
+    productversion = get_object_or_404(
+        model.ProductVersion, pk=productversion_id)
+    return _export_response(
+        request,
+        export.productversion_results(
+            productversion, latest=not request.GET.get("all")),
+        "productversion-%s" % productversion.id,
+        )
+
+
+
+def _export_response(request, results, filename):
+    """
+    Return a response streaming ``results`` in the requested format.
+
+    Format is given by the ``format`` querystring parameter: ``ndjson``
+    (default) or ``csv``.
+
+    """
+    format = request.GET.get("format", "ndjson")
+    try:
+        content_type, lines = export.FORMATS[format]
+    except KeyError:
+        return HttpResponseBadRequest(
+            "Unknown format '%s'; use one of %s." % (
+                format, ", ".join(sorted(export.FORMATS))))
+
+    # an iterator as content is consumed lazily, as it's written out
+    response = HttpResponse(
+        lines(export.rows(results)), content_type=content_type)
+    response["Content-Disposition"] = "attachment; filename=%s.%s" % (
+        filename, format)
+    return response
@@ -21,7 +21,8 @@ class RunTestsFinder(finder.Finder):
         finder.Column(
             "productversions",
             "_productversions.html",
-            model.ProductVersion.objects.all(),
+            model.ProductVersion.objects.select_related("product"),
+            dependencies=[model.Product],
             ),
         finder.Column(
             "runs",
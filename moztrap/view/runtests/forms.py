@@ -8,6 +8,7 @@ from django.core.exceptions import ValidationError, ObjectDoesNotExist
 import floppyforms as forms
 
 from ... import model
+from ...model.environments.models import element_signature, subset_signatures
 
 
 class EnvironmentSelectionForm(forms.Form):
@@ -56,6 +57,15 @@ class EnvironmentSelectionForm(forms.Form):
                 ee.element.category, set())
             bycat.add(ee.element)
 
+        # maps element-set signature to ID of first environment with that set
+        self.envid_by_signature = {}
+        for envid in sorted(self.elementids_by_envid):
+            self.envid_by_signature.setdefault(
+                element_signature(
+                    [e for e in self.elementids_by_envid[envid] if e]),
+                envid,
+                )
+
         # construct choice-field for each env type
         for category in self.categories:
             self.fields["category_{0}".format(category.id)] = forms.ChoiceField(
@@ -81,15 +91,16 @@ class EnvironmentSelectionForm(forms.Form):
             [int(eid) for k, eid in self.cleaned_data.iteritems()
                 if k.find("category_") == 0 and eid])
         matches = [
-            envid for envid, element_ids in self.elementids_by_envid.items()
-            if set([e for e in element_ids if e]).issubset(selected_element_ids)
+            self.envid_by_signature[signature]
+            for signature in subset_signatures(selected_element_ids)
+            if signature in self.envid_by_signature
             ]
         if not matches:
             raise forms.ValidationError(
                 "The selected environment is not valid for this test run. "
                 "Please select a different combination.")
 
-        self.cleaned_data["environment"] = matches[0]
+        self.cleaned_data["environment"] = min(matches)
 
         return self.cleaned_data
 
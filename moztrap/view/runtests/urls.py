@@ -16,5 +16,8 @@ urlpatterns = patterns(
     url(r"^run/(?P<run_id>\d+)/env/(?P<env_id>\d+)/$",
         "run",
         name="runtests_run"),
+    url(r"^run/(?P<run_id>\d+)/env/(?P<env_id>\d+)/next/$",
+        "next_test",
+        name="runtests_next"),
 
 )
@@ -5,10 +5,12 @@ Views for test execution.
 import json
 from django.db.models import Max
 
+from django.core.urlresolvers import reverse
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.response import TemplateResponse
 from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_POST
 
 from django.contrib import messages
 
@@ -24,6 +26,11 @@ from .forms import EnvironmentSelectionForm, EnvironmentBuildSelectionForm
 
 
 
+# for prepopulating the finder's columns on the run page
+run_finder = RunTestsFinder()
+
+
+
 
 @never_cache
 @permission_required("execution.execute")
@@ -252,11 +259,67 @@ def run(request, run_id, env_id):
             "finder": {
                 # finder decorator populates top column (products), we
                 # prepopulate the other two columns
-                "productversions": model.ProductVersion.objects.filter(
-                    product=run.productversion.product),
-                "runs": model.Run.objects.order_by("name").filter(
-                    productversion=run.productversion,
-                    status=model.Run.STATUS.active),
+                "productversions": run_finder.objects(
+                    "productversions", run.productversion.product_id),
+                "runs": run_finder.objects(
+                    "runs", run.productversion_id),
                 },
             }
         )
+
+
+
+@never_cache
+@permission_required("execution.execute")
+@require_POST
+def next_test(request, run_id, env_id):
+    """
+    Claim the next unclaimed test in this run/environment for this tester.
+
+    Claiming is a state change, so only POST is accepted; a link that GETs it
+    could be followed by prefetchers and crawlers.
+
+    Ajax requests get a JSON description of the claimed test; others are
+    redirected to the run page, filtered to the claimed case.
+
+    """
+    run = get_object_or_404(model.Run, pk=run_id)
+
+    if not run.status == model.Run.STATUS.active:
+        messages.info(
+            request,
+            "That test run is currently not open for testing. "
+            "Please select a different test run.")
+        return redirect("runtests")
+
+    try:
+        environment = run.environments.get(pk=env_id)
+    except model.Environment.DoesNotExist:
+        return redirect("runtests_environment", run_id=run_id)
+
+    workitem = model.WorkItem.objects.claim(run, environment, request.user)
+
+    run_url = reverse(
+        "runtests_run", kwargs={"run_id": run.id, "env_id": environment.id})
+
+    if workitem is None:
+        url = run_url
+        data = {"runcaseversion_id": None, "url": url}
+    else:
+        rcv = workitem.runcaseversion
+        url = "{0}?filter-id={1}".format(run_url, rcv.caseversion.case_id)
+        data = {
+            "runcaseversion_id": rcv.id,
+            "case_id": rcv.caseversion.case_id,
+            "name": rcv.caseversion.name,
+            "lease_expires": workitem.lease_expires.isoformat(),
+            "url": url,
+            }
+
+    if request.is_ajax():
+        return HttpResponse(json.dumps(data), content_type="application/json")
+
+    if workitem is None:
+        messages.info(
+            request, "There are no unclaimed tests left in this run.")
+    return redirect(url)
@@ -24,6 +24,11 @@ urlpatterns = patterns(
     "",
     url(r"^$", "moztrap.view.views.home", name="home"),
 
+    # lazy filter options ----------------------------------------------------
+    url(r"^_filter_options/$",
+        "moztrap.view.views.filter_options",
+        name="filter_options"),
+
     # runtests ---------------------------------------------------------------
     url(r"^runtests/", include("moztrap.view.runtests.urls")),
 
@@ -48,4 +53,7 @@ urlpatterns = patterns(
     # open web apps-----------------------------------------------------------
     url("^owa/", include("moztrap.view.owa.urls")),
 
+    # debug ------------------------------------------------------------------
+    url(r"^debug/", include("moztrap.debug.urls")),
+
     ) + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -38,3 +38,26 @@ def permission_required(perm):
                 )
         return _wrapped_view
     return decorator
+
+
+
+def staff_required(view_func):
+    """
+    View decorator to require an active staff user, redirecting as needed.
+
+    Redirects like ``permission_required``: to the home page if the user is
+    logged in but not staff, to login if they are not logged in.
+
+    """
+    @wraps(view_func, assigned=available_attrs(view_func))
+    def _wrapped_view(request, *args, **kwargs):
+        if request.user.is_active and request.user.is_staff:
+            return view_func(request, *args, **kwargs)
+        if request.user.is_authenticated():
+            return redirect("/")
+        return redirect_to_login(
+            request.get_full_path(),
+            settings.LOGIN_URL,
+            REDIRECT_FIELD_NAME,
+            )
+    return _wrapped_view
@@ -0,0 +1,143 @@
+"""
+Conditional GET (ETag) support for views.
+
+ETags are derived from model cache generations (see ``moztrap.model.cache``)
+rather than from the rendered response, so a request whose ETag still matches
+is answered 304 without running any queries or rendering anything.
+
+"""
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+
+from messages_ui import middleware
+
+from moztrap.deploy import routers
+from moztrap.model import cache
+
+
+
+def etag(request, dependencies):
+    """
+    Return ETag for a response to ``request`` derived from ``dependencies``.
+
+    The ETag also varies with the full path, whether the request is Ajax, the
+    user and their permissions, the CSRF token embedded in forms, and (for
+    views reading from a replica) ``routers.replica_epoch``. Returns
+    None for requests other than GET or HEAD, and when there are messages
+    waiting to be shown, since a 304 response wouldn't show them.
+
+    """
+    if request.method not in ("GET", "HEAD"):
+        return None
+    if len(get_messages(request)):
+        return None
+
+    user = getattr(request, "user", None)
+    user_id, perms = None, ""
+    if user is not None and user.is_authenticated():
+        user_id = user.pk
+        perms = ",".join(sorted(user.get_all_permissions()))
+
+    return cache.fingerprint(
+        dependencies,
+        request.get_full_path(),
+        request.is_ajax(),
+        user_id,
+        perms,
+        getattr(request, "csrf_token", ""),
+        routers.replica_epoch(),
+        )
+
+
+
+def not_modified(request, tag):
+    """Return True if ``request`` has an If-None-Match matching ``tag``."""
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if not if_none_match:
+        return False
+    try:
+        etags = parse_etags(if_none_match)
+    except ValueError:
+        return False
+    return tag in etags or "*" in etags
+
+
+
+def conditional(*dependencies, **kwargs):
+    """
+    Decorate a view to set an ETag and answer matching GETs with a 304.
+
+    ``dependencies`` are the model classes (or "app_label.ModelName" strings)
+    whose data the view shows. If the view shows particular instances, give an
+    ``objects`` callable; it's called with the view's arguments (other than
+    the request) and returns a list of instances or ``(model, pk)`` tuples.
+
+    If-Modified-Since is ignored; a matching If-None-Match is sufficient.
+
+    """
+    objects = kwargs.pop("objects", None)
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            deps = list(dependencies)
+            if objects is not None:
+                deps.extend(objects(*args, **kwargs))
+            tag = etag(request, deps)
+            if tag is None:
+                return view_func(request, *args, **kwargs)
+
+            if not_modified(request, tag):
+                response = HttpResponseNotModified()
+                # a 304 has no content
+                del response["Content-Type"]
+            else:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            if not response.has_header("ETag"):
+                response["ETag"] = quote_etag(tag)
+            return response
+
+        return _wrapped_view
+
+    return decorator
+
+
+
+class AjaxMessagesMiddleware(middleware.AjaxMessagesMiddleware):
+    """
+    Adds messages to Ajax responses; passes 304s through untouched.
+
+    The messages_ui middleware expects every Ajax response to have a
+    Content-Type, which a 304 in answer to an Ajax request doesn't.
+
+    """
+    def process_response(self, request, response):
+        if response.status_code == 304:
+            return response
+        return super(AjaxMessagesMiddleware, self).process_response(
+            request, response)
+
+
+
+class CacheBumpMiddleware(object):
+    """
+    Bumps model cache generations again after the request's transaction.
+
+    Must come before ``TransactionMiddleware``, so its ``process_response``
+    runs after the commit or rollback; see ``moztrap.model.cache``.
+
+    """
+    def process_request(self, request):
+        """Start each request with nothing pending."""
+        cache.discard_pending()
+
+
+    def process_response(self, request, response):
+        """Bump again the generations bumped during the request."""
+        cache.flush_pending()
+        return response
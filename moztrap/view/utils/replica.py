@@ -0,0 +1,63 @@
+"""
+Serving read-only views from read replicas.
+
+Mark views that can show slightly stale data (reports, lists polled by CI)
+with the ``read_replica`` decorator; ``ReplicaMiddleware`` then sends the
+reads of GET and HEAD requests to them to one of ``DATABASE_REPLICAS`` (see
+``moztrap.deploy.routers``).
+
+A client whose request wrote anything is pinned to the primary for the next
+``REPLICA_LAG_SECONDS``, by a cookie, so it sees its own writes (e.g. the
+page it's redirected to after a POST) even if a replica hasn't caught up.
+
+"""
+import random
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from moztrap.deploy import routers
+
+
+
+PIN_COOKIE = "mtprimary"
+
+
+
+def read_replica(view_func):
+    """Mark ``view_func`` as able to read from a replica; must be outermost."""
+    view_func.read_replica = True
+    return view_func
+
+
+
+class ReplicaMiddleware(object):
+    """Sends reads of ``read_replica`` views to a replica."""
+    def __init__(self):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed()
+
+
+    def process_request(self, request):
+        """Start each request reading from the primary."""
+        routers.reset()
+
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Read from a random replica, if the view and request allow it."""
+        if (request.method in ("GET", "HEAD") and
+                getattr(view_func, "read_replica", False) and
+                PIN_COOKIE not in request.COOKIES):
+            routers.use_replica(random.choice(settings.DATABASE_REPLICAS))
+
+
+    def process_response(self, request, response):
+        """Pin a client that wrote anything to the primary for a while."""
+        if routers.reset():
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_LAG_SECONDS,
+                httponly=True,
+                )
+        return response
@@ -1,9 +1,14 @@
 """
-MozTrap home view.
+MozTrap home view, and JSON options for lazy list filters.
 
 """
+import json
+
+from django.http import HttpResponse, Http404
 from django.shortcuts import redirect
+from django.views.decorators.cache import never_cache
 
+from .lists.filters import lazy_filter, option_counts
 from .utils.auth import login_maybe_required
 
 
@@ -14,3 +19,64 @@ def home(request):
     if request.user.has_perm("execution.execute"):
         return redirect("runtests")
     return redirect("results_runs")
+
+
+
+@never_cache
+@login_maybe_required
+def filter_options(request):
+    """
+    Return JSON page of options of a lazy filter matching ``text``.
+
+    The filter is identified by the ``path`` of its list view and its
+    ``key``; ``page`` is a one-based page number. Options are returned as
+    autocomplete suggestions, with ``more`` true if there are more pages.
+
+    """
+    flt = lazy_filter(
+        request.GET.get("path", ""), request.GET.get("key", ""))
+    if flt is None:
+        raise Http404
+    text = request.GET.get("text", "")
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        page = 1
+
+    options, more = flt.search(text, page)
+    counts = option_counts(
+        request.GET["path"], flt.key, request.GET, request.COOKIES)
+
+    suggestions = []
+    for value, label in options:
+        # highlight the first search word found in the label, if any
+        pre, typed, post = label, u"", u""
+        for word in text.split():
+            start = label.lower().find(word.lower())
+            if start != -1:
+                pre = label[:start]
+                typed = label[start:start + len(word)]
+                post = label[start + len(word):]
+                break
+        suggestion = {
+            "preText": pre,
+            "typedText": typed,
+            "postText": post,
+            "id": value,
+            "name": label,
+            "type": flt.key,
+            "displayType": flt.name.lower(),
+            }
+        if counts is not None:
+            suggestion["counted"] = True
+            suggestion["count"] = counts.get(value, 0)
+        suggestions.append(suggestion)
+    return HttpResponse(
+        json.dumps(
+            {
+                "suggestions": suggestions,
+                "more": more,
+                }
+            ),
+        content_type="application/json",
+        )
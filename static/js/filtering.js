@@ -39,10 +39,33 @@ var MT = (function (MT, $) {
         $('.listpage').on('click', '.filter-link', function (e) {
             var thisLink = $(this),
                 name = thisLink.text(),
-                type = thisLink.data('type');
-            $('#filterform').find('.filter-group[data-name="' + type + '"] .filter-item label').filter(function () {
-                return $(this).text() === name;
-            }).closest('.filter-item').children('input').click();
+                type = thisLink.data('type'),
+                group = $('#filterform').find('.filter-group[data-name="' + type + '"]'),
+                input = group.find('.filter-item label').filter(function () {
+                    return $(this).text() === name;
+                }).closest('.filter-item').children('input');
+            if (input.length) {
+                input.click();
+            } else if (group.data('options-url')) {
+                // lazy filters only have their selected options on the page
+                $.get(group.data('options-url'), {text: name}, function (response) {
+                    $.each(response.suggestions, function () {
+                        var index = group.find('input').length + 1;
+                        if (this.name === name) {
+                            group.removeClass('empty').children('ul').append(ich.autocomplete_input({
+                                typeName: type,
+                                inputName: name,
+                                id: this.id,
+                                index: index,
+                                prefix: 'filter',
+                                pinable: true
+                            }));
+                            $('#id-filter-' + type + '-' + index.toString()).click();
+                            return false;
+                        }
+                    });
+                });
+            }
             e.preventDefault();
         });
     };
@@ -209,6 +232,37 @@ var MT = (function (MT, $) {
         });
     };
 
+    // Update filter-option counts from those of a replaced list
+    MT.updateFacetCounts = function (container) {
+        var context = $(container);
+
+        context.on('after-replace', '.itemlist.action-ajax-replace', function (event, replacement) {
+            var counts = replacement.data('facet-counts');
+            if (counts) {
+                context.find('#filterform .filter-group').each(function () {
+                    var group = $(this),
+                        groupCounts = counts[group.data('name')];
+                    if (groupCounts) {
+                        group.find('.filter-item').each(function () {
+                            var item = $(this),
+                                value = item.children('input').val(),
+                                count = item.find('.facet-count');
+                            // only options rendered with the list are counted
+                            if (!groupCounts.hasOwnProperty(value)) {
+                                count.remove();
+                                return;
+                            }
+                            if (!count.length) {
+                                count = $('<span class="facet-count"></span>').prependTo(item.find('.onoff'));
+                            }
+                            count.text(groupCounts[value]);
+                        });
+                    }
+                });
+            }
+        });
+    };
+
     // Filter list of items by hiding/showing based on selected filter-inputs
     MT.clientSideFilter = function (opts) {
         var defaults = {
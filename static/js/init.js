@@ -19,6 +19,7 @@ var MT = (function (MT, $) {
             textbox: '#text-filter',
             inputList: '.visual .filter-group:not(.keyword)',
             newInputList: '.visual .filter-group.keyword',
+            lazyInputList: '.visual .filter-group.lazy',
             multipleCategories: true,
             allowNew: true,
             autoSubmit: true,
@@ -150,6 +151,7 @@ var MT = (function (MT, $) {
         MT.preventCaching('#filter');
         MT.directFilterLinks();
         MT.filterFormAjax('.manage, .results, .run');
+        MT.updateFacetCounts('.manage, .results');
         MT.clientSideFilter({container: '#envnarrowing'});
         MT.pinFilter();
         MT.updatePageForExistingPinnedFilters();
@@ -183,7 +185,7 @@ var MT = (function (MT, $) {
         MT.populateMultiselectItems({
             container: '#suite-edit-form, #suite-add-form',
             trigger_field: '#id_product',
-            ajax_url_root: "/api/v1/caseselection/?format=json&limit=0",
+            ajax_url_root: "/api/v1/caseselection/?format=json",
             ajax_trigger_filter: "productversion__product",
             ajax_for_field: "case__suites",
             for_type: "suite",
@@ -193,7 +195,7 @@ var MT = (function (MT, $) {
         MT.populateMultiselectItems({
             container: '#tag-add-form, #tag-edit-form',
             trigger_field: '#id_product',
-            ajax_url_root: "/api/v1/caseversionselection/?format=json&limit=0",
+            ajax_url_root: "/api/v1/caseversionselection/?format=json",
             ajax_trigger_filter: "productversion__product",
             ajax_for_field: "tags",
             for_type: "tag",
@@ -204,7 +206,7 @@ var MT = (function (MT, $) {
         MT.populateMultiselectItems({
             container: '#run-add-form',
             trigger_field: '#id_productversion',
-            ajax_url_root: "/api/v1/suiteselection/?format=json&limit=0",
+            ajax_url_root: "/api/v1/suiteselection/?format=json",
             ajax_trigger_filter: "product",
             ajax_for_field: "runs",
             for_type: "run",
@@ -213,7 +215,7 @@ var MT = (function (MT, $) {
         MT.populateMultiselectItems({
             container: '#run-edit-form',
             trigger_field: '#id_productversion',
-            ajax_url_root: "/api/v1/suiteselection/?format=json&limit=0",
+            ajax_url_root: "/api/v1/suiteselection/?format=json",
             ajax_trigger_filter: "product",
             ajax_for_field: "runs",
             for_type: "run",
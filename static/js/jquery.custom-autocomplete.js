@@ -28,6 +28,7 @@
             suggestionList = context.find(options.suggestionList),
             inputList = context.find(options.inputList),
             newInputList = context.find(options.newInputList),
+            lazyInputList = context.find(options.lazyInputList),
             origInputs = inputList.html(),
             origNewInputs = newInputList.html(),
             inputs = inputList.add(newInputList).find(options.inputs),
@@ -41,6 +42,7 @@
             typedText,
             ajaxCalls = 0,
             ajaxResponses = 0,
+            lazySuggestions = {},
 
             // Removes (faked) placeholder text from textbox
             removeFakePlaceholder = function () {
@@ -105,6 +107,36 @@
                 });
             },
 
+            // Fetch suggestions for each lazy list (whose inputs aren't all on the page) from its options URL
+            fetchLazySuggestions = function () {
+                var text = typedText;
+                lazySuggestions = {};
+                updateSuggestions();
+                lazyInputList.each(function () {
+                    var listURL = $(this).data('options-url'),
+                        // the list's filter state, for counts of the options
+                        state = $(this).closest('form').find('input.check:checked').serialize(),
+                        query = $.param({text: text}) + (state ? '&' + state : ''),
+                        cacheKey = listURL + '&' + query,
+                        merge = function (response) {
+                            if (text === typedText) {
+                                lazySuggestions[listURL] = response.suggestions;
+                                updateSuggestions();
+                            }
+                        };
+                    if (cache[cacheKey]) {
+                        merge(cache[cacheKey]);
+                    } else {
+                        ajaxCalls = ajaxCalls + 1;
+                        $.get(listURL, query, function (response) {
+                            ajaxResponses = ajaxResponses + 1;
+                            cache[cacheKey] = response;
+                            merge(response);
+                        });
+                    }
+                });
+            },
+
             // Create list of autocomplete suggestions from Ajax response or existing list of inputs
             updateSuggestions = function (data, cached) {
                 var extraDataName, suggestions;
@@ -141,6 +173,15 @@
                         }
                         data.suggestions.push(thisSuggestion);
                     });
+
+                    // Add suggestions fetched for lazy lists, unless already on the page
+                    $.each(lazySuggestions, function (listURL, listSuggestions) {
+                        $.each(listSuggestions, function () {
+                            if (!inputs.filter('[data-name="' + this.type + '"][value="' + this.id + '"]').length) {
+                                data.suggestions.push(this);
+                            }
+                        });
+                    });
                 }
 
                 if (options.allowNew && !cached) {
@@ -250,6 +291,8 @@
                                         updateSuggestions(response, false);
                                     });
                                 }
+                            } else if (lazyInputList.length) {
+                                fetchLazySuggestions();
                             } else {
                                 updateSuggestions();
                             }
@@ -419,7 +462,7 @@
                     thisInput.prop('checked', true).change();
                 } else {
                     if (options.multipleCategories) {
-                        thisGroup = newInputList.filter(function () {
+                        thisGroup = newInputList.add(lazyInputList).filter(function () {
                             return $(this).data('name') === thisTypeName;
                         });
                     } else {
@@ -603,6 +646,8 @@
         restrictAllowNew: false,                        // Set ``true`` if new inputs are only allowed if textbox has data-allow-new="true"
         newInputList: null,                             // Selector for list of new inputs (only needed if ``allowNew: true``
                                                         //      and ``multipleCategories: true``)
+        lazyInputList: null,                            // Selector for lists whose suggestions are fetched from their
+                                                        //      data-options-url (only selected inputs are on the page)
         newInputTextbox: null,                          // Selector for secondary textbox to enter new group-specific inputs
         fakePlaceholder: false,                         // Set ``true`` to create fake placeholder text when using ``initialFocus: true``
         initialFocus: false,                            // Set ``true`` to give textbox focus on initial page load
@@ -16,7 +16,10 @@ var MT = (function (MT, $) {
                 container: 'body',
                 data_attr: 'product-id',
                 refetch_on_trigger: true,
-                fetch_without_trigger_value: false
+                fetch_without_trigger_value: false,
+                // items per page of the available and included lists
+                available_page_size: 100,
+                included_page_size: 500
             },
             options = $.extend({}, defaults, opts);
 
@@ -43,13 +46,9 @@ var MT = (function (MT, $) {
                         $(".multiselect").closest(
                             ".formfield").removeClass("hiddenfield");
                         MT.doPopulateMultiselect(
-                            options.ajax_url_root,
-                            options.ajax_trigger_filter,
+                            options,
                             trigger_id,
-                            options.ich_template,
-                            options.ajax_for_field,
-                            included_id,
-                            options.use_latest
+                            included_id
                         );
                     }
                     else if (options.hide_without_trigger_value) {
@@ -108,14 +107,9 @@ var MT = (function (MT, $) {
                         $(".multiselect").closest(
                             ".formfield").removeClass("hiddenfield");
                         MT.doPopulateMultiselect(
-                            options.ajax_url_root,
-                            options.ajax_trigger_filter,
+                            options,
                             trigger_id,
-                            options.ich_template,
-                            options.ajax_for_field,
-                            included_id,
-                            options.included_sort_field,
-                            options.use_latest
+                            included_id
                         );
                     }
                     else if (options.hide_without_trigger_value) {
@@ -127,44 +121,157 @@ var MT = (function (MT, $) {
         }
     };
 
-    // cache for the ajax calls for multiselect items.
-    var cache = {};
-
     // any ajax requests currently in progress so we can abort them if
     // we want to start a new one.
     var current_xhrs = {};
 
-    // Use AJAX to get a set of items filtered by product_id
-    MT.doPopulateMultiselect = function (
-        ajax_url_root,
-        ajax_trigger_filter,
-        trigger_id,
-        ich_template,
-        ajax_for_field,
-        included_id,
-        included_sort_field,
-        use_latest) {
+    // the state of the available list: the url of its next page, and how to
+    // fetch and render it.
+    var available_state = {};
+
+    // Abort the ajax request for ``name``, if any.
+    var abortXhr = function (name) {
+        if (current_xhrs[name]) {
+            current_xhrs[name].abort();
+            delete current_xhrs[name];
+        }
+    };
+
+    var loadError = function (response) {
+        $(ich.message({
+            message: "Error loading data.  Please reload page or try again later.",
+            tags: "error"
+        })).appendTo($('#messages ul'));
+        $('#messages ul').messages();
+
+        console.error(response);
+    };
+
+    // Return the ids of the items in ``list``.
+    var itemIds = function (list) {
+        var ids = {};
+        list.find(".bulk-value").each(function () {
+            ids[$(this).val()] = true;
+        });
+        return ids;
+    };
+
+    // Fetch the next page of the available list, if there is one, and append
+    // the items on it that aren't already included.  Keeps fetching until
+    // the list scrolls, so there's always something to scroll to.
+    var fetchAvailable = function () {
+        var state = available_state,
+            available = $(".multiunselected").find(".select"),
+            included = $(".multiselected").find(".select");
+
+        if (!state.next || current_xhrs.available) {
+            return;
+        }
+        current_xhrs.available = $.ajax({
+            type: "GET",
+            url: state.next,
+            context: document.body,
+            beforeSend: function () {
+                available.loadingOverlay();
+            },
+            success: function (response) {
+                var ids = itemIds(included),
+                    items = state.ich_template({items: response.objects});
+                delete current_xhrs.available;
+                available.loadingOverlay("remove");
+                // skip items that have already been moved to included
+                available.append(items.filter(".selectitem").filter(
+                    function () {
+                        return !ids[$(this).find(".bulk-value").val()];
+                    }
+                ));
+                state.next = response.meta.next;
+                if (available.prop("scrollHeight") <= available.innerHeight()) {
+                    fetchAvailable();
+                }
+            },
+            error: function (response, textStatus) {
+                delete current_xhrs.available;
+                available.loadingOverlay("remove");
+                if (textStatus !== "abort") {
+                    loadError(response);
+                }
+            }
+        });
+    };
+
+    // Start the available list over from its first page, with the current
+    // values of the widget's filters.
+    var resetAvailable = function () {
+        var url = new URI(available_state.url),
+            available = $(".multiunselected").find(".select");
+
+        abortXhr("available");
+        $(".multiunselected .visual").find(":checked").each(function () {
+            url.addSearch($(this).attr("name"), $(this).val());
+        });
+        available.html("");
+        available_state.next = url.toString();
+        fetchAvailable();
+    };
+
+    // Fetch the included list a page at a time, appending each page as it
+    // comes in; saving the form is disabled until every page is in.
+    var fetchIncluded = function (url, ich_template) {
+        var included = $(".multiselected").find(".select");
+
+        current_xhrs.included = $.ajax({
+            type: "GET",
+            url: url,
+            context: document.body,
+            success: function (response) {
+                delete current_xhrs.included;
+                included.loadingOverlay("remove");
+                included.append(ich_template({items: response.objects}));
+                if (response.meta.next) {
+                    included.loadingOverlay();
+                    fetchIncluded(response.meta.next, ich_template);
+                }
+                else {
+                    $(".form-actions :input").prop("disabled", false);
+                }
+            },
+            error: function (response, textStatus) {
+                delete current_xhrs.included;
+                included.loadingOverlay("remove");
+                if (textStatus !== "abort") {
+                    // so that if the form is submitted when the ajax has
+                    // failed, we don't try to update the items list, only
+                    // update the other fields in the form.
+                    $(".multiselect").parent().find(":input").prop("disabled", true);
+                    loadError(response);
+                }
+            }
+        });
+    };
 
+    // Use AJAX to get the available and included items, filtered by
+    // ``trigger_id`` (usually a product id).  The available items are
+    // searched and filtered server-side by the widget's filters, and fetched
+    // a page at a time as the list is scrolled.
+    MT.doPopulateMultiselect = function (options, trigger_id, included_id) {
         var available = $(".multiunselected").find(".select"),
             included = $(".multiselected").find(".select"),
-            avail_url = new URI(ajax_url_root);
+            avail_url = new URI(options.ajax_url_root),
+            incl_url;
 
         // if there are currently doing any ajax fetches for items, abort them
         // so we can do this new one.
-        if (current_xhrs.include) {
-            current_xhrs.include.abort();
-        }
-        if (current_xhrs.available) {
-            current_xhrs.available.abort();
-        }
+        abortXhr("included");
+        abortXhr("available");
 
         if (trigger_id) {
             // we may not have a trigger_id if the form supports fetching
             // without it.  (like tags)
-            avail_url.addSearch(ajax_trigger_filter, trigger_id);
+            avail_url.addSearch(options.ajax_trigger_filter, trigger_id);
         }
 
-        if (use_latest) {
+        if (options.use_latest) {
             // get the ``latest`` case versions to display here
 
             // @@@ maybe we could check cookies here.  If productversion is
@@ -176,143 +283,55 @@ var MT = (function (MT, $) {
             // out, perhaps.
             avail_url.addSearch("latest", 1);
         }
-        var incl_url = new URI(avail_url.toString());
+        incl_url = new URI(avail_url.toString());
 
         if (included_id) {
-            avail_url.addSearch(ajax_for_field + "__ne", included_id);
-            incl_url.addSearch(ajax_for_field, included_id);
-            incl_url.addSearch("order_by", included_sort_field);
+            avail_url.addSearch(options.ajax_for_field + "__ne", included_id);
+            incl_url.addSearch(options.ajax_for_field, included_id);
+            incl_url.addSearch("order_by", options.included_sort_field);
         }
+        avail_url.addSearch("limit", options.available_page_size);
+        incl_url.addSearch("limit", options.included_page_size);
 
         if (available.length) {
-
-            if (cache[avail_url.toString()]) {
-                available.html(cache[avail_url.toString()]);
-                if (included_id) {
-                    // included_id means we're editing existing, not a new tag
-                    included.html(cache[incl_url.toString()]);
-                }
-                else {
-                    // if we switch products for a new case, we want to be sure
-                    // we empty the included section, so you don't include
-                    // cases from two different products
-                    included.html("");
-                }
+            if (included_id) {
+                // included_id means we're editing existing, not a new tag
+                included.html("");
+                included.loadingOverlay();
+                // disable saving form till the values are loaded.
+                $(".form-actions :input").prop("disabled", true);
+                fetchIncluded(incl_url.toString(), options.ich_template);
             }
             else {
-                // ajax fetch included first, then available
-
-                /*
-                  Had wanted to show when each list was complete.  This could
-                  be useful because the included list may often be shorter
-                  and the user could see it while waiting for the available
-                  list to load.
-
-                  However, I was not able to find a reliable way to disable
-                  drag and drop.  And if you drag from one list to another
-                  before the destination list is done loading, it will blow
-                  away the item you tracked to it.
-
-                  Disable attr didn't seem to work on article items.  There
-                  is a "draggable" property, but I couldn't find what would
-                  actually prevent the dragging.
-
-                 */
-                var avail_complete = false,
-                    incl_complete = false;
-
-                // set the items of the available and included lists
-                var setItems = function () {
-                    if (incl_complete && avail_complete) {
-                        included.loadingOverlay("remove");
-                        included.html(cache[incl_url.toString()]);
-                        available.loadingOverlay("remove");
-                        available.html(cache[avail_url.toString()]);
-                        $(".form-actions :input").prop("disabled", false);
-                    }
-                };
-
-                // fetch included
-                if (included_id) {
-                    current_xhrs.include = $.ajax({
-                        type: "GET",
-                        url: incl_url.toString(),
-                        context: document.body,
-                        beforeSend: function () {
-                            included.html("");
-                            included.loadingOverlay();
-                            // disable saving form till the values are loaded.
-                            $(".form-actions :input").prop("disabled", true);
-                        },
-                        success: function (response) {
-                            /*
-                             The included section comes in sorted by order they
-                             fall.
-                             remove the "Loading..." overlay once they're
-                             loaded up.
-                             */
-                            cache[incl_url.toString()] = ich_template(
-                                {items: response.objects});
-                            incl_complete = true;
-                            setItems();
-                        },
-                        error: function (response) {
-                            $(".multiselected").loadingOverlay("remove");
-
-                            // so that if the form is submitted when the ajax
-                            // has failed, we don't try to update the items
-                            // list, only update the other fields in the form.
-                            $(".multiselect").parent().find(":input").prop("disabled", true);
-                            $(ich.message({
-                                message: "Error loading data.  Please reload page or try again later.",
-                                tags: "error"
-                            })).appendTo($('#messages ul'));
-                            $('#messages ul').messages();
-
-                            console.error(response);
-                        },
-                        always: function () {
-                            delete current_xhrs.include;
-                        }
-                    });
-                }
-                else {
-                    // if there's no included_id, this in a new item, and
-                    // we just want it to be blank
-                    included.html("");
-                    incl_complete = true;
-                }
+                // if we switch products for a new case, we want to be sure
+                // we empty the included section, so you don't include
+                // cases from two different products
+                included.html("");
+            }
 
-                // fetch available items
-                current_xhrs.available = $.ajax({
-                    type: "GET",
-                    url: avail_url.toString(),
-                    context: document.body,
-                    beforeSend: function () {
-                        available.html("");
-                        available.loadingOverlay();
-                    },
-                    success: function (response) {
-                        /*
-                         remove the "Loading..." overlay once they're loaded
-                         up.
-                         */
-                        cache[avail_url.toString()] = ich_template(
-                            {items: response.objects});
-                        avail_complete = true;
-                        setItems();
-
-                    },
-                    error: function (response) {
-                        $(".multiunselected").loadingOverlay("remove");
-                        console.error(response);
-                    },
-                    always: function () {
-                        delete current_xhrs.include;
+            available_state = {
+                url: avail_url.toString(),
+                ich_template: options.ich_template
+            };
+            if (!available.data("multiselect-ajax")) {
+                available.data("multiselect-ajax", true);
+                // fetch the next page when scrolled to the bottom
+                available.scroll(function () {
+                    if (available.scrollTop() + available.innerHeight() >=
+                            available.prop("scrollHeight") - 50) {
+                        fetchAvailable();
                     }
                 });
-
+                // the widget's filters are applied server-side
+                $(".multiunselected .visual").on(
+                    "change",
+                    'input[type="checkbox"]',
+                    function () {
+                        resetAvailable();
+                    }
+                );
             }
+            resetAvailable();
         }
     };
 
@@ -15,3 +15,4 @@ from . import admin
 from . import api
 from . import view
 from .base import TestCase, DBTestCase, TransactionTestCase
+from .baselines import QueryBaselineTestCase
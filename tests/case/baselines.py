@@ -0,0 +1,162 @@
+"""
+Base TestCase for query-count regression baselines.
+
+``QueryBaselineTestCase.assertQueryBaseline`` runs an operation at several
+data sizes, recording the number of queries, the count of each query shape
+(see ``moztrap.debug.queries.fingerprint``) and the time taken at each size.
+It fails if the number of queries grows faster than linearly with data size,
+or exceeds the checked-in baseline for that size by more than ``threshold``.
+
+Times are recorded in the baseline file for reference but never compared,
+since they depend on the machine. Query shapes are only used to explain
+failures; their SQL varies with the database backend the baselines were
+recorded with.
+
+To record new baselines (e.g. after deliberately changing an operation's
+queries), run the tests with ``UPDATE_QUERY_BASELINES=1`` in the environment
+and commit the changed baseline file.
+
+"""
+import json
+import math
+import os
+import time
+
+from moztrap.debug.queries import QueryLog
+
+from .base import DBTestCase
+
+
+
+UPDATE_ENV = "UPDATE_QUERY_BASELINES"
+
+
+
+class QueryBaselineTestCase(DBTestCase):
+    """Test case comparing query counts of operations with a baseline file."""
+    # path of JSON file holding baselines
+    baseline_file = None
+    # data sizes each operation is measured at
+    sizes = [1, 5, 10]
+    # fraction a query count may exceed its baseline by
+    threshold = 0.1
+
+
+    def measure(self, setup, size):
+        """
+        Return (query count, shape counts, time in ms) of an operation.
+
+        ``setup`` is called with ``size`` to create data of that size; it
+        returns the operation (a callable taking no arguments) to measure.
+
+        """
+        operation = setup(size)
+        with QueryLog() as log:
+            start = time.time()
+            operation()
+            elapsed = time.time() - start
+        shapes = dict((fp, shape[0]) for fp, shape in log.shapes.items())
+        return log.count, shapes, elapsed * 1000
+
+
+    def assertQueryBaseline(self, name, setup, sizes=None):
+        """
+        Assert operation ``name`` is within its query baseline at all sizes.
+
+        See ``measure`` for ``setup``.
+
+        """
+        sizes = sorted(sizes or self.sizes)
+        measured = {}
+        for size in sizes:
+            count, shapes, ms = self.measure(setup, size)
+            measured[str(size)] = {
+                "queries": count,
+                "shapes": shapes,
+                "time_ms": round(ms, 1),
+                }
+
+        self.assertNotSuperLinear(
+            name, [(size, measured[str(size)]["queries"]) for size in sizes])
+
+        baselines = self.load_baselines()
+        if os.environ.get(UPDATE_ENV):
+            baselines[name] = measured
+            self.save_baselines(baselines)
+            return
+
+        if name not in baselines:
+            self.fail(
+                "No query baseline for {0}; run with {1}=1 to record "
+                "one.".format(name, UPDATE_ENV))
+        for size in sizes:
+            baseline = baselines[name].get(str(size))
+            if baseline is None:
+                self.fail(
+                    "No query baseline for {0} at size {1}; run with {2}=1 "
+                    "to record one.".format(name, size, UPDATE_ENV))
+            self.assertWithinBaseline(
+                "{0} at size {1}".format(name, size),
+                measured[str(size)],
+                baseline,
+                )
+
+
+    def assertNotSuperLinear(self, name, counts):
+        """
+        Assert query ``counts`` (list of (size, count)) grow at most linearly.
+
+        The queries added per unit of size between the two smallest sizes
+        sets the rate; between each pair of larger sizes the increase may
+        exceed that rate by ``threshold``, plus one query.
+
+        """
+        (size0, count0), (size1, count1) = counts[:2]
+        rate = float(count1 - count0) / (size1 - size0)
+        for (small, small_count), (big, big_count) in zip(counts, counts[1:]):
+            allowed = max(rate, 0) * (big - small) * (1 + self.threshold) + 1
+            if big_count - small_count > allowed:
+                self.fail(
+                    "Queries of {0} grow super-linearly: {1}.".format(
+                        name,
+                        ", ".join(
+                            "{0} at size {1}".format(c, s) for s, c in counts),
+                        )
+                    )
+
+
+    def assertWithinBaseline(self, name, measured, baseline):
+        """Assert ``measured`` queries are within ``threshold`` of baseline."""
+        allowed = int(math.floor(baseline["queries"] * (1 + self.threshold)))
+        if measured["queries"] <= allowed:
+            return
+        grown = []
+        for fp, count in sorted(measured["shapes"].items()):
+            before = baseline["shapes"].get(fp, 0)
+            if count > before:
+                grown.append("{0} -> {1} x {2}".format(before, count, fp))
+        self.fail(
+            "{0} ran {1} queries, baseline is {2}. Query shapes that "
+            "increased:\n{3}".format(
+                name,
+                measured["queries"],
+                baseline["queries"],
+                "\n".join(grown),
+                )
+            )
+
+
+    def load_baselines(self):
+        """Return dictionary of baselines from ``baseline_file``."""
+        try:
+            with open(self.baseline_file) as f:
+                return json.load(f)
+        except IOError:
+            return {}
+
+
+    def save_baselines(self, baselines):
+        """Write dictionary of ``baselines`` to ``baseline_file``."""
+        with open(self.baseline_file, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
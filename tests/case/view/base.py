@@ -307,6 +307,27 @@ class ListFinderTests(object):
             )
 
 
+    def test_finder_ajax_not_modified(self):
+        """Finder ajax responses have ETags; unchanged columns get a 304."""
+        pv = self.F.ProductVersionFactory.create(version="1.0.1")
+        params = {
+            "finder": "1",
+            "col": "productversions",
+            "id": str(pv.product.id),
+            }
+        ajax = {"X-Requested-With": "XMLHttpRequest"}
+
+        etag = self.get(params=params, headers=ajax).headers["ETag"]
+        ajax["If-None-Match"] = etag
+
+        self.get(params=params, headers=ajax, status=304)
+
+        self.F.ProductVersionFactory.create(product=pv.product)
+        res = self.get(params=params, headers=ajax, status=200)
+
+        self.assertNotEqual(res.headers["ETag"], etag)
+
+
 
 class NoCacheTest(object):
     """Test that a given view marks it's responses as uncacheable."""
@@ -0,0 +1,144 @@
+"""
+Tests for hot-path benchmarks.
+
+"""
+from mock import patch
+
+from tests import case
+
+
+
+class BenchmarksTest(case.DBTestCase):
+    """Runs each benchmark once against a tiny generated data set."""
+    def setUp(self):
+        super(BenchmarksTest, self).setUp()
+        from moztrap.model.synthetic import Generator, SCALES
+        Generator(SCALES["tiny"]).generate()
+        # closing connections would roll back the test's transaction
+        patcher = patch(
+            "moztrap.debug.benchmarks.finish_request", lambda: None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+    @property
+    def benchmarks(self):
+        """The module under test."""
+        from moztrap.debug import benchmarks
+        return benchmarks
+
+
+    def test_all(self):
+        """All benchmarks run, reporting times and query counts."""
+        results = self.benchmarks.run(repeat=2)
+
+        self.assertEqual(
+            set(results["benchmarks"]),
+            set(b.__name__ for b in self.benchmarks.BENCHMARKS),
+            )
+        self.assertResults(results)
+
+
+    def test_run_by_name(self):
+        """Can run just the named benchmarks."""
+        results = self.benchmarks.run(["case_list", "api_list"], repeat=2)
+
+        self.assertEqual(
+            set(results["benchmarks"]), set(["case_list", "api_list"]))
+        self.assertResults(results)
+
+
+    def assertResults(self, results):
+        """Assert each benchmark's results are plausible."""
+        for name, result in results["benchmarks"].items():
+            if "skipped" in result:
+                continue
+            self.assertEqual(len(result["times_ms"]), 2, name)
+            self.assertGreater(result["per_second"], 0, name)
+            if name == "filter_urls":
+                self.assertEqual(result["queries"], 0)
+            else:
+                self.assertGreater(result["queries"], 0, name)
+            self.assertLessEqual(result["min_ms"], result["median_ms"], name)
+        self.assertEqual(results["counts"]["Product"], 1)
+
+
+    def test_cleans_up(self):
+        """Benchmarks that create data delete it again."""
+        self.benchmarks.run(
+            ["run_activation", "case_import", "productversion_clone"])
+
+        self.assertEqual(self.model.Run.everything.count(), 4)
+        self.assertEqual(self.model.CaseVersion.everything.count(), 20)
+        self.assertEqual(self.model.ProductVersion.everything.count(), 2)
+
+
+    def test_unknown(self):
+        """Asking for an unknown benchmark is an error."""
+        with self.assertRaises(self.benchmarks.BenchmarkError):
+            self.benchmarks.run(["nonexistent"])
+
+
+    def test_no_data(self):
+        """Benchmarks needing data raise BenchmarkError without it."""
+        self.model.ProductVersion.everything.all().delete(permanent=True)
+
+        with self.assertRaises(self.benchmarks.BenchmarkError):
+            self.benchmarks.run(["case_list"])
+
+
+    def test_ajax(self):
+        """Ajax benchmarks report requests per second."""
+        results = self.benchmarks.run(["ajax_unpooled"], repeat=1)
+
+        result = results["benchmarks"]["ajax_unpooled"]
+        self.assertEqual(result["operations"], self.benchmarks.AJAX_REQUESTS)
+
+
+    def test_ajax_cleans_up(self):
+        """Ajax benchmarks pass tests in their own run, deleted afterwards."""
+        runs = self.model.Run.everything.count()
+        results = self.model.Result.everything.count()
+
+        # keep the benchmark user, so its results aren't deleted with it
+        with patch.object(self.benchmarks.Bench, "cleanup"):
+            self.benchmarks.run(["ajax_unpooled"], repeat=2)
+
+        self.assertEqual(self.model.Run.everything.count(), runs)
+        self.assertEqual(self.model.Result.everything.count(), results)
+
+
+    def test_deletes_user(self):
+        """The superuser benchmarks run as is deleted afterwards."""
+        users = self.model.User.objects.count()
+
+        self.benchmarks.run(["case_list"], repeat=1)
+
+        self.assertEqual(self.model.User.objects.count(), users)
+        self.assertFalse(
+            self.model.User.objects.filter(
+                username__startswith="benchmark-").exists())
+
+
+    def test_not_generated(self):
+        """Won't run against data not from generate_data."""
+        self.model.User.objects.filter(username="synthetic-tester").delete()
+
+        with self.assertRaises(self.benchmarks.BenchmarkError):
+            self.benchmarks.run(["case_list"])
+
+
+    def test_force(self):
+        """Runs against data not from generate_data if forced."""
+        self.model.User.objects.filter(username="synthetic-tester").delete()
+
+        results = self.benchmarks.run(["case_list"], repeat=1, force=True)
+
+        self.assertIn("times_ms", results["benchmarks"]["case_list"])
+
+
+    def test_skipped(self):
+        """The pooled benchmark is skipped if the ENGINE isn't pooled."""
+        results = self.benchmarks.run(["ajax_pooled"], repeat=1)
+
+        self.assertIn("skipped", results["benchmarks"]["ajax_pooled"])
@@ -55,3 +55,153 @@ class AjaxTracebackMiddlewareTest(case.TestCase):
         request.is_ajax.return_value = False
 
         self.assertIs(m.process_exception(request), None)
+
+
+
+class QueryCountMiddlewareTest(case.DBTestCase):
+    @property
+    def middleware(self):
+        from moztrap.debug.middleware import QueryCountMiddleware
+        return QueryCountMiddleware
+
+
+    def request(self):
+        """Return a request for the manage products page."""
+        from django.test import RequestFactory
+        return RequestFactory().get("/manage/products/")
+
+
+    def process(self, middleware, request, queries):
+        """Process ``request``, running ``queries`` in the "view"."""
+        def view(request):
+            for i in range(queries):
+                list(self.model.Product.objects.filter(pk=i))
+        middleware.process_request(request)
+        middleware.process_view(request, view, (), {})
+        view(request)
+        with patch("moztrap.debug.middleware.logger") as logger:
+            middleware.process_response(request, Mock())
+        return logger
+
+
+    @override_settings(QUERY_LOG_SAMPLE_RATE=0)
+    def test_not_used_when_not_sampling(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            self.middleware()
+
+
+    @override_settings(QUERY_LOG_SAMPLE_RATE=1)
+    def test_logs_count(self):
+        """Logs view name and query count."""
+        logger = self.process(self.middleware(), self.request(), 2)
+
+        args = logger.info.call_args[0]
+        self.assertEqual(args[0], "%s %s: %s queries in %.1f ms")
+        self.assertEqual(
+            args[1:4],
+            (
+                "tests.debug.test_middleware.view",
+                "/manage/products/",
+                2,
+                ),
+            )
+        self.assertFalse(logger.warning.called)
+
+
+    @override_settings(QUERY_LOG_SAMPLE_RATE=0.5)
+    def test_sampled(self):
+        """Requests not in the sample aren't logged."""
+        with patch("random.random", lambda: 0.6):
+            logger = self.process(self.middleware(), self.request(), 2)
+
+        self.assertFalse(logger.info.called)
+
+
+    @override_settings(QUERY_LOG_SAMPLE_RATE=1, QUERY_LOG_REPEAT_THRESHOLD=3)
+    def test_repeated(self):
+        """Warns of queries repeated at least the threshold number of times."""
+        logger = self.process(self.middleware(), self.request(), 3)
+
+        args = logger.warning.call_args[0]
+        self.assertEqual(args[0], "%s: query repeated %s times (%.1f ms): %s")
+        self.assertEqual(args[2], 3)
+
+
+    @override_settings(
+        QUERY_LOG_SAMPLE_RATE=1, QUERY_BUDGETS={"manage_products": 1})
+    def test_over_budget(self):
+        """Warns of views over their query budget."""
+        logger = self.process(self.middleware(), self.request(), 2)
+
+        logger.warning.assert_called_with(
+            "%s: %s queries, over budget of %s",
+            "tests.debug.test_middleware.view",
+            2,
+            1,
+            )
+
+
+
+class ProfileMiddlewareTest(case.TestCase):
+    @property
+    def middleware(self):
+        from moztrap.debug.middleware import ProfileMiddleware
+        return ProfileMiddleware
+
+
+    @override_settings(PROFILE_SPOOL_DIR=None)
+    def test_not_used_without_spool(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            self.middleware()
+
+
+    @override_settings(PROFILE_SPOOL_DIR="/tmp/profiles")
+    def test_profiles_requested(self):
+        """Requests asking for profiling are captured around the view."""
+        request, view, response = Mock(), Mock(), Mock()
+        m = self.middleware()
+        with patch("moztrap.debug.profiling.requested", lambda r: True):
+            with patch("moztrap.debug.profiling.Capture") as Capture:
+                self.assertIs(m.process_view(request, view, (1,), {}), None)
+                result = m.process_response(request, response)
+
+        Capture.assert_called_with(request, view)
+        capture = Capture.return_value
+        self.assertTrue(capture.start.called)
+        capture.save.assert_called_with(response)
+        self.assertIs(result, capture.save.return_value)
+
+
+    @override_settings(PROFILE_SPOOL_DIR="/tmp/profiles")
+    def test_view_exception(self):
+        """
+        A view exception stops the capture, but is left to other middleware.
+
+        The view is called by Django rather than the middleware, so exception
+        middleware (e.g. rolling back the transaction) still runs, and the
+        error response is profiled.
+
+        """
+        request, view, response = Mock(), Mock(), Mock()
+        m = self.middleware()
+        with patch("moztrap.debug.profiling.requested", lambda r: True):
+            with patch("moztrap.debug.profiling.Capture") as Capture:
+                m.process_view(request, view, (), {})
+                self.assertIs(m.process_exception(request, ValueError()), None)
+                m.process_response(request, response)
+
+        capture = Capture.return_value
+        self.assertTrue(capture.stop.called)
+        capture.save.assert_called_with(response)
+
+
+    @override_settings(PROFILE_SPOOL_DIR="/tmp/profiles")
+    def test_not_requested(self):
+        """Other requests are left alone."""
+        with patch("moztrap.debug.profiling.requested", lambda r: False):
+            m = self.middleware()
+            request, response = Mock(spec=[]), Mock()
+            self.assertIs(m.process_view(request, Mock(), (), {}), None)
+            result = m.process_response(request, response)
+
+        self.assertIs(result, response)
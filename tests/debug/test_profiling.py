@@ -0,0 +1,258 @@
+"""
+Tests for request profiling.
+
+"""
+import os
+import shutil
+import tempfile
+
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from mock import Mock
+
+from tests import case
+
+
+
+class SpoolTestMixin(object):
+    """Run each test with a fresh temporary spool directory."""
+    def setUp(self):
+        super(SpoolTestMixin, self).setUp()
+        self.spool = tempfile.mkdtemp()
+        self.override = override_settings(PROFILE_SPOOL_DIR=self.spool)
+        self.override.enable()
+
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.spool)
+        super(SpoolTestMixin, self).tearDown()
+
+
+    @property
+    def profiling(self):
+        """The module under test."""
+        from moztrap.debug import profiling
+        return profiling
+
+
+    def capture(self, **details):
+        """Save a capture of a profile of a trivial function; return id."""
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.runcall(sorted, [3, 2, 1])
+        details.setdefault("queries", [])
+        return self.profiling.save(profiler, details)
+
+
+
+class RequestedTest(case.TestCase):
+    """Tests for which requests are profiled."""
+    @property
+    def requested(self):
+        """The function under test."""
+        from moztrap.debug.profiling import requested
+        return requested
+
+
+    def request(self, path="/", staff=False, **extra):
+        """Return a GET request for ``path`` by a user."""
+        request = RequestFactory().get(path, **extra)
+        request.user = Mock()
+        request.user.is_active = True
+        request.user.is_staff = staff
+        return request
+
+
+    def test_staff_with_param(self):
+        """Staff users can ask for profiling with a query parameter."""
+        self.assertTrue(self.requested(self.request("/?_profile", True)))
+
+
+    def test_staff_without_param(self):
+        """Staff requests without the query parameter aren't profiled."""
+        self.assertFalse(self.requested(self.request("/", True)))
+
+
+    def test_non_staff_with_param(self):
+        """Non-staff users can't ask for profiling with a query parameter."""
+        self.assertFalse(self.requested(self.request("/?_profile")))
+
+
+    @override_settings(PROFILE_SECRET="sekrit")
+    def test_secret_header(self):
+        """Anyone with a header matching the secret is profiled."""
+        self.assertTrue(
+            self.requested(
+                self.request(HTTP_X_MOZTRAP_PROFILE="sekrit")))
+
+
+    @override_settings(PROFILE_SECRET="sekrit")
+    def test_wrong_secret_header(self):
+        """A header not matching the secret doesn't trigger profiling."""
+        self.assertFalse(
+            self.requested(
+                self.request(HTTP_X_MOZTRAP_PROFILE="wrong")))
+
+
+    @override_settings(PROFILE_SECRET="")
+    def test_no_secret(self):
+        """With no secret set, no header triggers profiling."""
+        self.assertFalse(
+            self.requested(
+                self.request(HTTP_X_MOZTRAP_PROFILE="")))
+
+
+
+class CaptureTest(SpoolTestMixin, case.DBTestCase):
+    """Tests for Capture."""
+    def request(self):
+        """Return a request from user "someone"."""
+        request = RequestFactory().get("/some/path/?_profile")
+        request.user = Mock()
+        request.user.is_authenticated.return_value = True
+        request.user.username = "someone"
+        return request
+
+
+    def test_spools(self):
+        """Profile and query log of the view are spooled."""
+        def view(request):
+            list(self.model.Product.objects.all())
+            return HttpResponse("ok")
+
+        request = self.request()
+        capture = self.profiling.Capture(request, view)
+        capture.start()
+        response = capture.save(view(request))
+
+        self.assertEqual(response.content, "ok")
+        profile_id = response["X-MozTrap-Profile-Id"]
+        details = self.profiling.load(profile_id)
+        self.assertEqual(details["path"], "/some/path/?_profile")
+        self.assertEqual(details["view"], "tests.debug.test_profiling.view")
+        self.assertEqual(details["user"], "someone")
+        self.assertEqual(details["status"], 200)
+        self.assertEqual(details["query_count"], 1)
+        self.assertIn('FROM "core_product"', details["queries"][0]["sql"])
+        self.assertTrue(
+            os.path.exists(os.path.join(self.spool, profile_id + ".prof")))
+
+
+    def test_stopped(self):
+        """Queries after the capture is stopped aren't recorded."""
+        def view(request):
+            list(self.model.Product.objects.all())
+            return HttpResponse("ok")
+
+        request = self.request()
+        capture = self.profiling.Capture(request, view)
+        capture.start()
+        view(request)
+        capture.stop()
+        response = capture.save(view(request))
+
+        details = self.profiling.load(response["X-MozTrap-Profile-Id"])
+        self.assertEqual(details["query_count"], 1)
+
+
+    def test_error_status(self):
+        """The status of an error response is recorded."""
+        capture = self.profiling.Capture(self.request(), Mock())
+        capture.start()
+        capture.stop()
+        response = capture.save(HttpResponse(status=500))
+
+        details = self.profiling.load(response["X-MozTrap-Profile-Id"])
+        self.assertEqual(details["status"], 500)
+
+
+
+class ProfiledRequestTest(SpoolTestMixin, case.DBTestCase):
+    """Tests for requests profiled through the full middleware stack."""
+    def test_profiled(self):
+        """A request with the secret header is profiled, view and all."""
+        from django.test.client import Client
+        with override_settings(PROFILE_SECRET="sekrit"):
+            response = Client().get(
+                "/manage/products/", HTTP_X_MOZTRAP_PROFILE="sekrit")
+
+        details = self.profiling.load(response["X-MozTrap-Profile-Id"])
+        self.assertEqual(details["path"], "/manage/products/")
+        self.assertEqual(details["status"], 302)
+
+
+
+class CapturesTest(SpoolTestMixin, case.TestCase):
+    """Tests for listing, loading and pruning spooled captures."""
+    def test_captures(self):
+        """Lists captures newest first, without their queries."""
+        first = self.capture(path="/first/")
+        second = self.capture(path="/second/")
+
+        captures = self.profiling.captures()
+
+        self.assertEqual(
+            sorted([c["id"] for c in captures], reverse=True),
+            [c["id"] for c in captures],
+            )
+        self.assertEqual(
+            set([c["id"] for c in captures]), set([first, second]))
+        self.assertNotIn("queries", captures[0])
+
+
+    def test_no_spool(self):
+        """With no spool directory, there are no captures."""
+        with override_settings(PROFILE_SPOOL_DIR=None):
+            self.assertEqual(self.profiling.captures(), [])
+
+
+    def test_prune(self):
+        """Only the newest PROFILE_SPOOL_MAX captures are kept."""
+        with override_settings(PROFILE_SPOOL_MAX=2):
+            ids = [self.capture() for i in range(3)]
+
+        kept = [c["id"] for c in self.profiling.captures()]
+        self.assertEqual(len(kept), 2)
+        self.assertEqual(len(os.listdir(self.spool)), 4)
+        self.assertEqual(set(kept), set(sorted(ids)[1:]))
+
+
+    def test_load_missing(self):
+        """Loading a missing capture raises ProfileNotFound."""
+        with self.assertRaises(self.profiling.ProfileNotFound):
+            self.profiling.load("nonexistent")
+
+
+    def test_bad_id(self):
+        """Ids that aren't plain names are rejected."""
+        with self.assertRaises(self.profiling.ProfileNotFound):
+            self.profiling.load("../etc/passwd")
+
+
+
+class TopTest(SpoolTestMixin, case.TestCase):
+    """Tests for call tables."""
+    def test_cumulative(self):
+        """Returns top functions by cumulative time."""
+        profile_id = self.capture()
+
+        rows = self.profiling.top(profile_id, 10)
+
+        self.assertTrue(any("sorted" in r["function"] for r in rows))
+        cumtimes = [r["cumtime"] for r in rows]
+        self.assertEqual(cumtimes, sorted(cumtimes, reverse=True))
+
+
+    def test_limit(self):
+        """Returns at most ``limit`` functions."""
+        profile_id = self.capture()
+
+        self.assertEqual(len(self.profiling.top(profile_id, 1, "calls")), 1)
+
+
+    def test_missing(self):
+        """Missing profile raises ProfileNotFound."""
+        with self.assertRaises(self.profiling.ProfileNotFound):
+            self.profiling.top("nonexistent", 10)
@@ -0,0 +1,154 @@
+"""
+Tests for SQL query counting and fingerprinting.
+
+"""
+from django.test.utils import override_settings
+
+from tests import case
+
+
+
+class FingerprintTest(case.TestCase):
+    """Tests for fingerprint."""
+    @property
+    def fingerprint(self):
+        """The function under test."""
+        from moztrap.debug.queries import fingerprint
+        return fingerprint
+
+
+    def test_literals(self):
+        """String and number literals are replaced."""
+        self.assertEqual(
+            self.fingerprint("SELECT a FROM t WHERE b = 'x''y' AND c = 1.5"),
+            "SELECT a FROM t WHERE b = ? AND c = ?",
+            )
+
+
+    def test_lists(self):
+        """Lists of placeholders are collapsed."""
+        self.assertEqual(
+            self.fingerprint("SELECT a FROM t WHERE b IN (%s, %s, %s)"),
+            self.fingerprint("SELECT a FROM t WHERE b IN (1,2)"),
+            )
+
+
+    def test_whitespace(self):
+        """Whitespace is normalized."""
+        self.assertEqual(
+            self.fingerprint("SELECT a\n    FROM t  "), "SELECT a FROM t")
+
+
+
+class QueryLogTest(case.DBTestCase):
+    """Tests for QueryLog."""
+    @property
+    def QueryLog(self):
+        """The class under test."""
+        from moztrap.debug.queries import QueryLog
+        return QueryLog
+
+
+    def test_count(self):
+        """Counts and times queries run while active."""
+        with self.QueryLog() as log:
+            list(self.model.Product.objects.all())
+            list(self.model.Product.objects.all())
+
+        self.assertEqual(log.count, 2)
+        self.assertGreaterEqual(log.time, 0)
+
+
+    def test_stopped(self):
+        """Queries after the log stops aren't counted."""
+        with self.QueryLog() as log:
+            pass
+        list(self.model.Product.objects.all())
+
+        self.assertEqual(log.count, 0)
+
+
+    def test_nested(self):
+        """Nested logs both record queries."""
+        with self.QueryLog() as outer:
+            list(self.model.Product.objects.all())
+            with self.QueryLog() as inner:
+                list(self.model.Product.objects.all())
+
+        self.assertEqual((outer.count, inner.count), (2, 1))
+
+
+    def test_repeated(self):
+        """Repeated query shapes (N+1 patterns) are reported."""
+        products = [self.F.ProductFactory.create() for i in range(3)]
+
+        with self.QueryLog() as log:
+            list(self.model.Tag.objects.all())
+            for p in products:
+                self.model.Product.objects.get(pk=p.pk)
+
+        repeated = log.repeated()
+        self.assertEqual(len(repeated), 1)
+        fp, count, total, sql = repeated[0]
+        self.assertEqual(count, 3)
+        self.assertIn('FROM "core_product"', fp)
+
+
+    def test_repeated_threshold(self):
+        """Only shapes repeated at least ``threshold`` times are reported."""
+        with self.QueryLog() as log:
+            list(self.model.Product.objects.all())
+            list(self.model.Product.objects.all())
+
+        self.assertEqual(len(log.repeated(3)), 0)
+
+
+    def test_statements(self):
+        """Keeps each statement, in order, only if asked to."""
+        with self.QueryLog(statements=True) as log:
+            list(self.model.Product.objects.all())
+            list(self.model.Tag.objects.all())
+        with self.QueryLog() as plain:
+            list(self.model.Product.objects.all())
+
+        self.assertEqual(len(log.statements), 2)
+        self.assertIn('FROM "core_product"', log.statements[0][0])
+        self.assertIn('FROM "tags_tag"', log.statements[1][0])
+        self.assertIs(plain.statements, None)
+
+
+
+class QueryBudgetTest(case.DBTestCase):
+    """Tests for query_budget."""
+    @property
+    def query_budget(self):
+        """The context manager under test."""
+        from moztrap.debug.queries import query_budget
+        return query_budget
+
+
+    def test_within(self):
+        """Nothing happens if the budget isn't exceeded."""
+        with self.query_budget(1):
+            list(self.model.Product.objects.all())
+
+
+    def test_exceeded(self):
+        """Exceeding the budget fails, listing repeated queries."""
+        from moztrap.debug.queries import QueryBudgetExceeded
+
+        with self.assertRaises(QueryBudgetExceeded) as cm:
+            with self.query_budget(1):
+                list(self.model.Product.objects.all())
+                list(self.model.Product.objects.all())
+
+        self.assertTrue(
+            str(cm.exception).startswith("2 queries run, budget is 1.\n2 x "))
+
+
+    @override_settings(QUERY_BUDGETS={"some_view": 0})
+    def test_named(self):
+        """A budget can be looked up by URL name."""
+        with self.assertRaises(AssertionError):
+            with self.query_budget("some_view"):
+                list(self.model.Product.objects.all())
@@ -0,0 +1,121 @@
+"""
+Tests for debug views.
+
+"""
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.urlresolvers import reverse
+
+import mock
+
+from tests import case
+
+
+
+class ProfileViewsTest(case.view.WebTest):
+    """Tests for the profile list, details and download views."""
+    def setUp(self):
+        super(ProfileViewsTest, self).setUp()
+        self.spool = tempfile.mkdtemp()
+        self.override = mock.patch.object(
+            settings, "PROFILE_SPOOL_DIR", self.spool)
+        self.override.start()
+        self.staff = self.F.UserFactory.create(is_staff=True)
+
+
+    def tearDown(self):
+        self.override.stop()
+        shutil.rmtree(self.spool)
+        super(ProfileViewsTest, self).tearDown()
+
+
+    def capture(self):
+        """Save a capture of a profile of a trivial function; return id."""
+        import cProfile
+        from moztrap.debug import profiling
+        profiler = cProfile.Profile()
+        profiler.runcall(sorted, [3, 2, 1])
+        return profiling.save(
+            profiler,
+            {
+                "path": "/some/path/",
+                "method": "GET",
+                "view": "some.view",
+                "user": None,
+                "status": 200,
+                "started": "2012-01-01T00:00:00",
+                "time": 12.5,
+                "query_count": 1,
+                "query_time": 0.5,
+                "queries": [{"sql": "SELECT 1", "time": 0.5}],
+                },
+            )
+
+
+    def test_list(self):
+        """Staff can list captured profiles."""
+        profile_id = self.capture()
+
+        res = self.app.get(reverse("debug_profiles"), user=self.staff)
+
+        res.mustcontain("/some/path/")
+        res.mustcontain(
+            reverse("debug_profile_details", kwargs={"profile_id": profile_id}))
+
+
+    def test_list_requires_staff(self):
+        """Non-staff users don't get the profile list."""
+        self.capture()
+        user = self.F.UserFactory.create()
+
+        res = self.app.get(reverse("debug_profiles"), user=user, status=302)
+
+        self.assertEqual(res.headers["Location"], "http://localhost:80/")
+
+
+    def test_details(self):
+        """Staff can see a profile's call table and queries."""
+        profile_id = self.capture()
+
+        res = self.app.get(
+            reverse("debug_profile_details", kwargs={"profile_id": profile_id}),
+            params={"sort": "tottime", "limit": "5"},
+            user=self.staff,
+            )
+
+        res.mustcontain("Top 5 functions by tottime")
+        res.mustcontain("sorted")
+        res.mustcontain("SELECT 1")
+
+
+    def test_details_missing(self):
+        """Details of a missing profile is 404."""
+        self.app.get(
+            reverse("debug_profile_details", kwargs={"profile_id": "nope"}),
+            user=self.staff,
+            status=404,
+            )
+
+
+    def test_download(self):
+        """Staff can download a profile in pstats format."""
+        profile_id = self.capture()
+
+        res = self.app.get(
+            reverse(
+                "debug_profile_download", kwargs={"profile_id": profile_id}),
+            user=self.staff,
+            )
+
+        self.assertEqual(res.content_type, "application/octet-stream")
+        with open("%s/%s.prof" % (self.spool, profile_id), "rb") as f:
+            self.assertEqual(res.body, f.read())
+
+
+    def test_disabled(self):
+        """With no spool directory, the views are 404."""
+        with mock.patch.object(settings, "PROFILE_SPOOL_DIR", None):
+            self.app.get(
+                reverse("debug_profiles"), user=self.staff, status=404)
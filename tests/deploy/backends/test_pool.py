@@ -0,0 +1,135 @@
+"""
+Tests for pooled database connections.
+
+"""
+import os
+import tempfile
+
+from tests import case
+
+
+
+class PooledDatabaseWrapperTest(case.TestCase):
+    """Tests of pooling with the SQLite pooled backend, on a file database."""
+    def setUp(self):
+        """Create an empty database file."""
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+        self.alias = "pooltest-%s" % id(self)
+        self.addCleanup(self.clear_pool)
+
+
+    def clear_pool(self):
+        """Close and forget the pool of the test database."""
+        from moztrap.deploy.backends import pool
+        pool._pools.pop(self.alias).clear()
+
+
+    def wrapper(self, **settings):
+        """Return a pooled wrapper for the test database."""
+        from moztrap.deploy.backends.sqlite3.base import DatabaseWrapper
+        settings_dict = {
+            "ENGINE": "moztrap.deploy.backends.sqlite3",
+            "NAME": self.path,
+            "OPTIONS": {},
+            "TIME_ZONE": None,
+            }
+        settings_dict.update(settings)
+        return DatabaseWrapper(settings_dict, alias=self.alias)
+
+
+    def test_reuse(self):
+        """A closed connection is reused by the next wrapper (i.e. thread)."""
+        db = self.wrapper()
+        db._cursor()
+        raw = db.connection
+        db.close()
+        other = self.wrapper()
+        other._cursor()
+
+        self.assertIs(other.connection, raw)
+        self.assertEqual(len(db.pool), 0)
+
+
+    def test_reuse_same(self):
+        """The same wrapper gets its connection back after closing it."""
+        db = self.wrapper()
+        db._cursor()
+        raw = db.connection
+        db.close()
+        db._cursor()
+
+        self.assertIs(db.connection, raw)
+
+
+    def test_size(self):
+        """No more than POOL_SIZE connections are kept."""
+        dbs = [self.wrapper(POOL_SIZE=1) for i in range(2)]
+        for db in dbs:
+            db._cursor()
+        for db in dbs:
+            db.close()
+
+        self.assertEqual(len(dbs[0].pool), 1)
+
+
+    def test_size_zero(self):
+        """POOL_SIZE 0 turns pooling off."""
+        db = self.wrapper(POOL_SIZE=0)
+        db._cursor()
+        raw = db.connection
+        db.close()
+        db._cursor()
+
+        self.assertIsNot(db.connection, raw)
+
+
+    def test_max_age(self):
+        """Connections older than POOL_MAX_AGE aren't reused."""
+        db = self.wrapper(POOL_MAX_AGE=-1)
+        db._cursor()
+        raw = db.connection
+        db.close()
+        db._cursor()
+
+        self.assertIsNot(db.connection, raw)
+
+
+    def test_health_check(self):
+        """A pooled connection that can't run queries is discarded."""
+        db = self.wrapper()
+        db._cursor()
+        raw = db.connection
+        db.close()
+        raw.close()
+        cursor = db._cursor()
+
+        self.assertIsNot(db.connection, raw)
+        cursor.execute("SELECT 1")
+        self.assertEqual(len(db.pool), 0)
+
+
+    def test_rollback(self):
+        """Uncommitted changes are rolled back when a connection is pooled."""
+        db = self.wrapper()
+        cursor = db._cursor()
+        cursor.execute("CREATE TABLE t (x integer)")
+        db.connection.commit()
+        cursor.execute("INSERT INTO t VALUES (1)")
+        db.close()
+        cursor = db._cursor()
+        cursor.execute("SELECT count(*) FROM t")
+
+        self.assertEqual(cursor.fetchone()[0], 0)
+
+
+    def test_memory(self):
+        """Closing an in-memory database is ignored, as it would destroy it."""
+        db = self.wrapper(NAME=":memory:")
+        db._cursor()
+        raw = db.connection
+        db.close()
+
+        self.assertIs(db.connection, raw)
+        self.assertEqual(len(db.pool), 0)
@@ -0,0 +1,192 @@
+"""
+Tests for the read-replica database router.
+
+"""
+import os
+import tempfile
+
+from django.core.management.color import no_style
+from django.db import connections, DEFAULT_DB_ALIAS
+
+from tests import case
+
+
+
+class ReplicaRouterTest(case.TestCase):
+    """Tests for ReplicaRouter."""
+    @property
+    def routers(self):
+        """The module under test."""
+        from moztrap.deploy import routers
+        return routers
+
+
+    def setUp(self):
+        """Start reading from the primary."""
+        self.routers.reset()
+        self.router = self.routers.ReplicaRouter()
+
+
+    def tearDown(self):
+        """Leave reads going to the primary."""
+        self.routers.reset()
+
+
+    def test_read_primary(self):
+        """By default, reads go to the primary."""
+        from moztrap.model import Product
+        self.assertEqual(self.router.db_for_read(Product), DEFAULT_DB_ALIAS)
+
+
+    def test_read_replica(self):
+        """Within replica_reads, reads go to the replica."""
+        from moztrap.model import Product
+        with self.routers.replica_reads("replica"):
+            self.assertEqual(self.router.db_for_read(Product), "replica")
+
+        self.assertEqual(self.router.db_for_read(Product), DEFAULT_DB_ALIAS)
+
+
+    def test_primary_apps(self):
+        """Reads of sessions always go to the primary."""
+        from django.contrib.sessions.models import Session
+        with self.routers.replica_reads("replica"):
+            self.assertEqual(
+                self.router.db_for_read(Session), DEFAULT_DB_ALIAS)
+
+
+    def test_write_primary(self):
+        """Writes go to the primary."""
+        from moztrap.model import Product
+        with self.routers.replica_reads("replica"):
+            self.assertEqual(
+                self.router.db_for_write(Product), DEFAULT_DB_ALIAS)
+
+
+    def test_write_pins_primary(self):
+        """After a write, reads go to the primary."""
+        from moztrap.model import Product
+        with self.routers.replica_reads("replica"):
+            self.router.db_for_write(Product)
+            self.assertEqual(self.router.db_for_read(Product), DEFAULT_DB_ALIAS)
+
+
+    def test_reset(self):
+        """reset() returns whether there were writes, and forgets them."""
+        from moztrap.model import Product
+        self.assertFalse(self.routers.reset())
+        self.router.db_for_write(Product)
+
+        self.assertTrue(self.routers.reset())
+        self.assertFalse(self.routers.reset())
+
+
+    def test_replica_epoch(self):
+        """replica_epoch() is None when reading from the primary."""
+        self.assertIs(self.routers.replica_epoch(), None)
+        with self.routers.replica_reads("replica"):
+            self.assertIsInstance(self.routers.replica_epoch(), int)
+
+
+    def test_allow_syncdb(self):
+        """Tables are only created on the primary."""
+        from moztrap.model import Product
+        self.assertTrue(self.router.allow_syncdb(DEFAULT_DB_ALIAS, Product))
+        self.assertFalse(self.router.allow_syncdb("replica", Product))
+
+
+
+class ReplicaDatabaseTest(case.DBTestCase):
+    """
+    Tests of reads from a replica that's a separate SQLite database.
+
+    The replica only has a product table, and holds different products from
+    the primary, so it's obvious which database a read went to.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        """Create the replica database, with a product table."""
+        from moztrap.model import Product
+        fd, cls.replica_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        connections.databases["replica"] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": cls.replica_path,
+            }
+        connection = connections["replica"]
+        # as test database creation does; else TestCase won't use transactions
+        connection.features.confirm()
+        sql, references = connection.creation.sql_create_model(
+            Product, no_style())
+        cursor = connection.cursor()
+        for statement in sql:
+            cursor.execute(statement)
+        super(ReplicaDatabaseTest, cls).setUpClass()
+
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove the replica database."""
+        super(ReplicaDatabaseTest, cls).tearDownClass()
+        connections["replica"].close()
+        delattr(connections._connections, "replica")
+        del connections.databases["replica"]
+        os.remove(cls.replica_path)
+
+
+    def setUp(self):
+        """A product in each database."""
+        from moztrap.deploy import routers
+        super(ReplicaDatabaseTest, self).setUp()
+        routers.reset()
+        self.addCleanup(routers.reset)
+        self.model.Product.objects.create(name="On primary")
+        cursor = connections["replica"].cursor()
+        cursor.execute("DELETE FROM core_product")
+        self.model.Product(name="On replica").save(using="replica")
+        routers.reset()
+
+
+    def names(self):
+        """Return names of all products read."""
+        return list(self.model.Product.objects.values_list("name", flat=True))
+
+
+    def test_primary(self):
+        """By default, reads go to the primary."""
+        self.assertEqual(self.names(), ["On primary"])
+
+
+    def test_replica(self):
+        """Within replica_reads, reads go to the replica."""
+        from moztrap.deploy.routers import replica_reads
+        with replica_reads("replica"):
+            self.assertEqual(self.names(), ["On replica"])
+
+
+    def test_read_after_write(self):
+        """Reads after a write go to the primary."""
+        from moztrap.deploy.routers import replica_reads
+        with replica_reads("replica"):
+            self.model.Product.objects.create(name="Written")
+            self.assertEqual(
+                sorted(self.names()), ["On primary", "Written"])
+
+
+    def test_update(self):
+        """Queryset updates within replica_reads go to the primary."""
+        from moztrap.deploy.routers import replica_reads
+        with replica_reads("replica"):
+            self.model.Product.objects.update(name="Updated")
+
+        self.assertEqual(self.names(), ["Updated"])
+
+
+    def test_soft_delete(self):
+        """Queryset soft-deletes within replica_reads go to the primary."""
+        from moztrap.deploy.routers import replica_reads
+        with replica_reads("replica"):
+            self.model.Product.objects.all().delete()
+
+        self.assertEqual(self.names(), [])
@@ -59,6 +59,7 @@ class ProductVersionEnvironmentsResourceTest(case.api.ApiTestCase):
                         )),
                     ],
                 u'id': unicode(envs[0].id),
+                u'label': u'OS X',
                 u'profile': unicode(self.get_detail_url(
                     "profile",
                     envs[0].profile.id
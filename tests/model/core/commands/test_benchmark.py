@@ -0,0 +1,94 @@
+"""
+Tests for management command to run benchmarks.
+
+"""
+from cStringIO import StringIO
+import json
+import os
+from tempfile import mkstemp
+
+from django.core.management import call_command
+
+from mock import patch
+
+from tests import case
+
+
+
+class BenchmarkTest(case.DBTestCase):
+    """Tests for benchmark management command."""
+
+    def call_command(self, *args, **kwargs):
+        """
+        Runs the management command and returns (stdout, stderr) output.
+
+        Also patch ``sys.exit`` so a ``CommandError`` doesn't cause an exit.
+
+        """
+        with patch("sys.stdout", StringIO()) as stdout:
+            with patch("sys.stderr", StringIO()) as stderr:
+                with patch("sys.exit"):
+                    call_command("benchmark", *args, **kwargs)
+
+        stdout.seek(0)
+        stderr.seek(0)
+        return (stdout.read(), stderr.read())
+
+
+    def setUp(self):
+        super(BenchmarkTest, self).setUp()
+        from moztrap.model.synthetic import Generator, SCALES
+        Generator(SCALES["tiny"]).generate()
+
+
+    def test_json(self):
+        """Writes results of the named benchmarks as JSON."""
+        output = self.call_command("case_list", repeat=2, label="abc123")
+
+        results = json.loads(output[0])
+        self.assertEqual(results["label"], "abc123")
+        self.assertEqual(results["repeat"], 2)
+        self.assertEqual(results["benchmarks"].keys(), ["case_list"])
+        self.assertEqual(
+            len(results["benchmarks"]["case_list"]["times_ms"]), 2)
+
+
+    def test_output_file(self):
+        """Can write results to a file."""
+        fd, path = mkstemp()
+        os.close(fd)
+        try:
+            self.call_command("case_list", repeat=1, output=path)
+            with open(path) as f:
+                results = json.load(f)
+        finally:
+            os.remove(path)
+
+        self.assertEqual(results["benchmarks"].keys(), ["case_list"])
+
+
+    def test_unknown(self):
+        """Unknown benchmark names are an error."""
+        output = self.call_command("nonexistent")
+
+        self.assertIn("Unknown benchmarks: nonexistent.", output[1])
+
+
+
+    def test_not_generated(self):
+        """Refuses to run against data not from generate_data."""
+        self.model.User.objects.filter(username="synthetic-tester").delete()
+
+        output = self.call_command("case_list")
+
+        self.assertIn("no data from generate_data", output[1])
+
+
+    def test_force(self):
+        """Runs against data not from generate_data if forced."""
+        self.model.User.objects.filter(username="synthetic-tester").delete()
+
+        output = self.call_command("case_list", repeat=1, force=True)
+
+        results = json.loads(output[0])
+        self.assertEqual(results["benchmarks"].keys(), ["case_list"])
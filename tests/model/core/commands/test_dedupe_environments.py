@@ -0,0 +1,36 @@
+"""
+Tests for management command to merge identical environments.
+
+"""
+from cStringIO import StringIO
+
+from django.core.management import call_command
+
+from mock import patch
+
+from tests import case
+
+
+
+class DedupeEnvironmentsTest(case.DBTestCase):
+    """Tests for dedupe_environments management command."""
+    def call_command(self, *args, **kwargs):
+        """Runs the management command and returns stdout output."""
+        with patch("sys.stdout", StringIO()) as stdout:
+            call_command("dedupe_environments", *args, **kwargs)
+
+        stdout.seek(0)
+        return stdout.read()
+
+
+    def test_dedupe(self):
+        """Merges identical environments and reports how many."""
+        profile = self.F.ProfileFactory.create()
+        el = self.F.ElementFactory.create()
+        for i in range(3):
+            self.F.EnvironmentFactory.create(profile=profile).elements.add(el)
+
+        output = self.call_command()
+
+        self.assertEqual(output, "Merged 2 environments.\n")
+        self.assertEqual(profile.environments.count(), 1)
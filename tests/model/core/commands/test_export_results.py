@@ -0,0 +1,88 @@
+"""
+Tests for management command to export results.
+
+"""
+from cStringIO import StringIO
+import json
+import os
+from tempfile import mkstemp
+
+from django.core.management import call_command
+
+from mock import patch
+
+from tests import case
+
+
+
+class ExportResultsTest(case.DBTestCase):
+    """Tests for export_results management command."""
+
+    def call_command(self, *args, **kwargs):
+        """
+        Runs the management command and returns (stdout, stderr) output.
+
+        Also patch ``sys.exit`` so a ``CommandError`` doesn't cause an exit.
+
+        """
+        with patch("sys.stdout", StringIO()) as stdout:
+            with patch("sys.stderr", StringIO()) as stderr:
+                with patch("sys.exit"):
+                    call_command("export_results", *args, **kwargs)
+
+        stdout.seek(0)
+        stderr.seek(0)
+        return (stdout.read(), stderr.read())
+
+
+    def test_no_options(self):
+        """Need either a run or a product version."""
+        output = self.call_command()
+
+        self.assertIn("Give exactly one of --run or --productversion", output[1])
+
+
+    def test_bad_format(self):
+        """Format must be ndjson or csv."""
+        output = self.call_command(run="1", format="xml")
+
+        self.assertIn('Unknown format "xml"', output[1])
+
+
+    def test_no_such_run(self):
+        """Nonexistent run is an error."""
+        output = self.call_command(run="9999")
+
+        self.assertIn('"9999" does not exist', output[1])
+
+
+    def test_run(self):
+        """Writes NDJSON results for a run to stdout."""
+        result = self.F.ResultFactory.create()
+
+        output = self.call_command(run=str(result.runcaseversion.run.id))
+
+        [line] = output[0].splitlines()
+        self.assertEqual(json.loads(line)["result_id"], result.id)
+
+
+    def test_productversion_csv_to_file(self):
+        """Writes CSV results for a product version to a file."""
+        result = self.F.ResultFactory.create()
+        fd, path = mkstemp()
+        os.close(fd)
+
+        try:
+            self.call_command(
+                productversion=str(
+                    result.runcaseversion.run.productversion.id),
+                format="csv",
+                output=path,
+                )
+            with open(path) as fh:
+                lines = fh.read().splitlines()
+        finally:
+            os.remove(path)
+
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith("%s," % result.id))
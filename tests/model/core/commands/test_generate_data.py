@@ -0,0 +1,66 @@
+"""
+Tests for management command to generate synthetic data.
+
+"""
+from cStringIO import StringIO
+
+from django.core.management import call_command
+
+from mock import patch
+
+from tests import case
+
+
+
+class GenerateDataTest(case.DBTestCase):
+    """Tests for generate_data management command."""
+
+    def call_command(self, *args, **kwargs):
+        """
+        Runs the management command and returns (stdout, stderr) output.
+
+        Also patch ``sys.exit`` so a ``CommandError`` doesn't cause an exit.
+
+        """
+        with patch("sys.stdout", StringIO()) as stdout:
+            with patch("sys.stderr", StringIO()) as stderr:
+                with patch("sys.exit"):
+                    call_command("generate_data", *args, **kwargs)
+
+        stdout.seek(0)
+        stderr.seek(0)
+        return (stdout.read(), stderr.read())
+
+
+    def test_scale(self):
+        """Generates data at the given preset scale."""
+        output = self.call_command(scale="tiny")
+
+        self.assertEqual(self.model.CaseVersion.objects.count(), 20)
+        self.assertIn("CaseVersion: 20\n", output[0])
+        self.assertIn("Generated in", output[0])
+
+
+    def test_override(self):
+        """Counts of the preset scale can be overridden."""
+        self.call_command(scale="tiny", products=2, cases=3)
+
+        self.assertEqual(self.model.Product.objects.count(), 2)
+        self.assertEqual(self.model.CaseVersion.objects.count(), 12)
+
+
+    def test_bulk(self):
+        """Rows are inserted in bulk, not one query per row."""
+        from moztrap.debug.queries import QueryLog
+        with QueryLog() as log:
+            self.call_command(scale="tiny", cases=100, verbosity=0)
+
+        self.assertEqual(self.model.CaseStep.objects.count(), 400)
+        self.assertLess(log.count, 150)
+
+
+    def test_unknown_scale(self):
+        """An unknown scale is an error."""
+        output = self.call_command(scale="enormous")
+
+        self.assertIn('Unknown scale "enormous"', output[1])
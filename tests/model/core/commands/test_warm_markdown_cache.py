@@ -0,0 +1,105 @@
+"""
+Tests for management command to pre-warm the rendered Markdown cache.
+
+"""
+from cStringIO import StringIO
+
+from django.core.management import call_command
+
+from mock import patch
+
+from tests import case
+
+
+
+class WarmMarkdownCacheTest(case.DBTestCase):
+    """Tests for warm_markdown_cache management command."""
+    def setUp(self):
+        """Start with empty Markdown caches."""
+        super(WarmMarkdownCacheTest, self).setUp()
+        from moztrap.view.markup import render
+        render.reset()
+        render.get_local().clear()
+        render.get_shared().clear()
+        self.addCleanup(render.reset)
+
+
+    def call_command(self, *args, **kwargs):
+        """
+        Runs the management command and returns (stdout, stderr) output.
+
+        Also patch ``sys.exit`` so a ``CommandError`` doesn't cause an exit.
+
+        """
+        with patch("sys.stdout", StringIO()) as stdout:
+            with patch("sys.stderr", StringIO()) as stderr:
+                with patch("sys.exit"):
+                    call_command("warm_markdown_cache", *args, **kwargs)
+
+        stdout.seek(0)
+        stderr.seek(0)
+        return (stdout.read(), stderr.read())
+
+
+    def is_cached(self, text):
+        """Return True if rendering of ``text`` is in the shared cache."""
+        from moztrap.view.markup import render
+        return render.get_shared().get(render.cache_key(text)) is not None
+
+
+    def create_run(self, **kwargs):
+        """Create a run with a case, step, tag and result comment."""
+        run = self.F.RunFactory.create(description="run desc", **kwargs)
+        cv = self.F.CaseVersionFactory.create(description="cv desc")
+        self.F.CaseStepFactory.create(
+            caseversion=cv, instruction="do it", expected="done")
+        cv.tags.add(self.F.TagFactory.create(description="tag desc"))
+        rcv = self.F.RunCaseVersionFactory.create(run=run, caseversion=cv)
+        self.F.ResultFactory.create(runcaseversion=rcv, comment="comment")
+        return run
+
+
+    def test_active_runs(self):
+        """By default, warms texts of all active runs."""
+        self.create_run(status="active")
+        self.F.RunFactory.create(status="draft", description="draft desc")
+
+        stdout, stderr = self.call_command()
+
+        for text in [
+                "run desc", "cv desc", "do it", "done", "tag desc", "comment"]:
+            self.assertTrue(self.is_cached(text), text)
+        self.assertFalse(self.is_cached("draft desc"))
+        self.assertEqual(stdout, "Warmed 6 texts for 1 runs.\n")
+
+
+    def test_run(self):
+        """Warms only the given runs."""
+        self.create_run(status="active")
+        run = self.F.RunFactory.create(status="draft", description="draft")
+
+        self.call_command(runs=[str(run.id)])
+
+        self.assertTrue(self.is_cached("draft"))
+        self.assertFalse(self.is_cached("run desc"))
+
+
+    def test_bad_run(self):
+        """Nonexistent run ids are an error."""
+        stdout, stderr = self.call_command(runs=["0"])
+
+        self.assertEqual(
+            stderr, "Error: Some of the given runs do not exist.\n")
+
+
+    def test_benchmark(self):
+        """Reports uncached and cached rendering time for each run."""
+        run = self.create_run(status="active")
+
+        stdout, stderr = self.call_command(benchmark=True)
+
+        self.assertRegexpMatches(
+            stdout,
+            r"^Run {0} \(6 texts\): [\d.]+ ms uncached, [\d.]+ ms cached\n"
+            .format(run.id),
+            )
@@ -77,11 +77,20 @@ class EnvironmentResourceTest(ApiCrudCases):
             u"elements": [unicode(
                 self.get_detail_url("element", str(elem.id))
             ) for elem in backend_obj.elements.all()],
+            u"label": backend_obj.label,
             u"resource_uri": unicode(
                 self.get_detail_url(self.resource_name, str(backend_obj.id))),
         }
 
 
+    def clean_backend_data(self, backend_obj):
+        """Returns backend_data, minus the read-only label."""
+        data = super(EnvironmentResourceTest, self).clean_backend_data(
+            backend_obj)
+        data.pop("label")
+        return data
+
+
     def test_elements_must_be_from_different_categories(self):
         """A post with two elements from the same category should error."""
         logger.info("test_elements_must_be_from_different_categories")
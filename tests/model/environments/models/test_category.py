@@ -56,3 +56,43 @@ class CategoryTest(case.DBTestCase):
         env.delete()
 
         self.assertTrue(el.category.deletable)
+
+
+    def test_annotate_deletable(self):
+        """annotate_deletable annotates deletable flags in one query."""
+        used = self.F.ElementFactory.create(name="Debian").category
+        self.F.EnvironmentFactory.create().elements.add(used.elements.get())
+        unused = self.F.CategoryFactory.create()
+        deleted = self.F.ElementFactory.create().category
+        env = self.F.EnvironmentFactory.create()
+        env.elements.add(deleted.elements.get())
+        env.delete()
+
+        with self.assertNumQueries(2):
+            categories = list(
+                self.model.Category.objects.order_by(
+                    "id").annotate_deletable())
+            deletable = [c.deletable for c in categories]
+
+        self.assertEqual(deletable, [False, True, True])
+
+
+    def test_queryset_delete_prevention(self):
+        """Deleting a queryset including a category in use is prevented."""
+        el = self.F.ElementFactory.create(name="Debian")
+        self.F.EnvironmentFactory.create().elements.add(el)
+        unused = self.F.CategoryFactory.create()
+
+        with self.assertRaises(self.model.ProtectedError):
+            self.model.Category.objects.all().delete()
+
+        self.assertIsNone(self.refresh(unused).deleted_on)
+
+
+    def test_queryset_delete(self):
+        """Can delete a queryset of categories not in use."""
+        c = self.F.CategoryFactory.create()
+
+        self.model.Category.objects.all().delete()
+
+        self.assertIsNotNone(self.refresh(c).deleted_on)
@@ -56,3 +56,39 @@ class ElementTest(case.DBTestCase):
         env.delete()
 
         self.assertTrue(el.deletable)
+
+
+    def test_annotate_deletable(self):
+        """annotate_deletable annotates deletable flags in one query."""
+        used = self.F.ElementFactory.create(name="A")
+        self.F.EnvironmentFactory.create().elements.add(used)
+        self.F.ElementFactory.create(name="B")
+
+        with self.assertNumQueries(2):
+            deletable = [
+                e.deletable for e in
+                self.model.Element.objects.order_by(
+                    "name").annotate_deletable()]
+
+        self.assertEqual(deletable, [False, True])
+
+
+    def test_queryset_delete_prevention(self):
+        """Deleting a queryset including an element in use is prevented."""
+        used = self.F.ElementFactory.create()
+        self.F.EnvironmentFactory.create().elements.add(used)
+
+        with self.assertRaises(self.model.ProtectedError):
+            self.model.Element.objects.filter(pk=used.pk).delete()
+
+        self.assertIsNone(self.refresh(used).deleted_on)
+
+
+    def test_delete_ignores_stale_annotation(self):
+        """Deleting an element rechecks whether it's in use."""
+        el = self.model.Element.objects.filter(
+            pk=self.F.ElementFactory.create().pk).annotate_deletable()[0]
+        self.F.EnvironmentFactory.create().elements.add(el)
+
+        with self.assertRaises(self.model.ProtectedError):
+            el.delete()
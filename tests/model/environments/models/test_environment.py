@@ -73,6 +73,31 @@ class EnvironmentTest(case.DBTestCase):
         self.assertTrue(env.deletable)
 
 
+    def test_annotate_deletable(self):
+        """annotate_deletable annotates deletable flags in one query."""
+        used = self.F.EnvironmentFactory.create()
+        self.F.ProductVersionFactory.create(environments=[used])
+        unused = self.F.EnvironmentFactory.create()
+
+        with self.assertNumQueries(2):
+            deletable = [
+                e.deletable for e in
+                self.model.Environment.objects.filter(
+                    pk__in=[used.pk, unused.pk]).order_by(
+                    "id").annotate_deletable()]
+
+        self.assertEqual(deletable, [False, True])
+
+
+    def test_queryset_delete_prevention(self):
+        """Deleting a queryset including an env in use is prevented."""
+        env = self.F.EnvironmentFactory.create()
+        self.F.ProductVersionFactory.create(environments=[env])
+
+        with self.assertRaises(self.model.ProtectedError):
+            self.model.Environment.objects.filter(pk=env.pk).delete()
+
+
     def test_remove_from_profile_not_in_use(self):
         """If an environment is not in use, remove_from_profile deletes it."""
         el = self.F.ElementFactory.create()
@@ -98,3 +123,304 @@ class EnvironmentTest(case.DBTestCase):
         env = self.refresh(env)
         self.assertEqual(env.profile, None)
         self.assertEqual(env.modified_by, u)
+
+
+
+class EnvironmentSignatureTest(case.DBTestCase):
+    """Tests for environment element signatures."""
+    @property
+    def models(self):
+        """The module under test."""
+        from moztrap.model.environments import models
+        return models
+
+
+    def test_element_signature(self):
+        """Signature is independent of order and repetition of ids."""
+        self.assertEqual(
+            self.models.element_signature([3, 1, 2, 1]),
+            self.models.element_signature(["1", "2", "3"]),
+            )
+
+
+    def test_empty_signature(self):
+        """Signature of no elements is the empty string."""
+        self.assertEqual(self.models.element_signature([]), "")
+
+
+    def test_subset_signatures(self):
+        """subset_signatures returns signatures of all non-empty subsets."""
+        sig = self.models.element_signature
+        self.assertEqual(
+            set(self.models.subset_signatures([1, 2])),
+            set([sig([1]), sig([2]), sig([1, 2])]),
+            )
+
+
+    def test_add(self):
+        """Adding elements updates the environment's signature."""
+        env = self.F.EnvironmentFactory.create()
+        e1 = self.F.ElementFactory.create()
+        e2 = self.F.ElementFactory.create()
+
+        env.elements.add(e1, e2)
+
+        expected = self.models.element_signature([e1.id, e2.id])
+        self.assertEqual(env.signature, expected)
+        self.assertEqual(self.refresh(env).signature, expected)
+
+
+    def test_remove(self):
+        """Removing elements updates the environment's signature."""
+        env = self.F.EnvironmentFactory.create()
+        e1 = self.F.ElementFactory.create()
+        e2 = self.F.ElementFactory.create()
+        env.elements.add(e1, e2)
+
+        env.elements.remove(e2)
+
+        self.assertEqual(
+            self.refresh(env).signature,
+            self.models.element_signature([e1.id]),
+            )
+
+
+    def test_clear(self):
+        """Clearing elements empties the environment's signature."""
+        env = self.F.EnvironmentFactory.create()
+        env.elements.add(self.F.ElementFactory.create())
+
+        env.elements.clear()
+
+        self.assertEqual(self.refresh(env).signature, "")
+
+
+    def test_reverse_add(self):
+        """Adding environments to an element updates their signatures."""
+        env = self.F.EnvironmentFactory.create()
+        el = self.F.ElementFactory.create()
+
+        el.environments.add(env)
+
+        self.assertEqual(
+            self.refresh(env).signature,
+            self.models.element_signature([el.id]),
+            )
+
+
+    def test_reverse_clear(self):
+        """Clearing an element's environments updates their signatures."""
+        env = self.F.EnvironmentFactory.create()
+        el = self.F.ElementFactory.create()
+        env.elements.add(el)
+
+        el.environments.clear()
+
+        self.assertEqual(self.refresh(env).signature, "")
+
+
+    def test_save_keeps_signature(self):
+        """Saving an environment after changing elements keeps signature."""
+        env = self.F.EnvironmentFactory.create()
+        el = self.F.ElementFactory.create()
+        env.elements.add(el)
+
+        env.save()
+
+        self.assertEqual(
+            self.refresh(env).signature,
+            self.models.element_signature([el.id]),
+            )
+
+
+    def test_clone(self):
+        """A cloned environment has the same signature."""
+        env = self.F.EnvironmentFactory.create()
+        env.elements.add(self.F.ElementFactory.create())
+
+        new = env.clone()
+
+        self.assertEqual(self.refresh(new).signature, env.signature)
+
+
+    def test_with_elements(self):
+        """with_elements finds environments with exactly given elements."""
+        envs = self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["Linux", "OS X"], "Language": ["English"]})
+        linux = self.model.Element.objects.get(name="Linux")
+        english = self.model.Element.objects.get(name="English")
+
+        self.assertEqual(
+            list(self.model.Environment.objects.with_elements(
+                [english, linux.id])),
+            [e for e in envs if linux in e.elements.all()],
+            )
+        self.assertEqual(
+            list(self.model.Environment.objects.with_elements([linux])), [])
+
+
+    def test_within(self):
+        """within finds environments with elements among given elements."""
+        linux, english, spanish = [
+            self.F.ElementFactory.create(name=name)
+            for name in ["Linux", "English", "Spanish"]]
+        envs = []
+        for elements in [[linux, english], [linux, spanish], [linux]]:
+            env = self.F.EnvironmentFactory.create()
+            env.elements.add(*elements)
+            envs.append(env)
+
+        self.assertEqual(
+            set(self.model.Environment.objects.within([linux, english])),
+            set([envs[0], envs[2]]),
+            )
+
+
+
+class EnvironmentElementCacheTest(case.DBTestCase):
+    """Tests for environments' denormalized element caches."""
+    def setUp(self):
+        """Create an environment with elements in two categories."""
+        self.env = self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["OS X"], "Language": ["English"]})[0]
+        self.os = self.model.Element.objects.get(name="OS X")
+        self.english = self.model.Element.objects.get(name="English")
+
+
+    def test_cached(self):
+        """Element ids and names are cached in category name order."""
+        env = self.refresh(self.env)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(env.element_ids, [self.english.id, self.os.id])
+            self.assertEqual(env.element_names, [u"English", u"OS X"])
+            self.assertEqual(env.label, u"English, OS X")
+
+
+    def test_instance(self):
+        """Changing elements updates the instance's cache."""
+        self.env.elements.remove(self.english)
+
+        self.assertEqual(self.env.label, u"OS X")
+
+
+    def test_no_elements(self):
+        """An environment with no elements has an empty label."""
+        self.assertEqual(self.F.EnvironmentFactory.create().label, u"")
+
+
+    def test_rename_element(self):
+        """Renaming an element refreshes its environments' caches."""
+        self.os.name = u"Linux"
+        self.os.save()
+
+        self.assertEqual(self.refresh(self.env).label, u"English, Linux")
+
+
+    def test_rename_category(self):
+        """Renaming a category refreshes (and reorders) environment caches."""
+        category = self.english.category
+        category.name = u"Zone"
+        category.save()
+
+        self.assertEqual(self.refresh(self.env).label, u"OS X, English")
+
+
+
+class DedupeTest(case.DBTestCase):
+    """Tests for EnvironmentManager.dedupe."""
+    def setUp(self):
+        """Create two elements."""
+        self.elements = [
+            self.F.ElementFactory.create(name="Linux"),
+            self.F.ElementFactory.create(name="English"),
+            ]
+
+
+    def env(self, **kwargs):
+        """Create and return an environment with both elements."""
+        env = self.F.EnvironmentFactory.create(**kwargs)
+        env.elements.add(*self.elements)
+        return env
+
+
+    def dedupe(self):
+        """Dedupe environments; return number merged."""
+        return self.model.Environment.objects.dedupe()
+
+
+    def test_same_profile(self):
+        """Identical environments in a profile are merged into the oldest."""
+        profile = self.F.ProfileFactory.create()
+        env = self.env(profile=profile)
+        dupe = self.env(profile=profile)
+
+        self.assertEqual(self.dedupe(), 1)
+
+        self.assertEqual(list(profile.environments.all()), [env])
+        self.assertFalse(
+            self.model.Environment.everything.filter(pk=dupe.pk).exists())
+
+
+    def test_different_profiles(self):
+        """Identical environments in different profiles are both kept."""
+        self.env()
+        self.env()
+
+        self.assertEqual(self.dedupe(), 0)
+
+
+    def test_no_profile(self):
+        """An environment in no profile is merged into one in a profile."""
+        dupe = self.env(profile=None)
+        env = self.env()
+
+        self.assertEqual(self.dedupe(), 1)
+
+        self.assertEqual(
+            list(self.model.Environment.objects.all()), [env])
+        self.assertNotEqual(env.pk, dupe.pk)
+
+
+    def test_different_elements(self):
+        """Environments with different elements are not merged."""
+        profile = self.F.ProfileFactory.create()
+        self.env(profile=profile)
+        other = self.F.EnvironmentFactory.create(profile=profile)
+        other.elements.add(self.elements[0])
+
+        self.assertEqual(self.dedupe(), 0)
+
+
+    def test_m2m(self):
+        """References in m2m through tables are rewritten, without dupes."""
+        profile = self.F.ProfileFactory.create()
+        env = self.env(profile=profile)
+        dupe = self.env(profile=profile)
+        both = self.F.ProductVersionFactory.create(environments=[env, dupe])
+        one = self.F.ProductVersionFactory.create(environments=[dupe])
+
+        self.dedupe()
+
+        self.assertEqual(list(both.environments.all()), [env])
+        self.assertEqual(list(one.environments.all()), [env])
+
+
+    def test_foreign_keys(self):
+        """Results and work items are rewritten, without duplicate items."""
+        profile = self.F.ProfileFactory.create()
+        env = self.env(profile=profile)
+        dupe = self.env(profile=profile)
+        rcv = self.F.RunCaseVersionFactory.create()
+        result = self.F.ResultFactory.create(
+            runcaseversion=rcv, environment=dupe)
+        self.model.WorkItem.objects.create(
+            run=rcv.run, runcaseversion=rcv, environment=env)
+        self.model.WorkItem.objects.create(
+            run=rcv.run, runcaseversion=rcv, environment=dupe)
+
+        self.dedupe()
+
+        self.assertEqual(self.refresh(result).environment, env)
+        self.assertEqual(
+            [wi.environment for wi in rcv.workitems.all()], [env])
@@ -43,6 +43,84 @@ class ProfileTest(case.DBTestCase):
             )
 
 
+    def elements(self, **names):
+        """Create and return elements, given lists of names by category."""
+        elements = []
+        for category_name, element_names in sorted(names.items()):
+            category = self.F.CategoryFactory(name=category_name)
+            for name in element_names:
+                elements.append(
+                    self.F.ElementFactory(name=name, category=category))
+        return elements
+
+
+    def test_generate_caches(self):
+        """Generated environments have signatures and element caches."""
+        elements = self.elements(OS=["Windows"], Browser=["Firefox"])
+
+        p = self.model.Profile.generate("New Profile", *elements)
+
+        env = p.environments.get()
+        self.assertEqual(env.label, u"Firefox, Windows")
+        self.assertEqual(
+            list(self.model.Environment.objects.with_elements(elements)),
+            [env],
+            )
+
+
+    def test_generate_bulk(self):
+        """The number of queries doesn't depend on the number of envs."""
+        elements = self.elements(
+            OS=["Windows", "Linux", "OS X"],
+            Browser=["Firefox", "Chrome", "Safari"],
+            Locale=["English", "French", "German"],
+            )
+
+        with self.assertNumQueries(5):
+            p = self.model.Profile.generate("New Profile", *elements)
+
+        self.assertEqual(p.environments.count(), 27)
+        self.assertEqual(
+            self.model.Environment.elements.through.objects.filter(
+                environment__profile=p).count(),
+            81,
+            )
+
+
+    def test_generate_reuses(self):
+        """Identical environments in no profile are reused."""
+        elements = self.elements(OS=["Windows", "Linux"])
+        orphan = self.F.EnvironmentFactory.create(profile=None)
+        orphan.elements.add(elements[1])
+        other = self.F.EnvironmentFactory.create()
+        other.elements.add(elements[0])
+
+        p = self.model.Profile.generate("New Profile", *elements)
+
+        envs = list(p.environments.all())
+        self.assertEqual(len(envs), 2)
+        self.assertIn(orphan, envs)
+        self.assertNotIn(other, envs)
+        self.assertEqual(self.refresh(other).profile, other.profile)
+
+
+    def test_preview(self):
+        """Preview reports number of environments and estimated storage."""
+        elements = self.elements(
+            OS=["Windows", "Linux"], Browser=["Firefox", "Chrome"])
+        orphan = self.F.EnvironmentFactory.create(profile=None)
+        orphan.elements.add(elements[0], elements[2])
+
+        preview = self.model.Profile.preview(*elements)
+
+        self.assertEqual(preview["environments"], 4)
+        self.assertEqual(preview["new"], 3)
+        self.assertEqual(preview["reused"], 1)
+        self.assertEqual(preview["links"], 6)
+        self.assertTrue(preview["bytes"] > 0)
+        self.assertFalse(self.model.Profile.objects.exists())
+
+
     def test_clone(self):
         """Cloning a profile prefixes name with 'Cloned'."""
         p = self.F.ProfileFactory.create(name="Foo")
@@ -73,3 +151,22 @@ class ProfileTest(case.DBTestCase):
 
         self.assertEqual(
             [c.name for c in p.categories()], ["Browser", "OS"])
+
+
+    def test_annotate_categories(self):
+        """annotate_categories annotates categories of profiles in bulk."""
+        p1 = self.F.ProfileFactory.create()
+        self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["Windows", "OS X"], "Browser": ["Firefox"]}, profile=p1)
+        p2 = self.F.ProfileFactory.create()
+        self.F.EnvironmentFactory.create_full_set(
+            {"Locale": ["English"]}, profile=p2)
+        p3 = self.F.ProfileFactory.create()
+
+        with self.assertNumQueries(3):
+            categories = [
+                [c.name for c in p.categories()] for p in
+                self.model.Profile.objects.order_by(
+                    "id").annotate_categories()]
+
+        self.assertEqual(categories, [["Browser", "OS"], ["Locale"], []])
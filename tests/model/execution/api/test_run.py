@@ -101,6 +101,7 @@ class RunResourceTest(case.api.ApiTestCase):
                      envs[0].elements.get().id),
                  )],
             u'id': unicode(envs[0].id),
+            u'label': u'OS X',
             u'profile': unicode(self.get_detail_url(
                 "profile", envs[0].profile.id
             )),
@@ -137,3 +137,57 @@ class RunSuiteResourceTest(ApiCrudCases):
             "suite's product must match run's product."
         )
         self.assertEqual(res.text, error_message)
+
+
+    # setting a run's suites
+
+    def suites_payload(self, run, suites):
+        """Return PATCH payload setting ``suites`` as ``run``'s suites."""
+        return {
+            u"run": unicode(self.get_detail_url("run", str(run.id))),
+            u"suites": [
+                unicode(self.get_detail_url("suite", str(s.id)))
+                for s in suites
+                ],
+            }
+
+
+    def test_patch_sets_suites(self):
+        """PATCH with run and suites sets the run's suites in order."""
+        pv = self.F.ProductVersionFactory.create()
+        r = self.F.RunFactory.create(productversion=pv)
+        s1 = self.F.SuiteFactory.create(product=pv.product)
+        s2 = self.F.SuiteFactory.create(product=pv.product)
+        rs = self.F.RunSuiteFactory.create(run=r, suite=s1, order=0)
+        self.F.RunSuiteFactory.create(
+            run=r, suite__product=pv.product, order=1)
+
+        res = self.patch(
+            self.get_list_url(self.resource_name),
+            params=self.credentials,
+            payload=self.suites_payload(r, [s2, s1]),
+            )
+
+        self.assertEqual(res.json, {"added": 1, "removed": 1, "moved": 1})
+        self.assertEqual(
+            list(r.runsuites.values_list("suite", "order")),
+            [(s2.id, 0), (s1.id, 1)],
+            )
+        self.assertEqual(r.runsuites.get(suite=s1).id, rs.id)
+
+
+    def test_patch_mismatched_product_error(self):
+        """PATCH errors if a suite's product doesn't match run's."""
+        r = self.F.RunFactory.create()
+        s = self.F.SuiteFactory.create()
+
+        res = self.patch(
+            self.get_list_url(self.resource_name),
+            params=self.credentials,
+            payload=self.suites_payload(r, [s]),
+            status=400,
+            )
+
+        self.assertEqual(
+            res.text, "suite's product must match run's product.")
+        self.assertEqual(r.runsuites.count(), 0)
@@ -115,6 +115,21 @@ class RunTest(case.DBTestCase):
         self.assertNotEqual(new.runsuites.get(), rs)
 
 
+    def test_set_suites(self):
+        """set_suites sets the run's suites in order, keeping runsuites."""
+        rs = self.F.RunSuiteFactory.create(order=0)
+        r = rs.run
+        s = self.F.SuiteFactory.create(product=r.productversion.product)
+
+        r.set_suites([s, rs.suite])
+
+        self.assertEqual(
+            list(r.runsuites.values_list("suite", "order")),
+            [(s.id, 0), (rs.suite.id, 1)],
+            )
+        self.assertEqual(r.runsuites.get(suite=rs.suite).id, rs.id)
+
+
     def test_clone_no_run_caseversions(self):
         """Cloning a run does not clone member RunCaseVersions."""
         rcv = self.F.RunCaseVersionFactory.create()
@@ -943,7 +958,9 @@ class RunActivationTest(case.DBTestCase):
         connection.queries = []
 
         try:
-            with self.assertNumQueries(18):
+            # 18 queries explained above, plus selecting the work items of
+            # deleted runcaseversions and syncing the run's work items
+            with self.assertNumQueries(21):
                 r.activate()
 
             # to debug, uncomment these lines:
@@ -957,10 +974,10 @@ class RunActivationTest(case.DBTestCase):
             updates = [x["sql"] for x in connection.queries if x["sql"].startswith("UPDATE")]
             deletes = [x["sql"] for x in connection.queries if x["sql"].startswith("DELETE")]
 
-            self.assertEqual(len(selects), 11)
-            self.assertEqual(len(inserts), 2)
+            self.assertEqual(len(selects), 12)
+            self.assertEqual(len(inserts), 3)
             self.assertEqual(len(updates), 2)
-            self.assertEqual(len(deletes), 3)
+            self.assertEqual(len(deletes), 4)
         except AssertionError as e:
             raise e
         finally:
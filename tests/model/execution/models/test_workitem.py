@@ -0,0 +1,309 @@
+"""
+Tests for WorkItem model and the tester work queue.
+
+"""
+import datetime
+from multiprocessing.pool import ThreadPool
+import os
+import tempfile
+
+from django.db import connection
+
+from tests import case
+
+
+
+class WorkItemTestMixin(object):
+    """Common setup for work queue tests."""
+    def create_run(self, **kwargs):
+        """Create an active run with two environments."""
+        kwargs.setdefault("status", "active")
+        run = self.F.RunFactory.create(**kwargs)
+        self.envs = self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["Windows", "Linux"]})
+        run.environments.add(*self.envs)
+        return run
+
+
+    def create_rcv(self, run, order=0, priority=None):
+        """Create a runcaseversion in both envs of ``run``."""
+        return self.F.RunCaseVersionFactory.create(
+            run=run,
+            order=order,
+            caseversion__case__priority=priority,
+            environments=self.envs,
+            )
+
+
+
+class WorkItemTest(WorkItemTestMixin, case.DBTestCase):
+    def setUp(self):
+        """All tests need an active run and a tester."""
+        self.run = self.create_run()
+        self.user = self.F.UserFactory.create()
+
+
+    def claim(self, user=None, env=None, **kwargs):
+        return self.model.WorkItem.objects.claim(
+            self.run, env or self.envs[0], user or self.user, **kwargs)
+
+
+    def test_unicode(self):
+        """Unicode representation names the runcaseversion and environment."""
+        rcv = self.create_rcv(self.run)
+        self.run._sync_workitems()
+
+        wi = self.model.WorkItem.objects.get(
+            runcaseversion=rcv, environment=self.envs[0])
+
+        self.assertEqual(unicode(wi), u"%s in %s" % (rcv, self.envs[0]))
+
+
+    def test_sync_creates_item_per_env(self):
+        """Syncing creates one work item per runcaseversion/env pair."""
+        self.create_rcv(self.run)
+        self.create_rcv(self.run)
+
+        self.run._sync_workitems()
+
+        self.assertEqual(self.run.workitems.count(), 4)
+
+
+    def test_sync_idempotent(self):
+        """Syncing twice doesn't duplicate work items."""
+        self.create_rcv(self.run)
+
+        self.run._sync_workitems()
+        self.run._sync_workitems()
+
+        self.assertEqual(self.run.workitems.count(), 2)
+
+
+    def test_sync_removes_stale(self):
+        """Items for a runcaseversion that's gone are removed on sync."""
+        rcv = self.create_rcv(self.run)
+        self.run._sync_workitems()
+
+        rcv.delete(permanent=False)
+        self.run._sync_workitems()
+
+        self.assertEqual(self.model.WorkItem.everything.count(), 0)
+
+
+    def test_sync_marks_completed(self):
+        """An already-completed rcv/env pair is synced as completed."""
+        rcv = self.create_rcv(self.run)
+        self.F.ResultFactory.create(
+            runcaseversion=rcv, environment=self.envs[0], status="passed")
+
+        self.run._sync_workitems()
+
+        self.assertTrue(
+            self.run.workitems.get(environment=self.envs[0]).completed)
+        self.assertFalse(
+            self.run.workitems.get(environment=self.envs[1]).completed)
+
+
+    def test_sync_keeps_live_claim(self):
+        """A claimed item keeps its claim across a sync."""
+        self.create_rcv(self.run)
+        self.run._sync_workitems()
+        wi = self.claim()
+
+        self.run._sync_workitems()
+
+        self.assertEqual(self.refresh(wi).claimed_by, self.user)
+
+
+    def test_claim_priority_then_order(self):
+        """Claims go by case priority first, then run order."""
+        low = self.create_rcv(self.run, order=1, priority=3)
+        none = self.create_rcv(self.run, order=0)
+        high_later = self.create_rcv(self.run, order=3, priority=1)
+        high = self.create_rcv(self.run, order=2, priority=1)
+        self.run._sync_workitems()
+
+        claimed = [
+            self.claim(user=self.F.UserFactory.create()).runcaseversion
+            for i in range(4)
+            ]
+
+        self.assertEqual(claimed, [high, high_later, low, none])
+
+
+    def test_claim_sets_lease(self):
+        """A claim records the tester and a lease expiry."""
+        self.create_rcv(self.run)
+        self.run._sync_workitems()
+
+        wi = self.claim(lease=datetime.timedelta(minutes=5))
+
+        self.assertEqual(wi.claimed_by, self.user)
+        self.assertEqual(wi.environment, self.envs[0])
+        self.assertGreater(wi.lease_expires, datetime.datetime.utcnow())
+        self.assertLess(
+            wi.lease_expires,
+            datetime.datetime.utcnow() + datetime.timedelta(minutes=6))
+
+
+    def test_claim_skips_claimed(self):
+        """A different tester doesn't get an item claimed by someone else."""
+        rcv1 = self.create_rcv(self.run, order=1)
+        rcv2 = self.create_rcv(self.run, order=2)
+        self.run._sync_workitems()
+
+        self.claim()
+        wi = self.claim(user=self.F.UserFactory.create())
+
+        self.assertEqual(wi.runcaseversion, rcv2)
+
+
+    def test_claim_releases_own_previous(self):
+        """Claiming again releases the tester's previous claim first."""
+        rcv = self.create_rcv(self.run, order=1)
+        self.create_rcv(self.run, order=2)
+        self.run._sync_workitems()
+
+        first = self.claim()
+        second = self.claim()
+
+        self.assertEqual(second.runcaseversion, rcv)
+        self.assertEqual(second.pk, first.pk)
+        self.assertEqual(
+            self.run.workitems.filter(claimed_by=self.user).count(), 1)
+
+
+    def test_claim_expired_lease(self):
+        """An item whose lease has expired can be claimed by someone else."""
+        rcv = self.create_rcv(self.run)
+        self.run._sync_workitems()
+        self.claim(lease=datetime.timedelta(minutes=-1))
+
+        other = self.F.UserFactory.create()
+        wi = self.claim(user=other)
+
+        self.assertEqual(wi.runcaseversion, rcv)
+        self.assertEqual(wi.claimed_by, other)
+
+
+    def test_claim_none_left(self):
+        """Returns None when all work is claimed."""
+        self.create_rcv(self.run)
+        self.run._sync_workitems()
+        self.claim()
+
+        self.assertIsNone(self.claim(user=self.F.UserFactory.create()))
+
+
+    def test_claim_environment_specific(self):
+        """Claims only come from the given environment."""
+        self.create_rcv(self.run)
+        self.run._sync_workitems()
+
+        wi = self.claim(env=self.envs[1])
+
+        self.assertEqual(wi.environment, self.envs[1])
+
+
+    def test_completed_result_releases(self):
+        """Recording a completed result releases and completes the item."""
+        rcv = self.create_rcv(self.run)
+        self.run._sync_workitems()
+        wi = self.claim()
+
+        rcv.result_pass(environment=self.envs[0], user=self.user)
+
+        wi = self.refresh(wi)
+        self.assertTrue(wi.completed)
+        self.assertIsNone(wi.claimed_by)
+        self.assertIsNone(wi.lease_expires)
+        self.assertIsNone(self.claim(user=self.F.UserFactory.create()))
+
+
+    def test_started_result_keeps_claim(self):
+        """Starting a test doesn't release its claim."""
+        rcv = self.create_rcv(self.run)
+        self.run._sync_workitems()
+        wi = self.claim()
+
+        rcv.start(environment=self.envs[0], user=self.user)
+
+        wi = self.refresh(wi)
+        self.assertFalse(wi.completed)
+        self.assertEqual(wi.claimed_by, self.user)
+
+
+    def test_release(self):
+        """Releasing a claim makes the item available again."""
+        self.create_rcv(self.run)
+        self.run._sync_workitems()
+        wi = self.claim()
+
+        wi.release()
+
+        self.assertIsNone(self.refresh(wi).claimed_by)
+        self.assertEqual(self.claim(user=self.F.UserFactory.create()), wi)
+
+
+
+class WorkItemConcurrencyTest(WorkItemTestMixin, case.TransactionTestCase):
+    """
+    Concurrent claims never hand out the same item twice.
+
+    In-memory SQLite databases aren't shared between threads, so on one of
+    those these tests run against a file-backed test database instead.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        """Switch to a file-backed test database if in-memory SQLite."""
+        cls.memory_connection = None
+        if (connection.vendor != "sqlite" or
+                connection.settings_dict["NAME"] != ":memory:"):
+            return
+        # closing an in-memory SQLite connection is a no-op; set it aside
+        cls.memory_connection = connection.connection
+        connection.connection = None
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        cls.old_test_name = connection.settings_dict.get("TEST_NAME")
+        connection.settings_dict["TEST_NAME"] = path
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+
+    @classmethod
+    def tearDownClass(cls):
+        """Drop the file-backed database and go back to the in-memory one."""
+        if cls.memory_connection is None:
+            return
+        connection.creation.destroy_test_db(":memory:", verbosity=0)
+        connection.settings_dict["NAME"] = ":memory:"
+        connection.settings_dict["TEST_NAME"] = cls.old_test_name
+        connection.connection = cls.memory_connection
+
+
+    def test_concurrent_claims(self):
+        run = self.create_run()
+        for i in range(10):
+            self.create_rcv(run, order=i)
+        run._sync_workitems()
+        users = [self.F.UserFactory.create() for i in range(15)]
+        env = self.envs[0]
+
+        def claim(user):
+            try:
+                wi = self.model.WorkItem.objects.claim(run, env, user)
+                return wi.pk if wi is not None else None
+            finally:
+                connection.close()
+
+        pool = ThreadPool(5)
+        try:
+            claimed = pool.map(claim, users)
+        finally:
+            pool.close()
+            pool.join()
+
+        claimed_pks = [pk for pk in claimed if pk is not None]
+        self.assertEqual(len(claimed_pks), 10)
+        self.assertEqual(len(set(claimed_pks)), 10)
@@ -0,0 +1,166 @@
+"""
+Tests for streaming results export.
+
+"""
+import csv
+from cStringIO import StringIO
+import json
+
+from tests import case
+
+
+
+class ExportTest(case.DBTestCase):
+    """Tests for results export rows and formats."""
+    @property
+    def export(self):
+        """The module under test."""
+        from moztrap.model.execution import export
+        return export
+
+
+    def setUp(self):
+        """Every test needs a run and an environment."""
+        self.run = self.F.RunFactory.create(name="Run")
+        self.env = self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["Linux"], "Browser": ["Firefox"]})[0]
+
+
+    def create_result(self, run=None, **kwargs):
+        """Create a result for a new runcaseversion in ``run``."""
+        kwargs.setdefault("environment", self.env)
+        kwargs.setdefault(
+            "runcaseversion",
+            self.F.RunCaseVersionFactory.create(run=run or self.run))
+        return self.F.ResultFactory.create(**kwargs)
+
+
+    def test_row(self):
+        """A row has all fields for the result."""
+        result = self.create_result(
+            tester=self.F.UserFactory.create(username="tester"),
+            status="failed",
+            comment="broken",
+            runcaseversion=self.F.RunCaseVersionFactory.create(
+                run=self.run, caseversion__name="Case"),
+            )
+        self.F.StepResultFactory.create(
+            result=result, bug_url="http://example.com/2")
+        self.F.StepResultFactory.create(
+            result=result, bug_url="http://example.com/1")
+        self.F.StepResultFactory.create(result=result)
+
+        [row] = list(self.export.rows(self.export.run_results(self.run)))
+
+        self.assertEqual(row.keys(), self.export.FIELDS)
+        self.assertEqual(row["result_id"], result.id)
+        self.assertEqual(row["run_id"], self.run.id)
+        self.assertEqual(row["run"], "Run")
+        self.assertEqual(
+            row["case_id"], result.runcaseversion.caseversion.case.id)
+        self.assertEqual(row["caseversion"], "Case")
+        self.assertEqual(row["environment"], "Firefox, Linux")
+        self.assertEqual(row["tester"], "tester")
+        self.assertEqual(row["status"], "failed")
+        self.assertEqual(row["comment"], "broken")
+        self.assertEqual(
+            row["bugs"], ["http://example.com/1", "http://example.com/2"])
+        self.assertEqual(row["created_on"], result.created_on.isoformat())
+
+
+    def test_chunks(self):
+        """Results in several chunks are all returned, in id order."""
+        results = [self.create_result() for i in range(5)]
+
+        rows = list(
+            self.export.rows(self.export.run_results(self.run), chunk_size=2))
+
+        self.assertEqual(
+            [row["result_id"] for row in rows], [r.id for r in results])
+
+
+    def test_queries_per_chunk(self):
+        """Queries depend on the number of chunks, not results."""
+        for i in range(4):
+            self.create_result()
+
+        # per chunk: results, bug URLs; first chunk also env labels; plus a
+        # final empty chunk
+        with self.assertNumQueries(6):
+            list(self.export.rows(
+                    self.export.run_results(self.run), chunk_size=2))
+
+
+    def test_latest_only(self):
+        """By default only the latest results are exported."""
+        rcv = self.F.RunCaseVersionFactory.create(run=self.run)
+        user = self.F.UserFactory.create()
+        self.create_result(runcaseversion=rcv, tester=user, status="started")
+        latest = self.create_result(
+            runcaseversion=rcv, tester=user, status="passed")
+
+        rows = list(self.export.rows(self.export.run_results(self.run)))
+        all_rows = list(self.export.rows(
+                self.export.run_results(self.run, latest=False)))
+
+        self.assertEqual([row["result_id"] for row in rows], [latest.id])
+        self.assertEqual(len(all_rows), 2)
+
+
+    def test_series(self):
+        """Exporting a series includes results of runs in the series."""
+        series = self.F.RunFactory.create(is_series=True)
+        member = self.F.RunFactory.create(series=series)
+        result = self.create_result(run=member)
+        self.create_result()
+
+        rows = list(self.export.rows(self.export.run_results(series)))
+
+        self.assertEqual([row["result_id"] for row in rows], [result.id])
+
+
+    def test_productversion(self):
+        """Exporting a product version includes results of all its runs."""
+        other = self.F.RunFactory.create(
+            productversion=self.run.productversion)
+        r1 = self.create_result()
+        r2 = self.create_result(run=other)
+        self.create_result(run=self.F.RunFactory.create())
+
+        rows = list(self.export.rows(
+                self.export.productversion_results(self.run.productversion)))
+
+        self.assertEqual(
+            [row["result_id"] for row in rows], [r1.id, r2.id])
+
+
+    def test_ndjson(self):
+        """NDJSON format is one JSON object per line."""
+        result = self.create_result()
+
+        lines = list(self.export.ndjson(
+                self.export.rows(self.export.run_results(self.run))))
+
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].endswith("\n"))
+        self.assertEqual(json.loads(lines[0])["result_id"], result.id)
+
+
+    def test_csv(self):
+        """CSV format has a header row and encodes as UTF-8."""
+        result = self.create_result(comment=u"\u2603")
+        self.F.StepResultFactory.create(
+            result=result, bug_url="http://example.com/1")
+        self.F.StepResultFactory.create(
+            result=result, bug_url="http://example.com/2")
+
+        data = "".join(self.export.csv_lines(
+                self.export.rows(self.export.run_results(self.run))))
+
+        header, row = list(csv.reader(StringIO(data)))
+        self.assertEqual(header, self.export.FIELDS)
+        row = dict(zip(header, row))
+        self.assertEqual(row["result_id"], str(result.id))
+        self.assertEqual(row["comment"].decode("utf-8"), u"\u2603")
+        self.assertEqual(
+            row["bugs"], "http://example.com/1 http://example.com/2")
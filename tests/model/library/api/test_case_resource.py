@@ -289,3 +289,56 @@ class CaseSelectionResourceTest(case.api.ApiTestCase):
             self.available_param,
             exp_objects=exp_objects,
             )
+
+
+    def names(self, params):
+        """Return names of the listed cases, given params."""
+        res = self.get_list(params=params)
+        return [o["name"] for o in res.json["objects"]]
+
+
+    def test_filter_name(self):
+        """The widget's name filter matches all its keywords."""
+        self.factory.create(name="Open the browser")
+        self.factory.create(name="Open the app")
+
+        self.assertEqual(
+            self.names({"filter-name": ["open", "browser"]}),
+            ["Open the browser"],
+            )
+
+
+    def test_filter_tag_and_author(self):
+        """The widget's tag and author filters are applied server-side."""
+        u = self.F.UserFactory.create()
+        t = self.F.TagFactory.create()
+        cv = self.factory.create(name="Tagged", user=u)
+        cv.tags.add(t)
+        self.factory.create(name="Other", user=u)
+
+        self.assertEqual(
+            self.names({"filter-tag": t.id, "filter-author": u.id}),
+            ["Tagged"],
+            )
+
+
+    def test_filter_priority(self):
+        """The widget's priority filter is applied server-side."""
+        self.factory.create(name="High", case__priority=1)
+        self.factory.create(name="Low", case__priority=4)
+
+        self.assertEqual(self.names({"filter-priority": "1"}), ["High"])
+
+
+    def test_pages_in_name_order(self):
+        """Offset pages are ordered by name, then id."""
+        for name in ["b", "a", "b", "c"]:
+            self.factory.create(name=name)
+
+        first = self.get_list(params={"limit": 2}).json["objects"]
+        second = self.get_list(
+            params={"limit": 2, "offset": 2}).json["objects"]
+
+        self.assertEqual(
+            [o["name"] for o in first + second], ["a", "b", "b", "c"])
+        self.assertLess(int(first[1]["id"]), int(second[0]["id"]))
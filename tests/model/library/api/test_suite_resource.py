@@ -299,3 +299,17 @@ class SuiteSelectionResourceTest(case.api.ApiTestCase):
                     ],
                 ) for s, rs in [(s1, runsuite3), (s2, runsuite4)]],
             )
+
+
+    def test_filter_name_and_author(self):
+        """The widget's name and author filters are applied server-side."""
+        u = self.F.UserFactory.create()
+        self.factory.create(name="Smoke tests", user=u)
+        self.factory.create(name="Smoke tests 2")
+        self.factory.create(name="Other", user=u)
+
+        res = self.get_list(
+            params={"filter-name": "smoke", "filter-author": u.id})
+
+        self.assertEqual(
+            [o["name"] for o in res.json["objects"]], ["Smoke tests"])
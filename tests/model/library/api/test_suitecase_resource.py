@@ -137,3 +137,88 @@ class SuiteCaseResourceTest(ApiCrudCases):
             "case's product must match suite's product."
         )
         self.assertEqual(res.text, error_message)
+
+
+    # setting a suite's cases
+
+    def cases_payload(self, suite, cases):
+        """Return PATCH payload setting ``cases`` as ``suite``'s cases."""
+        return {
+            u"suite": unicode(self.get_detail_url("suite", str(suite.id))),
+            u"cases": [
+                unicode(self.get_detail_url("case", str(c.id))) for c in cases],
+            }
+
+
+    def test_patch_sets_cases(self):
+        """PATCH with suite and cases sets the suite's cases in order."""
+        sc = self.F.SuiteCaseFactory.create(order=0)
+        s = sc.suite
+        c1 = self.F.CaseFactory.create(product=s.product)
+        c2 = self.F.CaseFactory.create(product=s.product)
+
+        res = self.patch(
+            self.get_list_url(self.resource_name),
+            params=self.credentials,
+            payload=self.cases_payload(s, [c1, sc.case, c2]),
+            )
+
+        self.assertEqual(res.json, {"added": 2, "removed": 0, "moved": 1})
+        self.assertEqual(
+            list(s.suitecases.values_list("case", "order")),
+            [(c1.id, 0), (sc.case.id, 1), (c2.id, 2)],
+            )
+        self.assertEqual(s.suitecases.get(case=sc.case).id, sc.id)
+        self.assertEqual(
+            s.suitecases.get(case=c1).created_by, self.user)
+
+
+    def test_patch_mismatched_product_error(self):
+        """PATCH errors if a case's product doesn't match suite's."""
+        s = self.F.SuiteFactory.create()
+        c = self.F.CaseFactory.create()
+
+        res = self.patch(
+            self.get_list_url(self.resource_name),
+            params=self.credentials,
+            payload=self.cases_payload(s, [c]),
+            status=400,
+            )
+
+        self.assertEqual(
+            res.text, "case's product must match suite's product.")
+        self.assertEqual(s.suitecases.count(), 0)
+
+
+    def test_patch_without_cases_error(self):
+        """PATCH must provide suite and a list of cases."""
+        s = self.F.SuiteFactory.create()
+        payload = self.cases_payload(s, [])
+        payload["cases"] = "foo"
+
+        res = self.patch(
+            self.get_list_url(self.resource_name),
+            params=self.credentials,
+            payload=payload,
+            status=400,
+            )
+
+        self.assertEqual(
+            res.text, "PATCH request must contain suite and cases list.")
+
+
+    def test_patch_bad_case_error(self):
+        """PATCH errors if a case doesn't exist."""
+        s = self.F.SuiteFactory.create()
+        payload = self.cases_payload(s, [])
+        payload["cases"] = [self.get_detail_url("case", "0")]
+
+        res = self.patch(
+            self.get_list_url(self.resource_name),
+            params=self.credentials,
+            payload=payload,
+            status=400,
+            )
+
+        self.assertEqual(
+            res.text, "suite and cases must be valid resource uris.")
@@ -299,6 +299,31 @@ class CaseVersionTest(case.DBTestCase):
         self.assertEqual(cv.latest, True)
 
 
+    def test_save_latest_unchanged(self):
+        """Saving without changing the latest version is no bulk change."""
+        from moztrap.model import cache
+        c = self.F.CaseFactory.create()
+        cv1 = self.F.CaseVersionFactory.create(
+            productversion__product=c.product,
+            productversion__version="1",
+            case=c,
+            )
+        cv2 = self.F.CaseVersionFactory.create(
+            productversion__product=c.product,
+            productversion__version="2",
+            case=c,
+            )
+        # the bulk generation of case versions, bumped by queryset updates
+        before = cache.generations([cv1])[0]
+
+        cv2.save()
+        # the instance's cc_version still matches the database
+        cv2.save()
+
+        self.assertEqual(cache.generations([cv1])[0], before)
+        self.assertEqual(self.refresh(cv2).latest, True)
+
+
     def test_skip_set_latest(self):
         """Passing skip_set_latest to save skips setting latest version."""
         cv1 = self.F.CaseVersionFactory.create(productversion__version="1")
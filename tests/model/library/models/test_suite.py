@@ -23,6 +23,21 @@ class SuiteTest(case.DBTestCase):
         self.assertEqual(new.cases.get(), sc.case)
 
 
+    def test_set_cases(self):
+        """set_cases sets the suite's cases in order, keeping suitecases."""
+        sc = self.F.SuiteCaseFactory.create(order=0)
+        s = sc.suite
+        c = self.F.CaseFactory.create(product=s.product)
+
+        s.set_cases([c, sc.case])
+
+        self.assertEqual(
+            list(s.suitecases.values_list("case", "order")),
+            [(c.id, 0), (sc.case.id, 1)],
+            )
+        self.assertEqual(s.suitecases.get(case=sc.case).id, sc.id)
+
+
     def test_clone_sets_draft_state(self):
         """Clone of active suite is still draft."""
         s = self.F.SuiteFactory(status="active")
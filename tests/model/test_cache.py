@@ -0,0 +1,491 @@
+"""
+Tests for generation-counter cache of model-derived data.
+
+"""
+from mock import patch
+
+from tests import case
+
+
+
+class CacheTestMixin(object):
+    """Common setup for model cache tests."""
+    @property
+    def cache(self):
+        """The module under test."""
+        from moztrap.model import cache
+        return cache
+
+
+    def setUp(self):
+        """Start every test with an empty cache and no stats."""
+        super(CacheTestMixin, self).setUp()
+        self.cache.get_backend().clear()
+        self.cache.stats.reset()
+
+
+
+class GenerationsTest(CacheTestMixin, case.DBTestCase):
+    """Tests for generation counters and the MTModel hooks that bump them."""
+    def assertBumped(self, dependency, func):
+        """Assert that calling ``func`` changes generation of ``dependency``."""
+        before = self.cache.generations([dependency])
+        func()
+        self.assertNotEqual(self.cache.generations([dependency]), before)
+
+
+    def assertNotBumped(self, dependency, func):
+        """Assert calling ``func`` doesn't change ``dependency`` generation."""
+        before = self.cache.generations([dependency])
+        func()
+        self.assertEqual(self.cache.generations([dependency]), before)
+
+
+    def test_stable(self):
+        """Generations don't change by themselves."""
+        p = self.F.ProductFactory.create()
+
+        self.assertEqual(
+            self.cache.generations([p, self.model.Product]),
+            self.cache.generations([p, self.model.Product]),
+            )
+
+
+    def test_create(self):
+        """Creating an instance bumps its model's generation."""
+        self.assertBumped(self.model.Product, self.F.ProductFactory.create)
+
+
+    def test_save(self):
+        """Saving an instance bumps its generation and its model's."""
+        p = self.F.ProductFactory.create()
+
+        self.assertBumped(p, p.save)
+        self.assertBumped(self.model.Product, p.save)
+
+
+    def test_save_other(self):
+        """Saving an instance doesn't bump other instances' generations."""
+        p = self.F.ProductFactory.create()
+        other = self.F.ProductFactory.create()
+
+        self.assertNotBumped(p, other.save)
+
+
+    def test_delete(self):
+        """Deleting bumps generations of the instance and its cascade."""
+        pv = self.F.ProductVersionFactory.create()
+
+        self.assertBumped(pv, pv.product.delete)
+
+
+    def test_undelete(self):
+        """Undeleting bumps generations of the instance and its cascade."""
+        pv = self.F.ProductVersionFactory.create()
+        pv.product.delete()
+        product = self.refresh(pv.product)
+
+        self.assertBumped(pv, product.undelete)
+
+
+    def test_permanent_delete(self):
+        """Permanently deleting bumps the model generation."""
+        p = self.F.ProductFactory.create()
+
+        self.assertBumped(
+            self.model.Product, lambda: p.delete(permanent=True))
+
+
+    def test_queryset_update(self):
+        """Queryset update bumps every instance of the model."""
+        p = self.F.ProductFactory.create()
+
+        self.assertBumped(
+            p, lambda: self.model.Product.objects.update(name="Foo"))
+
+
+    def test_queryset_update_no_rows(self):
+        """Queryset update of no rows doesn't bump anything."""
+        p = self.F.ProductFactory.create()
+
+        self.assertNotBumped(
+            p,
+            lambda: self.model.Product.objects.filter(
+                name="nonexistent").update(name="Foo"),
+            )
+
+
+    def test_related(self):
+        """A related generation is bumped only by ``bump_related``."""
+        p = self.F.ProductFactory.create()
+        other = self.F.ProductFactory.create()
+        related = (self.model.Product, p.pk, "things")
+
+        self.assertNotBumped(related, p.save)
+        self.assertNotBumped(
+            related,
+            lambda: self.cache.bump_related(
+                self.model.Product, [other.pk], "things"),
+            )
+        self.assertBumped(
+            related,
+            lambda: self.cache.bump_related(
+                self.model.Product, [p.pk], "things"),
+            )
+
+
+    def test_related_bulk(self):
+        """Queryset update bumps related generations of every instance."""
+        p = self.F.ProductFactory.create()
+
+        self.assertBumped(
+            (self.model.Product, p.pk, "things"),
+            lambda: self.model.Product.objects.update(name="Foo"),
+            )
+
+
+    def test_result_related(self):
+        """Saving a result bumps its runcaseversion's and run's results."""
+        rcv = self.F.RunCaseVersionFactory.create()
+
+        self.assertBumped(
+            (self.model.RunCaseVersion, rcv.pk, "results"),
+            lambda: self.F.ResultFactory.create(runcaseversion=rcv),
+            )
+        self.assertBumped(
+            (self.model.Run, rcv.run.pk, "results"),
+            lambda: self.F.ResultFactory.create(runcaseversion=rcv),
+            )
+
+
+    def test_queryset_delete(self):
+        """Queryset delete bumps the deleted instances."""
+        p = self.F.ProductFactory.create()
+
+        self.assertBumped(p, lambda: self.model.Product.objects.all().delete())
+
+
+    def test_queryset_permanent_delete(self):
+        """Queryset permanent delete bumps the model generation."""
+        self.F.ProductFactory.create()
+
+        self.assertBumped(
+            self.model.Product,
+            lambda: self.model.Product.objects.all().delete(permanent=True),
+            )
+
+
+    def test_m2m(self):
+        """Changing an m2m relation bumps instances on both sides."""
+        pv = self.F.ProductVersionFactory.create()
+        env = self.F.EnvironmentFactory.create()
+
+        self.assertBumped(pv, lambda: pv.environments.add(env))
+        self.assertBumped(env, lambda: pv.environments.remove(env))
+        self.assertBumped(env, lambda: pv.environments.clear())
+
+
+    def test_user(self):
+        """Saving a user (not an MTModel) bumps its generations."""
+        u = self.F.UserFactory.create()
+
+        self.assertBumped(u, lambda: u.save())
+        self.assertBumped(self.model.User, lambda: u.save())
+
+
+    def test_proxy(self):
+        """A proxy model shares generations with the model it proxies."""
+        from django.contrib.auth.models import User as BaseUser
+        u = self.F.UserFactory.create()
+
+        self.assertEqual(
+            self.cache.generations([BaseUser, (BaseUser, u.pk)]),
+            self.cache.generations([self.model.User, u]),
+            )
+
+
+    def test_model_name(self):
+        """A model can be given as an "app_label.ModelName" string."""
+        self.assertBumped(
+            "core.Product", lambda: self.F.ProductFactory.create())
+
+
+    def test_unknown_model_name(self):
+        """An unknown model name is a ValueError."""
+        with self.assertRaises(ValueError):
+            self.cache.generations(["core.Bogus"])
+
+
+    def test_evicted_counter(self):
+        """A counter that's evicted comes back with a new value."""
+        p = self.F.ProductFactory.create()
+        before = self.cache.generations([p])
+
+        self.cache.get_backend().clear()
+
+        with patch(
+                "moztrap.model.cache._initial_generation",
+                lambda: before[1] + 1):
+            self.assertNotEqual(self.cache.generations([p]), before)
+
+
+
+class ObjectGenerationsTest(CacheTestMixin, case.DBTestCase):
+    """Tests for ``object_generations``."""
+    def test_matches_generations(self):
+        """Returns the same generations as ``generations`` would."""
+        p = self.F.ProductFactory.create()
+        p.save()
+
+        bulk, objects = self.cache.object_generations(
+            self.model.Product, [p.pk])
+
+        self.assertEqual([bulk] + objects, self.cache.generations([p]))
+
+
+    def test_missing(self):
+        """An instance never bumped has generation None, until it is."""
+        p = self.F.ProductFactory.create()
+        self.cache.get_backend().clear()
+
+        bulk, objects = self.cache.object_generations(
+            self.model.Product, [p.pk])
+        self.assertEqual(objects, [None])
+
+        p.save()
+        bulk, objects = self.cache.object_generations(
+            self.model.Product, [p.pk])
+        self.assertIsNotNone(objects[0])
+
+
+
+class PendingTest(CacheTestMixin, case.DBTestCase):
+    """Tests for bumping generations again after a transaction."""
+    def setUp(self):
+        """Start with nothing pending."""
+        super(PendingTest, self).setUp()
+        self.cache.discard_pending()
+        self.addCleanup(self.cache.discard_pending)
+
+
+    def test_flush_bumps_again(self):
+        """A value cached before commit isn't found after it."""
+        p = self.F.ProductFactory.create()
+        p.name = "new"
+        p.save()
+        # e.g. another connection reading the pre-commit data
+        self.cache.cached("foo", [p], lambda: "old")
+
+        self.cache.flush_pending()
+
+        self.assertEqual(self.cache.cached("foo", [p], lambda: "new"), "new")
+
+
+    def test_flush_once(self):
+        """Pending bumps are only flushed once."""
+        self.F.ProductFactory.create()
+        self.cache.flush_pending()
+        before = self.cache.generations([self.model.Product])
+
+        self.cache.flush_pending()
+
+        self.assertEqual(
+            self.cache.generations([self.model.Product]), before)
+
+
+    def test_discard(self):
+        """Discarded pending bumps aren't flushed."""
+        self.F.ProductFactory.create()
+        before = self.cache.generations([self.model.Product])
+
+        self.cache.discard_pending()
+        self.cache.flush_pending()
+
+        self.assertEqual(
+            self.cache.generations([self.model.Product]), before)
+
+
+    def test_not_managed(self):
+        """Outside a transaction, writes are committed; nothing's pending."""
+        with patch("moztrap.model.cache.transaction.is_managed", lambda: False):
+            self.F.ProductFactory.create()
+        before = self.cache.generations([self.model.Product])
+
+        self.cache.flush_pending()
+
+        self.assertEqual(
+            self.cache.generations([self.model.Product]), before)
+
+
+
+class CachedTest(CacheTestMixin, case.DBTestCase):
+    """Tests for the ``cached`` function."""
+    def compute(self, value):
+        """Return a callable that counts its calls and returns ``value``."""
+        def compute():
+            self.calls += 1
+            return value
+        self.calls = 0
+        return compute
+
+
+    def test_hit(self):
+        """Second lookup with unchanged dependencies is a hit."""
+        p = self.F.ProductFactory.create()
+        compute = self.compute("value")
+
+        self.assertEqual(self.cache.cached("test:p", [p], compute), "value")
+        self.assertEqual(self.cache.cached("test:p", [p], compute), "value")
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(
+            self.cache.stats.get("test"),
+            {"hits": 1, "misses": 1, "hit_rate": 0.5},
+            )
+
+
+    def test_not_stored_from_replica(self):
+        """Values computed while reading from a replica aren't cached."""
+        from moztrap.deploy.routers import replica_reads
+        p = self.F.ProductFactory.create()
+        compute = self.compute("value")
+
+        with replica_reads("default"):
+            self.assertEqual(
+                self.cache.cached("test:p", [p], compute), "value")
+        self.cache.cached("test:p", [p], compute)
+
+        self.assertEqual(self.calls, 2)
+
+
+    def test_hit_from_replica(self):
+        """Values cached from the primary are used when reading a replica."""
+        from moztrap.deploy.routers import replica_reads
+        p = self.F.ProductFactory.create()
+        compute = self.compute("value")
+
+        self.cache.cached("test:p", [p], compute)
+        with replica_reads("default"):
+            self.cache.cached("test:p", [p], compute)
+
+        self.assertEqual(self.calls, 1)
+
+
+    def test_invalidated(self):
+        """Changing a dependency makes the next lookup a miss."""
+        p = self.F.ProductFactory.create()
+        compute = self.compute("value")
+        self.cache.cached("test:p", [p], compute)
+
+        p.save()
+        self.cache.cached("test:p", [p], compute)
+
+        self.assertEqual(self.calls, 2)
+
+
+    def test_model_dependency(self):
+        """Depending on a model, any new instance invalidates."""
+        compute = self.compute("value")
+        self.cache.cached("test:all", [self.model.Product], compute)
+
+        self.F.ProductFactory.create()
+        self.cache.cached("test:all", [self.model.Product], compute)
+
+        self.assertEqual(self.calls, 2)
+
+
+    def test_none(self):
+        """A computed None is cached."""
+        compute = self.compute(None)
+
+        self.assertIsNone(self.cache.cached("test:none", [], compute))
+        self.assertIsNone(self.cache.cached("test:none", [], compute))
+
+        self.assertEqual(self.calls, 1)
+
+
+    def test_long_key(self):
+        """Long keys are hashed, keeping their namespace."""
+        key = self.cache.make_key("test:" + "x" * 300, [])
+
+        self.assertTrue(key.startswith("mt:test:"))
+        self.assertLess(len(key), 250)
+
+
+    def test_backend_setting(self):
+        """Backend is the MODEL_CACHE alias."""
+        self.cache.reset_backend()
+        try:
+            with self.settings(
+                    CACHES={
+                        "default": {
+                            "BACKEND":
+                                "django.core.cache.backends.locmem.LocMemCache",
+                            },
+                        "other": {
+                            "BACKEND":
+                                "django.core.cache.backends.dummy.DummyCache",
+                            },
+                        },
+                    MODEL_CACHE="other"):
+                backend = self.cache.get_backend()
+        finally:
+            self.cache.reset_backend()
+
+        self.assertEqual(backend.__class__.__name__, "DummyCache")
+
+
+
+class FingerprintTest(CacheTestMixin, case.DBTestCase):
+    """Tests for the ``fingerprint`` function."""
+    def test_stable(self):
+        """Same dependencies and parts give the same fingerprint."""
+        self.assertEqual(
+            self.cache.fingerprint(["core.Product"], "a", 1),
+            self.cache.fingerprint(["core.Product"], "a", 1),
+            )
+
+
+    def test_dependency_changed(self):
+        """Fingerprint changes when a dependency does."""
+        before = self.cache.fingerprint(["core.Product"])
+
+        self.F.ProductFactory.create()
+
+        self.assertNotEqual(self.cache.fingerprint(["core.Product"]), before)
+
+
+    def test_parts(self):
+        """Fingerprint varies with the extra parts."""
+        self.assertNotEqual(
+            self.cache.fingerprint(["core.Product"], "a"),
+            self.cache.fingerprint(["core.Product"], "b"),
+            )
+
+
+
+class CacheStatsTest(case.TestCase):
+    """Tests for CacheStats."""
+    @property
+    def stats(self):
+        """A fresh CacheStats instance."""
+        from moztrap.model.cache import CacheStats
+        return CacheStats()
+
+
+    def test_totals(self):
+        """Without a namespace, returns totals across namespaces."""
+        stats = self.stats
+        stats.record("a", True)
+        stats.record("b", False)
+        stats.record("b", True)
+
+        self.assertEqual(stats.namespaces(), ["a", "b"])
+        self.assertEqual(stats.get()["hits"], 2)
+        self.assertEqual(stats.get()["misses"], 1)
+
+
+    def test_empty(self):
+        """No lookups is a hit rate of zero."""
+        self.assertEqual(
+            self.stats.get("a"), {"hits": 0, "misses": 0, "hit_rate": 0.0})
@@ -0,0 +1,483 @@
+"""
+Tests for MTResource and other API base classes.
+
+"""
+from django.db import connection
+
+from tests import case
+
+
+
+class RelationGraphTest(case.DBTestCase):
+    """Tests for relation_graph."""
+    @property
+    def relation_graph(self):
+        """The function under test."""
+        from moztrap.model.mtapi import relation_graph
+        return relation_graph
+
+
+    def test_to_one(self):
+        """Non-full to-one fields are joined."""
+        from moztrap.model.library.api import SuiteResource
+
+        self.assertEqual(
+            self.relation_graph(SuiteResource()), (["product"], []))
+
+
+    def test_full_to_many(self):
+        """Related fields under a full to-many field are prefetched."""
+        from moztrap.model.environments.api import CategoryResource
+
+        self.assertEqual(
+            self.relation_graph(CategoryResource()),
+            ([], ["elements", "elements__category"]),
+            )
+
+
+    def test_meta_lookups(self):
+        """Lookups declared in Meta are included."""
+        from moztrap.model.execution.api import RunResource
+
+        select, prefetch = self.relation_graph(RunResource())
+
+        self.assertIn("productversion__product", select)
+        self.assertIn("productversion", select)
+        self.assertIn("runcaseversions", prefetch)
+
+
+    def test_prefix(self):
+        """Lookups are prefixed with the path to the resource."""
+        from moztrap.model.library.api import SuiteResource
+
+        self.assertEqual(
+            self.relation_graph(SuiteResource(), "suite__", True),
+            ([], ["suite__product"]),
+            )
+
+
+
+class ListQueryCountTest(case.api.ApiTestCase):
+    """Query counts for list endpoints don't grow with the page size."""
+    def count_queries(self, resource_name, limit):
+        """Return number of queries to GET a page of ``limit`` objects."""
+        old_debug_cursor = connection.use_debug_cursor
+        connection.use_debug_cursor = True
+        # queries are reset when the request starts
+        try:
+            res = self.get(
+                self.get_list_url(resource_name), params={"limit": limit})
+        finally:
+            connection.use_debug_cursor = old_debug_cursor
+        self.assertEqual(len(res.json["objects"]), limit)
+        return len(connection.queries)
+
+
+    def assertConstantQueries(self, resource_name, create):
+        """Assert that listing 1 or 5 objects takes the same queries."""
+        for i in range(5):
+            create()
+
+        self.assertEqual(
+            self.count_queries(resource_name, 1),
+            self.count_queries(resource_name, 5),
+            )
+
+
+    def create_caseversion(self, **kwargs):
+        """Create a caseversion with steps, environments and tags."""
+        cv = self.F.CaseVersionFactory.create(**kwargs)
+        self.F.CaseStepFactory.create(caseversion=cv, number=1)
+        self.F.CaseStepFactory.create(caseversion=cv, number=2)
+        cv.environments.add(*self.F.EnvironmentFactory.create_full_set(
+                {"OS": ["Linux", "Windows"]}))
+        cv.tags.add(self.F.TagFactory.create(product=cv.productversion.product))
+        return cv
+
+
+    def test_runcaseversion(self):
+        self.assertConstantQueries(
+            "runcaseversion",
+            lambda: self.F.RunCaseVersionFactory.create(
+                caseversion=self.create_caseversion()),
+            )
+
+
+    def test_run(self):
+        def create():
+            run = self.F.RunFactory.create()
+            run.environments.add(*self.F.EnvironmentFactory.create_full_set(
+                    {"OS": ["Linux", "Windows"]}))
+            self.F.RunCaseVersionFactory.create(run=run)
+
+        self.assertConstantQueries("run", create)
+
+
+    def test_caseversion(self):
+        self.assertConstantQueries("caseversion", self.create_caseversion)
+
+
+    def test_caseselection(self):
+        self.assertConstantQueries(
+            "caseselection",
+            lambda: self.create_caseversion(
+                created_by=self.F.UserFactory.create()),
+            )
+
+
+    def test_caseversionselection(self):
+        self.assertConstantQueries(
+            "caseversionselection", self.create_caseversion)
+
+
+    def test_suiteselection(self):
+        self.assertConstantQueries(
+            "suiteselection", self.F.SuiteFactory.create)
+
+
+    def test_product(self):
+        def create():
+            pv = self.F.ProductVersionFactory.create()
+            self.F.ProductVersionFactory.create(product=pv.product)
+
+        self.assertConstantQueries("product", create)
+
+
+    def test_environment(self):
+        self.assertConstantQueries(
+            "environment",
+            lambda: self.F.EnvironmentFactory.create_full_set(
+                {"OS": ["Linux"], "Browser": ["Firefox"]}),
+            )
+
+
+    def test_category(self):
+        def create():
+            category = self.F.CategoryFactory.create()
+            self.F.ElementFactory.create(category=category)
+            self.F.ElementFactory.create(category=category)
+
+        self.assertConstantQueries("category", create)
+
+
+
+class SparseFieldsTest(case.api.ApiTestCase):
+    """Tests for ``?fields=`` sparse fieldsets."""
+    @property
+    def resource_name(self):
+        return "caseversion"
+
+
+    def test_only_requested_fields(self):
+        """Only requested fields and resource_uri are returned."""
+        cv = self.F.CaseVersionFactory.create(name="Foo")
+
+        res = self.get_list(params={"fields": "id,name"})
+
+        self.assertEqual(
+            res.json["objects"],
+            [{
+                    u"id": unicode(cv.id),
+                    u"name": u"Foo",
+                    u"resource_uri": unicode(
+                        self.get_detail_url("caseversion", cv.id)),
+                    }]
+            )
+
+
+    def test_detail(self):
+        """Sparse fieldsets work for detail views as well."""
+        cv = self.F.CaseVersionFactory.create(name="Foo")
+
+        res = self.get_detail(cv.id, params={"fields": "name,case"})
+
+        self.assertEqual(
+            sorted(res.json.keys()), [u"case", u"name", u"resource_uri"])
+        self.assertEqual(
+            res.json["case"], unicode(self.get_detail_url("case", cv.case.id)))
+
+
+    def test_dehydrate_extras(self):
+        """Keys added by dehydrate are returned only if requested."""
+        self.F.RunFactory.create(productversion__product__name="Foo")
+
+        res = self.get(
+            self.get_list_url("run"), params={"fields": "id,product_name"})
+
+        self.assertEqual(
+            sorted(res.json["objects"][0].keys()),
+            [u"id", u"product_name", u"resource_uri"],
+            )
+        self.assertEqual(res.json["objects"][0]["product_name"], u"Foo")
+
+
+    def test_narrows_projection(self):
+        """Model fields that weren't requested aren't loaded."""
+        from moztrap.model.library.api import CaseVersionResource
+        resource = CaseVersionResource()
+        request = self.factory.get("/", {"fields": "name,case"})
+
+        qs = resource.get_object_list(request)
+
+        self.assertEqual(
+            qs.query.deferred_loading, (set(["case", "id", "name"]), False))
+
+
+    def test_unknown_field(self):
+        """Requesting a field that doesn't exist just doesn't return it."""
+        self.F.CaseVersionFactory.create()
+
+        res = self.get_list(params={"fields": "id,bogus"})
+
+        self.assertEqual(
+            sorted(res.json["objects"][0].keys()), [u"id", u"resource_uri"])
+
+
+    def test_fewer_queries(self):
+        """Unrequested related fields aren't fetched."""
+        cv = self.F.CaseVersionFactory.create()
+        self.F.CaseStepFactory.create(caseversion=cv)
+
+        with self.assertNumQueries(2):
+            self.get_list(params={"fields": "id,name"})
+
+
+    def list_queries(self, resource_name, fields):
+        """Return number of queries to get a list of ``fields``, uncached."""
+        from moztrap.debug.queries import QueryLog
+        from moztrap.model import cache
+        cache.get_backend().clear()
+        with QueryLog() as log:
+            self.get(
+                self.get_list_url(resource_name), params={"fields": fields})
+        return log.count
+
+
+    def test_dehydrate_skipped(self):
+        """Unrequested dehydrate keys don't cost queries per object."""
+        self.F.CaseVersionFactory.create()
+        one = self.list_queries("caseversionselection", "id,name")
+        for i in range(3):
+            self.F.CaseVersionFactory.create()
+
+        self.assertEqual(
+            self.list_queries("caseversionselection", "id,name"), one)
+
+
+    def test_dehydrate_fields_loaded(self):
+        """Fields read by dehydrate are loaded if its keys are requested."""
+        cv = self.F.CaseVersionFactory.create(case__priority=2)
+        one = self.list_queries("caseversionselection", "id,priority")
+        for i in range(3):
+            self.F.CaseVersionFactory.create()
+
+        self.assertEqual(
+            self.list_queries("caseversionselection", "id,priority"), one)
+        res = self.get(
+            self.get_list_url("caseversionselection"),
+            params={"fields": "id,priority,productversion_name"},
+            )
+        data = [o for o in res.json["objects"] if o["id"] == unicode(cv.id)]
+        self.assertEqual(data[0]["priority"], u"2")
+        self.assertEqual(
+            data[0]["productversion_name"], cv.productversion.name)
+
+
+    def test_loaded_fields(self):
+        """Requested dehydrate keys load all the fields dehydrate reads."""
+        from moztrap.model.mtapi import loaded_fields
+        from moztrap.model.library.api import CaseVersionSelectionResource
+        resource = CaseVersionSelectionResource()
+
+        self.assertEqual(
+            loaded_fields(resource, set(["id"])), set(["id"]))
+        self.assertEqual(
+            loaded_fields(resource, set(["id", "priority"])),
+            set(["id", "priority", "case", "productversion"]),
+            )
+
+
+    def test_loaded_fields_undeclared(self):
+        """All fields are loaded if dehydrate's keys aren't declared."""
+        from moztrap.model.mtapi import loaded_fields
+        from moztrap.model.library.api import CaseVersionSelectionResource
+
+        class Resource(CaseVersionSelectionResource):
+            class Meta(CaseVersionSelectionResource.Meta):
+                dehydrated = None
+
+        self.assertIsNone(loaded_fields(Resource(), set(["id"])))
+
+
+    @property
+    def factory(self):
+        """A request factory."""
+        from django.test.client import RequestFactory
+        return RequestFactory()
+
+
+
+class CursorPaginationTest(case.api.ApiTestCase):
+    """Tests for ``?cursor=`` pagination."""
+    @property
+    def resource_name(self):
+        return "runcaseversion"
+
+
+    def test_pages(self):
+        """Paging by cursor returns every object once, in id order."""
+        rcvs = [self.F.RunCaseVersionFactory.create() for i in range(5)]
+
+        seen = []
+        res = self.get_list(params={"cursor": "", "limit": 2})
+        while True:
+            seen.extend(int(o["id"]) for o in res.json["objects"])
+            next_url = res.json["meta"]["next"]
+            if next_url is None:
+                break
+            res = self.app.get(next_url)
+
+        self.assertEqual(seen, [rcv.id for rcv in rcvs])
+
+
+    def test_meta(self):
+        """Meta gives the cursor for the next page, and no total count."""
+        rcvs = [self.F.RunCaseVersionFactory.create() for i in range(3)]
+
+        res = self.get_list(params={"cursor": rcvs[0].id, "limit": 1})
+
+        self.assertEqual(
+            [o["id"] for o in res.json["objects"]], [unicode(rcvs[1].id)])
+        meta = res.json["meta"]
+        self.assertEqual(meta["cursor"], rcvs[0].id)
+        self.assertEqual(meta["next_cursor"], rcvs[1].id)
+        self.assertNotIn("total_count", meta)
+        self.assertIn("cursor=%s" % rcvs[1].id, meta["next"])
+        self.assertNotIn("offset", meta["next"])
+
+
+    def test_last_page(self):
+        """A full last page has no next cursor."""
+        self.F.RunCaseVersionFactory.create()
+        self.F.RunCaseVersionFactory.create()
+
+        res = self.get_list(params={"cursor": "", "limit": 2})
+
+        self.assertEqual(len(res.json["objects"]), 2)
+        self.assertIsNone(res.json["meta"]["next_cursor"])
+        self.assertIsNone(res.json["meta"]["next"])
+
+
+    def test_with_fields(self):
+        """Cursor pagination combines with sparse fieldsets."""
+        rcv = self.F.RunCaseVersionFactory.create()
+
+        res = self.get_list(params={"cursor": "", "fields": "id"})
+
+        self.assertEqual(
+            res.json["objects"],
+            [{
+                    u"id": unicode(rcv.id),
+                    u"resource_uri": unicode(
+                        self.get_detail_url("runcaseversion", rcv.id)),
+                    }]
+            )
+
+
+    def test_bad_cursor(self):
+        """A non-integer cursor is a 400."""
+        self.get_list(params={"cursor": "foo"}, status=400)
+
+
+    def test_order_by(self):
+        """order_by can't be combined with a cursor."""
+        self.get_list(params={"cursor": "", "order_by": "id"}, status=400)
+
+
+
+class ConditionalGetTest(case.api.ApiTestCase):
+    """Tests for ETags and conditional GETs of API resources."""
+    @property
+    def resource_name(self):
+        return "caseversion"
+
+
+    def get_url(self, url=None, etag=None, status=200, **params):
+        """GET ``url`` (default list URL) with If-None-Match ``etag``."""
+        if url is None:
+            url = self.get_list_url(self.resource_name)
+        params["format"] = "json"
+        headers = {}
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        return self.app.get(url, params=params, headers=headers, status=status)
+
+
+    def test_not_modified(self):
+        """A GET with a current If-None-Match is a 304."""
+        self.F.CaseVersionFactory.create()
+        etag = self.get_url().headers["ETag"]
+
+        self.get_url(etag=etag, status=304)
+
+
+    def test_changed(self):
+        """After a change to a model the resource shows, it's a 200."""
+        cv = self.F.CaseVersionFactory.create()
+        etag = self.get_url().headers["ETag"]
+
+        self.F.CaseStepFactory.create(caseversion=cv)
+
+        self.get_url(etag=etag, status=200)
+
+
+    def test_detail(self):
+        """Detail GETs are conditional too."""
+        cv = self.F.CaseVersionFactory.create()
+        url = self.get_detail_url(self.resource_name, cv.id)
+        etag = self.get_url(url).headers["ETag"]
+
+        self.get_url(url, etag=etag, status=304)
+
+
+    def test_varies_with_params(self):
+        """Different query parameters get different ETags."""
+        self.F.CaseVersionFactory.create()
+
+        self.assertNotEqual(
+            self.get_url(limit=1).headers["ETag"],
+            self.get_url(limit=2).headers["ETag"],
+            )
+
+
+    def test_filter_models(self):
+        """Models crossed by filters are dependencies."""
+        cv = self.F.CaseVersionFactory.create()
+        suite = self.F.SuiteFactory.create(name="foo")
+        self.F.SuiteCaseFactory.create(suite=suite, case=cv.case)
+        etag = self.get_url(case__suites__name="foo").headers["ETag"]
+
+        suite.name = "bar"
+        suite.save()
+
+        self.get_url(etag=etag, status=200, case__suites__name="foo")
+
+
+
+class ResourceModelsTest(case.DBTestCase):
+    """Tests for resource_models."""
+    def test_models(self):
+        """Includes related, full-related, and Meta-declared models."""
+        from moztrap.model.mtapi import resource_models
+        from moztrap.model.execution.api import SuiteSelectionResource
+
+        self.assertEqual(
+            set(resource_models(SuiteSelectionResource())),
+            set([
+                    self.model.Suite,
+                    self.model.Product,
+                    self.model.Run,
+                    self.model.User,
+                    "library.SuiteCase",
+                    ]),
+            )
@@ -762,3 +762,122 @@ class OptimisticLockingTest(case.DBTestCase):
 
         with self.assertRaises(self.model.ConcurrencyError):
             p.save()
+
+
+
+class SetOrderedMembersTest(MTModelTestCase):
+    """Tests for set_ordered_members, using SuiteCase."""
+    def setUp(self):
+        """Creates a suite and cases for it."""
+        super(SetOrderedMembersTest, self).setUp()
+        self.suite = self.F.SuiteFactory.create()
+        self.cases = [
+            self.F.CaseFactory.create(product=self.suite.product)
+            for i in range(3)
+            ]
+
+
+    def set_members(self, members):
+        """Set ``members`` as the suite's cases; return diff sizes."""
+        from moztrap.model.mtmodel import set_ordered_members
+        return set_ordered_members(
+            self.model.SuiteCase,
+            "suite",
+            self.suite,
+            "case",
+            members,
+            user=self.user,
+            )
+
+
+    def add(self, case, order):
+        """Add ``case`` to the suite with given order; return suitecase."""
+        return self.F.SuiteCaseFactory.create(
+            suite=self.suite, case=case, order=order)
+
+
+    def members(self):
+        """Return list of (case, order) of the suite's suitecases."""
+        return [
+            (sc.case, sc.order)
+            for sc in self.suite.suitecases.order_by("order", "id")
+            ]
+
+
+    def test_adds(self):
+        """New members are inserted in order, tracking user."""
+        c1, c2, c3 = self.cases
+
+        added = self.set_members([c2, c1.id])
+
+        self.assertEqual(added, (2, 0, 0))
+        self.assertEqual(self.members(), [(c2, 0), (c1, 1)])
+        sc = self.suite.suitecases.all()[0]
+        self.assertEqual(sc.created_by, self.user)
+        self.assertEqual(sc.modified_by, self.user)
+
+
+    def test_reorder_keeps_ids(self):
+        """Reordering updates orders in place, one query per shift."""
+        c1, c2, c3 = self.cases
+        ids = [self.add(c, i).id for i, c in enumerate(self.cases)]
+
+        with self.assertNumQueries(3):
+            moved = self.set_members([c3, c1, c2])
+
+        self.assertEqual(moved, (0, 0, 3))
+        self.assertEqual(self.members(), [(c3, 0), (c1, 1), (c2, 2)])
+        self.assertEqual(
+            sorted(self.suite.suitecases.values_list("id", flat=True)), ids)
+        sc = self.suite.suitecases.get(case=c1)
+        self.assertEqual(sc.modified_by, self.user)
+
+
+    def test_removes(self):
+        """Associations of removed members are deleted permanently."""
+        c1, c2, c3 = self.cases
+        self.add(c1, 0)
+        sc2 = self.add(c2, 1)
+
+        removed = self.set_members([c2])
+
+        self.assertEqual(removed, (0, 1, 1))
+        self.assertEqual(self.members(), [(c2, 0)])
+        self.assertEqual(self.suite.suitecases.get().id, sc2.id)
+        self.assertEqual(self.model.SuiteCase.everything.count(), 1)
+
+
+    def test_duplicates(self):
+        """Duplicate members and associations are collapsed to the first."""
+        c1, c2, c3 = self.cases
+        sc = self.add(c1, 0)
+        self.add(c1, 1)
+
+        self.set_members([c1, c2, c1])
+
+        self.assertEqual(self.members(), [(c1, 0), (c2, 1)])
+        self.assertEqual(self.suite.suitecases.get(case=c1).id, sc.id)
+
+
+    def test_unchanged(self):
+        """Nothing is written if the members are unchanged."""
+        for i, c in enumerate(self.cases):
+            self.add(c, i)
+
+        with self.assertNumQueries(1):
+            unchanged = self.set_members(self.cases)
+
+        self.assertEqual(unchanged, (0, 0, 0))
+
+
+    def test_ignores_deleted(self):
+        """Soft-deleted associations are left alone."""
+        c1, c2, c3 = self.cases
+        deleted = self.add(c1, 0)
+        deleted.delete()
+
+        self.set_members([c1])
+
+        self.assertEqual(self.members(), [(c1, 0)])
+        self.assertNotEqual(self.suite.suitecases.get().id, deleted.id)
+        self.assertEqual(self.model.SuiteCase.everything.count(), 2)
@@ -0,0 +1,134 @@
+"""
+Query-count regression baselines for model-layer operations.
+
+Baselines are in ``query_baselines.json`` alongside this module; see
+``tests.case.baselines`` for how they're checked and updated.
+
+"""
+import os
+
+from django.core.urlresolvers import reverse
+from django.test.client import Client
+
+from tests import case
+
+
+
+class QueryBaselinesTest(case.QueryBaselineTestCase):
+    baseline_file = os.path.join(
+        os.path.dirname(__file__), "query_baselines.json")
+
+
+    def setUp(self):
+        """Set up environments and a product version with them."""
+        self.envs = self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["Linux", "Windows"], "Browser": ["Firefox", "Chrome"]})
+
+
+    def productversion(self, **kwargs):
+        """Return a new product version with all environments."""
+        return self.F.ProductVersionFactory.create(
+            environments=self.envs, **kwargs)
+
+
+    def test_run_lock_case_versions(self):
+        """Locking in the case versions of a run's suite of ``size`` cases."""
+        def setup(size):
+            pv = self.productversion()
+            suite = self.F.SuiteFactory.create(
+                product=pv.product, status="active")
+            for i in range(size):
+                cv = self.F.CaseVersionFactory.create(
+                    productversion=pv, status="active")
+                self.F.SuiteCaseFactory.create(
+                    suite=suite, case=cv.case, order=i)
+            run = self.F.RunFactory.create(productversion=pv)
+            self.F.RunSuiteFactory.create(run=run, suite=suite)
+            return run._lock_case_versions
+
+        self.assertQueryBaseline("run_lock_case_versions", setup)
+
+
+    def test_caseversion_save(self):
+        """Saving a case version of a case with ``size`` versions."""
+        def setup(size):
+            product = self.F.ProductFactory.create()
+            case = self.F.CaseFactory.create(product=product)
+            for i in range(size):
+                cv = self.F.CaseVersionFactory.create(
+                    case=case,
+                    productversion=self.productversion(
+                        product=product, version=str(i)),
+                    )
+            cv.name = "Renamed"
+            return cv.save
+
+        self.assertQueryBaseline("caseversion_save", setup)
+
+
+    def test_caseversion_clone(self):
+        """Cloning a case version with ``size`` steps."""
+        def setup(size):
+            cv = self.F.CaseVersionFactory.create(
+                productversion=self.productversion())
+            for i in range(size):
+                self.F.CaseStepFactory.create(caseversion=cv, number=i + 1)
+            return cv.clone
+
+        self.assertQueryBaseline("caseversion_clone", setup)
+
+
+    def test_product_reorder_versions(self):
+        """Reordering ``size`` versions of a product with ``size`` cases."""
+        def setup(size):
+            product = self.F.ProductFactory.create()
+            for i in range(size):
+                pv = self.productversion(product=product, version=str(i))
+                self.F.CaseVersionFactory.create(
+                    productversion=pv,
+                    case=self.F.CaseFactory.create(product=product),
+                    )
+            return product.reorder_versions
+
+        self.assertQueryBaseline("product_reorder_versions", setup)
+
+
+    def api_list(self, resource_name, **params):
+        """Return function to GET list of all of ``resource_name``."""
+        url = reverse(
+            "api_dispatch_list",
+            kwargs={
+                "resource_name": resource_name,
+                "api_name": self.model.API_VERSION,
+                },
+            )
+        params.update({"format": "json", "limit": 100})
+
+        def get():
+            response = Client().get(url, params)
+            self.assertEqual(response.status_code, 200)
+
+        return get
+
+
+    def test_api_caseversion_list(self):
+        """API list of ``size`` case versions of a product version."""
+        def setup(size):
+            pv = self.productversion()
+            for i in range(size):
+                cv = self.F.CaseVersionFactory.create(productversion=pv)
+                self.F.CaseStepFactory.create(caseversion=cv, number=1)
+            return self.api_list("caseversion", productversion=pv.id)
+
+        self.assertQueryBaseline("api_caseversion_list", setup)
+
+
+    def test_api_run_list(self):
+        """API list of ``size`` runs of a product version."""
+        def setup(size):
+            pv = self.productversion()
+            for i in range(size):
+                self.F.RunFactory.create(productversion=pv)
+            return self.api_list("run", productversion=pv.id)
+
+        self.assertQueryBaseline("api_run_list", setup)
@@ -0,0 +1,105 @@
+"""
+Tests for synthetic data generation.
+
+"""
+from tests import case
+
+
+
+class GeneratorTest(case.DBTestCase):
+    """Tests for Generator."""
+    counts = {
+        "products": 2,
+        "versions": 2,
+        "cases": 3,
+        "steps": 2,
+        "suites": 2,
+        "environments": 3,
+        "runs": 2,
+        "run_cases": 2,
+        "results": 2,
+        }
+
+
+    def generate(self, **counts):
+        """Generate data at ``self.counts`` scale, updated by ``counts``."""
+        from moztrap.model.synthetic import Generator
+        scale = dict(self.counts, **counts)
+        return Generator(scale, batch_size=4).generate()
+
+
+    def test_counts(self):
+        """Generates the requested numbers of each kind of object."""
+        counts = self.generate()
+
+        self.assertEqual(counts["Product"], 2)
+        self.assertEqual(counts["ProductVersion"], 4)
+        self.assertEqual(counts["Case"], 6)
+        self.assertEqual(counts["CaseVersion"], 12)
+        self.assertEqual(counts["CaseStep"], 24)
+        self.assertEqual(counts["Environment"], 3)
+        self.assertEqual(counts["Run"], 8)
+        self.assertEqual(counts["RunCaseVersion"], 16)
+        self.assertEqual(counts["Result"], 32)
+
+        self.assertEqual(self.model.CaseVersion.objects.count(), 12)
+        self.assertEqual(self.model.Result.objects.count(), 32)
+
+
+    def test_relationships(self):
+        """Generated objects are related as the models expect."""
+        self.generate()
+
+        pv = self.model.ProductVersion.objects.filter(version="2.0")[0]
+        self.assertTrue(pv.latest)
+        self.assertEqual(pv.environments.count(), 3)
+        self.assertEqual(pv.caseversions.filter(latest=True).count(), 3)
+
+        run = pv.runs.all()[0]
+        self.assertEqual(run.status, "active")
+        self.assertEqual(run.suites.count(), 2)
+        rcv = run.runcaseversions.all()[0]
+        self.assertEqual(rcv.environments.count(), 3)
+        self.assertEqual(rcv.caseversion.steps.count(), 2)
+        self.assertEqual(
+            len(rcv.caseversion.case.suites.all()), 1)
+
+        env = self.model.Environment.objects.all()[0]
+        self.assertEqual(env.elements.count(), 3)
+
+
+    def test_workitems(self):
+        """Work items are created, completed where there are done results."""
+        self.generate(results=0)
+
+        self.assertEqual(
+            self.model.WorkItem.objects.filter(completed=False).count(),
+            # runs x cases per run x environments
+            8 * 2 * 3,
+            )
+
+
+    def test_results_capped(self):
+        """There's at most one result per environment."""
+        counts = self.generate(results=5)
+
+        self.assertEqual(counts["Result"], 16 * 3)
+
+
+    def test_repeated(self):
+        """Generating again adds more data alongside existing data."""
+        self.generate()
+        self.generate()
+
+        self.assertEqual(self.model.Product.objects.count(), 4)
+        self.assertEqual(self.model.Result.objects.count(), 64)
+
+
+    def test_bumps_generations(self):
+        """Cache generations of generated models are bumped."""
+        from moztrap.model import cache
+        before = cache.generations([self.model.Result])
+
+        self.generate()
+
+        self.assertNotEqual(cache.generations([self.model.Result]), before)
@@ -0,0 +1,113 @@
+"""
+Tests for list item caching template tags.
+
+"""
+from django import template
+
+from tests import case
+
+from ..test_itemcache import ItemCacheTestMixin
+
+
+
+class CacheItemTest(ItemCacheTestMixin, case.DBTestCase):
+    """Tests for cacheitem template tag."""
+    def render(self, tpl, **context):
+        """Render template source ``tpl`` with ``context``."""
+        return template.Template(tpl).render(template.Context(context))
+
+
+    def test_cached(self):
+        """Contents are rendered once, then served from the cache."""
+        tpl = (
+            '{% load itemcache %}{% cacheitem "tag" tag %}'
+            "{{ tag.name }} {{ extra }}{% endcacheitem %}")
+        tag = self.F.TagFactory.create(name="foo")
+
+        self.assertEqual(self.render(tpl, tag=tag, extra="a"), "foo a")
+        self.assertEqual(self.render(tpl, tag=tag, extra="b"), "foo a")
+        self.assertEqual(self.hits(), 1)
+
+
+    def test_depends(self):
+        """Changes to models named after ``depends`` invalidate contents."""
+        tpl = (
+            '{% load itemcache %}{% cacheitem "tag" tag depends "core.Product" %}'
+            "{{ extra }}{% endcacheitem %}")
+        tag = self.F.TagFactory.create()
+
+        self.render(tpl, tag=tag, extra="a")
+        self.F.ProductFactory.create()
+
+        self.assertEqual(self.render(tpl, tag=tag, extra="b"), "b")
+
+
+    def test_depends_instances(self):
+        """Changes to instances (or lists of them) after ``depends`` count."""
+        tpl = (
+            '{% load itemcache %}{% cacheitem "tag" tag depends products %}'
+            "{{ extra }}{% endcacheitem %}")
+        tag = self.F.TagFactory.create()
+        product = self.F.ProductFactory.create()
+        products = self.model.Product.objects.all()
+
+        self.render(tpl, tag=tag, products=products, extra="a")
+        self.F.ProductFactory.create()
+        self.assertEqual(
+            self.render(tpl, tag=tag, products=products, extra="b"), "a")
+        product.save()
+
+        self.assertEqual(
+            self.render(tpl, tag=tag, products=products, extra="c"), "c")
+
+
+    def test_depends_related(self):
+        """Bumping a related generation after ``depends`` invalidates."""
+        from moztrap.model import cache
+        tpl = (
+            '{% load itemcache %}'
+            '{% cacheitem "tag" tag depends product|related:"things" %}'
+            "{{ extra }}{% endcacheitem %}")
+        tag = self.F.TagFactory.create()
+        product = self.F.ProductFactory.create()
+
+        self.render(tpl, tag=tag, product=product, extra="a")
+        product.save()
+        self.assertEqual(
+            self.render(tpl, tag=tag, product=product, extra="b"), "a")
+        cache.bump_related(self.model.Product, [product.pk], "things")
+
+        self.assertEqual(
+            self.render(tpl, tag=tag, product=product, extra="c"), "c")
+
+
+    def test_perms(self):
+        """Contents vary with the user's permissions named after ``perms``."""
+        tpl = (
+            "{% load itemcache permissions %}"
+            '{% cacheitem "tag" tag perms "tags.manage_tags" %}'
+            '{% if user|has_perm:"tags.manage_tags" %}edit{% endif %}'
+            "{% endcacheitem %}")
+        tag = self.F.TagFactory.create()
+        manager = self.F.UserFactory.create(permissions=["tags.manage_tags"])
+
+        self.assertEqual(self.render(tpl, tag=tag, user=manager), "edit")
+        self.assertEqual(
+            self.render(tpl, tag=tag, user=self.F.UserFactory.create()), "")
+
+
+    def test_contents_versioned(self):
+        """Different tag contents don't share cached items."""
+        tag = self.F.TagFactory.create(name="foo")
+
+        self.render(
+            '{% load itemcache %}{% cacheitem "tag" tag %}a{% endcacheitem %}',
+            tag=tag)
+
+        self.assertEqual(
+            self.render(
+                '{% load itemcache %}{% cacheitem "tag" tag %}b'
+                "{% endcacheitem %}",
+                tag=tag),
+            "b",
+            )
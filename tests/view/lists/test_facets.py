@@ -0,0 +1,315 @@
+"""
+Tests for faceted filter-option counts.
+
+"""
+from array import array
+
+from django.utils.datastructures import MultiValueDict
+from mock import patch
+
+from tests import case
+
+
+
+class BitmapTest(case.TestCase):
+    """Tests for bitmap helpers."""
+    @property
+    def facets(self):
+        """The module under test."""
+        from moztrap.view.lists import facets
+        return facets
+
+
+    def test_bitmap(self):
+        """Bitmap has bits at given positions set."""
+        self.assertEqual(self.facets.bitmap([0, 3, 9]), 0b1000001001)
+        self.assertEqual(self.facets.bitmap([]), 0)
+
+
+    def test_compact_sparse(self):
+        """Positions of a value found on few items are stored as an array."""
+        members = self.facets.compact([5, 2], 1000)
+
+        self.assertEqual(members, array("L", [2, 5]))
+
+
+    def test_compact_dense(self):
+        """Positions of a common value are stored as a bitmap."""
+        self.assertEqual(self.facets.compact([0, 1], 10), 0b11)
+
+
+    def test_mask_count(self):
+        """Masks count intersections with bitmaps and arrays alike."""
+        mask = self.facets.Mask(self.facets.bitmap([1, 2, 17]))
+
+        self.assertEqual(mask.count(0b110), 2)
+        self.assertEqual(mask.count(array("L", [2, 3, 17, 900])), 2)
+
+
+    def test_empty_mask_count(self):
+        """An empty mask counts nothing."""
+        mask = self.facets.Mask(0)
+
+        self.assertEqual(mask.count(array("L", [0, 8])), 0)
+
+
+
+class FacetIndexTest(case.DBTestCase):
+    """Tests for FacetIndex."""
+    def setUp(self):
+        """Start with an empty cache and a fresh index of caseversions."""
+        super(FacetIndexTest, self).setUp()
+        from moztrap.model import cache
+        cache.get_backend().clear()
+        from moztrap.view.lists.facets import FacetIndex
+        self.index = FacetIndex(
+            self.model.CaseVersion,
+            product="productversion__product",
+            facets={
+                "status": [],
+                "priority": [self.model.Case],
+                "tag": [],
+                },
+            )
+
+
+    def bind(self, **data):
+        """Return caseversion BoundFilterSet for given filter data."""
+        from moztrap.view.filters import CaseVersionFilterSet
+        return CaseVersionFilterSet().bind(MultiValueDict(data))
+
+
+    def counts(self, bfs=None, **data):
+        """Return counts for caseversions, given filters or filter data."""
+        if bfs is None:
+            bfs = self.bind(**data)
+        return self.index.counts(bfs, self.model.CaseVersion.objects.all())
+
+
+    def test_counts(self):
+        """Counts the items with each value of each facet."""
+        pv = self.F.ProductVersionFactory.create()
+        self.F.CaseVersionFactory.create(productversion=pv, status="active")
+        self.F.CaseVersionFactory.create(productversion=pv, status="active")
+        self.F.CaseVersionFactory.create(productversion=pv, status="draft")
+
+        self.assertEqual(
+            self.counts()["status"], {"active": 2, "draft": 1})
+
+
+    def test_other_facets_filter(self):
+        """Counts are of the items matching the other facets' filters."""
+        t = self.F.TagFactory.create()
+        pv = self.F.ProductVersionFactory.create()
+        cv = self.F.CaseVersionFactory.create(
+            productversion=pv, status="active")
+        cv.tags.add(t)
+        self.F.CaseVersionFactory.create(productversion=pv, status="draft")
+
+        counts = self.counts(**{"filter-tag": [str(t.id)]})
+
+        self.assertEqual(counts["status"], {"active": 1, "draft": 0})
+        self.assertEqual(counts["tag"], {t.id: 1})
+
+
+    def test_own_facet_doesnt_filter(self):
+        """A facet's own selected values don't restrict its counts."""
+        pv = self.F.ProductVersionFactory.create()
+        self.F.CaseVersionFactory.create(productversion=pv, status="active")
+        self.F.CaseVersionFactory.create(productversion=pv, status="draft")
+
+        counts = self.counts(**{"filter-status": ["active"]})
+
+        self.assertEqual(counts["status"], {"active": 1, "draft": 1})
+
+
+    def test_products(self):
+        """Counts are summed across products, unless product is filtered."""
+        cv = self.F.CaseVersionFactory.create(status="active")
+        self.F.CaseVersionFactory.create(status="active")
+
+        self.assertEqual(self.counts()["status"], {"active": 2})
+        self.assertEqual(
+            self.counts(
+                **{"filter-product": [str(cv.productversion.product.id)]}
+                )["status"],
+            {"active": 1},
+            )
+
+
+    def test_other_filters(self):
+        """Filters that aren't facets are applied with a query."""
+        pv = self.F.ProductVersionFactory.create()
+        self.F.CaseVersionFactory.create(
+            productversion=pv, name="foo", status="active")
+        self.F.CaseVersionFactory.create(
+            productversion=pv, name="bar", status="draft")
+
+        self.assertEqual(
+            self.counts(**{"filter-name": ["foo"]})["status"],
+            {"active": 1, "draft": 0},
+            )
+
+
+    def test_no_queries_when_built(self):
+        """Once the index is built, counting doesn't touch the database."""
+        self.F.CaseVersionFactory.create()
+        self.counts()
+        bfs = self.bind(**{"filter-status": ["draft"]})
+
+        with self.assertNumQueries(0):
+            self.counts(bfs)
+
+
+    def test_refreshed(self):
+        """The index is rebuilt when the items change."""
+        cv = self.F.CaseVersionFactory.create(status="draft")
+        self.counts()
+
+        cv.status = "active"
+        cv.save()
+
+        counts = self.counts()["status"]
+        self.assertEqual(counts["active"], 1)
+        self.assertEqual(counts.get("draft", 0), 0)
+
+
+    def test_refreshes_only_changed_facet(self):
+        """A change to a facet's dependency rebuilds only that facet."""
+        cv = self.F.CaseVersionFactory.create()
+        self.counts()
+
+        cv.case.priority = 2
+        cv.case.save()
+        bfs = self.bind()
+
+        # only the priority facet is re-read
+        with self.assertNumQueries(1):
+            counts = self.counts(bfs)
+        self.assertEqual(counts["priority"], {2: 1})
+
+
+
+    def test_reads_only_changed_items(self):
+        """A change to an item re-reads only its facet values."""
+        cv = self.F.CaseVersionFactory.create(status="draft")
+        self.F.CaseVersionFactory.create(status="draft")
+        self.counts()
+
+        cv.status = "active"
+        cv.save()
+        bfs = self.bind()
+
+        # the ids of each product, and each facet of the changed item
+        with self.assertNumQueries(5):
+            counts = self.counts(bfs)
+        self.assertEqual(counts["status"], {"active": 1, "draft": 1})
+
+
+    def test_new_and_deleted_items(self):
+        """New and deleted items are added to and cleared from the index."""
+        pv = self.F.ProductVersionFactory.create()
+        cv = self.F.CaseVersionFactory.create(
+            productversion=pv, status="draft")
+        self.counts()
+
+        cv.delete()
+        self.F.CaseVersionFactory.create(productversion=pv, status="active")
+
+        counts = self.counts()["status"]
+        self.assertEqual(counts["active"], 1)
+        self.assertEqual(counts.get("draft", 0), 0)
+
+
+    def test_undeleted_item(self):
+        """An undeleted item is counted again."""
+        cv = self.F.CaseVersionFactory.create(status="draft")
+        cv.delete()
+        self.counts()
+
+        self.model.CaseVersion.everything.get(pk=cv.pk).undelete()
+
+        self.assertEqual(self.counts()["status"], {"draft": 1})
+
+
+    def test_rebuilt_after_many_changes(self):
+        """Past ``max_changes`` changed items, a partition is rebuilt."""
+        self.index.max_changes = 1
+        pv = self.F.ProductVersionFactory.create()
+        self.F.CaseVersionFactory.create(productversion=pv, status="draft")
+        self.counts()
+
+        self.F.CaseVersionFactory.create(productversion=pv, status="active")
+        self.F.CaseVersionFactory.create(productversion=pv, status="active")
+
+        self.assertEqual(
+            self.counts()["status"], {"active": 2, "draft": 1})
+        partition = self.index._partitions[pv.product.id]
+        self.assertEqual(len(partition.ids), 3)
+
+
+    def test_lock_not_held_during_queries(self):
+        """Partitions are read from the database without holding the lock."""
+        from moztrap.view.lists.facets import Partition
+        self.F.CaseVersionFactory.create()
+        index = Partition.index
+
+        def check_index(partition, key, pairs):
+            self.assertFalse(self.index._lock.locked())
+            return index(partition, key, pairs)
+
+        with patch.object(Partition, "index", check_index):
+            self.counts()
+
+
+    def test_not_kept_from_replica(self):
+        """Parts of the index built from a replica aren't kept."""
+        from moztrap.deploy.routers import replica_reads
+        self.F.CaseVersionFactory.create(status="draft")
+
+        # the replica "default" is the test database
+        with replica_reads("default"):
+            self.assertEqual(self.counts()["status"], {"draft": 1})
+        self.assertEqual(self.index._partitions, {})
+
+
+    def test_facet_not_kept_from_replica(self):
+        """A facet re-indexed from a replica isn't kept."""
+        from moztrap.deploy.routers import replica_reads
+        cv = self.F.CaseVersionFactory.create()
+        self.counts()
+        cv.case.priority = 2
+        cv.case.save()
+
+        with replica_reads("default"):
+            self.assertEqual(self.counts()["priority"], {2: 1})
+        bfs = self.bind()
+
+        # the priority facet is re-read from the primary
+        with self.assertNumQueries(1):
+            self.counts(bfs)
+
+
+
+class FacetCountsViewTest(case.view.AuthenticatedViewTestCase):
+    """Option counts are shown in the filters of the manage cases list."""
+    @property
+    def url(self):
+        """Shortcut for manage-cases url."""
+        from django.core.urlresolvers import reverse
+        return reverse("manage_cases")
+
+
+    def test_counts(self):
+        """Each status option shows its count."""
+        self.F.CaseVersionFactory.create(status="active")
+
+        res = self.get()
+
+        group = res.html.find("section", attrs={"data-name": "status"})
+        counts = dict(
+            (i.find("input")["value"], i.find("span", "facet-count").text)
+            for i in group.findAll("li", "filter-item")
+            )
+        self.assertEqual(counts["active"], "1")
+        self.assertEqual(counts["draft"], "0")
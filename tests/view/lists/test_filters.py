@@ -2,8 +2,10 @@
 Tests for queryset-filtering.
 
 """
+import json
+
 from django.http import QueryDict
-from mock import Mock
+from mock import Mock, patch
 
 from django.template.response import TemplateResponse
 from django.test import RequestFactory
@@ -64,6 +66,34 @@ class FilterUrlTest(FiltersTestCase):
             )
 
 
+    def test_no_filter(self):
+        """URL has empty querystring if view has no filter for the model."""
+        from moztrap.model import Environment
+
+        self.assertEqual(
+            self.filters.filter_url("manage_cases", Environment(pk=2)),
+            "/manage/cases/?"
+            )
+
+
+    def test_memoized(self):
+        """The view's URL is reversed and resolved once per model class."""
+        from django.core.urlresolvers import reverse, resolve
+        reverse = Mock(wraps=reverse)
+        resolve = Mock(wraps=resolve)
+
+        with patch.dict(self.filters._url_heads, clear=True):
+            with patch("moztrap.view.lists.filters.reverse", reverse):
+                with patch("moztrap.view.lists.filters.resolve", resolve):
+                    self.filters.filter_url("manage_cases", self.Product(pk=2))
+                    url = self.filters.filter_url(
+                        "manage_cases", self.Product(pk=3))
+
+        self.assertEqual(url, "/manage/cases/?filter-product=3")
+        self.assertEqual(reverse.call_count, 1)
+        self.assertEqual(resolve.call_count, 1)
+
+
 
 class FilterDecoratorTest(FiltersTestCase):
     """Tests for ``filter`` decorator."""
@@ -309,6 +339,24 @@ class FilterSetTest(FiltersTestCase):
         self.assertEqual(fs.params_for(3), {})
 
 
+    def test_param_for(self):
+        """param_for returns querystring param name for a model class."""
+        class MockModel(object):
+            pass
+
+        class SubModel(MockModel):
+            pass
+
+        mock_model_filter = self.filters.Filter("name", key="key")
+        mock_model_filter.queryset = Mock()
+        mock_model_filter.queryset.model = MockModel
+
+        fs = self.filters.FilterSet([mock_model_filter], prefix="foo:")
+
+        self.assertEqual(fs.param_for(SubModel), "foo:key")
+        self.assertEqual(fs.param_for(object), None)
+
+
 
 class BoundFilterSetTest(FiltersTestCase):
     """Tests for BoundFilterSet."""
@@ -364,6 +412,26 @@ class BoundFilterSetTest(FiltersTestCase):
 
 
 
+    def test_counts_json(self):
+        """counts_json has the counts of the rendered options."""
+        bfs = self.filters.FilterSet(
+            [
+                self.filters.ChoicesFilter(
+                    "status", choices=[("a", "A"), ("b", "B")]),
+                self.filters.KeywordExactFilter("tag"),
+                ]
+            ).bind(MultiValueDict({"filter-tag": ["t1"]}))
+
+        bfs.add_counts(
+            {"status": {"a": 2}, "tag": {"t1": 3, "t2": 1, "t3": 4}})
+
+        self.assertEqual(
+            json.loads(bfs.counts_json),
+            {"status": {"a": 2, "b": 0}, "tag": {"t1": 3}},
+            )
+
+
+
 class BoundFilterTest(FiltersTestCase):
     """Tests for BoundFilter."""
     def test_values(self):
@@ -589,6 +657,133 @@ class ModelFilterTest(FiltersTestCase):
 
 
 
+class LazyModelFilterTest(case.DBTestCase):
+    """Tests for LazyModelFilter."""
+    def setUp(self):
+        """Start with an empty cache."""
+        super(LazyModelFilterTest, self).setUp()
+        from moztrap.model import cache
+        cache.get_backend().clear()
+        cache.stats.reset()
+
+
+    def lazy_filter(self, **kwargs):
+        """Return a LazyModelFilter of tags."""
+        from moztrap.view.lists.filters import LazyModelFilter
+        kwargs.setdefault(
+            "queryset", self.model.Tag.objects.all().order_by("name"))
+        return LazyModelFilter("tag", **kwargs)
+
+
+    def test_options_only_selected(self):
+        """Only the selected values are options."""
+        t = self.F.TagFactory.create(name="one")
+        self.F.TagFactory.create(name="two")
+        f = self.lazy_filter()
+
+        self.assertEqual(f.options([t.id]), [(t.id, "one")])
+        self.assertEqual(f.options([]), [])
+
+
+    def test_values(self):
+        """Values are coerced, and must exist."""
+        t = self.F.TagFactory.create(name="one")
+        f = self.lazy_filter()
+
+        self.assertEqual(
+            f.values({"tag": [str(t.id), str(t.id + 1), "foo"]}), [t.id])
+
+
+    def test_search(self):
+        """Every word of search text must match one of the search fields."""
+        pv = self.F.ProductVersionFactory.create(
+            version="10", product__name="Firefox")
+        self.F.ProductVersionFactory.create(
+            version="11", product__name="Firefox")
+        self.F.ProductVersionFactory.create(
+            version="10", product__name="Thunderbird")
+        from moztrap.view.lists.filters import LazyModelFilter
+        f = LazyModelFilter(
+            "productversion",
+            queryset=self.model.ProductVersion.objects.all(),
+            search=["product__name", "version"],
+            )
+
+        self.assertEqual(
+            f.search("fire 10"), ([(pv.id, "Firefox 10")], False))
+
+
+    def test_search_pages(self):
+        """Search results are paginated."""
+        t1 = self.F.TagFactory.create(name="one")
+        t2 = self.F.TagFactory.create(name="two")
+        t3 = self.F.TagFactory.create(name="three")
+        f = self.lazy_filter()
+        f.page_size = 2
+
+        self.assertEqual(
+            f.search(""), ([(t1.id, "one"), (t3.id, "three")], True))
+        self.assertEqual(f.search("", 2), ([(t2.id, "two")], False))
+
+
+    def test_search_cached(self):
+        """Search results are cached until the model changes."""
+        t = self.F.TagFactory.create(name="one")
+        f = self.lazy_filter()
+        f.search("o")
+
+        with self.assertNumQueries(0):
+            self.assertEqual(f.search("o"), ([(t.id, "one")], False))
+
+        t.name = "uno"
+        t.save()
+
+        self.assertEqual(f.search("o"), ([(t.id, "uno")], False))
+
+
+    def test_search_dependencies(self):
+        """Cached results are also invalidated by changes to dependencies."""
+        pv = self.F.ProductVersionFactory.create(
+            version="10", product__name="Firefox")
+        from moztrap.view.lists.filters import LazyModelFilter
+        f = LazyModelFilter(
+            "productversion",
+            queryset=self.model.ProductVersion.objects.all(),
+            search=["version"],
+            dependencies=[self.model.Product],
+            )
+        f.search("10")
+
+        pv.product.name = "Fennec"
+        pv.product.save()
+
+        self.assertEqual(f.search("10"), ([(pv.id, "Fennec 10")], False))
+
+
+
+class LazyFilterTest(FiltersTestCase):
+    """Tests for ``lazy_filter`` function."""
+    def test_found(self):
+        """Finds lazy filter by list view path and filter key."""
+        f = self.filters.lazy_filter("/manage/cases/", "tag")
+
+        self.assertEqual(f.name, "tag")
+        self.assertTrue(f.lazy)
+
+
+    def test_not_lazy(self):
+        """Returns None for a filter that isn't lazy."""
+        self.assertIs(
+            self.filters.lazy_filter("/manage/cases/", "product"), None)
+
+
+    def test_unknown_path(self):
+        """Returns None for a path that isn't a filtered list view."""
+        self.assertIs(self.filters.lazy_filter("/nonexistent/", "tag"), None)
+        self.assertIs(self.filters.lazy_filter("/", "tag"), None)
+
+
+
 class KeywordExactFilterTest(FiltersTestCase):
     """Tests for KeywordExactFilter."""
     def test_options(self):
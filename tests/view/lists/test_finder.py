@@ -2,6 +2,7 @@
 Tests for finder.
 
 """
+from django.http import HttpResponse
 from django.template.response import TemplateResponse
 from django.test import RequestFactory
 
@@ -74,12 +75,13 @@ class FinderDecoratorTest(case.DBTestCase):
     @patch("moztrap.view.lists.finder.render")
     def test_ajax(self, render):
         """Ajax response is rendered column template."""
-        render.return_value = "some HTML"
+        render.return_value = response = HttpResponse("some HTML")
 
         MockFinder = Mock()
         f = MockFinder.return_value
         f.column_template.return_value = "some/finder/_column.html"
         f.objects.return_value = ["some", "objects"]
+        f.dependencies.return_value = []
 
         req = RequestFactory().get(
             "/some/url",
@@ -88,7 +90,7 @@ class FinderDecoratorTest(case.DBTestCase):
         res = self.on_template_response(
             {}, request=req, decorator=self.finder(MockFinder))
 
-        self.assertEqual(res, "some HTML")
+        self.assertIs(res, response)
 
         self.assertEqual(
             render.call_args[0][1:],
@@ -336,6 +338,47 @@ class FinderTest(case.DBTestCase):
             f.objects("runs", 1)
 
 
+    def test_parent_relations(self):
+        """Relationships to parent columns are found once, up front."""
+        f = self.ManageFinder()
+
+        self.assertEqual(
+            f.parent_relations,
+            {
+                "productversions": ("product", None),
+                "runs": ("productversion", None),
+                "suites": ("runs", self.model.RunSuite),
+                }
+            )
+
+
+    def test_dependencies(self):
+        """A column depends on its model and any m2m to its parent."""
+        f = self.ManageFinder()
+
+        self.assertEqual(
+            f.dependencies("suites"), [self.model.Suite, self.model.RunSuite])
+
+
+    def test_objects_cached(self):
+        """Column objects are cached until their model changes."""
+        from moztrap.model import cache
+        cache.get_backend().clear()
+        f = self.ManageFinder()
+        pv = self.F.ProductVersionFactory.create()
+
+        f.objects("productversions", pv.product.pk)
+        with self.assertNumQueries(0):
+            objects = f.objects("productversions", pv.product.pk)
+
+        self.assertEqual(objects, [pv])
+
+        pv2 = self.F.ProductVersionFactory.create(product=pv.product)
+
+        self.assertEqual(
+            set(f.objects("productversions", pv.product.pk)), set([pv, pv2]))
+
+
     def test_objects_of_no_parent(self):
         """Passing in parent for top column raises ValueError."""
         f = self.ManageFinder()
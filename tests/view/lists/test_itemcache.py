@@ -0,0 +1,156 @@
+"""
+Tests for list item caching.
+
+"""
+from mock import Mock
+
+from tests import case
+
+
+
+class ItemCacheTestMixin(object):
+    """Start every test with an empty cache and no stats."""
+    def setUp(self):
+        super(ItemCacheTestMixin, self).setUp()
+        from moztrap.model import cache
+        cache.get_backend().clear()
+        cache.stats.reset()
+
+
+    def hits(self):
+        """Return number of cached list items served so far."""
+        from moztrap.model import cache
+        return cache.stats.get("fragment")["hits"]
+
+
+
+class CachedRenderTest(ItemCacheTestMixin, case.DBTestCase):
+    """Tests for cached_render."""
+    @property
+    def cached_render(self):
+        """The function under test."""
+        from moztrap.view.lists.itemcache import cached_render
+        return cached_render
+
+
+    def render(self, obj, **kwargs):
+        """Render ``obj`` via cached_render; return (output, rendered?)."""
+        render = Mock()
+        render.return_value = u"<p>%s</p>" % obj.name
+        output = self.cached_render("item", obj, render, **kwargs)
+        return output, render.called
+
+
+    def test_cached(self):
+        """Second rendering of an unchanged object comes from the cache."""
+        tag = self.F.TagFactory.create(name="foo")
+
+        self.assertEqual(self.render(tag), (u"<p>foo</p>", True))
+        self.assertEqual(self.render(tag), (u"<p>foo</p>", False))
+        self.assertEqual(self.hits(), 1)
+
+
+    def test_safe(self):
+        """Output is marked safe."""
+        from django.utils.safestring import SafeData
+        tag = self.F.TagFactory.create()
+
+        self.render(tag)
+
+        self.assertIsInstance(self.render(tag)[0], SafeData)
+
+
+    def test_object_saved(self):
+        """Saving the object invalidates its cached item."""
+        tag = self.F.TagFactory.create(name="foo")
+        self.render(tag)
+        tag.name = "bar"
+        tag.save()
+
+        self.assertEqual(self.render(tag), (u"<p>bar</p>", True))
+
+
+    def test_other_object_saved(self):
+        """Saving another object of the same model doesn't invalidate."""
+        tag = self.F.TagFactory.create()
+        self.render(tag)
+        self.F.TagFactory.create()
+
+        self.assertFalse(self.render(tag)[1])
+
+
+    def test_dependency_changed(self):
+        """Changes to a dependency invalidate the cached item."""
+        tag = self.F.TagFactory.create()
+        self.render(tag, dependencies=["core.Product"])
+        self.F.ProductFactory.create()
+
+        self.assertTrue(self.render(tag, dependencies=["core.Product"])[1])
+
+
+    def test_instance_dependency(self):
+        """Instances can be dependencies."""
+        tag = self.F.TagFactory.create()
+        product = self.F.ProductFactory.create()
+        self.render(tag, dependencies=[product])
+        self.F.ProductFactory.create()
+
+        self.assertFalse(self.render(tag, dependencies=[product])[1])
+
+        product.save()
+
+        self.assertTrue(self.render(tag, dependencies=[product])[1])
+
+
+    def test_unknown_model(self):
+        """An unknown model name is a ValueError."""
+        tag = self.F.TagFactory.create()
+
+        with self.assertRaises(ValueError):
+            self.render(tag, dependencies=["core.Bogus"])
+
+
+    def test_perm_buckets(self):
+        """Users with different permissions don't share cached items."""
+        tag = self.F.TagFactory.create()
+        perms = ["tags.manage_tags"]
+        manager = self.F.UserFactory.create(permissions=perms)
+        other_manager = self.F.UserFactory.create(permissions=perms)
+        user = self.F.UserFactory.create()
+
+        self.assertTrue(self.render(tag, user=manager, perms=perms)[1])
+        self.assertFalse(self.render(tag, user=other_manager, perms=perms)[1])
+        self.assertTrue(self.render(tag, user=user, perms=perms)[1])
+
+
+    def test_version(self):
+        """Different versions of a template don't share cached items."""
+        tag = self.F.TagFactory.create()
+        self.render(tag, version="1")
+
+        self.assertTrue(self.render(tag, version="2")[1])
+
+
+
+class PermBucketTest(case.DBTestCase):
+    """Tests for perm_bucket."""
+    @property
+    def perm_bucket(self):
+        """The function under test."""
+        from moztrap.view.lists.itemcache import perm_bucket
+        return perm_bucket
+
+
+    def test_bucket(self):
+        """One digit per permission, 1 if the user has it."""
+        user = self.F.UserFactory.create(permissions=["tags.manage_tags"])
+
+        self.assertEqual(
+            self.perm_bucket(user, ["library.manage_cases", "tags.manage_tags"]),
+            "01",
+            )
+
+
+    def test_no_user(self):
+        """Without a user, no permissions."""
+        self.assertEqual(self.perm_bucket(None, ["tags.manage_tags"]), "0")
@@ -3,6 +3,8 @@
 Tests for case management views.
 
 """
+import json
+
 from django.conf import settings
 from django.core.urlresolvers import reverse
 
@@ -55,6 +57,24 @@ class CasesTest(case.view.manage.ListViewTestCase,
         self.assertIdInList(res, "caseversion-id-{0}".format(cv2.id))
 
 
+    def test_renamed_tag_rerenders_its_rows(self):
+        """Renaming a tag re-renders only the rows that show it."""
+        from moztrap.model import cache
+        cache.get_backend().clear()
+        tag = self.F.TagFactory.create(name="foo")
+        self.F.CaseVersionFactory.create().tags.add(tag)
+        self.F.CaseVersionFactory.create()
+        self.get()
+
+        tag.name = "bar"
+        tag.save()
+        cache.stats.reset()
+        res = self.get()
+
+        self.assertEqual(cache.stats.get("fragment")["misses"], 1)
+        self.assertElement(res.html, "a", "tag", title="filter by bar")
+
+
     def test_filter_by_status(self):
         """Can filter by status."""
         self.F.CaseVersionFactory.create(status="draft", name=u"Case 1 ùê")
@@ -110,6 +130,36 @@ class CasesTest(case.view.manage.ListViewTestCase,
         self.assertNotInList(res, "Case 2")
 
 
+    def test_lazy_filter_renders_selected(self):
+        """Only selected options of a lazy filter are rendered."""
+        t = self.F.TagFactory.create(name="selected")
+        self.F.TagFactory.create(name="unselected")
+
+        res = self.get(params={"filter-tag": t.id})
+
+        group = res.html.find("section", attrs={"data-name": "tag"})
+        self.assertEqual(
+            [l.text for l in group.findAll("label")], ["selected"])
+        self.assertEqual(
+            group["data-options-url"],
+            "/_filter_options/?path=/manage/cases/&key=tag")
+
+
+    def test_lazy_filter_counts_selected(self):
+        """Only counts of rendered options of a lazy filter are sent."""
+        t = self.F.TagFactory.create(name="selected")
+        u = self.F.TagFactory.create(name="unselected")
+        cv = self.F.CaseVersionFactory.create()
+        cv.tags.add(t)
+        cv.tags.add(u)
+
+        res = self.get(params={"filter-tag": t.id})
+
+        form = res.html.find("form", id="manage-cases-form")
+        self.assertEqual(
+            json.loads(form["data-facet-counts"])["tag"], {str(t.id): 1})
+
+
     def test_filter_by_product(self):
         """Can filter by product."""
         cv = self.F.CaseVersionFactory.create(name="Case 1")
@@ -233,6 +283,18 @@ class CaseDetailTest(case.view.AuthenticatedViewTestCase,
         res.mustcontain("#moo-{0}".format(self.cv.case.id))
 
 
+    def test_ajax_not_modified(self):
+        """An unchanged case's details answer an Ajax revalidation with 304."""
+        # the first request logs the user in, which is a write
+        self.get(ajax=True)
+        etag = self.get(ajax=True).headers["ETag"]
+
+        res = self.get(
+            ajax=True, headers={"If-None-Match": etag}, status=304)
+
+        self.assertEqual(res.body, "")
+
+
     def test_id_no_prefix(self):
         """Details show the id properly when no prefix is specified."""
         self.cv = self.F.CaseVersionFactory.create()
@@ -38,6 +38,25 @@ class AddProfileFormTest(case.DBTestCase):
             set(p.environments.get().elements.all()), set([e1, e2]))
 
 
+    def test_preview(self):
+        """Preview reports what would be generated, without saving."""
+        e1 = self.F.ElementFactory.create()
+        e2 = self.F.ElementFactory.create()
+
+        f = self.form(
+            {
+                "elements": [str(e1.id), str(e2.id)],
+                "name": "Foo",
+                "cc_version": "0"},
+            )
+        self.assertTrue(f.is_valid())
+        preview = f.preview()
+
+        self.assertEqual(preview["environments"], 1)
+        self.assertEqual(preview["links"], 2)
+        self.assertFalse(self.model.Profile.objects.exists())
+
+
     def test_empty_category_rendered(self):
         """A category with no elements is still rendered in elements widget."""
         self.F.CategoryFactory.create(name="EmptyCat")
@@ -140,6 +140,19 @@ class AddProfileTest(case.view.FormViewTestCase,
         self.assertEqual(p.environments.get().elements.get(), el)
 
 
+    def test_preview(self):
+        """Preview button shows what would be generated, without saving."""
+        el = self.F.ElementFactory.create()
+        form = self.get_form()
+        form["name"] = u"Foo Profile"
+        form["elements"] = [str(el.id)]
+
+        res = form.submit(name="preview", status=200)
+
+        res.mustcontain("This profile will have 1 environment")
+        self.assertFalse(self.model.Profile.objects.exists())
+
+
     def test_error(self):
         """Bound form with errors is re-displayed."""
         res = self.get_form().submit()
@@ -121,6 +121,34 @@ class EditRunFormTest(case.DBTestCase):
         self.assertEqual(set(run.suites.all()), set([s]))
 
 
+    def test_edit_suites_keeps_runsuites(self):
+        """Editing suites keeps the runsuites of suites that remain."""
+        pv = self.F.ProductVersionFactory.create()
+        r = self.F.RunFactory.create(productversion=pv)
+        s = self.F.SuiteFactory.create(product=pv.product)
+        rs = self.F.RunSuiteFactory.create(
+            run=r, suite__product=pv.product, order=0)
+
+        f = self.form(
+            {
+                "productversion": str(pv.id),
+                "name": r.name,
+                "description": r.description,
+                "start": r.start.strftime("%m/%d/%Y"),
+                "end": "",
+                "suites": [str(s.id), str(rs.suite.id)],
+                "cc_version": str(r.cc_version),
+                },
+            instance=r,
+            )
+
+        run = f.save()
+
+        self.assertEqual(run.runsuites.get(suite=rs.suite).id, rs.id)
+        self.assertEqual(
+            list(run.suites.order_by("runsuites__order")), [s, rs.suite])
+
+
     def test_no_change_product_option(self):
         """No option to change to a version of a different product."""
         self.F.ProductVersionFactory.create()
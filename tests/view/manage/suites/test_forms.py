@@ -179,6 +179,32 @@ class EditSuiteFormTest(case.DBTestCase):
             )
 
 
+    def test_edit_cases_keeps_suitecases(self):
+        """Editing cases keeps the suitecases of cases that remain."""
+        s = self.F.SuiteFactory.create()
+        c1 = self.F.CaseFactory.create(product=s.product)
+        c2 = self.F.CaseFactory.create(product=s.product)
+        sc = self.F.SuiteCaseFactory.create(suite=s, case=c1, order=0)
+
+        f = self.form(
+            {
+                "product": str(s.product.id),
+                "name": s.name,
+                "description": s.description,
+                "status": s.status,
+                "cases": [str(c2.id), str(c1.id)],
+                "cc_version": str(s.cc_version),
+                },
+            instance=s,
+            )
+
+        self.assertTrue(f.is_valid())
+        suite = f.save()
+
+        self.assertEqual(suite.suitecases.get(case=c1).id, sc.id)
+        self.assertEqual(suite.suitecases.get(case=c1).order, 1)
+
+
     def test_remove_dup_cases(self):
         """Can edit cases of a suite."""
         s = self.F.SuiteFactory.create()
@@ -0,0 +1,154 @@
+"""
+Tests for cached Markdown rendering.
+
+"""
+from django.test.utils import override_settings
+
+from mock import patch
+
+from tests import case
+
+
+
+class RenderTestMixin(object):
+    """Start every test with empty Markdown caches and no stats."""
+    @property
+    def render(self):
+        """The module under test."""
+        from moztrap.view.markup import render
+        return render
+
+
+    def setUp(self):
+        super(RenderTestMixin, self).setUp()
+        from moztrap.model.cache import stats
+        self.render.reset()
+        self.render.get_local().clear()
+        self.render.get_shared().clear()
+        stats.reset()
+        self.addCleanup(self.render.reset)
+
+
+    def markdown_stats(self):
+        """Return hits and misses recorded for Markdown rendering."""
+        from moztrap.model.cache import stats
+        counts = stats.get("markdown")
+        return counts["hits"], counts["misses"]
+
+
+
+class LRUCacheTest(case.TestCase):
+    """Tests for LRUCache."""
+    @property
+    def cache(self):
+        """An LRUCache of size 2."""
+        from moztrap.view.markup.render import LRUCache
+        return LRUCache(2)
+
+
+    def test_get_set(self):
+        """Values set can be got; missing keys return the default."""
+        c = self.cache
+        c.set("a", 1)
+
+        self.assertEqual(c.get("a"), 1)
+        self.assertEqual(c.get("b", 2), 2)
+
+
+    def test_evicts_least_recently_used(self):
+        """When full, the least recently used item is evicted."""
+        c = self.cache
+        c.set("a", 1)
+        c.set("b", 2)
+        c.get("a")
+        c.set("c", 3)
+
+        self.assertEqual(len(c), 2)
+        self.assertEqual(c.get("a"), 1)
+        self.assertEqual(c.get("b"), None)
+        self.assertEqual(c.get("c"), 3)
+
+
+    def test_many_uses(self):
+        """Order of use is kept across many gets, sets and evictions."""
+        c = self.cache
+        for i in range(100):
+            c.set("a", i)
+            c.get("a")
+            c.set(i % 3, i)
+
+        self.assertEqual(len(c), 2)
+        self.assertEqual(c.get("a"), 99)
+        self.assertEqual(c.get(0), 99)
+        self.assertEqual(c.get(1), None)
+
+
+
+class CachedRenderTest(RenderTestMixin, case.TestCase):
+    """Tests for cached_render."""
+    def test_renders(self):
+        """Renders Markdown to HTML, escaping HTML."""
+        self.assertEqual(
+            self.render.cached_render("_<b>_"),
+            u"<p><em>&lt;b&gt;</em></p>\n",
+            )
+
+
+    def test_local_hit(self):
+        """A repeated text is served from the in-process cache."""
+        self.render.cached_render("_foo_")
+
+        with patch("moztrap.view.markup.render.render", None):
+            html = self.render.cached_render("_foo_")
+
+        self.assertEqual(html, u"<p><em>foo</em></p>\n")
+        self.assertEqual(self.markdown_stats(), (1, 1))
+
+
+    def test_shared_hit(self):
+        """Text rendered by another process is served from the shared cache."""
+        self.render.cached_render("_foo_")
+        self.render.get_local().clear()
+
+        with patch("moztrap.view.markup.render.render", None):
+            html = self.render.cached_render("_foo_")
+
+        self.assertEqual(html, u"<p><em>foo</em></p>\n")
+        self.assertEqual(self.markdown_stats(), (1, 1))
+
+
+    def test_different_text(self):
+        """Different texts don't share a cache entry."""
+        self.render.cached_render("_foo_")
+
+        self.assertEqual(
+            self.render.cached_render("_bar_"), u"<p><em>bar</em></p>\n")
+        self.assertEqual(self.markdown_stats(), (0, 2))
+
+
+    def test_unicode(self):
+        """Non-ASCII text is hashed and rendered correctly."""
+        self.assertEqual(
+            self.render.cached_render(u"\u2603"), u"<p>\u2603</p>\n")
+
+
+    def test_local_size(self):
+        """The in-process cache is bounded by MARKDOWN_CACHE_SIZE."""
+        with override_settings(MARKDOWN_CACHE_SIZE=1):
+            self.render.reset()
+            self.render.cached_render("foo")
+            self.render.cached_render("bar")
+
+            self.assertEqual(len(self.render.get_local()), 1)
+
+
+    def test_no_shared(self):
+        """With MARKDOWN_CACHE set to None there is no shared tier."""
+        with override_settings(MARKDOWN_CACHE=None):
+            self.render.reset()
+            self.render.cached_render("_foo_")
+            self.render.get_local().clear()
+            self.render.cached_render("_foo_")
+
+            self.assertIsNone(self.render.get_shared())
+            self.assertEqual(self.markdown_stats(), (0, 2))
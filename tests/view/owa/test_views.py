@@ -25,6 +25,8 @@ from django.core.urlresolvers import reverse
 
 from django_webtest import WebTest
 
+from tests import case
+
 
 
 class ManifestTest(WebTest):
@@ -56,3 +58,297 @@ class ManifestTest(WebTest):
             json.loads(res.body)["description"],
             "A Test Case and Results management System.",
             )
+
+
+
+class OfflineRunTestMixin(object):
+    """Common setup for offline run bundle and sync tests."""
+    def setUp(self):
+        """These tests all require an active run with envs, and execute perm."""
+        super(OfflineRunTestMixin, self).setUp()
+        self.testrun = self.F.RunFactory.create(status="active")
+        self.envs = self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["Windows 7", "Ubuntu Linux"]})
+        self.testrun.environments.add(*self.envs)
+        self.add_perm("execute")
+
+
+    def create_rcv(self, **kwargs):
+        """Create a runcaseversion for this run with given kwargs."""
+        defaults = {
+            "run": self.testrun,
+            "caseversion__productversion": self.testrun.productversion,
+            "caseversion__case__product": self.testrun.productversion.product,
+            "environments": self.envs,
+            }
+        defaults.update(kwargs)
+        return self.F.RunCaseVersionFactory.create(**defaults)
+
+
+
+class BundleTest(OfflineRunTestMixin, case.view.AuthenticatedViewTestCase):
+    """Tests for offline run bundle view."""
+    @property
+    def url(self):
+        """Shortcut for owa bundle url."""
+        return reverse(
+            "owa_bundle",
+            kwargs={"run_id": self.testrun.id, "env_id": self.envs[0].id})
+
+
+    def test_requires_execute_permission(self):
+        """Requires execute permission."""
+        res = self.app.get(
+            self.url, user=self.F.UserFactory.create(), status=302)
+
+        self.assertRedirects(res, "/")
+
+
+    def test_bundle(self):
+        """Bundle contains cases with steps, attachments and cc_version."""
+        rcv = self.create_rcv(
+            caseversion__name="Foo", caseversion__description="desc")
+        cv = rcv.caseversion
+        self.F.CaseStepFactory.create(
+            caseversion=cv, number=1, instruction="do", expected="done")
+        self.F.CaseAttachmentFactory.create(caseversion=cv, name="shot.png")
+
+        res = self.get(status=200)
+
+        self.assertEqual(res.json["run"]["id"], self.testrun.id)
+        self.assertEqual(res.json["environment"]["id"], self.envs[0].id)
+        self.assertEqual(
+            res.json["sync_url"],
+            reverse(
+                "owa_sync",
+                kwargs={"run_id": self.testrun.id, "env_id": self.envs[0].id})
+            )
+        [data] = res.json["cases"]
+        self.assertEqual(data["runcaseversion"], rcv.id)
+        self.assertEqual(data["case"], cv.case.id)
+        self.assertEqual(data["cc_version"], self.refresh(cv).cc_version)
+        self.assertEqual(data["name"], "Foo")
+        self.assertEqual(data["description"], "desc")
+        self.assertEqual(data["steps"], [[1, "do", "done"]])
+        self.assertEqual(data["attachments"][0]["name"], "shot.png")
+        self.assertIsNone(data["result"])
+
+
+    def test_latest_result(self):
+        """Bundle includes the latest completed result in the environment."""
+        rcv = self.create_rcv()
+        self.F.ResultFactory.create(
+            runcaseversion=rcv,
+            environment=self.envs[0],
+            tester=self.user,
+            status="failed",
+            comment="nope",
+            )
+
+        res = self.get(status=200)
+
+        self.assertEqual(
+            res.json["cases"][0]["result"],
+            {"status": "failed", "tester": self.user.username, "comment": "nope"}
+            )
+
+
+    def test_other_environment_excluded(self):
+        """Cases not in the bundle's environment are left out."""
+        self.create_rcv(environments=[self.envs[1]])
+
+        res = self.get(status=200)
+
+        self.assertEqual(res.json["cases"], [])
+
+
+    def test_environment_not_in_run(self):
+        """Environment not in the run is a 404."""
+        url = reverse(
+            "owa_bundle",
+            kwargs={
+                "run_id": self.testrun.id,
+                "env_id": self.F.EnvironmentFactory.create().id,
+                })
+
+        self.app.get(url, user=self.user, status=404)
+
+
+
+class SyncTest(OfflineRunTestMixin, case.view.AuthenticatedViewTestCase):
+    """Tests for offline result sync view."""
+    @property
+    def url(self):
+        """Shortcut for owa sync url."""
+        return reverse(
+            "owa_sync",
+            kwargs={"run_id": self.testrun.id, "env_id": self.envs[0].id})
+
+
+    def test_login_required(self):
+        """Anonymous users can't sync results."""
+        self.app.post(self.url, "{}", status=403)
+
+
+    def sync(self, results, status=200, user=None):
+        """Post ``results`` to the sync URL, with CSRF token from a bundle."""
+        user = user or self.user
+        bundle = self.app.get(
+            reverse(
+                "owa_bundle",
+                kwargs={"run_id": self.testrun.id, "env_id": self.envs[0].id}),
+            user=user,
+            )
+        return self.app.post(
+            self.url,
+            json.dumps({"results": results}),
+            headers={"X-CSRFToken": str(bundle.json["csrf_token"])},
+            content_type="application/json",
+            user=user,
+            status=status,
+            )
+
+
+    def test_sync(self):
+        """Results are recorded for each submitted case."""
+        rcv1 = self.create_rcv()
+        rcv2 = self.create_rcv()
+        self.F.CaseStepFactory.create(caseversion=rcv2.caseversion, number=1)
+
+        res = self.sync([
+                {
+                    "runcaseversion": rcv1.id,
+                    "cc_version": rcv1.caseversion.cc_version,
+                    "status": "passed",
+                    },
+                {
+                    "runcaseversion": rcv2.id,
+                    "cc_version": rcv2.caseversion.cc_version,
+                    "status": "failed",
+                    "comment": "broke",
+                    "stepnumber": 1,
+                    "bug": "http://example.com/1",
+                    },
+                ])
+
+        self.assertEqual(res.json["applied"], [rcv1.id, rcv2.id])
+        self.assertEqual(res.json["conflicts"], [])
+        r1 = rcv1.results.get(is_latest=True)
+        self.assertEqual(r1.status, "passed")
+        self.assertEqual(r1.tester, self.user)
+        self.assertEqual(r1.environment, self.envs[0])
+        r2 = rcv2.results.get(is_latest=True)
+        self.assertEqual(r2.status, "failed")
+        self.assertEqual(r2.comment, "broke")
+        self.assertEqual(rcv2.bug_urls(), set(["http://example.com/1"]))
+
+
+    def test_changed_case_conflict(self):
+        """A case edited since the bundle was fetched is a conflict."""
+        rcv = self.create_rcv()
+        old_version = rcv.caseversion.cc_version
+        rcv.caseversion.save()
+
+        res = self.sync([{
+                    "runcaseversion": rcv.id,
+                    "cc_version": old_version,
+                    "status": "passed",
+                    }])
+
+        self.assertEqual(res.json["applied"], [])
+        self.assertEqual(
+            res.json["conflicts"],
+            [{"runcaseversion": rcv.id, "reason": "case changed"}])
+        self.assertEqual(rcv.results.count(), 0)
+
+
+    def test_not_in_run_conflict(self):
+        """A runcaseversion not in this run/env is a conflict."""
+        rcv = self.create_rcv(environments=[self.envs[1]])
+
+        res = self.sync([{
+                    "runcaseversion": rcv.id,
+                    "cc_version": rcv.caseversion.cc_version,
+                    "status": "passed",
+                    }])
+
+        self.assertEqual(
+            res.json["conflicts"],
+            [{"runcaseversion": rcv.id, "reason": "not in run"}])
+
+
+    def test_invalid_status_conflict(self):
+        """An unknown status is a conflict."""
+        rcv = self.create_rcv()
+
+        res = self.sync([{
+                    "runcaseversion": rcv.id,
+                    "cc_version": rcv.caseversion.cc_version,
+                    "status": "started",
+                    }])
+
+        self.assertEqual(
+            res.json["conflicts"],
+            [{"runcaseversion": rcv.id, "reason": "invalid status"}])
+
+
+    def test_skip_requires_manage_runs(self):
+        """Skipping offline requires the same permission as online."""
+        rcv = self.create_rcv()
+
+        res = self.sync([{
+                    "runcaseversion": rcv.id,
+                    "cc_version": rcv.caseversion.cc_version,
+                    "status": "skipped",
+                    }])
+
+        self.assertEqual(
+            res.json["conflicts"],
+            [{"runcaseversion": rcv.id, "reason": "not permitted"}])
+
+
+    def test_invalid_data_conflict(self):
+        """Bad extra data is a conflict, and doesn't stop the rest applying."""
+        rcvs = [self.create_rcv() for i in range(3)]
+        self.F.CaseStepFactory.create(
+            caseversion=rcvs[2].caseversion, number=2)
+
+        def failed(rcv, **kwargs):
+            kwargs.update({
+                    "runcaseversion": rcv.id,
+                    "cc_version": rcv.caseversion.cc_version,
+                    "status": "failed",
+                    })
+            return kwargs
+
+        res = self.sync([
+                failed(rcvs[0], stepnumber="two"),
+                failed(rcvs[1], comment=None),
+                failed(rcvs[2], stepnumber="2", comment="broke"),
+                ])
+
+        self.assertEqual(res.json["applied"], [rcvs[2].id])
+        self.assertEqual(
+            res.json["conflicts"],
+            [
+                {"runcaseversion": rcvs[0].id, "reason": "invalid data"},
+                {"runcaseversion": rcvs[1].id, "reason": "invalid data"},
+                ]
+            )
+        self.assertEqual(rcvs[0].results.count(), 0)
+        self.assertEqual(rcvs[1].results.count(), 0)
+        result = rcvs[2].results.get()
+        self.assertEqual(result.comment, "broke")
+        self.assertEqual(result.stepresults.get().step.number, 2)
+
+
+    def test_bad_data(self):
+        """Malformed data is a 400."""
+        self.sync("foo", status=400)
+
+
+    def test_inactive_run(self):
+        """Can't sync results to an inactive run."""
+        self.testrun.deactivate()
+
+        self.sync([], status=400)
@@ -248,6 +248,45 @@ class RunCaseVersionResultsViewTest(case.view.ListViewTestCase,
 
 
 
+class RunCaseVersionResultsItemCacheTest(case.view.AuthenticatedViewTestCase):
+    """Rendered runcaseversion list items are cached."""
+    @property
+    def url(self):
+        """Shortcut for runcaseversion results url."""
+        return reverse("results_runcaseversions")
+
+
+    def setUp(self):
+        """Start with an empty cache."""
+        super(RunCaseVersionResultsItemCacheTest, self).setUp()
+        from moztrap.model import cache
+        cache.get_backend().clear()
+
+
+    def queries(self):
+        """Load the list (warming the cache); return queries of a reload."""
+        from django.db import connection
+        self.get()
+        connection.use_debug_cursor = True
+        try:
+            start = len(connection.queries)
+            self.get()
+            return len(connection.queries) - start
+        finally:
+            connection.use_debug_cursor = False
+
+
+    def test_cached_rows_no_queries(self):
+        """Cached rows don't load deferred fields; queries don't grow."""
+        self.F.RunCaseVersionFactory.create()
+        one = self.queries()
+        for i in range(5):
+            self.F.RunCaseVersionFactory.create()
+
+        self.assertEqual(self.queries(), one)
+
+
+
 class RunCaseVersionDetailTest(case.view.AuthenticatedViewTestCase):
     """Test for runcaseversion-detail ajax view."""
     def setUp(self):
@@ -265,6 +304,19 @@ class RunCaseVersionDetailTest(case.view.AuthenticatedViewTestCase):
             )
 
 
+    def test_ajax_not_modified(self):
+        """Unchanged details answer an Ajax revalidation with 304."""
+        ajax = {"X-Requested-With": "XMLHttpRequest"}
+        # the first request logs the user in, which is a write
+        self.get(headers=ajax)
+        etag = self.get(headers=ajax).headers["ETag"]
+
+        ajax["If-None-Match"] = etag
+        res = self.get(headers=ajax, status=304)
+
+        self.assertEqual(res.body, "")
+
+
     def test_details_envs(self):
         """Details lists envs."""
         self.rcv.environments.add(
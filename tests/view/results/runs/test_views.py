@@ -83,3 +83,99 @@ class RunDetailTest(case.view.AuthenticatedViewTestCase):
             "{0}?filter-run={1}".format(
                 reverse("results_runcaseversions"), self.testrun.id)
             )
+
+
+
+class RunResultsItemCacheTest(case.view.AuthenticatedViewTestCase):
+    """Rendered run list items are cached."""
+    @property
+    def url(self):
+        """Shortcut for run results url."""
+        return reverse("results_runs")
+
+
+    def setUp(self):
+        """Start with an empty cache and no stats."""
+        super(RunResultsItemCacheTest, self).setUp()
+        from moztrap.model import cache
+        cache.get_backend().clear()
+        cache.stats.reset()
+
+
+    def fragment_stats(self):
+        """Get a full page of 100 runs; return its list-item cache stats."""
+        from moztrap.model import cache
+        cache.stats.reset()
+        self.get(params={"pagesize": 100})
+        return cache.stats.get("fragment")
+
+
+    def test_unchanged_rows_cached(self):
+        """On a second load of a page, unchanged rows come from the cache."""
+        runs = [self.F.RunFactory.create() for i in range(100)]
+
+        self.assertEqual(self.fragment_stats()["misses"], 100)
+        self.assertEqual(self.fragment_stats()["hits"], 100)
+
+        runs[0].name = "changed"
+        runs[0].save()
+        stats = self.fragment_stats()
+
+        self.assertEqual((stats["hits"], stats["misses"]), (99, 1))
+
+
+    def test_result_rerenders_own_row(self):
+        """A new result re-renders only the row of its own run."""
+        rcvs = [self.F.RunCaseVersionFactory.create() for i in range(3)]
+        self.fragment_stats()
+
+        self.F.ResultFactory.create(runcaseversion=rcvs[0])
+        stats = self.fragment_stats()
+
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+
+
+    def queries(self):
+        """Load a page (warming the cache); return queries of a reload."""
+        from django.db import connection
+        self.fragment_stats()
+        connection.use_debug_cursor = True
+        try:
+            start = len(connection.queries)
+            self.fragment_stats()
+            return len(connection.queries) - start
+        finally:
+            connection.use_debug_cursor = False
+
+
+    def test_cached_rows_no_queries(self):
+        """Cached rows don't load deferred fields; queries don't grow."""
+        self.F.RunFactory.create()
+        one = self.queries()
+        for i in range(5):
+            self.F.RunFactory.create()
+
+        self.assertEqual(self.queries(), one)
+
+
+
+class RunResultsConditionalTest(case.view.AuthenticatedViewTestCase):
+    """Run results list answers conditional GETs."""
+    @property
+    def url(self):
+        """Shortcut for run results url."""
+        return reverse("results_runs")
+
+
+    def test_not_modified(self):
+        """Unchanged list is a 304; a new run makes it a 200."""
+        self.F.RunFactory.create()
+        # the first request logs the user in, which is a write; generations
+        # bumped by a request are bumped again after it
+        self.get()
+        etag = self.get().headers["ETag"]
+
+        self.get(headers={"If-None-Match": etag}, status=304)
+
+        self.F.RunFactory.create()
+        self.get(headers={"If-None-Match": etag}, status=200)
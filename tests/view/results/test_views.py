@@ -1,7 +1,9 @@
 """
-Tests for home results view.
+Tests for home results view and results export.
 
 """
+import json
+
 from django.core.urlresolvers import reverse
 
 from tests import case
@@ -22,3 +24,113 @@ class ResultsHomeViewTest(case.view.AuthenticatedViewTestCase):
 
         self.assertRedirects(
             res, reverse("results_runs") + "?openfinder=1&filter-status=active")
+
+
+
+class ExportRunViewTest(case.view.AuthenticatedViewTestCase):
+    """Tests for run results export view."""
+    def setUp(self):
+        """All tests need a run with a result."""
+        super(ExportRunViewTest, self).setUp()
+        self.testrun = self.F.RunFactory.create()
+        self.result = self.F.ResultFactory.create(
+            runcaseversion__run=self.testrun, status="passed")
+
+
+    @property
+    def url(self):
+        """Shortcut for run export url."""
+        return reverse(
+            "results_run_export", kwargs={"run_id": self.testrun.id})
+
+
+    def test_ndjson(self):
+        """Default format is newline-delimited JSON."""
+        res = self.get(status=200)
+
+        self.assertEqual(res.content_type, "application/x-ndjson")
+        self.assertEqual(
+            res.headers["Content-Disposition"],
+            "attachment; filename=run-%s.ndjson" % self.testrun.id,
+            )
+        [line] = res.body.splitlines()
+        self.assertEqual(json.loads(line)["result_id"], self.result.id)
+
+
+    def test_csv(self):
+        """Can export as CSV."""
+        res = self.get(params={"format": "csv"}, status=200)
+
+        self.assertEqual(res.content_type, "text/csv")
+        header, row = res.body.splitlines()
+        self.assertTrue(header.startswith("result_id,"))
+        self.assertTrue(row.startswith("%s," % self.result.id))
+
+
+    def test_bad_format(self):
+        """An unknown format is a 400."""
+        self.get(params={"format": "xml"}, status=400)
+
+
+    def test_all(self):
+        """Superseded results are included if ``all`` is given."""
+        self.F.ResultFactory.create(
+            runcaseversion=self.result.runcaseversion,
+            environment=self.result.environment,
+            tester=self.result.tester,
+            status="failed",
+            )
+
+        latest = self.get(status=200).body.splitlines()
+        everything = self.get(params={"all": "1"}, status=200).body.splitlines()
+
+        self.assertEqual(len(latest), 1)
+        self.assertEqual(len(everything), 2)
+
+
+    def test_not_found(self):
+        """A nonexistent run is a 404."""
+        self.app.get(
+            reverse("results_run_export", kwargs={"run_id": 9999}),
+            user=self.user,
+            status=404,
+            )
+
+
+
+class ExportProductVersionViewTest(case.view.AuthenticatedViewTestCase):
+    """Tests for product version results export view."""
+    @property
+    def url(self):
+        """Shortcut for product version export url."""
+        return reverse(
+            "results_productversion_export",
+            kwargs={"productversion_id": self.productversion.id},
+            )
+
+
+    def setUp(self):
+        """All tests need a product version."""
+        super(ExportProductVersionViewTest, self).setUp()
+        self.productversion = self.F.ProductVersionFactory.create()
+
+
+    def test_export(self):
+        """Exports results of all runs of the product version."""
+        r1 = self.F.ResultFactory.create(
+            runcaseversion__run__productversion=self.productversion)
+        r2 = self.F.ResultFactory.create(
+            runcaseversion__run__productversion=self.productversion)
+        self.F.ResultFactory.create()
+
+        res = self.get(status=200)
+
+        self.assertEqual(
+            [json.loads(line)["result_id"] for line in res.body.splitlines()],
+            [r1.id, r2.id],
+            )
+        self.assertEqual(
+            res.headers["Content-Disposition"],
+            "attachment; filename=productversion-%s.ndjson"
+            % self.productversion.id,
+            )
@@ -298,6 +298,17 @@ class RunTestsTest(case.view.ListViewTestCase,
         self.assertRedirects(res, "/")
 
 
+    def test_query_budget(self):
+        """A full page of tests stays within the view's query budget."""
+        from moztrap.debug.queries import query_budget
+        for i in range(20):
+            self.F.CaseStepFactory.create(
+                caseversion=self.create_result().runcaseversion.caseversion)
+
+        with query_budget("runtests_run"):
+            self.get()
+
+
     def test_markdown_safe(self):
         """Raw HTML and markdown attributes are escaped."""
         rcv = self.create_rcv(caseversion__description="<script>")
@@ -821,3 +832,150 @@ class RunTestsTest(case.view.ListViewTestCase,
 
         self.assertEqual(result.status, result.STATUS.invalidated)
         self.assertEqual(result.comment, "")
+
+
+
+class NextTestTest(case.view.AuthenticatedViewTestCase,
+                   case.view.NoCacheTest,
+                   ):
+    """Tests for next_test view."""
+    csrf_checks = False
+
+
+    def setUp(self):
+        """These tests all require a test run and envs, and execute perm."""
+        super(NextTestTest, self).setUp()
+        self.testrun = self.F.RunFactory.create(status="active")
+        self.envs = self.F.EnvironmentFactory.create_full_set(
+            {"OS": ["Windows 7", "Ubuntu Linux"]})
+        self.testrun.environments.add(*self.envs)
+        self.add_perm("execute")
+
+
+    @property
+    def url(self):
+        """Shortcut for runtests_next url."""
+        return reverse(
+            "runtests_next",
+            kwargs={"run_id": self.testrun.id, "env_id": self.envs[0].id})
+
+
+    @property
+    def run_url(self):
+        """Shortcut for runtests_run url."""
+        return reverse(
+            "runtests_run",
+            kwargs={"run_id": self.testrun.id, "env_id": self.envs[0].id})
+
+
+    def create_rcv(self, **kwargs):
+        """Create a runcaseversion for this run and sync the work queue."""
+        defaults = {
+            "run": self.testrun,
+            "caseversion__productversion": self.testrun.productversion,
+            "caseversion__case__product": self.testrun.productversion.product,
+            "environments": self.envs,
+            }
+        defaults.update(kwargs)
+        rcv = self.F.RunCaseVersionFactory.create(**defaults)
+        self.testrun._sync_workitems()
+        return rcv
+
+
+    def post(self, data=None, **kwargs):
+        """Shortcut for posting to url; supports `ajax` boolean kwarg."""
+        if kwargs.pop("ajax", False):
+            kwargs.setdefault("headers", {}).setdefault(
+                "X-Requested-With", "XMLHttpRequest")
+        return super(NextTestTest, self).post(data or {}, **kwargs)
+
+
+    def test_never_cache(self):
+        """Responses are marked uncacheable."""
+        res = self.post(status=302)
+
+        self.assertEqual(res.headers["Cache-Control"], "max-age=0")
+
+
+    def test_get_not_allowed(self):
+        """GET doesn't claim a test."""
+        rcv = self.create_rcv()
+
+        self.get(status=405)
+
+        self.assertIsNone(
+            rcv.workitems.get(environment=self.envs[0]).claimed_by)
+
+
+    def test_requires_execute_permission(self):
+        """Requires execute permission."""
+        res = self.app.post(
+            self.url, user=self.F.UserFactory.create(), status=302)
+
+        self.assertRedirects(res, "/")
+
+
+    def test_claim_redirects_to_case(self):
+        """Claims a test and redirects to the run filtered to that case."""
+        rcv = self.create_rcv()
+
+        res = self.post(status=302)
+
+        self.assertRedirects(
+            res,
+            "{0}?filter-id={1}".format(
+                self.run_url, rcv.caseversion.case.id)
+            )
+        self.assertEqual(
+            rcv.workitems.get(environment=self.envs[0]).claimed_by, self.user)
+
+
+    def test_claim_ajax(self):
+        """Ajax claim returns JSON describing the claimed test."""
+        rcv = self.create_rcv(caseversion__name="Foo")
+
+        res = self.post(ajax=True, status=200)
+
+        self.assertEqual(res.json["runcaseversion_id"], rcv.id)
+        self.assertEqual(res.json["case_id"], rcv.caseversion.case.id)
+        self.assertEqual(res.json["name"], "Foo")
+
+
+    def test_nothing_left(self):
+        """With nothing left to claim, redirects to the run with message."""
+        res = self.post(status=302)
+
+        self.assertRedirects(res, self.run_url)
+        res.follow().mustcontain("no unclaimed tests left")
+
+
+    def test_nothing_left_ajax(self):
+        """With nothing left to claim, ajax gets null runcaseversion."""
+        res = self.post(ajax=True, status=200)
+
+        self.assertIsNone(res.json["runcaseversion_id"])
+
+
+    def test_inactive_run(self):
+        """An inactive run redirects to run selection."""
+        self.testrun.deactivate()
+
+        res = self.post(status=302)
+
+        self.assertRedirects(res, reverse("runtests"))
+
+
+    def test_bad_environment(self):
+        """An environment not in the run redirects to environment selection."""
+        env = self.F.EnvironmentFactory.create()
+        url = reverse(
+            "runtests_next",
+            kwargs={"run_id": self.testrun.id, "env_id": env.id})
+
+        res = self.app.post(url, user=self.user, status=302)
+
+        self.assertRedirects(
+            res,
+            reverse(
+                "runtests_environment", kwargs={"run_id": self.testrun.id})
+            )
@@ -1,5 +1,5 @@
 """
-Tests for home view.
+Tests for home and filter-options views.
 
 """
 from django.core.urlresolvers import reverse
@@ -29,3 +29,97 @@ class HomeViewTest(case.view.AuthenticatedViewTestCase):
         res = self.get(status=302)
 
         self.assertRedirects(res, reverse("results_runs"))
+
+
+
+class FilterOptionsTest(case.view.AuthenticatedViewTestCase,
+                        case.view.NoCacheTest,
+                        ):
+    """Tests for lazy filter options view."""
+    @property
+    def url(self):
+        """Shortcut for filter-options url."""
+        return reverse("filter_options")
+
+
+    def get(self, **kwargs):
+        """Get options of manage-cases tag filter, or of filter in params."""
+        params = {"path": "/manage/cases/", "key": "tag"}
+        params.update(kwargs.pop("params", {}))
+        return super(FilterOptionsTest, self).get(params=params, **kwargs)
+
+
+    def setUp(self):
+        """Start with an empty cache."""
+        super(FilterOptionsTest, self).setUp()
+        from moztrap.model import cache
+        cache.get_backend().clear()
+
+
+    def test_matching_options_json(self):
+        """Returns page of matching options as suggestions in JSON."""
+        t = self.F.TagFactory.create(name="FooBar")
+        self.F.TagFactory.create(name="baz")
+
+        res = self.get(params={"text": "oob"})
+
+        self.assertEqual(
+            res.json,
+            {
+                "suggestions": [
+                    {
+                        "id": t.id,
+                        "name": "FooBar",
+                        "preText": "F",
+                        "typedText": "ooB",
+                        "postText": "ar",
+                        "type": "tag",
+                        "displayType": "tag",
+                        "counted": True,
+                        "count": 0,
+                        }
+                    ],
+                "more": False,
+                }
+            )
+
+
+    def test_counts(self):
+        """Suggestions have counts of items, given the list's filters."""
+        t = self.F.TagFactory.create(name="foo")
+        for status in ["active", "active", "draft"]:
+            cv = self.F.CaseVersionFactory.create(status=status)
+            cv.tags.add(t)
+
+        res = self.get(params={"text": "foo", "filter-status": "active"})
+
+        self.assertEqual(res.json["suggestions"][0]["count"], 2)
+
+
+    def test_not_counted(self):
+        """Suggestions of a filter the list doesn't count have no counts."""
+        self.F.UserFactory.create(username="foo")
+
+        res = self.get(
+            params={"path": "/manage/products/", "key": "creator"})
+
+        self.assertNotIn("count", res.json["suggestions"][0])
+
+
+    def test_page(self):
+        """Later pages can be requested."""
+        self.F.TagFactory.create(name="foo")
+
+        res = self.get(params={"page": "2"})
+
+        self.assertEqual(res.json, {"suggestions": [], "more": False})
+
+
+    def test_not_lazy(self):
+        """404 for a filter that isn't lazy."""
+        self.get(params={"key": "product"}, status=404)
+
+
+    def test_unknown_path(self):
+        """404 for a path that isn't a filtered list view."""
+        self.get(params={"path": "/nonexistent/"}, status=404)
@@ -0,0 +1,196 @@
+"""
+Tests for conditional GET view utilities.
+
+"""
+from django.http import HttpResponse, HttpResponseNotFound
+from django.test import RequestFactory
+
+from mock import Mock
+
+from tests import case
+
+
+
+class ConditionalTest(case.DBTestCase):
+    """Tests for conditional view decorator."""
+    @property
+    def conditional(self):
+        """The decorator-factory under test."""
+        from moztrap.view.utils.conditional import conditional
+        return conditional
+
+
+    def setUp(self):
+        """Count calls to the decorated view."""
+        super(ConditionalTest, self).setUp()
+        self.calls = 0
+
+
+    def view(self, *dependencies, **kwargs):
+        """Return simple view depending on ``dependencies``."""
+        @self.conditional(*dependencies, **kwargs)
+        def view(request, *args, **kwargs):
+            self.calls += 1
+            return HttpResponse("content")
+
+        return view
+
+
+    def request(self, etag=None, method="get", **kwargs):
+        """Return request, with given If-None-Match header."""
+        if etag is not None:
+            kwargs["HTTP_IF_NONE_MATCH"] = etag
+        request = getattr(RequestFactory(), method)("/", **kwargs)
+        request.user = self.F.UserFactory.create()
+        return request
+
+
+    def test_sets_etag(self):
+        """Response has an ETag."""
+        response = self.view("core.Product")(self.request())
+
+        self.assertTrue(response["ETag"])
+        self.assertEqual(response.content, "content")
+
+
+    def test_not_modified(self):
+        """Matching If-None-Match gets a 304, without calling the view."""
+        view = self.view("core.Product")
+        request = self.request()
+        etag = view(request)["ETag"]
+        request.META["HTTP_IF_NONE_MATCH"] = etag
+
+        response = view(request)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(self.calls, 1)
+
+
+    def test_modified(self):
+        """After a dependency changes, the old ETag doesn't match."""
+        view = self.view("core.Product")
+        request = self.request()
+        request.META["HTTP_IF_NONE_MATCH"] = view(request)["ETag"]
+
+        self.F.ProductFactory.create()
+        response = view(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.calls, 2)
+
+
+    def test_modified_after_commit(self):
+        """An ETag handed out before a write commits doesn't match after."""
+        from moztrap.model import cache
+        cache.discard_pending()
+        view = self.view("core.Product")
+        self.F.ProductFactory.create()
+        # e.g. another request, reading the pre-commit data
+        request = self.request()
+        request.META["HTTP_IF_NONE_MATCH"] = view(request)["ETag"]
+
+        cache.flush_pending()
+        response = view(request)
+
+        self.assertEqual(response.status_code, 200)
+
+
+    def test_objects(self):
+        """``objects`` callable gets the view's arguments."""
+        p = self.F.ProductFactory.create()
+        view = self.view(objects=lambda product_id: [(type(p), product_id)])
+        request = self.request()
+        request.META["HTTP_IF_NONE_MATCH"] = view(
+            request, product_id=p.id)["ETag"]
+
+        self.F.ProductFactory.create()
+        self.assertEqual(view(request, product_id=p.id).status_code, 304)
+
+        p.save()
+        self.assertEqual(view(request, product_id=p.id).status_code, 200)
+
+
+    def test_varies_with_user(self):
+        """Different users get different ETags."""
+        view = self.view("core.Product")
+
+        self.assertNotEqual(
+            view(self.request())["ETag"], view(self.request())["ETag"])
+
+
+    def test_varies_with_ajax(self):
+        """Ajax and non-Ajax requests get different ETags."""
+        view = self.view("core.Product")
+        request = self.request()
+        ajax_request = self.request(HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        ajax_request.user = request.user
+
+        self.assertNotEqual(view(request)["ETag"], view(ajax_request)["ETag"])
+
+
+    def test_post(self):
+        """No ETag for a POST."""
+        response = self.view("core.Product")(self.request(method="post"))
+
+        self.assertFalse(response.has_header("ETag"))
+
+
+    def test_messages(self):
+        """No ETag if there are messages waiting to be shown."""
+        request = self.request()
+        request._messages = [Mock()]
+
+        response = self.view("core.Product")(request)
+
+        self.assertFalse(response.has_header("ETag"))
+
+
+    def test_error(self):
+        """No ETag on an error response."""
+        @self.conditional("core.Product")
+        def view(request):
+            return HttpResponseNotFound()
+
+        self.assertFalse(view(self.request()).has_header("ETag"))
+
+
+
+class CacheBumpMiddlewareTest(case.DBTestCase):
+    """Tests for CacheBumpMiddleware."""
+    def setUp(self):
+        """Create the middleware; start with an empty model cache."""
+        super(CacheBumpMiddlewareTest, self).setUp()
+        from moztrap.model import cache
+        from moztrap.view.utils.conditional import CacheBumpMiddleware
+        self.cache = cache
+        cache.get_backend().clear()
+        cache.discard_pending()
+        self.middleware = CacheBumpMiddleware()
+
+
+    def test_bumps_after_response(self):
+        """Generations bumped during the request are bumped again after."""
+        request = RequestFactory().post("/")
+        self.middleware.process_request(request)
+        self.F.ProductFactory.create()
+        during = self.cache.generations([self.model.Product])
+
+        response = self.middleware.process_response(request, HttpResponse())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(
+            self.cache.generations([self.model.Product]), during)
+
+
+    def test_discards_leftovers(self):
+        """Bumps pending from before the request aren't its business."""
+        self.F.ProductFactory.create()
+        before = self.cache.generations([self.model.Product])
+        request = RequestFactory().get("/")
+
+        self.middleware.process_request(request)
+        self.middleware.process_response(request, HttpResponse())
+
+        self.assertEqual(
+            self.cache.generations([self.model.Product]), before)
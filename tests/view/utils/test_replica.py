@@ -0,0 +1,139 @@
+"""
+Tests for read-replica view utilities.
+
+"""
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from mock import patch
+
+from tests import case
+
+
+
+class ReplicaMiddlewareTest(case.TestCase):
+    """Tests for ReplicaMiddleware."""
+    @property
+    def replica(self):
+        """The module under test."""
+        from moztrap.view.utils import replica
+        return replica
+
+
+    def setUp(self):
+        """Configure a replica, and record the replica views read from."""
+        from moztrap.deploy import routers
+        self.routers = routers
+        patcher = patch.object(settings, "DATABASE_REPLICAS", ["replica"])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(routers.reset)
+        self.middleware = self.replica.ReplicaMiddleware()
+        self.read_from = []
+
+
+    def view(self, read_replica=True, write=False):
+        """Return a view, recording which replica it reads from."""
+        def view(request):
+            self.read_from.append(self.routers.current_replica())
+            if write:
+                self.routers.ReplicaRouter().db_for_write(None)
+            return HttpResponse("content")
+
+        if read_replica:
+            view = self.replica.read_replica(view)
+        return view
+
+
+    def get(self, view, request=None):
+        """Pass ``request`` (default a GET) to ``view`` via the middleware."""
+        if request is None:
+            request = RequestFactory().get("/")
+        self.assertIs(self.middleware.process_request(request), None)
+        self.assertIs(
+            self.middleware.process_view(request, view, (), {}), None)
+        response = view(request)
+        return self.middleware.process_response(request, response)
+
+
+    def test_not_used(self):
+        """Middleware isn't used if there are no replicas."""
+        with patch.object(settings, "DATABASE_REPLICAS", []):
+            with self.assertRaises(MiddlewareNotUsed):
+                self.replica.ReplicaMiddleware()
+
+
+    def test_replica(self):
+        """GET of a read_replica view reads from a replica."""
+        self.get(self.view())
+
+        self.assertEqual(self.read_from, ["replica"])
+
+
+    def test_back_to_primary(self):
+        """Reads go back to the primary after the response."""
+        self.get(self.view())
+
+        self.assertIs(self.routers.current_replica(), None)
+
+
+    def test_unmarked_view(self):
+        """GET of a view not marked read_replica reads from the primary."""
+        self.get(self.view(read_replica=False))
+
+        self.assertEqual(self.read_from, [None])
+
+
+    def test_post(self):
+        """A POST reads from the primary."""
+        self.get(self.view(), RequestFactory().post("/"))
+
+        self.assertEqual(self.read_from, [None])
+
+
+    def test_pinned(self):
+        """A client with the pin cookie reads from the primary."""
+        request = RequestFactory().get("/")
+        request.COOKIES[self.replica.PIN_COOKIE] = "1"
+        self.get(self.view(), request)
+
+        self.assertEqual(self.read_from, [None])
+
+
+    def test_write_pins(self):
+        """A request that writes sets the pin cookie."""
+        response = self.get(self.view(write=True), RequestFactory().post("/"))
+
+        cookie = response.cookies[self.replica.PIN_COOKIE]
+        self.assertEqual(cookie["max-age"], settings.REPLICA_LAG_SECONDS)
+
+
+    def test_no_write_no_pin(self):
+        """A request that doesn't write doesn't set the pin cookie."""
+        response = self.get(self.view())
+
+        self.assertNotIn(self.replica.PIN_COOKIE, response.cookies)
+
+
+    def test_results_views(self):
+        """The results lists are marked read_replica."""
+        from moztrap.view.results.runs.views import runs_list
+        from moztrap.view.results.runcaseversions.views import (
+            runcaseversions_list)
+        from moztrap.view.results.results.views import results_list
+
+        for view in [runs_list, runcaseversions_list, results_list]:
+            self.assertTrue(getattr(view, "read_replica", False))
+
+
+    def test_api(self):
+        """Resources with Meta.read_replica have views marked read_replica."""
+        from moztrap.model.execution.api import RunResource, ResultResource
+
+        self.assertTrue(
+            RunResource().wrap_view("dispatch_list").read_replica)
+        self.assertFalse(
+            hasattr(ResultResource().wrap_view("dispatch_list"),
+                    "read_replica"))